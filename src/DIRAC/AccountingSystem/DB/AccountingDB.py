@@ -4,6 +4,7 @@ import datetime
 import time
 import threading
 import random
+from decimal import Decimal
 
 from DIRAC.Core.Base.DB import DB
 from DIRAC import S_OK, S_ERROR, gConfig
@@ -29,6 +30,8 @@ class AccountingDB(DB):
         self.dbCatalog = {}
         self.dbBucketsLength = {}
         self.__keysCache = {}
+        self.__insertionStatsLock = threading.Lock()
+        self.__insertionStats = {"Records": 0, "BucketContributions": 0, "BucketWrites": 0, "Fallbacks": 0}
         maxParallelInsertions = self.getCSOption("ParallelRecordInsertions", 10)
         self.__threadPool = ThreadPool(1, maxParallelInsertions)
         self.__threadPool.daemonize()
@@ -175,6 +178,8 @@ class AccountingDB(DB):
         pending = 0
         now = TimeUtilities.toEpoch()
         recordsPerSlot = self.getCSOption("RecordsPerSlot", 100)
+        # Records whose contributions to the buckets are combined before being written
+        recordsPerAggregation = max(1, self.getCSOption("RecordsPerAggregation", 1000))
         for typeName in self.dbCatalog:
             self.log.info("[PENDING] Checking %s" % typeName)
             pendingInQueue = self.__threadPool.pendingJobs()
@@ -215,7 +220,7 @@ class AccountingDB(DB):
                 )
                 self.__doingPendingLockTime = 0
                 return result
-            # Group them in groups of 10
+            # Group them, each group is written at once
             recordsToProcess = []
             for record in dbData:
                 pending += 1
@@ -224,15 +229,42 @@ class AccountingDB(DB):
                 endTime = record[-1]
                 valuesList = list(record[1:-2])
                 recordsToProcess.append((iD, typeName, startTime, endTime, valuesList, now))
-                if len(recordsToProcess) % recordsPerSlot == 0:
+                if len(recordsToProcess) % recordsPerAggregation == 0:
                     self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable, args=(recordsToProcess,))
                     recordsToProcess = []
             if recordsToProcess:
                 self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable, args=(recordsToProcess,))
         self.log.info("[PENDING] Got %s records requests for all types" % pending)
+        stats = self.getInsertionStatistics()["Value"]
+        self.log.info(
+            "[PENDING] Insertion statistics",
+            "%s records, %s bucket contributions written in %s buckets (ratio %.1f), %s fallbacks"
+            % (
+                stats["Records"],
+                stats["BucketContributions"],
+                stats["BucketWrites"],
+                stats["CompressionRatio"],
+                stats["Fallbacks"],
+            ),
+        )
         self.__doingPendingLockTime = 0
         return S_OK()
 
+    def getInsertionStatistics(self):
+        """
+        Get the statistics of the insertion of the records in the buckets
+
+        :return: S_OK(dict) with the number of Records inserted, their BucketContributions, the number of
+                 BucketWrites they were combined into and the CompressionRatio between both, and the
+                 number of Fallbacks to the insertion record by record
+        """
+        with self.__insertionStatsLock:
+            stats = dict(self.__insertionStats)
+        stats["CompressionRatio"] = (
+            float(stats["BucketContributions"]) / stats["BucketWrites"] if stats["BucketWrites"] else 0.0
+        )
+        return S_OK(stats)
+
     def __addToCatalog(self, typeName, keyFields, valueFields, bucketsLength):
         """
         Add type to catalog
@@ -601,9 +633,30 @@ class AccountingDB(DB):
         Do the real insert and delete from the in buffer table
         """
         self.log.verbose("Received bundle to process", "of %s elements" % len(recordTuples))
+        recordsPerType = {}
+        for record in recordTuples:
+            recordsPerType.setdefault(record[1], []).append(record)
+        for typeName, records in recordsPerType.items():
+            result = self.__insertRecordsCombined(typeName, records)
+            if result["OK"]:
+                idList = ", ".join(str(record[0]) for record in records)
+                result = self._update("DELETE FROM `%s` WHERE id in (%s)" % (_getTableName("in", typeName), idList))
+                if not result["OK"]:
+                    self.log.error("Can't delete rows from the IN table", result["Message"])
+                continue
+            # One of the records may be wrong: insert them one by one
+            self.log.warn("Can't insert the records together, inserting them one by one", result["Message"])
+            with self.__insertionStatsLock:
+                self.__insertionStats["Fallbacks"] += 1
+            self.__insertRecordsOneByOne(records)
+
+    def __insertRecordsOneByOne(self, recordTuples):
+        """
+        Insert the records and delete them from the in buffer table, one at a time
+        """
         for record in recordTuples:
             iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
-            result = self.insertRecordDirectly(typeName, startTime, endTime, valuesList)
+            result = self.insertRecordDirectly(typeName, startTime, endTime, list(valuesList))
             if not result["OK"]:
                 self._update("UPDATE `%s` SET taken=0 WHERE id=%s" % (_getTableName("in", typeName), iD))
                 self.log.error("Can't insert row", result["Message"])
@@ -612,6 +665,95 @@ class AccountingDB(DB):
             if not result["OK"]:
                 self.log.error("Can't delete row from the IN table", result["Message"])
 
+    def __insertRecordsCombined(self, typeName, recordTuples):
+        """
+        Insert several records of a type in a single transaction. The contributions of the records to
+        the same bucket (same keys, start time and length) are summed before being written, so that
+        each bucket is written once, with a few multi-rows statements.
+        """
+        if self.__readOnly:
+            return S_ERROR("ReadOnly mode enabled. No modification allowed")
+        if typeName not in self.dbCatalog:
+            return S_ERROR("Type %s has not been defined in the db" % typeName)
+        keyFields = self.dbCatalog[typeName]["keys"]
+        valueFields = self.dbCatalog[typeName]["values"]
+        numKeys = len(keyFields)
+        nowEpoch = int(TimeUtilities.toEpoch())
+        typeRows = []
+        # ( startTime, bucketLength, key ids ) -> [ values, entriesInBucket ]
+        buckets = {}
+        nContributions = 0
+        for record in recordTuples:
+            startTime, endTime, valuesList = record[2:5]
+            if len(valuesList) != numKeys + len(valueFields):
+                return S_ERROR("Fields mismatch for record %s" % typeName)
+            valuesList = list(valuesList)
+            # Discover key indexes
+            for keyPos, keyName in enumerate(keyFields):
+                retVal = self.__addKeyValue(typeName, keyName, valuesList[keyPos])
+                if not retVal["OK"]:
+                    return retVal
+                valuesList[keyPos] = retVal["Value"]
+            typeRows.append(valuesList + [startTime, endTime])
+            # HACK: One more value to count the total entries
+            values = [Decimal(str(value)) for value in valuesList[numKeys:]] + [Decimal(1)]
+            for bucketStartTime, bucketProportion, bucketLength in self.calculateBuckets(
+                typeName, startTime, endTime, nowEpoch
+            ):
+                bucketKey = (bucketStartTime, bucketLength) + tuple(valuesList[:numKeys])
+                proportion = Decimal(str(bucketProportion))
+                bucketValues = buckets.setdefault(bucketKey, [Decimal(0)] * len(values))
+                for pos, value in enumerate(values):
+                    bucketValues[pos] += value * proportion
+                nContributions += 1
+
+        # Always write the buckets in the same order, to avoid dead locks between the insertion threads
+        bucketRows = [list(bucketKey) + bucketValues for bucketKey, bucketValues in sorted(buckets.items())]
+        bucketFields = ["startTime", "bucketLength"] + keyFields + valueFields + ["entriesInBucket"]
+        for _i in range(max(1, self.__deadLockRetries)):
+            retVal = self._getConnection()
+            if not retVal["OK"]:
+                return retVal
+            connObj = retVal["Value"]
+            try:
+                retVal = self.__startTransaction(connObj)
+                if not retVal["OK"]:
+                    return retVal
+                retVal = self.insertMany(
+                    _getTableName("type", typeName), self.dbCatalog[typeName]["typeFields"], typeRows, conn=connObj
+                )
+                if retVal["OK"]:
+                    retVal = self.upsertMany(
+                        _getTableName("bucket", typeName),
+                        bucketFields,
+                        bucketRows,
+                        incrementFields=valueFields + ["entriesInBucket"],
+                        conn=connObj,
+                    )
+                if retVal["OK"]:
+                    retVal = self.__commitTransaction(connObj)
+                    if retVal["OK"]:
+                        break
+                self.__rollbackTransaction(connObj)
+            finally:
+                connObj.close()
+            # If failed because of dead lock try restarting
+            if "try restarting transaction" not in retVal["Message"]:
+                return retVal
+        if not retVal["OK"]:
+            return retVal
+
+        with self.__insertionStatsLock:
+            self.__insertionStats["Records"] += len(recordTuples)
+            self.__insertionStats["BucketContributions"] += nContributions
+            self.__insertionStats["BucketWrites"] += len(bucketRows)
+        self.log.verbose(
+            "Inserted records",
+            "%s records of %s, %s bucket contributions in %s buckets"
+            % (len(recordTuples), typeName, nContributions, len(bucketRows)),
+        )
+        return S_OK()
+
     def insertRecordDirectly(self, typeName, startTime, endTime, valuesList):
         """
         Add an entry to the type contents
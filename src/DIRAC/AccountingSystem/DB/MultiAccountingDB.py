@@ -96,3 +96,17 @@ class MultiAccountingDB(object):
             if not res["OK"]:
                 end = res
         return end
+
+    def getInsertionStatistics(self):
+        """Get the statistics of the insertion of the records in the buckets, summed over all the DBs
+
+        :return: S_OK(dict) see AccountingDB.getInsertionStatistics
+        """
+        stats = {}
+        for db in self.__allDBs.values():
+            for key, value in db.getInsertionStatistics()["Value"].items():
+                stats[key] = stats.get(key, 0) + value
+        stats["CompressionRatio"] = (
+            float(stats["BucketContributions"]) / stats["BucketWrites"] if stats.get("BucketWrites") else 0.0
+        )
+        return S_OK(stats)
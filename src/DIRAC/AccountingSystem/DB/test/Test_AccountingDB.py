@@ -3,9 +3,12 @@
 # pylint: disable=protected-access
 
 # imports
+import time
 import unittest
+from decimal import Decimal
 from mock import MagicMock
 
+from DIRAC import S_OK, S_ERROR
 import DIRAC.AccountingSystem.DB.AccountingDB as moduleTested
 
 
@@ -417,6 +420,68 @@ ORDER BY startTime"
         self.assertEqual(retVal, expectedQuery)
 
 
+class InsertRecords(TestCase):
+    """testing the combined insertion of the records in the buckets"""
+
+    def test_insertRecordsCombined(self):
+        module = self.testClass()
+        typeName = "LHCb-Certification_Test"
+        module.dbCatalog = {
+            typeName: {
+                "keys": ["User"],
+                "values": ["Size"],
+                "typeFields": ["User", "Size", "startTime", "endTime"],
+            }
+        }
+        module.dbBucketsLength[typeName] = [(31104000, 3600)]
+        keyIds = {"alice": 1, "bob": 2}
+        module._AccountingDB__addKeyValue = lambda _typeName, _keyName, keyValue: S_OK(keyIds[keyValue])
+        module._getConnection = MagicMock(return_value=S_OK(MagicMock()))
+        module._query = MagicMock(return_value=S_OK())
+        module.insertMany = MagicMock(return_value=S_OK(4))
+        module.upsertMany = MagicMock(return_value=S_OK(3))
+
+        hour = (int(time.time()) // 3600 - 1) * 3600
+        records = [
+            (1, typeName, hour, hour, ["alice", 10], 0),
+            (2, typeName, hour + 10, hour + 10, ["alice", 5], 0),
+            (3, typeName, hour + 10, hour + 20, ["bob", 1], 0),
+            # Half in the next bucket
+            (4, typeName, hour + 3000, hour + 4200, ["alice", 4], 0),
+        ]
+        result = module._AccountingDB__insertRecordsCombined(typeName, records)
+        self.assertTrue(result["OK"], result)
+
+        self.assertEqual(len(module.insertMany.call_args[0][2]), 4)
+        self.assertEqual(records[0][4], ["alice", 10])
+        args, kwargs = module.upsertMany.call_args
+        self.assertEqual(args[1], ["startTime", "bucketLength", "User", "Size", "entriesInBucket"])
+        self.assertEqual(
+            args[2],
+            [
+                [hour, 3600, 1, 17, Decimal("2.5")],
+                [hour, 3600, 2, 1, 1],
+                [hour + 3600, 3600, 1, 2, Decimal("0.5")],
+            ],
+        )
+        self.assertEqual(kwargs["incrementFields"], ["Size", "entriesInBucket"])
+
+        stats = module.getInsertionStatistics()["Value"]
+        self.assertEqual(stats["Records"], 4)
+        self.assertEqual(stats["BucketContributions"], 5)
+        self.assertEqual(stats["BucketWrites"], 3)
+
+        # A dead lock, then an error: nothing is counted
+        module.upsertMany.side_effect = [
+            S_ERROR("Deadlock found when trying to get lock; try restarting transaction"),
+            S_ERROR("Out of range value"),
+        ]
+        result = module._AccountingDB__insertRecordsCombined(typeName, records)
+        self.assertFalse(result["OK"])
+        self.assertEqual(module.upsertMany.call_count, 3)
+        self.assertEqual(module.getInsertionStatistics()["Value"]["Records"], 4)
+
+
 #############################################################################
 # Test Suite run
 #############################################################################
@@ -425,4 +490,5 @@ ORDER BY startTime"
 if __name__ == "__main__":
     suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestCase)
     suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MakeQuery))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(InsertRecords))
     testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -38,6 +38,17 @@ class CSJSONClient(TornadoClient):
             retVal["Value"]["data"] = b64decode(retVal["Value"]["data"])
         return retVal
 
+    def getPatchIfNewer(self, sClientVersion):
+        """
+        Transmit request to service, decode base64 data if the whole configuration is sent.
+
+        :returns: Modifications to apply or configuration data, compressed, if changed
+        """
+        retVal = self.executeRPC("getPatchIfNewer", sClientVersion)
+        if retVal["OK"] and "data" in retVal["Value"]:
+            retVal["Value"]["data"] = b64decode(retVal["Value"]["data"])
+        return retVal
+
     def commitNewData(self, sData):
         """
         Transmit request to service by encoding data in base64.
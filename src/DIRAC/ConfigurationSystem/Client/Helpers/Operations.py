@@ -71,25 +71,96 @@
 
 """
 import os
-import _thread
 from diraccfg import CFG
 from DIRAC import S_OK, S_ERROR, gConfig
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry, CSGlobals
 from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
 from DIRAC.Core.Security.ProxyInfo import getVOfromProxyGroup
-from DIRAC.Core.Utilities import LockRing
+from DIRAC.Core.Utilities import List, LockRing
 from DIRAC.Core.Utilities.DErrno import ESECTION
 
 
+def _castOption(optionValue, defaultValue):
+    """Cast the value of an option to the type of the default value, as CFG.getOption does
+
+    :param optionValue: value of the option, None if it does not exist or is a section
+    :param defaultValue: default value
+    """
+    if optionValue is None:
+        optionValue = defaultValue
+    if optionValue == defaultValue:
+        return defaultValue if defaultValue is None or isinstance(defaultValue, type) else optionValue
+    if defaultValue is None:
+        return optionValue
+
+    defaultType = defaultValue if isinstance(defaultValue, type) else type(defaultValue)
+    try:
+        if defaultType == list:
+            return List.fromChar(optionValue, ",")
+        if defaultType == bool:
+            return optionValue.lower() in ("y", "yes", "true", "1")
+        return defaultType(optionValue)
+    except Exception:
+        return defaultValue
+
+
+class OperationsSnapshot(object):
+    """The /Operations sections merged for a VO and a setup, flattened so that an option or a section
+    is found with a single dictionary lookup
+    """
+
+    def __init__(self, cfg):
+        """c'tor
+
+        :param cfg: merged CFG of the Operations sections, not to be modified afterwards
+        """
+        self.cfg = cfg
+        # Path -> option value or section CFG
+        self.entries = {}
+        self.__flatten(cfg, "")
+
+    def __flatten(self, cfg, path):
+        for key in cfg.listAll():
+            value = cfg[key]
+            keyPath = "%s/%s" % (path, key) if path else key
+            self.entries[keyPath] = value
+            if isinstance(value, CFG):
+                self.__flatten(value, keyPath)
+
+    def get(self, path):
+        """Get an entry of the snapshot
+
+        :param str path: path relative to the Operations section
+        :return: value of the option, CFG of the section or None if the path does not exist
+        """
+        entry = self.entries.get(path)
+        if entry is None:
+            path = "/".join(List.fromChar(path, "/"))
+            if not path:
+                return self.cfg
+            entry = self.entries.get(path)
+        return entry
+
+    def getOption(self, optionPath, defaultValue=None):
+        """Get the value of an option, with the semantic of CFG.getOption"""
+        value = self.get(optionPath)
+        return _castOption(value if isinstance(value, str) else None, defaultValue)
+
+
 class Operations(object):
     """Operations class
 
-    The /Operations CFG section is maintained in a cache by an Operations object
+    The /Operations CFG sections are merged for each VO and setup in a snapshot shared by all the
+    Operations objects. The snapshots are rebuilt when the configuration changes (that is when the cache key
+    of gConfigurationData changes) and are used without any lock otherwise.
     """
 
-    __cache = {}
-    __cacheVersion = 0
+    # (cache key of the configuration the snapshots were built from, {(vo, setup): OperationsSnapshot}),
+    # replaced as a whole
+    __snapshots = (None, {})
     __cacheLock = LockRing.LockRing().getLock()
+    # Use of the snapshots, not protected by a lock so only approximate
+    __statistics = {"Hits": 0, "Misses": 0}
 
     def __init__(self, vo=False, group=False, setup=False):
         """c'tor
@@ -127,32 +198,50 @@ class Operations(object):
             self.__setup = CSGlobals.getSetup()
 
     def __getCache(self):
-        Operations.__cacheLock.acquire()
-        try:
-            currentVersion = gConfigurationData.getVersion()
-            if currentVersion != Operations.__cacheVersion:
-                Operations.__cache = {}
-                Operations.__cacheVersion = currentVersion
-
-            cacheKey = (self.__vo, self.__setup)
-            if cacheKey in Operations.__cache:
-                return Operations.__cache[cacheKey]
-
-            mergedCFG = CFG()
+        """Get the snapshot of the Operations sections for the VO and the setup
 
-            for path in self.__getSearchPaths():
-                pathCFG = gConfigurationData.mergedCFG[path]
-                if pathCFG:
-                    mergedCFG = mergedCFG.mergeWith(pathCFG)
-
-            Operations.__cache[cacheKey] = mergedCFG
-
-            return Operations.__cache[cacheKey]
-        finally:
-            try:
-                Operations.__cacheLock.release()
-            except _thread.error:
-                pass
+        :return: OperationsSnapshot
+        """
+        cacheKey = gConfigurationData.getCacheKey()
+        snapshotsKey, snapshots = Operations.__snapshots
+        if snapshotsKey == cacheKey:
+            snapshot = snapshots.get((self.__vo, self.__setup))
+            if snapshot is not None:
+                Operations.__statistics["Hits"] += 1
+                return snapshot
+
+        with Operations.__cacheLock:
+            Operations.__statistics["Misses"] += 1
+            cacheKey = gConfigurationData.getCacheKey()
+            csCFG = gConfigurationData.mergedCFG
+            snapshotsKey, snapshots = Operations.__snapshots
+            if snapshotsKey != cacheKey:
+                snapshots = {}
+            # The search paths may set the VO
+            searchPaths = self.__getSearchPaths()
+            snapshotKey = (self.__vo, self.__setup)
+            snapshot = snapshots.get(snapshotKey)
+            if snapshot is None:
+                mergedCFG = CFG()
+                for path in searchPaths:
+                    pathCFG = csCFG[path]
+                    if pathCFG:
+                        mergedCFG = mergedCFG.mergeWith(pathCFG)
+                snapshot = OperationsSnapshot(mergedCFG)
+                snapshots = dict(snapshots)
+                snapshots[snapshotKey] = snapshot
+                Operations.__snapshots = (cacheKey, snapshots)
+            return snapshot
+
+    @classmethod
+    def getCacheStatistics(cls):
+        """Get the use of the snapshots of the Operations sections
+
+        :return: dict with the number of Hits and Misses of the snapshots and the number of Snapshots
+        """
+        stats = dict(cls.__statistics)
+        stats["Snapshots"] = len(cls.__snapshots[1])
+        return stats
 
     def __getSearchPaths(self):
         paths = ["/Operations/Defaults", "/Operations/%s" % self.__setup]
@@ -169,11 +258,9 @@ class Operations(object):
         return self.__getCache().getOption(optionPath, defaultValue)
 
     def __getCFG(self, sectionPath):
-        cacheCFG = self.__getCache()
-        section = cacheCFG.getRecursive(sectionPath)
-        if not section:
+        sectionCFG = self.__getCache().get(sectionPath)
+        if sectionCFG is None:
             return S_ERROR(ESECTION, "%s in Operations does not exist" % sectionPath)
-        sectionCFG = section["value"]
         if isinstance(sectionCFG, str):
             return S_ERROR("%s in Operations is not a section" % sectionPath)
         return S_OK(sectionCFG)
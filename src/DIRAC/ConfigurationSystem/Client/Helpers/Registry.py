@@ -1,9 +1,15 @@
 """ Helper for /Registry section
+
+    The reverse lookups (DN -> user, ID -> user, DN -> host, user/property/VO -> groups) use indexes
+    of the /Registry section, built at the first lookup after each change of the configuration
+    (see ConfigurationData.getCacheKey) and dropped when a new version of the configuration is received.
 """
 import errno
+import threading
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import getVO
 
 ID_DN_PREFIX = "/O=DIRAC/CN="
@@ -12,6 +18,75 @@ ID_DN_PREFIX = "/O=DIRAC/CN="
 
 gBaseRegistrySection = "/Registry"
 
+# Group options indexed by value
+__indexedGroupOptions = ("Users", "Properties", "VO")
+# The indexes and the cache key of the configuration they were built from
+__registryIndex = {"CacheKey": None}
+__registryIndexLock = threading.Lock()
+
+
+def __buildRegistryIndex():
+    """Build the reverse lookup tables of the /Registry section
+
+    :return: dict
+    """
+    usersForDN = {}
+    usersForID = {}
+    for username in getAllUsers():
+        for dn in gConfig.getValue("%s/Users/%s/DN" % (gBaseRegistrySection, username), []):
+            usersForDN.setdefault(dn, []).append(username)
+        for userID in gConfig.getValue("%s/Users/%s/ID" % (gBaseRegistrySection, username), []):
+            usersForID.setdefault(userID, []).append(username)
+    hostsForDN = {}
+    for hostname in getHosts().get("Value", []):
+        for dn in gConfig.getValue("%s/Hosts/%s/DN" % (gBaseRegistrySection, hostname), []):
+            hostsForDN.setdefault(dn, []).append(hostname)
+    groupsWithOption = {optionName: {} for optionName in __indexedGroupOptions}
+    for group in getAllGroups():
+        for optionName, groupsForValue in groupsWithOption.items():
+            for value in gConfig.getValue("%s/Groups/%s/%s" % (gBaseRegistrySection, group, optionName), []):
+                groups = groupsForValue.setdefault(value, [])
+                if group not in groups:
+                    groups.append(group)
+    for groupsForValue in groupsWithOption.values():
+        for groups in groupsForValue.values():
+            groups.sort()
+    return {
+        "UsersForDN": usersForDN,
+        "UsersForID": usersForID,
+        "HostsForDN": hostsForDN,
+        "GroupsWithOption": groupsWithOption,
+    }
+
+
+def __getRegistryIndex():
+    """Get the reverse lookup tables of the /Registry section, up to date with the configuration
+
+    :return: dict
+    """
+    global __registryIndex
+    cacheKey = gConfigurationData.getCacheKey()
+    index = __registryIndex
+    if index["CacheKey"] == cacheKey:
+        return index
+    with __registryIndexLock:
+        index = __registryIndex
+        if index["CacheKey"] != cacheKey:
+            index = __buildRegistryIndex()
+            index["CacheKey"] = cacheKey
+            __registryIndex = index
+    return index
+
+
+def __resetRegistryIndex(_eventName=None, _params=None):
+    """Drop the reverse lookup tables, called when a new configuration version is received"""
+    global __registryIndex
+    __registryIndex = {"CacheKey": None}
+    return S_OK()
+
+
+gConfig.addListenerToNewVersionEvent(__resetRegistryIndex)
+
 
 def getUsernameForDN(dn, usersList=None):
     """Find DIRAC user for DN
@@ -22,14 +97,11 @@ def getUsernameForDN(dn, usersList=None):
     :return: S_OK(str)/S_ERROR()
     """
     dn = dn.strip()
-    if not usersList:
-        result = gConfig.getSections("%s/Users" % gBaseRegistrySection)
-        if not result["OK"]:
-            return result
-        usersList = result["Value"]
-    for username in usersList:
-        if dn in gConfig.getValue("%s/Users/%s/DN" % (gBaseRegistrySection, username), []):
-            return S_OK(username)
+    users = __getRegistryIndex()["UsersForDN"].get(dn, [])
+    if usersList:
+        users = [username for username in usersList if username in users]
+    if users:
+        return S_OK(users[0])
     return S_ERROR("No username found for dn %s" % dn)
 
 
@@ -77,15 +149,18 @@ def __getGroupsWithAttr(attrName, value):
 
     :return: S_OK(list)/S_ERROR() -- contain list of groups
     """
-    result = gConfig.getSections("%s/Groups" % gBaseRegistrySection)
-    if not result["OK"]:
-        return result
-    groupsList = result["Value"]
-    groups = []
-    for group in groupsList:
-        if value in gConfig.getValue("%s/Groups/%s/%s" % (gBaseRegistrySection, group, attrName), []):
-            groups.append(group)
-    groups.sort()
+    if attrName in __indexedGroupOptions:
+        groups = list(__getRegistryIndex()["GroupsWithOption"][attrName].get(value, []))
+    else:
+        result = gConfig.getSections("%s/Groups" % gBaseRegistrySection)
+        if not result["OK"]:
+            return result
+        groupsList = result["Value"]
+        groups = []
+        for group in groupsList:
+            if value in gConfig.getValue("%s/Groups/%s/%s" % (gBaseRegistrySection, group, attrName), []):
+                groups.append(group)
+        groups.sort()
     return S_OK(groups) if groups else S_ERROR("No groups found for %s=%s" % (attrName, value))
 
 
@@ -131,13 +206,9 @@ def getHostnameForDN(dn):
     :return: S_OK()/S_ERROR()
     """
     dn = dn.strip()
-    result = gConfig.getSections("%s/Hosts" % gBaseRegistrySection)
-    if not result["OK"]:
-        return result
-    hostList = result["Value"]
-    for hostname in hostList:
-        if dn in gConfig.getValue("%s/Hosts/%s/DN" % (gBaseRegistrySection, hostname), []):
-            return S_OK(hostname)
+    hosts = __getRegistryIndex()["HostsForDN"].get(dn)
+    if hosts:
+        return S_OK(hosts[0])
     return S_ERROR("No hostname found for dn %s" % dn)
 
 
@@ -585,14 +656,11 @@ def getUsernameForID(ID, usersList=None):
 
     :return: S_OK(str)/S_ERROR()
     """
-    if not usersList:
-        result = gConfig.getSections("%s/Users" % gBaseRegistrySection)
-        if not result["OK"]:
-            return result
-        usersList = result["Value"]
-    for username in usersList:
-        if ID in gConfig.getValue("%s/Users/%s/ID" % (gBaseRegistrySection, username), []):
-            return S_OK(username)
+    users = __getRegistryIndex()["UsersForID"].get(ID, [])
+    if usersList:
+        users = [username for username in usersList if username in users]
+    if users:
+        return S_OK(users[0])
     return S_ERROR("No username found for ID %s" % ID)
 
 
@@ -0,0 +1,101 @@
+""" Test the snapshots of the Operations helper """
+from diraccfg import CFG
+
+from DIRAC import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
+
+operationsCFG = """
+Operations
+{
+  Defaults
+  {
+    JobScheduling
+    {
+      CheckJobLimits = True
+      MatchingDelay
+      {
+        SiteA = 10
+      }
+    }
+    Sites = SiteA, SiteB
+  }
+  OpsSetup
+  {
+    JobScheduling
+    {
+      CheckJobLimits = False
+    }
+  }
+  opsVO
+  {
+    OpsSetup
+    {
+      JobScheduling
+      {
+        MatchingDelay
+        {
+          SiteB = 20
+        }
+      }
+      Timeout = 60
+    }
+  }
+}
+"""
+
+
+def loadCFG(buffer):
+    cfg = CFG()
+    cfg.loadFromBuffer(buffer)
+    gConfig.loadCFG(cfg)
+
+
+def test_snapshot():
+    loadCFG(operationsCFG)
+    ops = Operations(vo="opsVO", setup="OpsSetup")
+
+    assert ops.getValue("JobScheduling/CheckJobLimits", True) is False
+    assert ops.getValue("/JobScheduling//CheckJobLimits/") == "False"
+    assert ops.getValue("Sites", []) == ["SiteA", "SiteB"]
+    assert ops.getValue("Timeout", 0) == 60
+    assert ops.getValue("Timeout", "a") == "60"
+    assert ops.getValue("Missing", 5) == 5
+    assert ops.getValue("JobScheduling", "NoValue") == "NoValue"
+    assert ops.getOptionsDict("JobScheduling/MatchingDelay")["Value"] == {"SiteA": "10", "SiteB": "20"}
+    assert ops.getSections("")["Value"] == ["JobScheduling"]
+    assert not ops.getOptions("Missing")["OK"]
+    assert not ops.getOptions("Timeout")["OK"]
+
+    # Another VO has its own snapshot
+    assert Operations(vo="otherVO", setup="OpsSetup").getValue("Timeout", 0) == 0
+
+    # The snapshot is reused until the configuration changes
+    stats = Operations.getCacheStatistics()
+    for _ in range(10):
+        Operations(vo="opsVO", setup="OpsSetup").getValue("Timeout")
+    assert Operations.getCacheStatistics()["Hits"] == stats["Hits"] + 10
+    assert Operations.getCacheStatistics()["Misses"] == stats["Misses"]
+
+    loadCFG("Operations\n{\n  opsVO\n  {\n    OpsSetup\n    {\n      Timeout = 30\n    }\n  }\n}\n")
+    assert ops.getValue("Timeout", 0) == 30
+    assert Operations.getCacheStatistics()["Misses"] == stats["Misses"] + 1
+    assert Operations.getCacheStatistics()["Snapshots"] == 1
+
+    # Switching to the server certificate and back does not drop the snapshots
+    stats = Operations.getCacheStatistics()
+    useServerCertificate = gConfigurationData.extractOptionFromCFG("/DIRAC/Security/UseServerCertificate")
+    gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", "false")
+    assert ops.getValue("Timeout", 0) == 30
+    gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", "true")
+    assert ops.getValue("Timeout", 0) == 30
+    assert Operations.getCacheStatistics()["Misses"] == stats["Misses"]
+    if useServerCertificate is None:
+        gConfigurationData.deleteOptionInCFG("/DIRAC/Security/UseServerCertificate")
+    else:
+        gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", useServerCertificate)
+
+    # But any other local modification does
+    gConfigurationData.setOptionInCFG("/Operations/opsVO/OpsSetup/Timeout", "45")
+    assert ops.getValue("Timeout", 0) == 45
+    assert Operations.getCacheStatistics()["Misses"] == stats["Misses"] + 1
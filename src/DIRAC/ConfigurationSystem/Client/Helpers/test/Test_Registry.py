@@ -0,0 +1,115 @@
+""" Test the lookups of the Registry helper """
+from diraccfg import CFG
+
+from DIRAC import gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+registryCFG = """
+Registry
+{
+  Users
+  {
+    regUserA
+    {
+      DN = /DC=org/DC=test/CN=regUserA
+      ID = 1234-abcd
+    }
+    regUserB
+    {
+      DN = /DC=org/DC=test/CN=regUserB, /DC=org/DC=test/CN=regUserB2
+    }
+  }
+  Hosts
+  {
+    reg.host.ch
+    {
+      DN = /DC=org/DC=test/CN=reg.host.ch
+    }
+  }
+  Groups
+  {
+    reg_user
+    {
+      Users = regUserA, regUserB
+      Properties = NormalUser
+      VO = regVO
+    }
+    reg_admin
+    {
+      Users = regUserB
+      Properties = NormalUser, ServiceAdministrator
+    }
+  }
+}
+"""
+
+
+def loadCFG(buffer):
+    cfg = CFG()
+    cfg.loadFromBuffer(buffer)
+    gConfig.loadCFG(cfg)
+
+
+def test_reverseLookups():
+    loadCFG(registryCFG)
+
+    assert Registry.getUsernameForDN(" /DC=org/DC=test/CN=regUserB2")["Value"] == "regUserB"
+    assert Registry.getUsernameForDN("/DC=org/DC=test/CN=regUserA", ["regUserB"])["OK"] is False
+    assert Registry.getUsernameForDN("/DC=org/DC=test/CN=unknown")["OK"] is False
+    assert Registry.getUsernameForID("1234-abcd")["Value"] == "regUserA"
+    assert Registry.getHostnameForDN("/DC=org/DC=test/CN=reg.host.ch")["Value"] == "reg.host.ch"
+    assert Registry.getGroupsForDN("/DC=org/DC=test/CN=regUserB")["Value"] == ["reg_admin", "reg_user"]
+    assert Registry.getGroupsForUser("regUserA")["Value"] == ["reg_user"]
+    assert Registry.getGroupsWithProperty("ServiceAdministrator")["Value"] == ["reg_admin"]
+    assert Registry.getGroupsForUser("unknown")["OK"] is False
+
+    # The indexes follow the changes of the configuration
+    loadCFG(
+        """
+        Registry
+        {
+          Users
+          {
+            regUserC
+            {
+              DN = /DC=org/DC=test/CN=regUserC
+            }
+          }
+          Groups
+          {
+            reg_admin
+            {
+              Users = regUserB, regUserC
+            }
+          }
+        }
+        """
+    )
+    assert Registry.getUsernameForDN("/DC=org/DC=test/CN=regUserC")["Value"] == "regUserC"
+    assert Registry.getGroupsForDN("/DC=org/DC=test/CN=regUserC")["Value"] == ["reg_admin"]
+
+
+def test_indexCacheKey(monkeypatch):
+    loadCFG(registryCFG)
+    assert Registry.getUsernameForID("1234-abcd")["Value"] == "regUserA"
+    buildRegistryIndex = getattr(Registry, "__buildRegistryIndex")
+    builds = []
+    monkeypatch.setattr(Registry, "__buildRegistryIndex", lambda: builds.append(1) or buildRegistryIndex())
+
+    # Switching to the server certificate and back does not rebuild the indexes
+    useServerCertificate = gConfigurationData.extractOptionFromCFG("/DIRAC/Security/UseServerCertificate")
+    gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", "false")
+    gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", "true")
+    assert Registry.getUsernameForID("1234-abcd")["Value"] == "regUserA"
+    assert not builds
+
+    # Any other local modification does
+    gConfigurationData.setOptionInCFG("/Registry/Users/regUserA/ID", "5678-efgh")
+    assert Registry.getUsernameForID("5678-efgh")["Value"] == "regUserA"
+    assert builds == [1]
+
+    if useServerCertificate is None:
+        gConfigurationData.deleteOptionInCFG("/DIRAC/Security/UseServerCertificate")
+    else:
+        gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", useServerCertificate)
@@ -385,8 +385,9 @@ def getDBParameters(fullname):
            Not used as the method will fail if it cannot be found
            defaultQueueSize is the QueueSize to return if the option is not found in the CS
 
-    :return: S_OK(dict)/S_ERROR() - dictionary with the keys: 'host', 'port', 'user', 'password',
-                                    'db' and 'queueSize'
+    :return: S_OK(dict)/S_ERROR() - dictionary with the keys: 'Host', 'Port', 'User', 'Password',
+                                    'DBName' and optionally 'MinQueueSize' and 'MaxQueueSize' (bounds
+                                    of the pool of connections)
     """
 
     cs_path = getDatabaseSection(fullname)
@@ -443,6 +444,15 @@ def getDBParameters(fullname):
     dbName = result["Value"]
     parameters["DBName"] = dbName
 
+    # Bounds of the pool of connections, only defined if set
+    for option in ("MinQueueSize", "MaxQueueSize"):
+        result = gConfig.getOption(cs_path + "/" + option)
+        if not result["OK"]:
+            # No individual value found, try at the common place
+            result = gConfig.getOption("/Systems/Databases/" + option)
+        if result["OK"]:
+            parameters[option] = int(result["Value"])
+
     return S_OK(parameters)
 
 
@@ -51,6 +51,28 @@ class ConfigurationHandler(RequestHandler):
             retDict["data"] = gServiceInterface.getCompressedConfigurationData()
         return S_OK(retDict)
 
+    types_getPatchIfNewer = [str]
+
+    @classmethod
+    def export_getPatchIfNewer(cls, sClientVersion):
+        """Get the modifications to apply to the configuration of the client if a newer version exists
+
+        :param str sClientVersion: version of the client
+
+        :return: S_OK(dict) with the newestVersion and, if the client is not up to date, either the
+                 patch (list of modification lists to apply in order) or the compressed data if the
+                 version of the client is too old
+        """
+        sVersion = gServiceInterface.getVersion()
+        retDict = {"newestVersion": sVersion}
+        if sClientVersion < sVersion:
+            result = gServiceInterface.getConfigurationPatch(sClientVersion)
+            if result["OK"]:
+                retDict["newestVersion"], retDict["patch"] = result["Value"]
+            else:
+                retDict["data"] = gServiceInterface.getCompressedConfigurationData()
+        return S_OK(retDict)
+
     types_publishSlaveServer = [str]
 
     @classmethod
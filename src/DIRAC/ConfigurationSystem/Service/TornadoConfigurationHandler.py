@@ -57,6 +57,23 @@ class TornadoConfigurationHandler(TornadoService):
             retDict["data"] = b64encode(self.ServiceInterface.getCompressedConfigurationData()).decode()
         return S_OK(retDict)
 
+    def export_getPatchIfNewer(self, sClientVersion):
+        """
+        Returns the modifications to apply to the configuration of the client if a newer configuration exists,
+        or the whole configuration if the version of the client is too old. If not just returns the version
+
+        :param sClientVersion: Version used by client
+        """
+        sVersion = self.ServiceInterface.getVersion()
+        retDict = {"newestVersion": sVersion}
+        if sClientVersion < sVersion:
+            result = self.ServiceInterface.getConfigurationPatch(sClientVersion)
+            if result["OK"]:
+                retDict["newestVersion"], retDict["patch"] = result["Value"]
+            else:
+                retDict["data"] = b64encode(self.ServiceInterface.getCompressedConfigurationData()).decode()
+        return S_OK(retDict)
+
     def export_publishSlaveServer(self, sURL):
         """
         Used by slave server to register as a slave server.
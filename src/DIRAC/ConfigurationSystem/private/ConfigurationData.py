@@ -7,6 +7,7 @@ import zipfile
 import _thread
 import time
 import datetime
+import itertools
 import DIRAC
 
 from diraccfg import CFG
@@ -18,6 +19,10 @@ from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 
 class ConfigurationData(object):
+
+    # Sections whose local modifications don't change what the helpers cache, e.g. the UseServerCertificate toggles
+    cacheNeutralSections = ("/DIRAC/Security/",)
+
     def __init__(self, loadDefaultCFG=True):
         envVar = os.environ.get("DIRAC_FEWER_CFG_LOCKS", "no").lower()
         self.__locksEnabled = envVar not in ("y", "yes", "t", "true", "on", "1")
@@ -29,6 +34,8 @@ class ConfigurationData(object):
             self.runningThreadsNumber = 0
 
         self.__compressedConfigurationData = None
+        self.__modificationCounter = itertools.count()
+        self.__modifications = next(self.__modificationCounter)
         self.configurationPath = "/DIRAC/Configuration"
         self.backupsDir = os.path.join(DIRAC.rootPath, "etc", "csbackup")
         self._isService = False
@@ -47,9 +54,15 @@ class ConfigurationData(object):
     def getBackupDir(self):
         return self.backupsDir
 
-    def sync(self):
+    def sync(self, modifiedPath=None):
+        """Rebuild the merged configuration
+
+        :param str modifiedPath: option modified since the last synchronization, if it is the only change
+        """
         gLogger.debug("Updating configuration internals")
         self.mergedCFG = self.remoteCFG.mergeWith(self.localCFG)
+        if modifiedPath is None or not ("/%s" % modifiedPath.strip("/")).startswith(self.cacheNeutralSections):
+            self.__modifications = next(self.__modificationCounter)
         self.remoteServerList = []
         localServers = self.extractOptionFromCFG(
             "%s/Servers" % self.configurationPath, self.localCFG, disableDangerZones=True
@@ -97,6 +110,34 @@ class ConfigurationData(object):
         self.unlock()
         self.sync()
 
+    def applyRemotePatch(self, patch, version):
+        """Apply modifications to the remote configuration
+
+        The modifications are applied to a copy, which replaces the remote configuration only if it
+        gets the expected version.
+
+        :param list patch: list of modification lists (see CFG.getModifications) to apply in order
+        :param str version: version of the configuration after the modifications
+
+        :return: S_OK / S_ERROR if the modifications could not be applied
+        """
+        self.dangerZoneStart()
+        try:
+            remoteCFG = self.remoteCFG.clone()
+        finally:
+            self.dangerZoneEnd()
+        for modList in patch:
+            result = remoteCFG.applyModifications(modList)
+            if not result["OK"]:
+                return result
+        if self.getVersion(remoteCFG) != version:
+            return S_ERROR("Patched configuration has version %s instead of %s" % (self.getVersion(remoteCFG), version))
+        self.lock()
+        self.remoteCFG = remoteCFG
+        self.unlock()
+        self.sync()
+        return S_OK()
+
     def loadConfigurationData(self, fileName=False):
         name = self.getName()
         self.lock()
@@ -181,7 +222,7 @@ class ConfigurationData(object):
         finally:
             if not disableDangerZones:
                 self.dangerZoneEnd()
-        self.sync()
+        self.sync(path)
 
     def deleteOptionInCFG(self, path, cfg=False):
         if not cfg:
@@ -196,7 +237,7 @@ class ConfigurationData(object):
             cfg.deleteKey(levelList[-1])
         finally:
             self.dangerZoneEnd()
-        self.sync()
+        self.sync(path)
 
     def generateNewVersion(self):
         self.setVersion(str(datetime.datetime.utcnow()))
@@ -216,6 +257,16 @@ class ConfigurationData(object):
             return value
         return "0"
 
+    def getCacheKey(self):
+        """Key identifying the content of the configuration, for the caches built from it
+
+        It changes with the version of the remote configuration and with any modification of the configuration
+        but the ones of the cacheNeutralSections.
+
+        :return: tuple
+        """
+        return (self.getVersion(), self.__modifications)
+
     def getName(self):
         return self.extractOptionFromCFG("%s/Name" % self.configurationPath, self.mergedCFG)
 
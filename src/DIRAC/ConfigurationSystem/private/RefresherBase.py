@@ -16,13 +16,26 @@ def _updateFromRemoteLocation(serviceClient):
     """
     gLogger.debug("", "Trying to refresh from %s" % serviceClient.serverURL)
     localVersion = gConfigurationData.getVersion()
-    retVal = serviceClient.getCompressedDataIfNewer(localVersion)
+    retVal = serviceClient.getPatchIfNewer(localVersion)
+    if not retVal["OK"]:
+        # Servers which can not send patches
+        gLogger.debug("Can't get a patch of the configuration", retVal["Message"])
+        retVal = serviceClient.getCompressedDataIfNewer(localVersion)
     if retVal["OK"]:
         dataDict = retVal["Value"]
         newestVersion = dataDict["newestVersion"]
         if localVersion < newestVersion:
             gLogger.debug("New version available", "Updating to version %s..." % newestVersion)
-            gConfigurationData.loadRemoteCFGFromCompressedMem(dataDict["data"])
+            if "patch" in dataDict:
+                result = gConfigurationData.applyRemotePatch(dataDict["patch"], newestVersion)
+                if not result["OK"]:
+                    gLogger.warn("Can't apply the patch of the configuration", result["Message"])
+                    result = serviceClient.getCompressedData()
+                    if not result["OK"]:
+                        return result
+                    dataDict["data"] = result["Value"]
+            if "data" in dataDict:
+                gConfigurationData.loadRemoteCFGFromCompressedMem(dataDict["data"])
             gLogger.debug("Updated to version %s" % gConfigurationData.getVersion())
             gEventDispatcher.triggerEvent("CSNewVersion", newestVersion, threaded=True)
         return S_OK()
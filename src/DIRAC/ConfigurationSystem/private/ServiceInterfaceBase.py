@@ -1,6 +1,7 @@
 """Service interface is the service which provide config for client and synchronize Master/Slave servers"""
 
 import os
+import threading
 import time
 import re
 import zipfile
@@ -16,6 +17,60 @@ from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 
+class PatchHistory(object):
+    """Modifications between the recent versions of the configuration, to update the clients
+    with a patch rather than with the whole configuration
+    """
+
+    def __init__(self, maxSize=20):
+        """c'tor
+
+        :param int maxSize: number of versions for which a patch can be served
+        """
+        self.__maxSize = maxSize
+        self.__lock = threading.Lock()
+        # List of (version, modifications to get the next version)
+        self.__patches = []
+        self.__lastVersion = None
+        self.__lastCFG = None
+
+    @property
+    def lastVersion(self):
+        """Last version recorded"""
+        return self.__lastVersion
+
+    def record(self, version, cfg):
+        """Record a new version of the configuration
+
+        :param str version: version of the configuration
+        :param cfg: CFG of this version, not to be modified afterwards
+        """
+        with self.__lock:
+            if version == self.__lastVersion:
+                return
+            if self.__lastCFG is not None:
+                self.__patches.append((self.__lastVersion, self.__lastCFG.getModifications(cfg)))
+                del self.__patches[: -self.__maxSize]
+            self.__lastVersion = version
+            self.__lastCFG = cfg
+
+    def getPatch(self, fromVersion):
+        """Get the modifications to apply to a version of the configuration to get the last one
+
+        :param str fromVersion: version of the client
+
+        :return: S_OK((last version, list of modification lists to apply in order)) / S_ERROR if
+                 fromVersion is not in the history
+        """
+        with self.__lock:
+            if fromVersion == self.__lastVersion:
+                return S_OK((self.__lastVersion, []))
+            for index, (patchVersion, _modList) in enumerate(self.__patches):
+                if patchVersion == fromVersion:
+                    return S_OK((self.__lastVersion, [modList for _version, modList in self.__patches[index:]]))
+        return S_ERROR("No patch available from version %s" % fromVersion)
+
+
 class ServiceInterfaceBase(object):
     """Service interface is the service which provide config for client and synchronize Master/Slave servers"""
 
@@ -23,17 +78,30 @@ class ServiceInterfaceBase(object):
         self.sURL = sURL
         gLogger.info("Initializing Configuration Service", "URL is %s" % sURL)
         self.__modificationsIgnoreMask = ["/DIRAC/Configuration/Servers", "/DIRAC/Configuration/Version"]
+        self.__patchHistory = PatchHistory()
         gConfigurationData.setAsService()
         if not gConfigurationData.isMaster():
             gLogger.info("Starting configuration service as slave")
+            gRefresher.addListenerToNewVersionEvent(self.__recordVersion)
             gRefresher.autoRefreshAndPublish(self.sURL)
         else:
             gLogger.info("Starting configuration service as master")
             gRefresher.disable()
             self.__loadConfigurationData()
+            self.__recordVersion()
             self.dAliveSlaveServers = {}
             self._launchCheckSlaves()
 
+    def __recordVersion(self, _eventName=None, _params=None):
+        """Keep track of the modifications done by a new version of the configuration"""
+        gConfigurationData.dangerZoneStart()
+        try:
+            cfg = gConfigurationData.getRemoteCFG().clone()
+        finally:
+            gConfigurationData.dangerZoneEnd()
+        self.__patchHistory.record(gConfigurationData.getVersion(cfg), cfg)
+        return S_OK()
+
     def isMaster(self):
         return gConfigurationData.isMaster()
 
@@ -74,6 +142,7 @@ class ServiceInterfaceBase(object):
         if gConfigurationData.isMaster():
             gConfigurationData.generateNewVersion()
             gConfigurationData.writeRemoteConfigurationToDisk()
+            self.__recordVersion()
 
     def publishSlaveServer(self, sSlaveURL):
         """
@@ -235,6 +304,7 @@ class ServiceInterfaceBase(object):
         gConfigurationData.unlock()
         gLogger.info("Generating new version")
         gConfigurationData.generateNewVersion()
+        self.__recordVersion()
         # self.__checkSlavesStatus( forceWriteConfiguration = True )
         gLogger.info("Writing new version to disk")
         retVal = gConfigurationData.writeRemoteConfigurationToDisk(
@@ -254,6 +324,18 @@ class ServiceInterfaceBase(object):
     def getVersion(self):
         return gConfigurationData.getVersion()
 
+    def getConfigurationPatch(self, sClientVersion):
+        """Get the modifications to apply to a version of the configuration to get the current one
+
+        :param str sClientVersion: version of the client
+
+        :return: S_OK((current version, list of modification lists to apply in order)) / S_ERROR if the
+                 client version is too old
+        """
+        if gConfigurationData.getVersion() != self.__patchHistory.lastVersion:
+            self.__recordVersion()
+        return self.__patchHistory.getPatch(sClientVersion)
+
     def getCommitHistory(self):
         files = self.__getCfgBackups(gConfigurationData.getBackupDir())
         backups = [".".join(fileName.split(".")[1:-1]).split("@") for fileName in files]
@@ -0,0 +1,92 @@
+""" Test the update of the configuration with patches """
+from diraccfg import CFG
+
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+from DIRAC.ConfigurationSystem.private.ServiceInterfaceBase import PatchHistory
+
+baseCFG = """
+DIRAC
+{
+  Configuration
+  {
+    Version = 1
+    Name = Test
+  }
+  Setup = TestSetup
+}
+Systems
+{
+  WorkloadManagement
+  {
+    Services
+    {
+      Matcher
+      {
+        Port = 9170
+      }
+    }
+  }
+}
+"""
+
+
+def getVersions(nVersions):
+    """Get successive versions of the configuration"""
+    cfg = CFG()
+    cfg.loadFromBuffer(baseCFG)
+    versions = [("1", cfg)]
+    for i in range(2, nVersions + 1):
+        cfg = cfg.clone()
+        cfg.setOption("/DIRAC/Configuration/Version", str(i))
+        cfg.setOption("/Systems/WorkloadManagement/Services/Matcher/Option%d" % i, "value%d" % i)
+        if i % 2:
+            cfg.deleteKey("/Systems/WorkloadManagement/Services/Matcher/Option%d" % (i - 1))
+        versions.append((str(i), cfg))
+    return versions
+
+
+def test_patchHistory():
+    history = PatchHistory(maxSize=3)
+    versions = getVersions(5)
+    for version, cfg in versions:
+        history.record(version, cfg)
+    # Recording the same version twice does nothing
+    history.record(*versions[-1])
+    assert history.lastVersion == "5"
+
+    assert history.getPatch("5")["Value"] == ("5", [])
+    result = history.getPatch("3")
+    assert result["OK"]
+    newestVersion, patch = result["Value"]
+    assert newestVersion == "5"
+    assert len(patch) == 2
+    cfg = versions[2][1].clone()
+    for modList in patch:
+        assert cfg.applyModifications(modList)["OK"]
+    assert str(cfg) == str(versions[-1][1])
+
+    # Too old
+    assert not history.getPatch("1")["OK"]
+    assert history.getPatch("2")["OK"]
+
+
+def test_applyRemotePatch():
+    versions = getVersions(4)
+    history = PatchHistory()
+    for version, cfg in versions:
+        history.record(version, cfg)
+
+    configurationData = ConfigurationData(False)
+    configurationData.setRemoteCFG(versions[0][1])
+    assert configurationData.getVersion() == "1"
+
+    newestVersion, patch = history.getPatch("1")["Value"]
+    assert configurationData.applyRemotePatch(patch, newestVersion)["OK"]
+    assert configurationData.getVersion() == "4"
+    assert str(configurationData.getRemoteCFG()) == str(versions[-1][1])
+    assert configurationData.mergedCFG["Systems"]["WorkloadManagement"]["Services"]["Matcher"]["Option4"] == "value4"
+
+    # A patch not matching the configuration is not applied
+    assert not configurationData.applyRemotePatch(patch, newestVersion)["OK"]
+    assert not configurationData.applyRemotePatch(patch[:1], "5")["OK"]
+    assert configurationData.getVersion() == "4"
@@ -31,6 +31,8 @@ class DB(DIRACDB, MySQL):
             dbName=self.dbName,
             port=self.dbPort,
             debug=debug,
+            poolMinSize=dbParameters.get("MinQueueSize"),
+            poolMaxSize=dbParameters.get("MaxQueueSize"),
             parentLogger=parentLogger,
         )
 
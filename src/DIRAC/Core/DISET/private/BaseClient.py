@@ -1,6 +1,7 @@
 """ This module exposes the BaseClient class,
     which serves as base for InnerRPCClient and TransferClient.
 """
+import os
 import time
 
 import _thread
@@ -14,8 +15,10 @@ from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServiceFailoverURL
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.ConfigurationSystem.Client.Helpers.CSGlobals import skipCACheck
+from DIRAC.Core.DISET.private.ConnectionPool import gConnectionPool
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
+from DIRAC.Core.Security.Locations import getProxyLocation
 
 
 class BaseClient(object):
@@ -38,6 +41,19 @@ class BaseClient(object):
     KW_PROXY_CHAIN = "proxyChain"
     KW_SKIP_CA_CHECK = "skipCACheck"
     KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+    KW_STREAMING_THRESHOLD = "streamingThreshold"
+    KW_KEEP_CONNECTION = "keepConnection"
+
+    # Options which only change the proposals, not the connections
+    # (the credentials of the proposals are part of the key of the connections, see __getConnectionKey)
+    __PROPOSAL_KWARGS = (
+        KW_EXTRA_CREDENTIALS,
+        KW_DELEGATED_DN,
+        KW_DELEGATED_GROUP,
+        KW_KEEP_ALIVE_LAPSE,
+        KW_STREAMING_THRESHOLD,
+        KW_KEEP_CONNECTION,
+    )
 
     __threadConfig = ThreadConfig()
 
@@ -58,6 +74,12 @@ class BaseClient(object):
         :param proxyChain: Specify the proxy chain
         :param skipCACheck: Do not check the CA
         :param keepAliveLapse: Duration for keepAliveLapse (heartbeat like)
+        :param streamingThreshold: Responses bigger than this number of bytes are decoded while they
+                                   are received, so that they are never completely held in memory
+                                   in their encoded form (default 0: disabled)
+        :param keepConnection: Ask the service to keep the connection open after an RPC call, so that
+                               the next calls with the same credentials reuse it without a new handshake
+                               (default False)
         """
 
         if not isinstance(serviceName, str):
@@ -436,14 +458,18 @@ and this is thread %s
             gLogger.error("DISET client thread safety error", msgTxt)
             # raise Exception( msgTxt )
 
-    def _connect(self):
+    def _connect(self, reuseConnection=True):
         """Establish the connection.
         It uses the URL discovered in __discoverURL.
         In case the connection cannot be established, __discoverURL
         is called again, and _connect calls itself.
         We stop after trying self.__nbOfRetry * self.__nbOfUrls
 
-        :return: S_OK()/S_ERROR()
+        If the keepConnection option is set, an idle connection kept after a previous call
+        is used if there is one (and reuseConnection is True). The result then has ReusedConnection set.
+
+        :param bool reuseConnection: allow to use an idle connection
+        :return: S_OK((trid, transport))/S_ERROR()
         """
         # Check if the useServerCertificate configuration changed
         # Note: I am not really sure that  all this block makes
@@ -465,6 +491,14 @@ and this is thread %s
         if self.__enableThreadCheck:
             self.__checkThreadID()
 
+        if reuseConnection and self.kwargs.get(self.KW_KEEP_CONNECTION):
+            transport = gConnectionPool.checkout(self.__getConnectionKey())
+            if transport:
+                gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+                result = S_OK((getGlobalTransportPool().add(transport), transport))
+                result["ReusedConnection"] = True
+                return result
+
         gLogger.debug("Trying to connect to: %s" % self.serviceURL)
         try:
             # Calls the transport method of the apropriate protocol.
@@ -512,7 +546,7 @@ and this is thread %s
                     # rediscover the URL
                     self.__discoverURL()
                     # try to reconnect
-                    return self._connect()
+                    return self._connect(reuseConnection)
                 else:
                     return retVal
         except Exception as e:
@@ -524,13 +558,37 @@ and this is thread %s
 
         return S_OK((trid, transport))
 
-    def _disconnect(self, trid):
+    def _disconnect(self, trid, keepConnection=False):
         """Disconnect the connection.
 
         :param str trid: Transport ID in the transportPool
+        :param bool keepConnection: the service keeps the connection open, park it in the
+                                    pool of idle connections instead of closing it
         """
+        if keepConnection:
+            transport = getGlobalTransportPool().get(trid)
+            getGlobalTransportPool().remove(trid)
+            if transport:
+                gConnectionPool.release(self.__getConnectionKey(), transport)
+            return
         getGlobalTransportPool().close(trid)
 
+    def __getConnectionKey(self):
+        """Key of the connections of the client in the pool of idle connections
+
+        It is made of the service URL, the options of the transport, the extra credentials of the
+        proposals (a connection is never reused on behalf of another delegated user) and the modification
+        time of the proxy so that a renewed proxy gets new connections.
+        """
+        options = tuple(
+            sorted((key, str(value)) for key, value in self.kwargs.items() if key not in self.__PROPOSAL_KWARGS)
+        )
+        try:
+            proxyTime = os.stat(self.kwargs.get(self.KW_PROXY_LOCATION) or getProxyLocation()).st_mtime
+        except (OSError, TypeError):
+            proxyTime = None
+        return (self.serviceURL, options, str(self.__extraCredentials), proxyTime)
+
     @staticmethod
     def _serializeStConnectionInfo(stConnectionInfo):
         """We want to send tuple but we need to convert
@@ -565,6 +623,9 @@ and this is thread %s
         if not self.__initStatus["OK"]:
             return self.__initStatus
         stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo), action, self.__extraCredentials, DIRAC.version)
+        if action[0] == "RPC" and self.kwargs.get(self.KW_KEEP_CONNECTION):
+            # Services not knowing this option ignore it, and do not acknowledge it
+            stConnectionInfo += ({"keepConnection": True},)
 
         # Send the connection info and get the answer back
         retVal = transport.sendData(S_OK(BaseClient._serializeStConnectionInfo(stConnectionInfo)))
@@ -0,0 +1,145 @@
+""" Pool of the connections kept open by the DISET clients between their RPC calls
+
+When a client asks for it (keepConnection option) and the service agrees, the connection of an RPC call
+is not closed afterwards but parked in this pool, so that the next call to the same service with the same
+credentials reuses it instead of doing a new (TLS) handshake. A connection is used by a single call at a
+time; the idle ones are closed after some time, if there are too many of them, or if they are found
+unusable (closed by the service) when taken from the pool.
+"""
+import os
+import threading
+import time
+
+try:
+    import selectors
+except ImportError:
+    import selectors2 as selectors
+
+
+class ConnectionPool(object):
+    def __init__(self, maxIdleConnections=16, idleTimeout=30):
+        """c'tor
+
+        :param int maxIdleConnections: maximum number of idle connections kept in the pool
+        :param int idleTimeout: seconds after which an idle connection is closed, it has to be lower than the
+                                IdleConnectionTimeout of the services
+        """
+        self.__maxIdleConnections = maxIdleConnections
+        self.__idleTimeout = idleTimeout
+        self.__lock = threading.Lock()
+        # key -> list of (last use time, transport), the most recently used last
+        self.__idleConnections = {}
+        self.__nIdle = 0
+        self.__stats = {"Checkouts": 0, "Reused": 0, "Released": 0, "Expired": 0, "Discarded": 0, "Broken": 0}
+
+    @staticmethod
+    def isUsable(transport):
+        """Check that an idle connection can take a new proposal
+
+        Nothing is expected from the service on an idle connection: if it is readable, it was closed
+        (or is in an unknown state).
+        """
+        if transport.byteStream or transport.receivedMessages:
+            return False
+        sel = selectors.DefaultSelector()
+        try:
+            sel.register(transport.getSocket(), selectors.EVENT_READ)
+            return not sel.select(timeout=0)
+        except Exception:
+            return False
+        finally:
+            sel.close()
+
+    @staticmethod
+    def _close(transport):
+        try:
+            transport.close()
+        except Exception:
+            pass
+
+    def __expire(self, now):
+        """Close the connections idle for too long (called with the lock)"""
+        limit = now - self.__idleTimeout
+        for key in list(self.__idleConnections):
+            connections = self.__idleConnections[key]
+            while connections and connections[0][0] < limit:
+                self._close(connections.pop(0)[1])
+                self.__nIdle -= 1
+                self.__stats["Expired"] += 1
+            if not connections:
+                del self.__idleConnections[key]
+
+    def __evictOldest(self):
+        """Close the idle connection used the longest time ago (called with the lock)"""
+        key = min(self.__idleConnections, key=lambda key: self.__idleConnections[key][0][0])
+        connections = self.__idleConnections[key]
+        self._close(connections.pop(0)[1])
+        if not connections:
+            del self.__idleConnections[key]
+        self.__nIdle -= 1
+        self.__stats["Discarded"] += 1
+
+    def checkout(self, key):
+        """Take an idle connection from the pool
+
+        :param key: service URL and credentials of the connection
+        :return: transport, or None if there is no usable connection
+        """
+        with self.__lock:
+            self.__stats["Checkouts"] += 1
+            self.__expire(time.time())
+            connections = self.__idleConnections.get(key)
+            while connections:
+                transport = connections.pop()[1]
+                self.__nIdle -= 1
+                if not connections:
+                    del self.__idleConnections[key]
+                if self.isUsable(transport):
+                    self.__stats["Reused"] += 1
+                    return transport
+                self._close(transport)
+                self.__stats["Broken"] += 1
+        return None
+
+    def release(self, key, transport):
+        """Park a connection in the pool once its call is over
+
+        :param key: service URL and credentials of the connection
+        :param transport: transport whose last message was completely received
+        """
+        if not self.__maxIdleConnections:
+            self._close(transport)
+            return
+        with self.__lock:
+            now = time.time()
+            self.__expire(now)
+            if self.__nIdle >= self.__maxIdleConnections:
+                self.__evictOldest()
+            self.__idleConnections.setdefault(key, []).append((now, transport))
+            self.__nIdle += 1
+            self.__stats["Released"] += 1
+
+    def afterFork(self):
+        """Forget about the idle connections in a forked process
+
+        They are shared with the parent process, which keeps using them: they are not closed.
+        """
+        self.__lock = threading.Lock()
+        self.__idleConnections = {}
+        self.__nIdle = 0
+
+    def getStatistics(self):
+        """Get the use of the pool
+
+        :return: dict with the number of Checkouts, of connections Released to the pool and Reused (each one
+                 saving a handshake), Expired, Discarded (too many idle connections) and Broken (closed by
+                 the service), and the number of Idle connections
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["Idle"] = self.__nIdle
+        return stats
+
+
+gConnectionPool = ConnectionPool()
+os.register_at_fork(after_in_child=gConnectionPool.afterFork)
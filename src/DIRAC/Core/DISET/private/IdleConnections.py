@@ -0,0 +1,150 @@
+""" Connections kept open by a service between the RPC calls of its clients
+
+A client can ask for its connection to be kept open after an RPC call, to send its next proposal without
+a new handshake. These idle connections are watched by a single thread: when one of them becomes readable
+(a new proposal, or the client closing it), it is handed back to the service. The connections idle for
+too long are closed.
+"""
+import socket
+import threading
+import time
+
+try:
+    import selectors
+except ImportError:
+    import selectors2 as selectors
+
+from DIRAC import gLogger
+from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+
+
+class IdleConnections(object):
+    def __init__(self, name, readyCallback, maxConnections=100, idleTimeout=60, transportPool=None):
+        """c'tor
+
+        :param str name: name of the service, for the thread
+        :param readyCallback: function called with the transport id of a connection which became readable
+        :param int maxConnections: maximum number of idle connections, 0 to keep none
+        :param int idleTimeout: seconds after which an idle connection is closed
+        :param transportPool: TransportPool of the connections, the global one by default
+        """
+        self.__name = name
+        self.__readyCallback = readyCallback
+        self.__maxConnections = max(0, maxConnections)
+        self.__idleTimeout = idleTimeout
+        self.__trPool = transportPool or getGlobalTransportPool()
+        self.__lock = threading.Lock()
+        # trid -> time at which the connection became idle
+        self.__idle = {}
+        # Connections to register by the watching thread
+        self.__toAdd = []
+        self.__thread = None
+        self.__wakeUp = None
+        self.__stats = {"Kept": 0, "Reused": 0, "Expired": 0}
+
+    def canKeep(self):
+        """Whether one more connection can be kept"""
+        with self.__lock:
+            return len(self.__idle) < self.__maxConnections
+
+    def add(self, trid):
+        """Watch a connection until the next proposal of the client
+
+        :param str trid: transport id in the transport pool
+        :return: bool, False if the connection can't be kept (it has to be closed by the caller)
+        """
+        with self.__lock:
+            if len(self.__idle) >= self.__maxConnections:
+                return False
+            self.__idle[trid] = time.time()
+            self.__toAdd.append(trid)
+            self.__stats["Kept"] += 1
+            self.__startThread()
+            self.__wakeUp[1].send(b"x")
+        return True
+
+    def __startThread(self):
+        """Start the watching thread if needed (called with the lock)"""
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        if self.__wakeUp is None:
+            self.__wakeUp = socket.socketpair()
+        self.__thread = threading.Thread(target=self.__watch, name="%sIdleConnections" % self.__name)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __watch(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self.__wakeUp[0], selectors.EVENT_READ)
+        while True:
+            try:
+                self.__register(sel)
+                ready = []
+                for key, _events in sel.select(timeout=1):
+                    if key.fileobj is self.__wakeUp[0]:
+                        self.__wakeUp[0].recv(4096)
+                        continue
+                    sel.unregister(key.fileobj)
+                    ready.append(key.data)
+                expired = self.__expire(sel)
+                with self.__lock:
+                    for trid in ready:
+                        self.__idle.pop(trid, None)
+                    self.__stats["Reused"] += len(ready)
+                for trid in ready:
+                    self.__readyCallback(trid)
+                for trid in expired:
+                    self.__trPool.close(trid)
+            except Exception as e:
+                gLogger.exception("Error while watching the idle connections", lException=e)
+                time.sleep(1)
+
+    def __register(self, sel):
+        """Register the new idle connections in the selector"""
+        with self.__lock:
+            toAdd = self.__toAdd
+            self.__toAdd = []
+        for trid in toAdd:
+            transport = self.__trPool.get(trid)
+            if not transport:
+                with self.__lock:
+                    self.__idle.pop(trid, None)
+                continue
+            try:
+                sel.register(transport.getSocket(), selectors.EVENT_READ, trid)
+            except (ValueError, KeyError, OSError):
+                # The connection is already closed
+                with self.__lock:
+                    self.__idle.pop(trid, None)
+                self.__trPool.close(trid)
+
+    def __expire(self, sel):
+        """Unregister the connections idle for too long
+
+        :return: list of their transport ids, to be closed
+        """
+        expired = []
+        limit = time.time() - self.__idleTimeout
+        for key in list(sel.get_map().values()):
+            if key.data is None:
+                continue
+            with self.__lock:
+                if self.__idle.get(key.data, limit) >= limit:
+                    continue
+                del self.__idle[key.data]
+                self.__stats["Expired"] += 1
+            sel.unregister(key.fileobj)
+            expired.append(key.data)
+        return expired
+
+    def getStatistics(self):
+        """Get the use of the idle connections
+
+        :return: dict with the number of connections Kept, Reused for a new proposal and Expired,
+                 and the number of connections currently Idle
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["Idle"] = len(self.__idle)
+        stats["MaxConnections"] = self.__maxConnections
+        return stats
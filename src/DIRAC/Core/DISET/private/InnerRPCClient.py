@@ -20,18 +20,22 @@ class InnerRPCClient(BaseClient):
     # The connection retry is handled by BaseClient
     __retry = 0
 
-    def executeRPC(self, functionName, args):
+    def executeRPC(self, functionName, args, reuseConnection=True):
         """Perform the RPC call, connect before and disconnect after.
 
+        With the keepConnection option, the connection is taken from (and given back to)
+        the pool of idle connections when the service agrees to keep it open.
+
         :param functionName: name of the function
         :param args: arguments to the function
+        :param bool reuseConnection: allow to use an idle connection kept after a previous call
 
         :return: in case of success, the return of the server call. In any case
                 we add the connection stub to it.
 
 
         """
-        retVal = self._connect()
+        retVal = self._connect(reuseConnection)
 
         # Generate the stub which contains all the connection and call options
         # JSON: cast args to list for serialization purposes
@@ -39,38 +43,51 @@ class InnerRPCClient(BaseClient):
         if not retVal["OK"]:
             retVal["rpcStub"] = stub
             return retVal
+        reusedConnection = retVal.get("ReusedConnection", False)
         # Get the transport connection ID as well as the Transport object
         trid, transport = retVal["Value"]
+        keepConnection = False
         try:
             # Handshake to perform the RPC call for functionName
             retVal = self._proposeAction(transport, ("RPC", functionName))
             if not retVal["OK"]:
+                if reusedConnection and not cmpError(retVal, ENOAUTH):
+                    # The idle connection was closed by the service, nothing was executed
+                    return self.executeRPC(functionName, args, reuseConnection=False)
                 if cmpError(retVal, ENOAUTH):  # This query is unauthorized
                     retVal["rpcStub"] = stub
                     return retVal
                 else:  # we have network problem or the service is not responding
                     if self.__retry < 3:
                         self.__retry += 1
-                        return self.executeRPC(functionName, args)
+                        return self.executeRPC(functionName, args, reuseConnection)
                     else:
                         retVal["rpcStub"] = stub
                         return retVal
 
+            # The service keeps the connection open after the call if it acknowledged the option
+            serverAnswer = retVal.get("Value")
+            keepConnection = isinstance(serverAnswer, dict) and serverAnswer.get("keepConnection", False)
+
             # Send the arguments to the function
             # Note: we need to convert the arguments to list
             # We do not need to deseralize it because variadic functions
             # can work with list too
             retVal = transport.sendData(S_OK(list(args)))
             if not retVal["OK"]:
+                keepConnection = False
                 return retVal
 
             # Get the result of the call and append the stub to it
             # Note that the RPC timeout basically ticks here, since
             # the client waits for data for as long as the server side
             # processes the request.
-            receivedData = transport.receiveData()
+            receivedData = transport.receiveData(streamingThreshold=self.kwargs.get(self.KW_STREAMING_THRESHOLD, 0))
+            # Only a successful result is known to be completely received: the connection
+            # is not reused after an error, which may come from the transport
+            keepConnection = keepConnection and isinstance(receivedData, dict) and receivedData.get("OK", False)
             if isinstance(receivedData, dict):
                 receivedData["rpcStub"] = stub
             return receivedData
         finally:
-            self._disconnect(trid)
+            self._disconnect(trid, keepConnection)
@@ -17,6 +17,7 @@ from concurrent.futures import ThreadPoolExecutor
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
+from DIRAC.Core.DISET.private.IdleConnections import IdleConnections
 from DIRAC.Core.DISET.private.LockManager import LockManager
 from DIRAC.Core.DISET.private.ServiceConfiguration import ServiceConfiguration
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
@@ -61,6 +62,7 @@ class Service(object):
         self._transportPool = getGlobalTransportPool()
         self.__cloneId = 0
         self.__maxFD = 0
+        self._idleConnections = None
         self.activityMonitoring = False
         # Check if monitoring is enabled
         if "Monitoring" in Operations().getMonitoringBackends(monitoringType="ServiceMonitoring"):
@@ -90,6 +92,13 @@ class Service(object):
         self._lockManager = LockManager(self._cfg.getMaxWaitingPetitions())
         self._threadPool = ThreadPoolExecutor(max(0, self._cfg.getMaxThreads()))
         self._msgBroker = MessageBroker("%sMSB" % self._name, threadPool=self._threadPool)
+        # Connections kept open between the RPC calls of the clients asking for it
+        self._idleConnections = IdleConnections(
+            self._name,
+            self.__handleIdleConnection,
+            maxConnections=self._cfg.getMaxIdleConnections(),
+            idleTimeout=self._cfg.getIdleConnectionTimeout(),
+        )
         # Create static dict
         self._serviceInfoDict = {
             "serviceName": self._name,
@@ -315,6 +324,8 @@ class Service(object):
           and call RequestHandler._rh_executeAction()
         - Receive arguments/file/something else (depending on action) in the RequestHandler
         - Executing the action asked by the client
+        - Keep the connection open for the next proposal if the client asked for it after an RPC
+          (the next proposals are then processed by _processKeptConnection)
 
         :param clientTransport: Object which describe the opened connection (SSLTransport or PlainTransport)
 
@@ -341,31 +352,69 @@ class Service(object):
             trid = self._transportPool.add(clientTransport)
             if not trid:
                 return
-            # Receive and check proposal
-            result = self._receiveAndCheckProposal(trid)
-            if not result["OK"]:
-                self._transportPool.sendAndClose(trid, result)
-                return
-            proposalTuple = result["Value"]
-            # Instantiate handler
-            result = self._instantiateHandler(trid, proposalTuple)
-            if not result["OK"]:
-                self._transportPool.sendAndClose(trid, result)
-                return
-            handlerObj = result["Value"]
-            # Execute the action
-            result = self._processProposal(trid, proposalTuple, handlerObj)
-            # Close the connection if required
-            if result["closeTransport"] or not result["OK"]:
-                if not result["OK"]:
-                    gLogger.error("Error processing proposal", result["Message"])
-                self._transportPool.close(trid)
-            return result
+            return self.__serveProposal(trid)
         finally:
             self._lockManager.unlockGlobal()
             if monReport:
                 self.__endReportToMonitoring(monReport[0], monReport[1])
 
+    def __handleIdleConnection(self, trid):
+        """A kept connection received its next proposal (or was closed by the client)"""
+        self._threadPool.submit(self._processKeptConnection, trid)
+
+    def _processKeptConnection(self, trid):
+        """Process the next proposal received on a connection kept open after an RPC call
+
+        :param str trid: transport id of the connection
+        """
+        self._lockManager.lockGlobal()
+        try:
+            monReport = self.__startReportToMonitoring()
+        except Exception:
+            monReport = False
+        try:
+            return self.__serveProposal(trid, keptConnection=True)
+        finally:
+            self._lockManager.unlockGlobal()
+            if monReport:
+                self.__endReportToMonitoring(monReport[0], monReport[1])
+
+    def __serveProposal(self, trid, keptConnection=False):
+        """Receive, check and execute a proposal on an established connection
+
+        :param str trid: transport id of the connection
+        :param bool keptConnection: the connection was kept open after a previous RPC call
+
+        :return: S_OK/S_ERROR, see _processProposal
+        """
+        # Receive and check proposal
+        result = self._receiveAndCheckProposal(trid, keptConnection)
+        if not result["OK"]:
+            if result.get("closedByPeer"):
+                # The client does not reuse the kept connection
+                self._transportPool.close(trid)
+            else:
+                self._transportPool.sendAndClose(trid, result)
+            return result
+        proposalTuple = result["Value"]
+        # Instantiate handler
+        result = self._instantiateHandler(trid, proposalTuple)
+        if not result["OK"]:
+            self._transportPool.sendAndClose(trid, result)
+            return result
+        handlerObj = result["Value"]
+        # Execute the action
+        result = self._processProposal(trid, proposalTuple, handlerObj)
+        # Keep the connection for the next proposal of the client if possible
+        if result.get("keepTransport") and self._idleConnections.add(trid):
+            return result
+        # Close the connection if required
+        if result["closeTransport"] or not result["OK"]:
+            if not result["OK"]:
+                gLogger.error("Error processing proposal", result["Message"])
+            self._transportPool.close(trid)
+        return result
+
     @staticmethod
     def _createIdentityString(credDict, clientTransport=None):
         if "username" in credDict:
@@ -391,12 +440,21 @@ class Service(object):
         proposalTuple = tuple(tuple(x) if isinstance(x, list) else x for x in serializedProposal)
         return proposalTuple
 
-    def _receiveAndCheckProposal(self, trid):
+    def _receiveAndCheckProposal(self, trid, keptConnection=False):
         clientTransport = self._transportPool.get(trid)
-        # Get the peer credentials
-        credDict = clientTransport.getConnectingCredentials()
+        # Get the peer credentials, as they were after the handshake if the connection was kept
+        # (they are modified by the authorization of the previous proposal)
+        if keptConnection:
+            credDict = clientTransport.restoreConnectingCredentials()
+        else:
+            clientTransport.saveConnectingCredentials()
+            credDict = clientTransport.getConnectingCredentials()
         # Receive the action proposal
         retVal = clientTransport.receiveData(1024)
+        if not retVal["OK"] and keptConnection:
+            # The client closed the connection kept after its previous call
+            retVal["closedByPeer"] = True
+            return retVal
         if not retVal["OK"]:
             gLogger.error(
                 "Invalid action proposal",
@@ -515,8 +573,17 @@ class Service(object):
         return S_OK(handlerInstance)
 
     def _processProposal(self, trid, proposalTuple, handlerObj):
+        # The 5th element of the proposal holds the options of the connection, if any
+        connectionOptions = proposalTuple[4] if len(proposalTuple) > 4 and isinstance(proposalTuple[4], dict) else {}
+        keepTransport = (
+            proposalTuple[1][0] == "RPC"
+            and connectionOptions.get("keepConnection", False)
+            and self._idleConnections is not None
+            and self._idleConnections.canKeep()
+        )
         # Notify the client we're ready to execute the action
-        retVal = self._transportPool.send(trid, S_OK())
+        # (and whether the connection will be kept after it)
+        retVal = self._transportPool.send(trid, S_OK({"keepConnection": True}) if keepTransport else S_OK())
         if not retVal["OK"]:
             return retVal
 
@@ -548,6 +615,8 @@ class Service(object):
                 self._msgBroker.removeTransport(trid)
 
         result["closeTransport"] = not messageConnection or not result["OK"]
+        # The response was sent, the connection can wait for the next proposal
+        result["keepTransport"] = keepTransport and result["OK"]
         return result
 
     def _mbConnect(self, trid, handlerObj=None):
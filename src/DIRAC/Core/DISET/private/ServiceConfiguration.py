@@ -75,6 +75,18 @@ class ServiceConfiguration:
         except Exception:
             return 20
 
+    def getMaxIdleConnections(self):
+        try:
+            return int(self.getOption("MaxIdleConnections"))
+        except Exception:
+            return 100
+
+    def getIdleConnectionTimeout(self):
+        try:
+            return int(self.getOption("IdleConnectionTimeout"))
+        except Exception:
+            return 60
+
     def getMaxThreadsForMethod(self, actionType, method):
         try:
             return int(self.getOption("ThreadLimit/%s/%s" % (actionType, method)))
@@ -26,7 +26,7 @@ import selectors
 
 from DIRAC.Core.Utilities.ReturnValues import S_ERROR, S_OK
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
-from DIRAC.Core.Utilities import MixedEncode
+from DIRAC.Core.Utilities import DEncode, MixedEncode
 
 
 class BaseTransport(object):
@@ -39,6 +39,9 @@ class BaseTransport(object):
     iListenQueueSize = 128
     iReadTimeout = 600
     keepAliveMagic = b"dka"
+    # Number of container levels decoded while a big message is received (see DEncode.StreamDecoder).
+    # 3 covers the items of the Successful/Failed dicts of S_OK({"Successful": {}, "Failed": {}})
+    streamingDepth = 3
 
     def __init__(self, stServerAddress, bServerMode=False, **kwargs):
         self.bServerMode = bServerMode
@@ -47,6 +50,8 @@ class BaseTransport(object):
         self.packetSize = 1048576  # 1MiB
         self.stServerAddress = stServerAddress
         self.peerCredentials = {}
+        # Credentials of the handshake, see saveConnectingCredentials
+        self.__handshakeCredentials = {}
         self.remoteAddress = False
         self.appData = ""
         self.startedKeepAlives = set()
@@ -123,6 +128,22 @@ class BaseTransport(object):
         """
         self.peerCredentials["extraCredentials"] = extraCredentials
 
+    def saveConnectingCredentials(self):
+        """Keep a copy of the credentials of the handshake, see restoreConnectingCredentials"""
+        self.__handshakeCredentials = dict(self.peerCredentials)
+
+    def restoreConnectingCredentials(self):
+        """Restore the credentials of the handshake
+
+        The credentials are modified while a proposal is authorized (extra credentials, delegation...):
+        they have to be restored before the next proposal received on a connection kept open.
+
+        :return: dictionary with credentials, see getConnectingCredentials
+        """
+        self.peerCredentials.clear()
+        self.peerCredentials.update(self.__handshakeCredentials)
+        return self.peerCredentials
+
     def serverMode(self):
         return self.bServerMode
 
@@ -184,7 +205,15 @@ class BaseTransport(object):
         sCodedData = None
         return S_OK()
 
-    def receiveData(self, maxBufferSize=0, blockAfterKeepAlive=True, idleReceive=False):
+    def receiveData(self, maxBufferSize=0, blockAfterKeepAlive=True, idleReceive=False, streamingThreshold=0):
+        """Receive a message
+
+        :param int maxBufferSize: maximum size of the message (0 for no limit)
+        :param bool blockAfterKeepAlive: wait for the next message after a keep alive
+        :param bool idleReceive: store the message for the next call instead of returning it
+        :param int streamingThreshold: messages bigger than this (in bytes) are decoded while they are
+                                       received, instead of once they are complete (0 to disable)
+        """
         self.__updateLastActionTimestamp()
         if self.receivedMessages:
             return self.receivedMessages.pop(0)
@@ -227,6 +256,16 @@ class BaseTransport(object):
                 # If we already have all the data we need
                 data = pkgData[:pkgSize]
                 self.byteStream = pkgData[pkgSize:]
+            elif streamingThreshold and pkgSize > streamingThreshold:
+                # Decode the data while it is received
+                self.byteStream = b""
+                result = self.__receiveAndDecode(pkgData, pkgSize, maxBufferSize)
+                if not result["OK"]:
+                    return result
+                if idleReceive:
+                    self.receivedMessages.append(result["Value"])
+                    return S_OK()
+                return result["Value"]
             else:
                 # If we still need to read stuff
                 pkgMem = BytesIO()
@@ -263,6 +302,48 @@ class BaseTransport(object):
             gLogger.exception("Network error while receiving data")
             return S_ERROR("Network error while receiving data: %s" % str(e))
 
+    def __receiveAndDecode(self, pkgData, pkgSize, maxBufferSize):
+        """Receive the rest of a message, decoding it as it arrives
+
+        DEncode messages are given chunk by chunk to a StreamDecoder, so that the encoded message
+        is never completely in memory. Other messages (JSON) are decoded once complete.
+
+        :param bytes pkgData: beginning of the message
+        :param int pkgSize: size of the message
+        :param int maxBufferSize: maximum size of the message (0 for no limit)
+        :returns: S_OK(decoded message)/S_ERROR
+        """
+        decoder = None
+        chunks = []
+        readSize = len(pkgData)
+        rcvData = pkgData
+        try:
+            while True:
+                if rcvData:
+                    if decoder is None and not chunks and rcvData[:1] in (b"d", b"l"):
+                        decoder = DEncode.StreamDecoder(depth=self.streamingDepth, assemble=True)
+                    if decoder is not None:
+                        decoder.feed(rcvData)
+                    else:
+                        chunks.append(rcvData)
+                if readSize >= pkgSize:
+                    break
+                retVal = self._read(min(self.packetSize, pkgSize - readSize), skipReadyCheck=True)
+                if not retVal["OK"]:
+                    return retVal
+                if not retVal["Value"]:
+                    return S_ERROR("Peer closed connection")
+                rcvData = retVal["Value"]
+                readSize += len(rcvData)
+                if maxBufferSize and readSize > maxBufferSize:
+                    return S_ERROR("Read limit exceeded (%s chars)" % maxBufferSize)
+            if decoder is not None:
+                decoder.close()
+                return S_OK(decoder.result)
+            return S_OK(MixedEncode.decode(b"".join(chunks))[0])
+        except Exception as e:
+            return S_ERROR("Could not decode received data: %s" % str(e))
+
     def __processKeepAlive(self, maxBufferSize, blockAfterKeepAlive=True):
         gLogger.debug("Received Keep Alive")
         # Next message down the stream will be the ka data
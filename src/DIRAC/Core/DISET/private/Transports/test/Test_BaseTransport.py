@@ -0,0 +1,56 @@
+""" Test the reception of messages by the BaseTransport """
+import pytest
+
+from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
+from DIRAC.Core.Utilities import DEncode, JEncode
+
+
+class BufferTransport(BaseTransport):
+    """Transport reading from a buffer, in small packets"""
+
+    def __init__(self, data):
+        super(BufferTransport, self).__init__(("localhost", 0))
+        self.data = data
+
+    def _read(self, bufSize=4096, skipReadyCheck=False):
+        packet = self.data[: min(bufSize, 1000)]
+        self.data = self.data[len(packet) :]
+        return {"OK": True, "Value": packet}
+
+
+message = {
+    "OK": True,
+    "Value": {
+        "Successful": {"/vo/lfn/%d" % i: {"SE-%d" % (i % 3): "root://host//vo/lfn/%d" % i} for i in range(500)},
+        "Failed": {"/vo/lfn/missing": "No such file"},
+    },
+}
+
+
+@pytest.mark.parametrize("encode", [DEncode.encode, JEncode.encode])
+@pytest.mark.parametrize("streamingThreshold", [0, 100, 10**9])
+def test_receiveData(encode, streamingThreshold):
+    encodedMessage = encode(message)
+    if not isinstance(encodedMessage, bytes):
+        encodedMessage = encodedMessage.encode()
+    nextMessage = DEncode.encode({"OK": True, "Value": "next"})
+    transport = BufferTransport(b"%d:%s%d:%s" % (len(encodedMessage), encodedMessage, len(nextMessage), nextMessage))
+
+    assert transport.receiveData(streamingThreshold=streamingThreshold) == message
+    assert transport.receiveData(streamingThreshold=streamingThreshold) == {"OK": True, "Value": "next"}
+    assert not transport.data
+
+
+def test_receiveDataLimit():
+    encodedMessage = DEncode.encode(message)
+    transport = BufferTransport(b"%d:%s" % (len(encodedMessage), encodedMessage))
+    result = transport.receiveData(maxBufferSize=5000, streamingThreshold=100)
+    assert not result["OK"]
+    assert "Read limit exceeded" in result["Message"]
+
+
+def test_receiveDataTruncated():
+    encodedMessage = DEncode.encode(message)
+    transport = BufferTransport(b"%d:%s" % (len(encodedMessage), encodedMessage[:-2000]))
+    result = transport.receiveData(streamingThreshold=100)
+    assert not result["OK"]
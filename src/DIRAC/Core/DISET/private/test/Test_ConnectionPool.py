@@ -0,0 +1,156 @@
+""" Test the connections kept open between the RPC calls, on the client and on the service sides """
+import socket
+import threading
+import time
+
+from DIRAC.Core.DISET.AuthManager import AuthManager
+from DIRAC.Core.DISET.private.BaseClient import BaseClient
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+from DIRAC.Core.DISET.private.IdleConnections import IdleConnections
+from DIRAC.Core.DISET.private.Service import Service
+from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
+
+
+class SocketTransport(BaseTransport):
+    """Transport over one end of a socket pair"""
+
+    def __init__(self, sock):
+        super(SocketTransport, self).__init__(("localhost", 0))
+        self.oSocket = sock
+
+
+def transportPair():
+    clientSocket, serverSocket = socket.socketpair()
+    return SocketTransport(clientSocket), SocketTransport(serverSocket)
+
+
+def test_pool():
+    pool = ConnectionPool()
+    transport, peer = transportPair()
+    assert pool.checkout("dips://server:9135/Framework/Notification") is None
+    pool.release("dips://server:9135/Framework/Notification", transport)
+    assert pool.checkout("dips://server:9135/Framework/Other") is None
+    assert pool.checkout("dips://server:9135/Framework/Notification") is transport
+    # A connection is used by a single call at a time
+    assert pool.checkout("dips://server:9135/Framework/Notification") is None
+
+    # The service closed the connection while it was idle
+    pool.release("dips://server:9135/Framework/Notification", transport)
+    peer.close()
+    assert pool.checkout("dips://server:9135/Framework/Notification") is None
+
+    stats = pool.getStatistics()
+    assert stats["Checkouts"] == 5
+    assert stats["Released"] == 2
+    assert stats["Reused"] == 1
+    assert stats["Broken"] == 1
+    assert stats["Idle"] == 0
+
+
+def test_limits():
+    pool = ConnectionPool(maxIdleConnections=2, idleTimeout=0.05)
+    pairs = [transportPair() for _ in range(3)]
+    for i, (transport, _peer) in enumerate(pairs):
+        pool.release("server%d" % i, transport)
+    assert pool.getStatistics()["Discarded"] == 1
+    assert pool.checkout("server0") is None
+    assert pool.checkout("server1") is pairs[1][0]
+
+    time.sleep(0.1)
+    assert pool.checkout("server2") is None
+    assert pool.getStatistics()["Expired"] == 1
+    assert pool.getStatistics()["Idle"] == 0
+
+
+class FakeTransportPool(object):
+    def __init__(self):
+        self.transports = {}
+        self.closed = []
+
+    def get(self, trid):
+        return self.transports.get(trid)
+
+    def close(self, trid):
+        self.transports.pop(trid).close()
+        self.closed.append(trid)
+
+
+def test_idleConnections():
+    trPool = FakeTransportPool()
+    ready = []
+    event = threading.Event()
+
+    def readyCallback(trid):
+        ready.append(trid)
+        event.set()
+
+    idle = IdleConnections("Test", readyCallback, maxConnections=2, idleTimeout=1, transportPool=trPool)
+    client1, trPool.transports["tr1"] = transportPair()
+    client2, trPool.transports["tr2"] = transportPair()
+    assert idle.add("tr1")
+    assert idle.add("tr2")
+    assert not idle.canKeep()
+    assert not idle.add("tr3")
+
+    # The next proposal of the client
+    client1.sendData({"OK": True, "Value": ["Framework/Notification"]})
+    assert event.wait(5)
+    assert ready == ["tr1"]
+    assert idle.canKeep()
+
+    # The other connection is closed once idle for too long
+    for _ in range(50):
+        if trPool.closed:
+            break
+        time.sleep(0.1)
+    assert trPool.closed == ["tr2"]
+    assert client2.receiveData()["OK"] is False
+
+    stats = idle.getStatistics()
+    assert stats["Kept"] == 2
+    assert stats["Reused"] == 1
+    assert stats["Expired"] == 1
+    assert stats["Idle"] == 0
+
+
+def test_keptConnectionCredentials():
+    trPool = FakeTransportPool()
+    client, trPool.transports["tr1"] = transportPair()
+    # Credentials of the handshake
+    trPool.transports["tr1"].peerCredentials = {"DN": "/DN/host", "group": "hosts"}
+    authorized = []
+
+    def authorizeProposal(actionTuple, trid, credDict):
+        # Forwarded credentials are unpacked in place, as done by the AuthManager
+        authorized.append(dict(credDict))
+        if isinstance(credDict.get("extraCredentials"), (list, tuple)):
+            AuthManager.unpackForwardedCredentials(AuthManager.__new__(AuthManager), credDict)
+        return {"OK": True}
+
+    service = Service.__new__(Service)
+    service._transportPool = trPool
+    service._validNames = ["Framework/Notification"]
+    service._authorizeProposal = authorizeProposal
+
+    # Two consecutive proposals on the same connection, the first one on behalf of a delegated user
+    for extraCredentials, keptConnection in ((["/DN/user", "user"], False), ("", True)):
+        proposal = [["Framework/Notification", "Setup", ""], ["RPC", "ping"], extraCredentials, "v8r0", {}]
+        client.sendData({"OK": True, "Value": proposal})
+        assert service._receiveAndCheckProposal("tr1", keptConnection=keptConnection)["OK"]
+    assert authorized[0] == {"DN": "/DN/host", "group": "hosts", "extraCredentials": ("/DN/user", "user")}
+    assert authorized[1] == {"DN": "/DN/host", "group": "hosts"}
+    assert trPool.transports["tr1"].getConnectingCredentials() == {"DN": "/DN/host", "group": "hosts"}
+
+
+def test_connectionKey():
+    def getConnectionKey(extraCredentials):
+        client = BaseClient.__new__(BaseClient)
+        client.serviceURL = "dips://server:9135/Framework/Notification"
+        client.kwargs = {BaseClient.KW_PROXY_LOCATION: "/no/proxy", BaseClient.KW_DELEGATED_DN: "/DN/user"}
+        client._BaseClient__extraCredentials = extraCredentials
+        return client._BaseClient__getConnectionKey()
+
+    # The connections are not shared between delegated users
+    assert getConnectionKey(("/DN/user", "user")) == getConnectionKey(("/DN/user", "user"))
+    assert getConnectionKey(("/DN/user", "user")) != getConnectionKey(("/DN/user", "other"))
+    assert getConnectionKey(("/DN/user", "user")) != getConnectionKey("")
@@ -7,6 +7,9 @@
     KeepAlive lapse is also removed because managed by request,
     see https://requests.readthedocs.io/en/latest/user/advanced/#keep-alive
 
+    The requests are sent with sessions taken from a pool shared by all the clients of the process (gSessionPool),
+    so that the connections to a server, and their TLS handshake, are reused from one call to the next.
+
     If necessary this class can be modified to define number of retry in requests, documentation does not give
     lot of informations but you can see this simple solution from StackOverflow.
     After some tests request seems to retry 3 times by default.
@@ -29,7 +32,12 @@ import errno
 import os
 import requests
 import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from http import HTTPStatus
+from urllib.parse import urlparse
 
 
 from DIRAC import S_OK, S_ERROR, gLogger
@@ -45,6 +53,164 @@ from DIRAC.Core.Utilities import Network
 from DIRAC.Core.Utilities.JEncode import decode, encode
 
 
+class SessionPool(object):
+    """Pool of requests.Session, to keep the connections to the servers alive between the calls
+
+    A session is used by a single thread at a time: it is taken from the pool for a call and given back
+    afterwards. The idle sessions are kept per server and credentials (the certificate file and its
+    modification time, so that a renewed proxy gets new connections) and closed after some idle time
+    or if there are too many of them. A forked process does not use the sessions of its parent.
+    """
+
+    def __init__(self, maxIdleSessions=32, idleTimeout=60):
+        """c'tor
+
+        :param int maxIdleSessions: maximum number of idle sessions kept in the pool
+        :param int idleTimeout: seconds after which an idle session is closed
+        """
+        self.__maxIdleSessions = maxIdleSessions
+        self.__idleTimeout = idleTimeout
+        self.__lock = threading.Lock()
+        # key -> list of (last use time, session), the most recently used last
+        self.__idleSessions = {}
+        self.__nIdle = 0
+        self.__stats = {"Checkouts": 0, "Created": 0, "Reused": 0, "Expired": 0, "Discarded": 0}
+        self.__pid = os.getpid()
+        # session -> pid of the process which created it
+        self.__sessionPids = weakref.WeakKeyDictionary()
+
+    def __checkFork(self):
+        """Forget about the sessions of the parent process in a forked process
+
+        Their connections are still used by the parent process: they are not closed.
+        """
+        if self.__pid == os.getpid():
+            return
+        self.__pid = os.getpid()
+        self.__lock = threading.Lock()
+        self.__idleSessions = {}
+        self.__nIdle = 0
+
+    @staticmethod
+    def getKey(url, verify, cert):
+        """Get the key of the sessions which can be used for a call
+
+        :param str url: URL of the service
+        :param verify: CA location or False
+        :param cert: certificate location (or (certificate, key) locations) or None
+        """
+        parsedURL = urlparse(url)
+        certFiles = cert if isinstance(cert, (tuple, list)) else (cert,)
+        mtimes = []
+        for certFile in certFiles:
+            try:
+                mtimes.append(os.stat(certFile).st_mtime)
+            except (OSError, TypeError):
+                mtimes.append(None)
+        return (parsedURL.scheme, parsedURL.netloc, verify, cert, tuple(mtimes))
+
+    def __expire(self, now):
+        """Close the sessions idle for too long (called with the lock)"""
+        limit = now - self.__idleTimeout
+        for key in list(self.__idleSessions):
+            sessions = self.__idleSessions[key]
+            while sessions and sessions[0][0] < limit:
+                sessions.pop(0)[1].close()
+                self.__nIdle -= 1
+                self.__stats["Expired"] += 1
+            if not sessions:
+                del self.__idleSessions[key]
+
+    def __evictOldest(self):
+        """Close the idle session used the longest time ago (called with the lock)"""
+        key = min(self.__idleSessions, key=lambda key: self.__idleSessions[key][0][0])
+        sessions = self.__idleSessions[key]
+        sessions.pop(0)[1].close()
+        if not sessions:
+            del self.__idleSessions[key]
+        self.__nIdle -= 1
+        self.__stats["Discarded"] += 1
+
+    def checkout(self, key):
+        """Take a session from the pool, or create one
+
+        :param key: see getKey
+        :return: requests.Session
+        """
+        self.__checkFork()
+        with self.__lock:
+            self.__stats["Checkouts"] += 1
+            self.__expire(time.time())
+            sessions = self.__idleSessions.get(key)
+            if sessions:
+                session = sessions.pop()[1]
+                if not sessions:
+                    del self.__idleSessions[key]
+                self.__nIdle -= 1
+                self.__stats["Reused"] += 1
+                return session
+            self.__stats["Created"] += 1
+        session = requests.Session()
+        # The session is used by one thread at a time, a single connection is enough
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.__sessionPids[session] = self.__pid
+        return session
+
+    def release(self, key, session, broken=False):
+        """Give a session back to the pool
+
+        :param key: see getKey
+        :param session: requests.Session taken with checkout
+        :param bool broken: the session failed, it is closed instead
+        """
+        self.__checkFork()
+        if self.__sessionPids.get(session) != self.__pid:
+            # Taken before a fork, it belongs to the parent process
+            return
+        if broken or not self.__maxIdleSessions:
+            session.close()
+            return
+        with self.__lock:
+            now = time.time()
+            self.__expire(now)
+            if self.__nIdle >= self.__maxIdleSessions:
+                self.__evictOldest()
+            self.__idleSessions.setdefault(key, []).append((now, session))
+            self.__nIdle += 1
+
+    @contextmanager
+    def session(self, url, verify, cert):
+        """Context manager giving a session from the pool for a call
+
+        The session is closed if the call raises an exception.
+        """
+        key = self.getKey(url, verify, cert)
+        session = self.checkout(key)
+        try:
+            yield session
+        except BaseException:
+            self.release(key, session, broken=True)
+            raise
+        self.release(key, session)
+
+    def getStatistics(self):
+        """Get the use of the pool
+
+        :return: dict with the number of Checkouts, of sessions Created and Reused (for which the TLS
+                 handshake is avoided if the server kept the connection alive), Expired and Discarded
+                 (because of the size of the pool), and of Idle sessions
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["Idle"] = self.__nIdle
+        return stats
+
+
+gSessionPool = SessionPool()
+
+
 # TODO CHRIS: refactor all the messy `discover` methods
 # I do not do it now because I want first to decide
 # whether we go with code copy of fatorization
@@ -576,7 +742,8 @@ class TornadoBaseClient(object):
 
                 # Default case, just return the result
                 if not outputFile:
-                    call = requests.post(url, data=kwargs, timeout=self.timeout, verify=verify, **auth)
+                    with gSessionPool.session(url, verify, auth.get("cert")) as session:
+                        call = session.post(url, data=kwargs, timeout=self.timeout, verify=verify, **auth)
                     # raising the exception for status here
                     # means essentialy that we are losing here the information of what is returned by the server
                     # as error message, since it is not passed to the exception
@@ -595,21 +762,24 @@ class TornadoBaseClient(object):
                     rawText = None
                     # Stream download
                     # https://requests.readthedocs.io/en/latest/user/advanced/#body-content-workflow
-                    with requests.post(url, data=kwargs, timeout=self.timeout, verify=verify, stream=True, **auth) as r:
-                        rawText = r.text
-                        r.raise_for_status()
-
-                        if isinstance(outputFile, io.IOBase):
-                            for chunk in r.iter_content(4096):
-                                # if chunk:  # filter out keep-alive new chuncks
-                                outputFile.write(chunk)
-                        else:
-                            with open(outputFile, "wb") as f:
+                    with gSessionPool.session(url, verify, auth.get("cert")) as session:
+                        with session.post(
+                            url, data=kwargs, timeout=self.timeout, verify=verify, stream=True, **auth
+                        ) as r:
+                            rawText = r.text
+                            r.raise_for_status()
+
+                            if isinstance(outputFile, io.IOBase):
                                 for chunk in r.iter_content(4096):
                                     # if chunk:  # filter out keep-alive new chuncks
-                                    f.write(chunk)
-
-                        return S_OK()
+                                    outputFile.write(chunk)
+                            else:
+                                with open(outputFile, "wb") as f:
+                                    for chunk in r.iter_content(4096):
+                                        # if chunk:  # filter out keep-alive new chuncks
+                                        f.write(chunk)
+
+                    return S_OK()
 
             # Some HTTPError are not worth retrying
             except requests.exceptions.HTTPError as e:
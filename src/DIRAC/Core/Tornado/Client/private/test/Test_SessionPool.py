@@ -0,0 +1,90 @@
+""" Test the pool of requests sessions of the TornadoBaseClient """
+import os
+import time
+
+import pytest
+
+from DIRAC.Core.Tornado.Client.private.TornadoBaseClient import SessionPool
+
+
+def test_reuse(tmp_path):
+    proxy = tmp_path / "proxy"
+    proxy.write_text("proxy")
+    pool = SessionPool()
+
+    with pool.session("https://server:9135/Framework/Notification", "/ca", str(proxy)) as session:
+        pass
+    # Same server and credentials
+    with pool.session("https://server:9135/Framework/SystemAdministrator", "/ca", str(proxy)) as session2:
+        assert session2 is session
+        # A session is not used by two calls at the same time
+        with pool.session("https://server:9135/Framework/Notification", "/ca", str(proxy)) as session3:
+            assert session3 is not session
+    # Other server
+    with pool.session("https://server2:9135/Framework/Notification", "/ca", str(proxy)) as session4:
+        assert session4 is not session
+
+    stats = pool.getStatistics()
+    assert stats["Checkouts"] == 4
+    assert stats["Reused"] == 1
+    assert stats["Created"] == 3
+    assert stats["Idle"] == 3
+
+    # The proxy was renewed
+    time.sleep(0.01)
+    proxy.write_text("new proxy")
+    key = pool.getKey("https://server:9135/Framework/Notification", "/ca", str(proxy))
+    assert pool.checkout(key) not in (session, session3)
+
+
+def test_limits():
+    pool = SessionPool(maxIdleSessions=2, idleTimeout=0.05)
+    sessions = [pool.checkout(("https", "server%d" % i)) for i in range(3)]
+    for i, session in enumerate(sessions):
+        pool.release(("https", "server%d" % i), session)
+    stats = pool.getStatistics()
+    assert stats["Discarded"] == 1
+    assert stats["Idle"] == 2
+    # The oldest one was closed
+    assert pool.checkout(("https", "server0")) is not sessions[0]
+
+    time.sleep(0.1)
+    assert pool.checkout(("https", "server2")) is not sessions[2]
+    assert pool.getStatistics()["Expired"] == 2
+    assert pool.getStatistics()["Idle"] == 0
+
+
+def test_broken():
+    pool = SessionPool()
+    with pytest.raises(ValueError):
+        with pool.session("https://server:9135/Framework/Notification", False, None):
+            raise ValueError()
+    assert pool.getStatistics()["Idle"] == 0
+
+
+def test_afterFork():
+    pool = SessionPool()
+    # A session in use and an idle one at the time of the fork
+    busy = pool.checkout(("https", "server"))
+    idle = pool.checkout(("https", "server"))
+    pool.release(("https", "server"), idle)
+
+    pid = os.fork()
+    if pid == 0:
+        # In the forked process: the sessions created before the fork are never used
+        status = 1
+        try:
+            sessions = [pool.checkout(("https", "server"))]
+            pool.release(("https", "server"), busy)
+            sessions.append(pool.checkout(("https", "server")))
+            pool.release(("https", "server"), sessions[0])
+            if not {id(session) for session in sessions} & {id(busy), id(idle)}:
+                if pool.checkout(("https", "server")) is sessions[0]:
+                    status = 0
+        finally:
+            os._exit(status)
+
+    _pid, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0, status
+    # The parent keeps its sessions
+    assert pool.checkout(("https", "server")) is idle
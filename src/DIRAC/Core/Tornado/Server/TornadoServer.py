@@ -6,7 +6,9 @@ It may work better with TornadoClient but as it accepts HTTPS you can create you
 import time
 import datetime
 import os
+import signal
 import asyncio
+from functools import partial
 
 import M2Crypto
 
@@ -17,6 +19,7 @@ tornado.iostream.SSLIOStream.configure(
 )  # pylint: disable=wrong-import-position
 
 import tornado.ioloop
+import tornado.netutil
 from tornado.httpserver import HTTPServer
 from tornado.web import Application, RequestHandler
 
@@ -24,7 +27,9 @@ import DIRAC
 from DIRAC import gConfig, gLogger, S_OK
 from DIRAC.Core.Security import Locations
 from DIRAC.Core.Utilities import MemStat, Network, TimeUtilities
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Tornado.Server.HandlerManager import HandlerManager
+from DIRAC.Core.Tornado.Server.private.BaseRequestHandler import BaseRequestHandler
 from DIRAC.ConfigurationSystem.Client import PathFinder
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
@@ -56,6 +61,12 @@ class TornadoServer(object):
     * Loaded from the CS ``/Systems/Tornado/<instance>/Port``
     * Default to 8443
 
+    The server runs in a single process unless ``/Systems/Tornado/<instance>/NumberOfProcesses`` (or the
+    ``processes`` parameter) is greater than 1 (0 for the number of CPUs). In that case the process forks the
+    workers, which all listen on the same ports (SO_REUSEPORT), and restarts them if they die.
+    Sending SIGHUP to this process restarts the workers, SIGTERM stops them. Workers receiving SIGTERM stop
+    accepting connections and finish the requests in progress, for at most ``GracefulTimeout`` seconds.
+
 
     Example 1: Easy way to start tornado::
 
@@ -74,7 +85,7 @@ class TornadoServer(object):
 
     """
 
-    def __init__(self, services=True, endpoints=False, port=None):
+    def __init__(self, services=True, endpoints=False, port=None, processes=None):
         """C'r
 
         :param list services: (default True) List of service handlers to load.
@@ -85,14 +96,26 @@ class TornadoServer(object):
             If ``False``, do not load endpoints
         :param int port: Port to listen to.
             If ``None``, the port is resolved following the logic described in the class documentation
+        :param int processes: Number of worker processes, 0 for the number of CPUs.
+            If ``None``, it is taken from the CS ``/Systems/Tornado/<instance>/NumberOfProcesses``, default 1
         """
         self.__startTime = time.time()
         # Application metadata, routes and settings mapping on the ports
         self.__appsSettings = {}
         # Default port, if enother is not discover
+        tornadoSection = "/Systems/Tornado/%s" % PathFinder.getSystemInstance("Tornado")
         if port is None:
-            port = gConfig.getValue("/Systems/Tornado/%s/Port" % PathFinder.getSystemInstance("Tornado"), 8443)
+            port = gConfig.getValue("%s/Port" % tornadoSection, 8443)
         self.port = port
+        if processes is None:
+            processes = gConfig.getValue("%s/NumberOfProcesses" % tornadoSection, 1)
+        self.processes = processes or os.cpu_count() or 1
+        self.gracefulTimeout = gConfig.getValue("%s/GracefulTimeout" % tornadoSection, 30)
+        # Index of this worker process, None if not running with several processes
+        self.__workerIndex = None
+        # pid -> index of the worker processes, in the parent process
+        self.__workers = {}
+        self.__servers = []
 
         # Handler manager initialization with default settings
         self.handlerManager = HandlerManager(services, endpoints)
@@ -102,6 +125,8 @@ class TornadoServer(object):
         # Last update time stamp
         self.__monitorLastStatsUpdate = None
         self.__monitoringLoopDelay = 60  # In secs
+        # Statistics of the executors of the handlers at the last report, see __reportExecutorsToMonitoring
+        self.__executorStats = {}
 
         self.activityMonitoring = False
         if "Monitoring" in Operations().getMonitoringBackends(monitoringType="ServiceMonitoring"):
@@ -171,6 +196,99 @@ class TornadoServer(object):
 
         return S_OK()
 
+    def __forkWorker(self, index):
+        """Start a worker process
+
+        :param int index: index of the worker
+        :return: pid of the worker in the parent process, 0 in the worker
+        """
+        pid = os.fork()
+        if pid == 0:
+            self.__workerIndex = index
+            self.__workers = {}
+            # The threads of the scheduler are gone, the worker schedules its own tasks
+            gThreadScheduler.afterFork()
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, signal.SIG_DFL)
+            return 0
+        self.__workers[pid] = index
+        sLog.info("Started worker", "%d (pid %d)" % (index, pid))
+        return pid
+
+    def __runWorkers(self):
+        """Start the worker processes and keep them running, until the parent process gets SIGTERM.
+
+        Only returns in the worker processes.
+        """
+        signalled = {"stop": False, "restart": False}
+
+        def requestHandler(request):
+            def handler(_signum, _frame):
+                signalled[request] = True
+
+            return handler
+
+        signal.signal(signal.SIGTERM, requestHandler("stop"))
+        signal.signal(signal.SIGINT, requestHandler("stop"))
+        signal.signal(signal.SIGHUP, requestHandler("restart"))
+
+        for index in range(self.processes):
+            if self.__forkWorker(index) == 0:
+                return
+        # Workers being stopped, not to be replaced when they exit
+        stoppingWorkers = set()
+        stopping = False
+        while self.__workers:
+            if signalled["stop"] and not stopping:
+                stopping = True
+                sLog.always("Stopping the workers")
+                stoppingWorkers.update(self.__workers)
+                for pid in self.__workers:
+                    os.kill(pid, signal.SIGTERM)
+            if signalled["restart"] and not stopping:
+                signalled["restart"] = False
+                sLog.always("Restarting the workers")
+                for pid, index in list(self.__workers.items()):
+                    if pid in stoppingWorkers:
+                        continue
+                    # The new worker listens on the same ports before the old one stops accepting connections
+                    if self.__forkWorker(index) == 0:
+                        return
+                    stoppingWorkers.add(pid)
+                    os.kill(pid, signal.SIGTERM)
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(1)
+                continue
+            index = self.__workers.pop(pid, None)
+            if index is None:
+                continue
+            if pid in stoppingWorkers:
+                stoppingWorkers.discard(pid)
+                continue
+            sLog.error("Worker died, restarting it", "%d (pid %d, status %d)" % (index, pid, status))
+            # Do not restart in a tight loop if a worker can not start
+            time.sleep(1)
+            if self.__forkWorker(index) == 0:
+                return
+        sLog.always("All workers stopped")
+        raise SystemExit(0)
+
+    async def __stopGracefully(self):
+        """Stop accepting connections, wait for the requests in progress and stop the IOLoop"""
+        sLog.always("Stopping gracefully")
+        for server in self.__servers:
+            server.stop()
+        deadline = time.time() + self.gracefulTimeout
+        while time.time() < deadline and BaseRequestHandler.getRequestsInProgress() > 0:
+            await asyncio.sleep(0.1)
+        for server in self.__servers:
+            await server.close_all_connections()
+        tornado.ioloop.IOLoop.current().stop()
+
     def startTornado(self):
         """
         Starts the tornado server when ready.
@@ -180,6 +298,10 @@ class TornadoServer(object):
         if not self.__calculateAppSettings():
             raise Exception("There is no services loaded, please check your configuration")
 
+        if self.processes > 1:
+            sLog.always("Starting %d worker processes" % self.processes)
+            self.__runWorkers()
+
         sLog.debug("Starting Tornado")
 
         # Prepare SSL settings
@@ -206,7 +328,7 @@ class TornadoServer(object):
             # Response time
             # Starting monitoring, IOLoop waiting time in ms, __monitoringLoopDelay is defined in seconds
             tornado.ioloop.PeriodicCallback(
-                self.__reportToMonitoring(self.__elapsedTime), self.__monitoringLoopDelay * 1000
+                partial(self.__reportToMonitoring, self.__elapsedTime), self.__monitoringLoopDelay * 1000
             ).start()
 
             # If we are running with python3, Tornado will use asyncio,
@@ -226,12 +348,24 @@ class TornadoServer(object):
             router = Application(app["routes"], default_handler_class=NotFoundHandler, **settings)
             server = HTTPServer(router, ssl_options=ssl_options, decompress_request=True)
             try:
-                server.listen(int(port))
+                # The workers share the ports
+                server.add_sockets(tornado.netutil.bind_sockets(int(port), reuse_port=self.__workerIndex is not None))
             except Exception as e:  # pylint: disable=broad-except
                 sLog.exception("Exception starting HTTPServer", e)
                 raise
+            self.__servers.append(server)
             sLog.always("Listening on port %s" % port)
 
+        if self.__workerIndex is not None:
+            ioloop = tornado.ioloop.IOLoop.current()
+
+            def stopHandler(_signum, _frame):
+                ioloop.add_callback_from_signal(self.__stopGracefully)
+
+            signal.signal(signal.SIGTERM, stopHandler)
+            signal.signal(signal.SIGINT, stopHandler)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
         tornado.ioloop.IOLoop.current().start()
 
     def __reportToMonitoring(self, responseTime):
@@ -247,15 +381,58 @@ class TornadoServer(object):
                 "timestamp": int(TimeUtilities.toEpoch()),
                 "Host": Network.getFQDN(),
                 "ServiceName": "Tornado",
+                "Location": "Worker%d" % self.__workerIndex if self.__workerIndex is not None else "",
                 "MemoryUsage": self.__report[2],
                 "CpuPercentage": percentage,
                 "ResponseTime": responseTime,
             }
         )
+        self.__reportExecutorsToMonitoring()
         self.activityMonitoringReporter.commit()
         # Save memory usage and save realtime/CPU time for next call
         self.__report = self.__startReportToMonitoringLoop()
 
+    def __reportExecutorsToMonitoring(self):
+        """
+        Add the records of the executors of the handlers to the report: the requests admitted (Queries) and
+        rejected since the last report, the requests executed (ActiveQueries) and waiting for a thread
+        (PendingQueries), and the average time the tasks waited for a thread since the last report (in ms)
+        """
+        handlers = set()
+        for app in self.__appsSettings.values():
+            for route in app["routes"]:
+                handler = getattr(route, "handler_class", None)
+                if handler is None and isinstance(route, (tuple, list)):
+                    handler = route[1]
+                if isinstance(handler, type) and issubclass(handler, BaseRequestHandler):
+                    handlers.add(handler)
+        executorStats = {}
+        for handler in handlers:
+            executorStats.update(handler.getExecutorStatistics())
+
+        for name, stats in executorStats.items():
+            last = self.__executorStats.get(name, dict.fromkeys(("Requests", "Rejected", "Tasks", "TotalQueueTime"), 0))
+            tasks = stats["Tasks"] - last["Tasks"]
+            queueTime = (stats["TotalQueueTime"] - last["TotalQueueTime"]) / tasks if tasks else 0.0
+            if stats["MaxThreads"]:
+                activeQueries = min(stats["InProgress"], stats["MaxThreads"])
+            else:
+                activeQueries = stats["InProgress"]
+            self.activityMonitoringReporter.addRecord(
+                {
+                    "timestamp": int(TimeUtilities.toEpoch()),
+                    "Host": Network.getFQDN(),
+                    "ServiceName": "_".join(name.split("/")),
+                    "Location": "Worker%d" % self.__workerIndex if self.__workerIndex is not None else "",
+                    "Queries": stats["Requests"] - last["Requests"],
+                    "RejectedQueries": stats["Rejected"] - last["Rejected"],
+                    "ActiveQueries": activeQueries,
+                    "PendingQueries": stats["InProgress"] - activeQueries,
+                    "QueueTime": int(1000 * queueTime),
+                }
+            )
+        self.__executorStats = executorStats
+
     def __startReportToMonitoringLoop(self):
         """
         Snapshot of resources to be taken at the beginning
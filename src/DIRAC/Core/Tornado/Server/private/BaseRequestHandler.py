@@ -16,7 +16,6 @@ from functools import partial
 import jwt
 import tornado
 from tornado.web import RequestHandler, HTTPError
-from tornado.ioloop import IOLoop
 
 import DIRAC
 
@@ -26,6 +25,7 @@ from DIRAC.Core.DISET.AuthManager import AuthManager
 from DIRAC.Core.Utilities.JEncode import decode, encode
 from DIRAC.Core.Utilities.ReturnValues import isReturnStructure
 from DIRAC.Core.Security.X509Chain import X509Chain  # pylint: disable=import-error
+from DIRAC.Core.Tornado.Server.private.HandlerExecutor import HandlerExecutor
 from DIRAC.Resources.IdProvider.Utilities import getProvidersForInstance
 from DIRAC.Resources.IdProvider.IdProviderFactory import IdProviderFactory
 
@@ -256,6 +256,15 @@ class BaseRequestHandler(RequestHandler):
         - authentication request using one of the available algorithms called ``DEFAULT_AUTHENTICATION``, see :py:meth:`_gatherPeerCredentials` for more details.
         - and finally authorizing the request to access the component, see :py:meth:`authQuery <DIRAC.Core.DISET.AuthManager.AuthManager.authQuery>` for more details.
 
+    The authentication, the authorization and the target method are executed in the threads of the handler executor,
+    see :py:class:`HandlerExecutor <DIRAC.Core.Tornado.Server.private.HandlerExecutor.HandlerExecutor>`.
+    By default it is the default executor of the IOLoop, shared by all the handlers, without limit.
+    A handler gets its own pool of threads if ``MaxThreads`` is set in its CS section (or with the ``MAX_THREADS``
+    class variable), and a method gets its own pool if ``ThreadLimit/<method name>`` is set.
+    If ``MaxWaitingPetitions`` (or ``WaitingLimit/<method name>``, or ``MAX_WAITING_PETITIONS``) is set,
+    the requests coming when that many requests already wait for a thread are rejected
+    with a ``503 Service Unavailable`` status, so that the clients try another server.
+
     If all goes well, then a method is executed,
     the name of which coincides with the name of the request method (e.g.: :py:meth:`get`) which does:
 
@@ -278,6 +287,18 @@ class BaseRequestHandler(RequestHandler):
     # The variable that will contain the result of the request, see __execute method
     __result = None
 
+    # The executor which admitted the request, see prepare method
+    __executor = None
+
+    # Number of requests in progress in the process, see getRequestsInProgress
+    __requestsInProgress = 0
+    # Whether the request is counted in the requests in progress, see prepare method
+    __inProgress = False
+    # Whether a task of the request is being executed by its executor, see __runInExecutor
+    __running = False
+    # Whether the client closed the connection, see on_connection_close
+    __connectionClosed = False
+
     # Below are variables that the developer can OVERWRITE as needed
 
     # System name with which this component is associated.
@@ -308,6 +329,12 @@ class BaseRequestHandler(RequestHandler):
     # Note that `auth_methodName` will have a higher priority.
     DEFAULT_AUTHORIZATION = None
 
+    # Number of threads to execute the requests, 0 to use the default executor shared by all the handlers,
+    # and number of requests waiting for a thread above which requests are rejected, 0 for no limit.
+    # They can be overwritten in the CS with the MaxThreads and MaxWaitingPetitions options
+    MAX_THREADS = 0
+    MAX_WAITING_PETITIONS = 0
+
     # This will be overridden in __initialize to be handler specific
     log = gLogger.getSubLogger(__name__.split(".")[-1])
 
@@ -469,12 +496,55 @@ class BaseRequestHandler(RequestHandler):
 
             cls._componentInfoDict = cls._getComponentInfoDict(cls._fullComponentName, absoluteUrl)
 
+            cls._executor = HandlerExecutor(
+                cls._fullComponentName,
+                cls.__getExecutorOption("MaxThreads", cls.MAX_THREADS),
+                cls.__getExecutorOption("MaxWaitingPetitions", cls.MAX_WAITING_PETITIONS),
+            )
+            cls._methodExecutors = {}
+
             cls.initializeHandler(cls._componentInfoDict)
 
             cls.__init_done = True
 
             return S_OK()
 
+    @classmethod
+    def __getExecutorOption(cls, optionName: str, defaultValue: int) -> int:
+        """Get an option of the executors from the CS section of the component, if it has one"""
+        if not cls._componentInfoDict.get("csPaths"):
+            return defaultValue
+        return cls.srv_getCSOption(optionName, defaultValue)
+
+    @classmethod
+    def __getMethodExecutor(cls, methodName: str) -> HandlerExecutor:
+        """Get the executor of a method: its own if ThreadLimit/<methodName> is defined, or the handler one"""
+        if (executor := cls._methodExecutors.get(methodName)) is None:
+            with cls.__init_lock:
+                if (executor := cls._methodExecutors.get(methodName)) is None:
+                    executor = cls._executor
+                    if maxThreads := cls.__getExecutorOption(f"ThreadLimit/{methodName}", 0):
+                        executor = HandlerExecutor(
+                            f"{cls._fullComponentName}/{methodName}",
+                            maxThreads,
+                            cls.__getExecutorOption(f"WaitingLimit/{methodName}", 0),
+                        )
+                    cls._methodExecutors[methodName] = executor
+        return executor
+
+    @classmethod
+    def getExecutorStatistics(cls) -> dict:
+        """Get the statistics of the executors of the handler, reported to the monitoring by the TornadoServer,
+        see :py:meth:`HandlerExecutor.getStatistics <DIRAC.Core.Tornado.Server.private.HandlerExecutor.HandlerExecutor.getStatistics>`
+
+        :return: dict {executor name: statistics}
+        """
+        if not cls.__init_done:
+            return {}
+        executors = {cls._executor.name: cls._executor}
+        executors.update((executor.name, executor) for executor in list(cls._methodExecutors.values()))
+        return {name: executor.getStatistics() for name, executor in executors.items()}
+
     @classmethod
     def initializeHandler(cls, componentInfo: dict):
         """This method for handler initializaion. This method is called only one time,
@@ -521,7 +591,7 @@ class BaseRequestHandler(RequestHandler):
                 raise
 
     def _monitorRequest(self) -> None:
-        """Monitor action for each request.
+        """Monitor action for each request, executed in the IOLoop: it has to be quick.
         CAN be implemented by developer.
         """
         self._stats["requests"] += 1
@@ -568,19 +638,63 @@ class BaseRequestHandler(RequestHandler):
             self, "auth_" + self.__methodName, getattr(self.methodObj, "authorization", self.DEFAULT_AUTHORIZATION)
         )
 
+    @classmethod
+    def getRequestsInProgress(cls) -> int:
+        """Get the number of requests being processed by the handlers of the process
+
+        :return: number of requests
+        """
+        return BaseRequestHandler.__requestsInProgress
+
+    def __startRequest(self):
+        """Count the request among the requests in progress, until it is over (see __finishRequest)"""
+        self.__inProgress = True
+        BaseRequestHandler.__requestsInProgress += 1
+
+    def __finishRequest(self):
+        """The request is over: it is not counted among the requests in progress any more, and its admission
+        by its executor is released (called at least once, never while a task of the request is running)
+        """
+        if self.__inProgress:
+            self.__inProgress = False
+            BaseRequestHandler.__requestsInProgress -= 1
+            if self.__executor is not None:
+                self.__executor.release()
+
+    async def __runInExecutor(self, func, *args):
+        """Execute a task of the request in the executor which admitted it
+
+        If the client closed the connection in the meantime, the request is over when the task returns.
+        """
+        self.__running = True
+        try:
+            return await self.__executor.run(func, *args)
+        finally:
+            self.__running = False
+            if self.__connectionClosed:
+                self.__finishRequest()
+
     async def prepare(self):
         """Tornados prepare method that called before request"""
-        ioloop = IOLoop.current()
-        # Register activities "Fire and forget"
-        ioloop.run_in_executor(None, self._monitorRequest)
-        await ioloop.run_in_executor(None, self.__prepare)
-
-    def __prepare(self):
-        """Prepare the request. It reads certificates or tokens and check authorizations.
+        self.__startRequest()
+        self.__defineMethod()
+        executor = self.__getMethodExecutor(self.__methodName)
+        if not executor.admit():
+            self.log.warn("Too many requests, rejecting", f"{self._fullComponentName}: {self.__methodName}")
+            self.set_status(HTTPStatus.SERVICE_UNAVAILABLE)
+            self.set_header("Retry-After", "1")
+            self.finish("Too many requests, try again later")
+            return
+        self.__executor = executor
+        # Register activities, in the IOLoop: not to take a thread of the executor, it has to be quick
+        self._monitorRequest()
+        await self.__runInExecutor(self.__prepare)
+
+    def __defineMethod(self):
+        """Define the target method.
         We make the assumption that there is always going to be a ``method`` argument
         regardless of the HTTP method used
         """
-        # Define the target method
         if not (method := self._getMethod()):
             self.log.error("The appropriate method could not be found.")
             raise HTTPError(status_code=HTTPStatus.BAD_REQUEST)
@@ -599,6 +713,8 @@ class BaseRequestHandler(RequestHandler):
         # Get target method core name
         self.__methodName = methodName[methodName.find("_") + 1 :]
 
+    def __prepare(self):
+        """Prepare the request. It reads certificates or tokens and check authorizations."""
         try:
             self.credDict = self._gatherPeerCredentials()
         except Exception as e:  # pylint: disable=broad-except
@@ -649,11 +765,22 @@ class BaseRequestHandler(RequestHandler):
             self.log.exception("Exception serving request", "%s:%s" % (str(e), repr(e)))
             raise e if isinstance(e, HTTPError) else HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
 
+    def on_connection_close(self):
+        """Called if the client closes the connection
+
+        The request is over, unless a task of the request is running: it is then over when the task returns.
+        """
+        self.__connectionClosed = True
+        if not self.__running:
+            self.__finishRequest()
+        super().on_connection_close()
+
     def on_finish(self):
         """
         Called after the end of HTTP request.
         Log the request duration
         """
+        self.__finishRequest()
         elapsedTime = 1000.0 * self.request.request_time()
         credentials = self.srv_getFormattedRemoteCredentials()
 
@@ -914,7 +1041,10 @@ class BaseRequestHandler(RequestHandler):
         # https://www.tornadoweb.org/en/branch5.1/web.html#thread-safety-notes
         # However, we can still rely on instance attributes to store what should
         # be sent back (reminder: there is an instance of this class created for each request)
-        self.__result = await IOLoop.current().run_in_executor(None, partial(self.__executeMethod, args, kwargs))
+        if self.__connectionClosed:
+            # The client is gone, e.g. tired of waiting for a thread: the method is not executed for nothing
+            return
+        self.__result = await self.__runInExecutor(self.__executeMethod, args, kwargs)
 
         # Strip the exception/callstack info from S_ERROR responses
         if isinstance(self.__result, dict):
@@ -0,0 +1,82 @@
+"""Executor of the requests of a Tornado handler (or of one of its methods)
+
+The requests are admitted by the executor before being processed: when the number of requests in progress
+reaches the number of threads plus the number of waiting requests allowed, the new ones are rejected.
+Their processing (authorization and target method) is then done in the threads of the executor, and the
+time spent waiting for a thread is recorded.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado.ioloop import IOLoop
+
+
+class HandlerExecutor(object):
+    """Pool of threads with a limit on the number of requests"""
+
+    def __init__(self, name, maxThreads=0, maxWaiting=0):
+        """c'tor
+
+        :param str name: name of the executor, for the threads and the statistics
+        :param int maxThreads: number of threads, 0 to use the default executor of the IOLoop
+        :param int maxWaiting: number of requests which can wait for a thread, 0 for no limit
+        """
+        self.name = name
+        self.maxThreads = max(0, maxThreads)
+        self.maxWaiting = max(0, maxWaiting)
+        self.__pool = ThreadPoolExecutor(self.maxThreads, thread_name_prefix=name) if self.maxThreads else None
+        # Maximum number of requests in progress, 0 for no limit
+        self.__maxRequests = self.maxThreads + self.maxWaiting if self.maxWaiting else 0
+        self.__lock = threading.Lock()
+        self.__requests = 0
+        self.__stats = {"Requests": 0, "Rejected": 0, "Tasks": 0, "TotalQueueTime": 0.0, "MaxQueueTime": 0.0}
+
+    def admit(self):
+        """Admit a new request, to be released when it is over
+
+        :return: bool, False if the request is rejected
+        """
+        with self.__lock:
+            if self.__maxRequests and self.__requests >= self.__maxRequests:
+                self.__stats["Rejected"] += 1
+                return False
+            self.__requests += 1
+            self.__stats["Requests"] += 1
+        return True
+
+    def release(self):
+        """A request admitted is over"""
+        with self.__lock:
+            self.__requests -= 1
+
+    def run(self, func, *args):
+        """Execute a function in a thread of the executor
+
+        :return: awaitable giving the result of the function
+        """
+        submitTime = time.time()
+
+        def execute():
+            queueTime = time.time() - submitTime
+            with self.__lock:
+                self.__stats["Tasks"] += 1
+                self.__stats["TotalQueueTime"] += queueTime
+                self.__stats["MaxQueueTime"] = max(self.__stats["MaxQueueTime"], queueTime)
+            return func(*args)
+
+        return IOLoop.current().run_in_executor(self.__pool, execute)
+
+    def getStatistics(self):
+        """Get the use of the executor
+
+        :return: dict with the number of Requests admitted and Rejected, the number of requests InProgress,
+                 the number of Tasks executed and the Total/Max/AverageQueueTime they waited for a thread
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["InProgress"] = self.__requests
+        stats["AverageQueueTime"] = stats["TotalQueueTime"] / stats["Tasks"] if stats["Tasks"] else 0.0
+        stats["MaxThreads"] = self.maxThreads
+        stats["MaxWaiting"] = self.maxWaiting
+        return stats
@@ -0,0 +1,53 @@
+""" Test the lifecycle of the requests of the Tornado handlers """
+import asyncio
+import threading
+
+from DIRAC.Core.Tornado.Server.private.BaseRequestHandler import BaseRequestHandler
+from DIRAC.Core.Tornado.Server.private.HandlerExecutor import HandlerExecutor
+
+
+def makeRequest(executor):
+    """Get a handler whose request was admitted by an executor, as done by its prepare method"""
+    handler = BaseRequestHandler.__new__(BaseRequestHandler)
+    handler._BaseRequestHandler__startRequest()
+    assert executor.admit()
+    handler._BaseRequestHandler__executor = executor
+    return handler
+
+
+def test_connectionCloseWhileRunning():
+    executor = HandlerExecutor("Test/Handler", maxThreads=1)
+    requestsInProgress = BaseRequestHandler.getRequestsInProgress()
+    handler = makeRequest(executor)
+    release = threading.Event()
+
+    async def runRequest():
+        task = asyncio.ensure_future(handler._BaseRequestHandler__runInExecutor(release.wait, 5))
+        await asyncio.sleep(0.1)
+        # The request is not over while its task is running
+        handler.on_connection_close()
+        assert BaseRequestHandler.getRequestsInProgress() == requestsInProgress + 1
+        assert executor.getStatistics()["InProgress"] == 1
+        release.set()
+        return await task
+
+    assert asyncio.run(runRequest())
+    # It is over when the task returns, and the method is not executed for a gone client
+    assert BaseRequestHandler.getRequestsInProgress() == requestsInProgress
+    assert executor.getStatistics()["InProgress"] == 0
+    assert asyncio.run(handler._BaseRequestHandler__execute()) is None
+    assert executor.getStatistics()["Tasks"] == 1
+    handler._BaseRequestHandler__finishRequest()
+    assert BaseRequestHandler.getRequestsInProgress() == requestsInProgress
+
+
+def test_connectionCloseWhileIdle():
+    executor = HandlerExecutor("Test/Handler", maxThreads=1)
+    requestsInProgress = BaseRequestHandler.getRequestsInProgress()
+    handler = makeRequest(executor)
+    handler.on_connection_close()
+    assert BaseRequestHandler.getRequestsInProgress() == requestsInProgress
+    assert executor.getStatistics()["InProgress"] == 0
+    handler.on_connection_close()
+    assert BaseRequestHandler.getRequestsInProgress() == requestsInProgress
+    assert executor.getStatistics()["InProgress"] == 0
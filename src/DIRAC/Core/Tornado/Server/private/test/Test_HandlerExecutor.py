@@ -0,0 +1,43 @@
+""" Test the executors of the Tornado handlers """
+import asyncio
+import threading
+
+from DIRAC.Core.Tornado.Server.private.HandlerExecutor import HandlerExecutor
+
+
+def test_admission():
+    executor = HandlerExecutor("Test/Handler", maxThreads=2, maxWaiting=1)
+    assert all(executor.admit() for _ in range(3))
+    # The threads are busy and a request is already waiting
+    assert not executor.admit()
+    executor.release()
+    assert executor.admit()
+
+    stats = executor.getStatistics()
+    assert stats["Requests"] == 4
+    assert stats["Rejected"] == 1
+    assert stats["InProgress"] == 3
+
+    # Without limit
+    executor = HandlerExecutor("Test/Default")
+    assert all(executor.admit() for _ in range(1000))
+
+
+def test_run():
+    executor = HandlerExecutor("Test/Handler", maxThreads=1)
+    release = threading.Event()
+
+    async def runTasks():
+        slow = executor.run(release.wait, 5)
+        quick = executor.run(threading.current_thread)
+        await asyncio.sleep(0.1)
+        release.set()
+        return await slow, await quick
+
+    assert asyncio.run(runTasks())[1].name.startswith("Test/Handler")
+
+    stats = executor.getStatistics()
+    assert stats["Tasks"] == 2
+    # The quick task waited for the slow one
+    assert stats["MaxQueueTime"] >= 0.1
+    assert 0 < stats["AverageQueueTime"] < stats["MaxQueueTime"]
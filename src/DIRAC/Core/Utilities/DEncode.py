@@ -10,6 +10,13 @@ Encoding and decoding for dirac, Ids:
  l -> list
  t -> tuple
  d -> dictionary
+
+encode and decode use encodeFast and decodeFast, which produce the same bytes and objects as
+the generic implementations (encodeGeneric and decodeGeneric) dispatching each value through
+g_dEncodeFunctions and g_dDecodeFunctions, but handle the most common types inline.
+tests/Performance/DEncode/benchmark_DEncode.py compares the throughput of both.
+
+StreamDecoder and iterDecode decode data incrementally, as it is received.
 """
 from past.builtins import long
 import six
@@ -510,17 +517,16 @@ g_dEncodeFunctions[types.DictType] = encodeDict
 g_dDecodeFunctions[_ord("d")] = decodeDict
 
 
-# Encode function
-def encode(uObject):
-    """Generic encoding function"""
+def encodeGeneric(uObject):
+    """Generic encoding function, dispatching every value to its g_dEncodeFunctions entry"""
     eList = []
     # print("ENCODE FUNCTION : %s" % g_dEncodeFunctions[ type( uObject ) ])
     g_dEncodeFunctions[type(uObject)](uObject, eList)
     return b"".join(eList)
 
 
-def decode(data):
-    """Generic decoding function"""
+def decodeGeneric(data):
+    """Generic decoding function, dispatching every value to its g_dDecodeFunctions entry"""
     if not data:
         return data
     # print("DECODE FUNCTION : %s" % g_dDecodeFunctions[ sStream [ iIndex ] ])
@@ -529,6 +535,380 @@ def decode(data):
     return g_dDecodeFunctions[data[0]](data, 0)
 
 
+def encodeFast(uObject):
+    """Encoding function producing the same bytes as encodeGeneric
+
+    The most common types (str, int, list, dict...) are handled inline instead of
+    going through one g_dEncodeFunctions call per value. The other types
+    (datetime, or anything added to g_dEncodeFunctions) use the generic functions.
+    """
+    eList = []
+    append = eList.append
+
+    def encodeValue(value):
+        vType = type(value)
+        if vType is str:
+            value = value.encode()
+            append(b"s%d:" % len(value))
+            append(value)
+        elif vType is int:
+            append(b"i%de" % value)
+        elif vType is dict:
+            append(b"d")
+            for key, item in value.items():
+                kType = type(key)
+                if kType is str:
+                    key = key.encode()
+                    append(b"s%d:" % len(key))
+                    append(key)
+                else:
+                    encodeValue(key)
+                iType = type(item)
+                if iType is str:
+                    item = item.encode()
+                    append(b"s%d:" % len(item))
+                    append(item)
+                elif iType is int:
+                    append(b"i%de" % item)
+                else:
+                    encodeValue(item)
+            append(b"e")
+        elif vType is list or vType is tuple:
+            append(b"l" if vType is list else b"t")
+            for item in value:
+                iType = type(item)
+                if iType is str:
+                    item = item.encode()
+                    append(b"s%d:" % len(item))
+                    append(item)
+                elif iType is int:
+                    append(b"i%de" % item)
+                elif iType is float:
+                    append(b"f%se" % str(item).encode())
+                else:
+                    encodeValue(item)
+            append(b"e")
+        elif vType is bool:
+            append(b"b1" if value else b"b0")
+        elif value is None:
+            append(b"n")
+        elif vType is float:
+            append(b"f%se" % str(value).encode())
+        elif vType is bytes:
+            append(b"s%d:" % len(value))
+            append(value)
+        elif vType is _dateTimeType:
+            append(b"za")
+            encodeValue(
+                (
+                    value.year,
+                    value.month,
+                    value.day,
+                    value.hour,
+                    value.minute,
+                    value.second,
+                    value.microsecond,
+                    value.tzinfo,
+                )
+            )
+        else:
+            g_dEncodeFunctions[vType](value, eList)
+
+    encodeValue(uObject)
+    return b"".join(eList)
+
+
+# DEncode datetime markers
+_dateTimeTypes = {_ord("a"): datetime.datetime, _ord("d"): datetime.date, _ord("t"): datetime.time}
+
+
+def decodeFast(data, i=0):
+    """Decoding function returning the same result as decodeGeneric
+
+    The strings and ints found in lists, tuples and dicts, as well as the datetimes,
+    are decoded inline instead of going through one g_dDecodeFunctions call per value.
+    The other types (float, or anything added to g_dDecodeFunctions) use the generic functions.
+
+    :param data: encoded data (bytes or bytearray)
+    :param int i: position of the object to decode in data
+    :returns: tuple (decoded object, position following the object in data)
+    """
+    if not data:
+        return data
+    if not isinstance(data, (bytes, bytearray)):
+        raise NotImplementedError("This should never happen")
+
+    index = data.index
+
+    def decodeValue(i):
+        marker = data[i]
+        if marker == 115 or marker == 117:  # s, u
+            colon = index(b":", i + 1)
+            end = colon + 1 + int(data[i + 1 : colon])
+            return (data[colon + 1 : end].decode("utf-8", "surrogateescape"), end)
+        if marker == 105 or marker == 73:  # i, I
+            end = index(b"e", i + 1)
+            return (int(data[i + 1 : end]), end + 1)
+        if marker == 100:  # d
+            value = {}
+            i += 1
+            while data[i] != 101:
+                itemMarker = data[i]
+                if itemMarker == 115 or itemMarker == 117:
+                    colon = index(b":", i + 1)
+                    i = colon + 1 + int(data[i + 1 : colon])
+                    key = data[colon + 1 : i].decode("utf-8", "surrogateescape")
+                else:
+                    key, i = decodeValue(i)
+                itemMarker = data[i]
+                if itemMarker == 115 or itemMarker == 117:
+                    colon = index(b":", i + 1)
+                    i = colon + 1 + int(data[i + 1 : colon])
+                    value[key] = data[colon + 1 : i].decode("utf-8", "surrogateescape")
+                else:
+                    value[key], i = decodeValue(i)
+            return (value, i + 1)
+        if marker == 108 or marker == 116:  # l, t
+            value = []
+            append = value.append
+            i += 1
+            while data[i] != 101:
+                itemMarker = data[i]
+                if itemMarker == 115 or itemMarker == 117:
+                    colon = index(b":", i + 1)
+                    i = colon + 1 + int(data[i + 1 : colon])
+                    append(data[colon + 1 : i].decode("utf-8", "surrogateescape"))
+                elif itemMarker == 105:
+                    end = index(b"e", i + 1)
+                    append(int(data[i + 1 : end]))
+                    i = end + 1
+                else:
+                    item, i = decodeValue(i)
+                    append(item)
+            if marker == 116:
+                value = tuple(value)
+            return (value, i + 1)
+        if marker == 110:  # n
+            return (None, i + 1)
+        if marker == 98:  # b
+            return (data[i + 1] != 48, i + 2)
+        if marker == 122 and data[i + 2] == 116:  # z followed by the tuple of the datetime fields
+            dataType = data[i + 1]
+            if dataType in _dateTimeTypes:
+                tupleObject, i = decodeValue(i + 2)
+                return (_dateTimeTypes[dataType](*tupleObject), i)
+        return g_dDecodeFunctions[marker](data, i)
+
+    return decodeValue(i)
+
+
+# Marker of a dict waiting for the key of its next item in the StreamDecoder
+_noKey = object()
+
+
+class _StreamFrame(object):
+    """Container being decoded by the StreamDecoder"""
+
+    __slots__ = ("containerType", "container", "path", "key", "index")
+
+    def __init__(self, containerType, path, assemble):
+        self.containerType = containerType
+        self.container = ({} if containerType is dict else []) if assemble else None
+        self.path = path
+        # Key of the dict item being decoded
+        self.key = _noKey
+        # Index of the next list item
+        self.index = 0
+
+
+class StreamDecoder(object):
+    """Incremental decoder of DEncode data
+
+    The encoded data is given to feed() as it arrives. The containers (dict, list, tuple) nested
+    less than depth levels deep are parsed incrementally, and each of their items is decoded as soon
+    as all its bytes are available, so that the caller can process it without waiting for the rest
+    of the data. With depth=1, the items of the top level dict or list are returned one by one.
+
+    Every decoded item is returned as a tuple (path, key, value), where path is the tuple of keys
+    (or list indexes) leading to the container of the item, and key is the dict key (or list index)
+    of the item in its container. The containers parsed incrementally are not returned as items.
+
+    If assemble is True, the decoder also builds the complete decoded object, which is
+    available as result once finished. It is the same object decode would return, but the
+    encoded data does not have to be kept in memory until the end of the transfer.
+    """
+
+    def __init__(self, depth=1, assemble=False):
+        """C'tor
+
+        :param int depth: number of container levels decoded incrementally
+        :param bool assemble: build the complete decoded object
+        """
+        self.depth = depth
+        self.assemble = assemble
+        self.finished = False
+        self.result = None
+        self.__buffer = bytearray()
+        self.__position = 0
+        # Size the buffer has to reach before trying again to decode an incomplete item
+        self.__retrySize = 0
+        self.__stack = []
+
+    def feed(self, data):
+        """Add data to the stream and decode everything that can be decoded
+
+        :param bytes data: next chunk of the encoded data
+        :returns: list of (path, key, value) for the newly decoded items
+        """
+        if self.finished:
+            if data:
+                raise ValueError("Data found after the end of the encoded object")
+            return []
+        buf = self.__buffer
+        if self.__position:
+            del buf[: self.__position]
+            self.__position = 0
+        buf += data
+        # Do not try again to decode an incomplete item for every few bytes received
+        if len(buf) < self.__retrySize:
+            return []
+        self.__retrySize = 0
+
+        items = []
+        stack = self.__stack
+        position = 0
+        bufLen = len(buf)
+        while position < bufLen and not self.finished:
+            marker = buf[position]
+            frame = stack[-1] if stack else None
+            if frame is not None and marker == 101 and frame.key is _noKey:  # e
+                # End of a container decoded incrementally
+                stack.pop()
+                position += 1
+                value = frame.container
+                if value is not None and frame.containerType is tuple:
+                    value = tuple(value)
+                self.__addValue(value, None)
+                continue
+            if frame is None or frame.containerType is not dict or frame.key is not _noKey:
+                if len(stack) < self.depth and marker in _streamContainerTypes:
+                    # Start of a container to decode incrementally
+                    if frame is None:
+                        path = ()
+                    elif frame.containerType is dict:
+                        path = frame.path + (frame.key,)
+                    else:
+                        path = frame.path + (frame.index,)
+                    stack.append(_StreamFrame(_streamContainerTypes[marker], path, self.assemble))
+                    position += 1
+                    continue
+            try:
+                value, end = decodeFast(buf, position)
+            except (IndexError, ValueError):
+                end = bufLen
+            # Something has to follow an item of a container: the container end at least.
+            # Strings and floats can not be told complete otherwise.
+            if end >= bufLen:
+                if frame is None:
+                    # A single object, decoded in close()
+                    break
+                self.__retrySize = 2 * (bufLen - position)
+                break
+            position = end
+            if frame is not None and frame.containerType is dict and frame.key is _noKey:
+                frame.key = value
+            else:
+                self.__addValue(value, items)
+
+        if self.finished:
+            if position < bufLen:
+                raise ValueError("Data found after the end of the encoded object")
+            del buf[:]
+            position = 0
+        self.__position = position
+        return items
+
+    def __addValue(self, value, items):
+        """Put a decoded value in its container, and return it if items is a list"""
+        if not self.__stack:
+            self.finished = True
+            self.result = value
+            if items is not None:
+                items.append(((), None, value))
+            return
+        frame = self.__stack[-1]
+        if frame.containerType is dict:
+            key = frame.key
+            frame.key = _noKey
+            if self.assemble:
+                frame.container[key] = value
+        else:
+            key = frame.index
+            frame.index += 1
+            if self.assemble:
+                frame.container.append(value)
+        if items is not None:
+            items.append((frame.path, key, value))
+
+    def close(self):
+        """Signal the end of the data
+
+        :returns: list of (path, key, value) for the last decoded items
+        :raises ValueError: if the data is incomplete
+        """
+        # Decode what was waiting for more data
+        self.__retrySize = 0
+        items = self.feed(b"")
+        if not self.finished and not self.__stack and self.__position < len(self.__buffer):
+            value, end = decodeFast(self.__buffer, self.__position)
+            if end == len(self.__buffer):
+                self.__addValue(value, items)
+        if not self.finished:
+            raise ValueError("Incomplete encoded data")
+        return items
+
+
+# DEncode containers decoded incrementally by the StreamDecoder
+_streamContainerTypes = {_ord("d"): dict, _ord("l"): list, _ord("t"): tuple}
+
+
+def iterDecode(chunks, depth=1):
+    """Decode data while it is received
+
+    :param chunks: iterable of bytes, the consecutive pieces of the encoded data
+    :param int depth: number of container levels decoded incrementally (see StreamDecoder)
+    :returns: generator of (path, key, value) tuples, one for each decoded item
+    """
+    decoder = StreamDecoder(depth=depth)
+    for chunk in chunks:
+        for item in decoder.feed(chunk):
+            yield item
+    for item in decoder.close():
+        yield item
+
+
+# Encode function
+def encode(uObject):
+    """Encode an object
+
+    The debugging of the call stack (DIRAC_DEBUG_DENCODE_CALLSTACK) hooks into the
+    generic functions, so the fast functions are only used when it is disabled.
+    """
+    if DIRAC_DEBUG_DENCODE_CALLSTACK:
+        return encodeGeneric(uObject)
+    return encodeFast(uObject)
+
+
+def decode(data):
+    """Decode data
+
+    :returns: tuple (decoded object, length of the decoded data)
+    """
+    if DIRAC_DEBUG_DENCODE_CALLSTACK:
+        return decodeGeneric(data)
+    return decodeFast(data)
+
+
 if __name__ == "__main__":
     gObject = {2: "3", True: (3, None), 2.0 * 10**20: 2.0 * 10**-10}
     print("Initial: %s" % gObject)
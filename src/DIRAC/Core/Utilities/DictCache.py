@@ -3,23 +3,8 @@
 """
 import datetime
 import threading
-
-# DIRAC
-from DIRAC.Core.Utilities.LockRing import LockRing
-
-
-class ThreadLocalDict(threading.local):
-    """This class is just useful to have a mutable object (in this case, a dict) as a thread local
-    Read the _threading_local docstring for more details.
-
-    Its purpose is to have a different cache per thread
-    """
-
-    def __init__(self):  # pylint: disable=super-init-not-called
-        """c'tor"""
-        # Note: it is on purpose that the threading.local constructor is not called
-        # Dictionary, local to a thread, that will be used as such
-        self.cache = {}
+import time
+from collections import OrderedDict
 
 
 class MockLockRing(object):
@@ -31,63 +16,148 @@ class MockLockRing(object):
 
     acquire = release = doNothing
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class CacheShard(object):
+    """Part of the cache protected by a single lock
+
+    Each entry is a list [expiration time, value, number of uses].
+    """
+
+    def __init__(self, lock, maxSize=0, lfu=False):
+        """c'tor
+
+        :param lock: lock protecting the shard
+        :param int maxSize: maximum number of entries, 0 for no limit
+        :param bool lfu: keep track of the use counts for the LFU eviction
+        """
+        self.lock = lock
+        self.maxSize = maxSize
+        # Keys ordered from the least to the most recently used (only maintained if maxSize)
+        self.entries = OrderedDict()
+        # Number of uses -> keys with this number of uses, ordered by last use (only maintained for LFU)
+        self.useCounts = {} if lfu else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class ThreadLocalShard(threading.local):
+    """This class is just useful to have a mutable object (in this case, a CacheShard) as a thread local
+    Read the _threading_local docstring for more details.
+
+    Its purpose is to have a different cache per thread
+    """
+
+    def __init__(self, maxSize, lfu):  # pylint: disable=super-init-not-called
+        """c'tor"""
+        # Note: it is on purpose that the threading.local constructor is not called
+        # Cache, local to a thread, that will be used as such
+        self.shard = CacheShard(MockLockRing(), maxSize, lfu)
+
 
 class DictCache(object):
     """DictCache is a generic cache implementation.
     The user can decide whether this cache should be shared among the threads or not, but it is always thread safe
     Note that when shared, the access to the cache is protected by a lock, but not necessarily the
     object you are retrieving from it.
+
+    A shared cache is split in several shards, according to the hash of the keys, each of them with
+    its own lock, so that threads using different keys do not wait for each other.
+
+    Records are removed when they expire. If a maximum size is given, the least recently used (LRU)
+    or least frequently used (LFU) records are also evicted to make room for the new ones. The limit
+    is applied to each shard (maxSize / lockStripes records each).
     """
 
-    def __init__(self, deleteFunction=False, threadLocal=False):
+    LRU = "LRU"
+    LFU = "LFU"
+
+    def __init__(self, deleteFunction=False, threadLocal=False, maxSize=0, evictionPolicy=LRU, lockStripes=8):
         """Initialize the dict cache.
 
         :param deleteFunction: if not False, invoked when deleting a cached object
         :param threadLocal: if False, the cache will be shared among all the threads, otherwise,
                             each thread gets its own cache.
+        :param int maxSize: maximum number of records, 0 for no limit
+        :param str evictionPolicy: records evicted when the cache is full, LRU (least recently used)
+                                   or LFU (least frequently used)
+        :param int lockStripes: number of shards of a shared cache
         """
-
         self.__threadLocal = threadLocal
+        self.__maxSize = max(0, maxSize)
+        self.__lfu = bool(self.__maxSize) and evictionPolicy == self.LFU
 
-        # Placeholder either for a LockRing if the cache is shared,
-        # or a mock class if not.
-        self.__lock = None
+        # A shared cache is split in nShards, a thread local one is not
+        self.__nShards = 1 if threadLocal else max(1, lockStripes)
+        shardMaxSize = -(-self.__maxSize // self.__nShards)
 
-        # One of the following two objects is returned
-        # by the __cache property, depending on the threadLocal strategy
+        # One of the following two objects is used, depending on the threadLocal strategy
 
         # This is the Placeholder for a shared cache
-        self.__sharedCache = {}
-        # This is the Placeholder for a shared cache
-        self.__threadLocalCache = ThreadLocalDict()
+        self.__sharedShards = [CacheShard(threading.RLock(), shardMaxSize, self.__lfu) for _ in range(self.__nShards)]
+        # This is the Placeholder for a thread local cache
+        self.__threadLocalShard = ThreadLocalShard(shardMaxSize, self.__lfu)
 
         # Function to clean the elements
         self.__deleteFunction = deleteFunction
 
-    @property
-    def lock(self):
-        """Return the lock.
-        In practice, if the cache is shared among threads, it is a LockRing.
-        Otherwise, it is just a mock object.
-        """
-
-        if not self.__lock:
-            if not self.__threadLocal:
-                self.__lock = LockRing().getLock(self.__class__.__name__, recursive=True)
-            else:
-                self.__lock = MockLockRing()
-
-        return self.__lock
+        if evictionPolicy not in (self.LRU, self.LFU):
+            raise ValueError("Unknown eviction policy %s" % evictionPolicy)
 
     @property
-    def __cache(self):
-        """Returns either a shared or a thread local cache.
-        In any case, the returned object is a dictionary
-        """
+    def __shards(self):
+        """Returns either the shards of the shared cache or the thread local cache"""
         if self.__threadLocal:
-            return self.__threadLocalCache.cache
+            return [self.__threadLocalShard.shard]
+
+        return self.__sharedShards
 
-        return self.__sharedCache
+    def __getShard(self, cKey):
+        """Returns the shard holding a key"""
+        if self.__threadLocal:
+            return self.__threadLocalShard.shard
+        if self.__nShards == 1:
+            return self.__sharedShards[0]
+        return self.__sharedShards[hash(cKey) % self.__nShards]
+
+    def __use(self, shard, cKey, entry):
+        """Record the use of an entry (to be called with the shard lock)"""
+        if not shard.maxSize:
+            return
+        shard.entries.move_to_end(cKey)
+        if self.__lfu:
+            useCounts = shard.useCounts
+            del useCounts[entry[2]][cKey]
+            if not useCounts[entry[2]]:
+                del useCounts[entry[2]]
+            entry[2] += 1
+            useCounts.setdefault(entry[2], OrderedDict())[cKey] = None
+
+    def __remove(self, shard, cKey):
+        """Remove an entry, calling the deleteFunction (to be called with the shard lock)"""
+        entry = shard.entries.pop(cKey)
+        if self.__lfu:
+            useCounts = shard.useCounts
+            del useCounts[entry[2]][cKey]
+            if not useCounts[entry[2]]:
+                del useCounts[entry[2]]
+        if self.__deleteFunction:
+            self.__deleteFunction(entry[1])
+
+    def __evict(self, shard):
+        """Remove one entry to make room for a new one (to be called with the shard lock)"""
+        if self.__lfu:
+            cKey = next(iter(shard.useCounts[min(shard.useCounts)]))
+        else:
+            cKey = next(iter(shard.entries))
+        self.__remove(shard, cKey)
+        shard.evictions += 1
 
     def exists(self, cKey, validSeconds=0):
         """Returns True/False if the key exists for the given number of seconds
@@ -97,35 +167,27 @@ class DictCache(object):
 
         :return: bool
         """
-        self.lock.acquire()
-        try:
+        shard = self.__getShard(cKey)
+        with shard.lock:
             # Is the key in the cache?
-            if cKey in self.__cache:
-                expTime = self.__cache[cKey]["expirationTime"]
+            entry = shard.entries.get(cKey)
+            if entry is not None:
                 # If it's valid return True!
-                if expTime > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
+                if entry[0] > time.time() + validSeconds:
                     return True
-                else:
-                    # Delete expired
-                    self.delete(cKey)
+                # Delete expired
+                self.__remove(shard, cKey)
             return False
-        finally:
-            self.lock.release()
 
     def delete(self, cKey):
         """Delete a key from the cache
 
         :param cKey: identification key of the record
         """
-        self.lock.acquire()
-        try:
-            if cKey not in self.__cache:
-                return
-            if self.__deleteFunction:
-                self.__deleteFunction(self.__cache[cKey]["value"])
-            del self.__cache[cKey]
-        finally:
-            self.lock.release()
+        shard = self.__getShard(cKey)
+        with shard.lock:
+            if cKey in shard.entries:
+                self.__remove(shard, cKey)
 
     def add(self, cKey, validSeconds, value=None):
         """Add a record to the cache
@@ -136,12 +198,20 @@ class DictCache(object):
         """
         if max(0, validSeconds) == 0:
             return
-        self.lock.acquire()
-        try:
-            vD = {"expirationTime": datetime.datetime.now() + datetime.timedelta(seconds=validSeconds), "value": value}
-            self.__cache[cKey] = vD
-        finally:
-            self.lock.release()
+        expirationTime = time.time() + validSeconds
+        shard = self.__getShard(cKey)
+        with shard.lock:
+            entry = shard.entries.get(cKey)
+            if entry is not None:
+                entry[0] = expirationTime
+                entry[1] = value
+                self.__use(shard, cKey, entry)
+                return
+            if shard.maxSize and len(shard.entries) >= shard.maxSize:
+                self.__evict(shard)
+            shard.entries[cKey] = [expirationTime, value, 1]
+            if self.__lfu:
+                shard.useCounts.setdefault(1, OrderedDict())[cKey] = None
 
     def get(self, cKey, validSeconds=0):
         """Get a record from the cache
@@ -151,37 +221,50 @@ class DictCache(object):
 
         :return: None or value of key
         """
-        self.lock.acquire()
-        try:
+        shard = self.__getShard(cKey)
+        with shard.lock:
             # Is the key in the cache?
-            if cKey in self.__cache:
-                expTime = self.__cache[cKey]["expirationTime"]
-                # If it's valid return True!
-                if expTime > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
-                    return self.__cache[cKey]["value"]
-                else:
-                    # Delete expired
-                    self.delete(cKey)
+            entry = shard.entries.get(cKey)
+            if entry is not None:
+                # If it's valid return it!
+                if entry[0] > time.time() + validSeconds:
+                    shard.hits += 1
+                    self.__use(shard, cKey, entry)
+                    return entry[1]
+                # Delete expired
+                self.__remove(shard, cKey)
+            shard.misses += 1
             return None
-        finally:
-            self.lock.release()
+
+    def getStatistics(self):
+        """Get the usage counters of the cache (of the current thread's cache if thread local)
+
+        :return: dict with the number of Hits, Misses and Evictions (records removed because the
+                 cache was full), the current Size and the MaxSize of the cache
+        """
+        stats = {"Hits": 0, "Misses": 0, "Evictions": 0, "Size": 0, "MaxSize": self.__maxSize}
+        for shard in self.__shards:
+            with shard.lock:
+                stats["Hits"] += shard.hits
+                stats["Misses"] += shard.misses
+                stats["Evictions"] += shard.evictions
+                stats["Size"] += len(shard.entries)
+        return stats
 
     def showContentsInString(self):
         """Return a human readable string to represent the contents
 
         :return: str
         """
-        self.lock.acquire()
-        try:
-            data = []
-            for cKey in self.__cache:
-                data.append("%s:" % str(cKey))
-                data.append("\tExp: %s" % self.__cache[cKey]["expirationTime"])
-                if self.__cache[cKey]["value"]:
-                    data.append("\tVal: %s" % self.__cache[cKey]["value"])
-            return "\n".join(data)
-        finally:
-            self.lock.release()
+        data = []
+        for shard in self.__shards:
+            with shard.lock:
+                for cKey, entry in shard.entries.items():
+                    data.append("%s:" % str(cKey))
+                    data.append("\tExp: %s" % datetime.datetime.fromtimestamp(entry[0]))
+                    if entry[1]:
+                        data.append("\tVal: %s" % entry[1])
+        return "\n".join(data)
 
     def getKeys(self, validSeconds=0):
         """Get keys for all contents
@@ -190,35 +273,26 @@ class DictCache(object):
 
         :return: list
         """
-        self.lock.acquire()
-        try:
-            keys = []
-            limitTime = datetime.datetime.now() + datetime.timedelta(seconds=validSeconds)
-            for cKey in self.__cache:
-                if self.__cache[cKey]["expirationTime"] > limitTime:
-                    keys.append(cKey)
-            return keys
-        finally:
-            self.lock.release()
+        keys = []
+        limitTime = time.time() + validSeconds
+        for shard in self.__shards:
+            with shard.lock:
+                for cKey, entry in shard.entries.items():
+                    if entry[0] > limitTime:
+                        keys.append(cKey)
+        return keys
 
     def purgeExpired(self, expiredInSeconds=0):
         """Purge all entries that are expired or will be expired in <expiredInSeconds>
 
         :param int expiredInSeconds: expired time in a seconds
         """
-        self.lock.acquire()
-        try:
-            keys = []
-            limitTime = datetime.datetime.now() + datetime.timedelta(seconds=expiredInSeconds)
-            for cKey in self.__cache:
-                if self.__cache[cKey]["expirationTime"] < limitTime:
-                    keys.append(cKey)
-            for cKey in keys:
-                if self.__deleteFunction:
-                    self.__deleteFunction(self.__cache[cKey]["value"])
-                del self.__cache[cKey]
-        finally:
-            self.lock.release()
+        limitTime = time.time() + expiredInSeconds
+        for shard in self.__shards:
+            with shard.lock:
+                keys = [cKey for cKey, entry in shard.entries.items() if entry[0] < limitTime]
+                for cKey in keys:
+                    self.__remove(shard, cKey)
 
     def purgeAll(self, useLock=True):
         """Purge all entries
@@ -226,16 +300,15 @@ class DictCache(object):
 
         :param bool useLock: use lock
         """
-        if useLock:
-            self.lock.acquire()
-        try:
-            for cKey in list(self.__cache):
-                if self.__deleteFunction:
-                    self.__deleteFunction(self.__cache[cKey]["value"])
-                del self.__cache[cKey]
-        finally:
+        for shard in self.__shards:
             if useLock:
-                self.lock.release()
+                shard.lock.acquire()
+            try:
+                for cKey in list(shard.entries):
+                    self.__remove(shard, cKey)
+            finally:
+                if useLock:
+                    shard.lock.release()
 
     def __del__(self):
         """When the DictCache is deleted, all the entries should be purged.
@@ -245,8 +318,7 @@ class DictCache(object):
         (https://docs.python.org/2/reference/datamodel.html#object.__del__)
         """
         self.purgeAll(useLock=False)
-        del self.__lock
         if self.__threadLocal:
-            del self.__threadLocalCache
+            del self.__threadLocalShard
         else:
-            del self.__sharedCache
+            del self.__sharedShards
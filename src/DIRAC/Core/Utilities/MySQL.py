@@ -1,18 +1,17 @@
 """ DIRAC Basic MySQL Class
     It provides access to the basic MySQL methods in a multithread-safe mode
-    keeping used connections in a python Queue for further reuse.
+    keeping used connections in a bounded pool for further reuse.
 
     These are the coded methods:
 
 
-    __init__( host, user, passwd, name, [maxConnsInQueue=10] )
+    __init__( host, user, passwd, name, [poolMinSize, poolMaxSize] )
 
-    Initializes the Queue and tries to connect to the DB server,
+    Gets the pool of connections to the server (shared by all the objects using the
+    same server and credentials) and tries to connect to the DB server,
     using the _connect method.
-    "maxConnsInQueue" defines the size of the Queue of open connections
-    that are kept for reuse. It also defined the maximum number of open
-    connections available from the object.
-    maxConnsInQueue = 0 means unlimited and it is not supported.
+    "poolMaxSize" defines the maximum number of connections open at the same time,
+    "poolMinSize" the number of idle connections kept open for reuse.
 
 
     _except( methodName, exception, errorMessage )
@@ -56,10 +55,14 @@
 
     _getConnection()
 
-    Gets a connection from the Queue (or open a new one if none is available)
+    Gets a connection from the pool (or open a new one if none is available),
+    pinned to the current thread.
     Returns S_OK with connection in Value or S_ERROR
-    the calling method is responsible for closing this connection once it is no
-    longer needed.
+
+
+    _checkoutConnection() / _releaseConnection( conn )
+
+    Gets a connection from the pool for a single operation, and gives it back.
 
 
 
@@ -132,6 +135,15 @@
       for compatibility with other methods condDict keyed argument is added
 
 
+    insertMany( self, tableName, inFields, valuesList, ignore = False, conn = None )
+    upsertMany( self, tableName, inFields, valuesList, updateFields = None, conn = None, incrementFields = None )
+    updateMany( self, tableName, keyFields, updateFields, valuesList, condDict = None, conn = None )
+
+      Insert, insert or update (ON DUPLICATE KEY UPDATE), or update several rows at once,
+      in as few statements as the max_allowed_packet of the server allows.
+      String type values will be appropriately escaped.
+
+
     getCounters( self, table, attrList, condDict = None, older = None,
                  newer = None, timeStamp = None, connection = False ):
 
@@ -146,7 +158,6 @@
 
 
 """
-import collections
 import time
 import threading
 import MySQLdb
@@ -159,6 +170,17 @@ from DIRAC.Core.Utilities import DErrno
 gInstancesCount = 0
 MAXCONNECTRETRY = 10
 RETRY_SLEEP_DURATION = 5
+# Default bounds of the connection pools
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 20
+# Seconds to wait for a free connection when the pool is exhausted
+POOL_WAIT_TIMEOUT = 60
+# Connections idle for more seconds than this are pinged before being used
+PING_IDLE_TIME = 60
+# Minimum seconds between two cleanings of the pools
+CLEAN_INTERVAL = 10
+# Used if max_allowed_packet can not be read from the server (MySQL 5.7 default)
+DEFAULT_MAX_ALLOWED_PACKET = 4 * 1024 * 1024
 
 
 def _checkFields(inFields, inValues):
@@ -177,6 +199,24 @@ def _checkFields(inFields, inValues):
     return S_OK()
 
 
+def _pinningStatement(cmd):
+    """Tell whether a statement starts a state bound to the connection (transaction, table locks)
+
+    :return: True if it starts one, False if it ends it, None otherwise
+    """
+    statement = cmd.lstrip()[:17].upper()
+    if statement.startswith(("START TRANSACTION", "BEGIN", "LOCK TABLE")):
+        return True
+    if statement.startswith(("COMMIT", "ROLLBACK", "UNLOCK TABLE")):
+        return False
+    return None
+
+
+def _isConnectionError(excp):
+    """Tell whether an exception means that the connection is lost (client side errors CR_*)"""
+    return isinstance(excp, MySQLdb.OperationalError) and bool(excp.args) and 2000 <= excp.args[0] < 3000
+
+
 def _quotedList(fieldList=None):
     """
     Quote a list of MySQL Field Names with "`"
@@ -198,25 +238,112 @@ def _quotedList(fieldList=None):
     return ", ".join(quotedFields)
 
 
+class PooledConnection(object):
+    """A connection of the pool and its state"""
+
+    __slots__ = ("conn", "dbName", "lastUse", "checkoutTime", "thread", "pinned")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.dbName = ""
+        self.lastUse = time.time()
+        self.checkoutTime = 0
+        # Thread the connection is pinned to, if any, and the kind of pinning
+        self.thread = None
+        self.pinned = None
+
+
 class ConnectionPool(object):
     """
-    Management of connections per thread
+    Bounded pool of connections shared by all the threads
+
+    Connections are checked out for the duration of a single operation (see checkout() and release()),
+    so the number of connections does not grow with the number of threads. At most maxSize connections
+    are open at the same time, and threads wait (up to waitTimeout seconds) for one to be released
+    when the limit is reached. Up to minSize idle connections are kept open, the others are closed
+    after being idle for graceTime seconds.
+
+    A connection is pinned to a thread while it holds a session state: from transactionStart() to
+    transactionCommit() / transactionRollback(), or between explicit START TRANSACTION / LOCK TABLES
+    and COMMIT / ROLLBACK / UNLOCK TABLES statements. Connections obtained with get() are also
+    (softly) pinned to the thread for backward compatibility, and taken back if the pool runs out
+    of connections while they are not in use.
+
+    Connections are only pinged before being reused if they were idle for more than pingIdleTime seconds.
     """
 
-    def __init__(self, host, user, passwd, port=3306, graceTime=600):
+    HARD_PIN = "Hard"
+    SOFT_PIN = "Soft"
+
+    def __init__(
+        self,
+        host,
+        user,
+        passwd,
+        port=3306,
+        graceTime=600,
+        minSize=POOL_MIN_SIZE,
+        maxSize=POOL_MAX_SIZE,
+        pingIdleTime=PING_IDLE_TIME,
+        waitTimeout=POOL_WAIT_TIMEOUT,
+    ):
         self.__host = host
         self.__user = user
         self.__passwd = passwd
         self.__port = port
         self.__graceTime = graceTime
-        self.__spares = collections.deque()
-        self.__maxSpares = 10
+        self.__pingIdleTime = pingIdleTime
+        self.__waitTimeout = waitTimeout
+        self.__minSize = 0
+        self.__maxSize = 1
+        self.resize(minSize, maxSize)
+        self.__cond = threading.Condition()
+        # Idle connections, the most recently used ones last
+        self.__idle = []
+        # id( connection ) -> PooledConnection for all the open connections
+        self.__connections = {}
+        # thread -> pinned PooledConnection
+        self.__pinned = {}
+        # Open connections plus the ones being opened
+        self.__size = 0
         self.__lastClean = 0
-        self.__assigned = {}
+        self.__stats = dict.fromkeys(
+            (
+                "Checkouts",
+                "Waits",
+                "WaitTime",
+                "MaxWaitTime",
+                "Timeouts",
+                "UseTime",
+                "MaxInUse",
+                "Created",
+                "Closed",
+                "Pings",
+                "FailedPings",
+                "Reclaimed",
+            ),
+            0,
+        )
+
+    def resize(self, minSize=None, maxSize=None):
+        """Change the bounds of the pool
+
+        :param int minSize: number of idle connections kept open
+        :param int maxSize: maximum number of open connections
+        """
+        if maxSize is not None:
+            self.__maxSize = max(1, maxSize)
+        if minSize is not None:
+            self.__minSize = max(0, minSize)
+        self.__minSize = min(self.__minSize, self.__maxSize)
+
+    @property
+    def maxSize(self):
+        return self.__maxSize
 
     @property
-    def __thid(self):
-        return threading.current_thread()
+    def minSize(self):
+        return self.__minSize
 
     def __newConn(self):
         conn = MySQLdb.connect(host=self.__host, port=self.__port, user=self.__user, passwd=self.__passwd)
@@ -231,45 +358,13 @@ class ConnectionPool(object):
         cursor.close()
         return res
 
-    def get(self, dbName, retries=10):
-        retries = max(0, min(MAXCONNECTRETRY, retries))
-        self.clean()
-        return self.__getWithRetry(dbName, retries, retries)
-
-    def __getWithRetry(self, dbName, totalRetries, retriesLeft):
-        sleepTime = RETRY_SLEEP_DURATION * (totalRetries - retriesLeft)
-        if sleepTime > 0:
-            time.sleep(sleepTime)
+    def __close(self, conn):
         try:
-            conn, lastName, thid = self.__innerGet()
-        except MySQLdb.MySQLError as excp:
-            if retriesLeft > 0:
-                return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
-            return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % excp)
-
-        if not self.__ping(conn):
-            try:
-                self.__assigned.pop(thid)
-            except KeyError:
-                pass
-            if retriesLeft > 0:
-                return self.__getWithRetry(dbName, totalRetries, retriesLeft)
-            return S_ERROR(DErrno.EMYSQL, "Could not connect")
-
-        if lastName != dbName:
-            try:
-                conn.select_db(dbName)
-            except MySQLdb.MySQLError as excp:
-                if retriesLeft > 0:
-                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
-                return S_ERROR(DErrno.EMYSQL, "Could not select db %s: %s" % (dbName, excp))
-            try:
-                self.__assigned[thid][1] = dbName
-            except KeyError:
-                if retriesLeft > 0:
-                    return self.__getWithRetry(dbName, totalRetries, retriesLeft - 1)
-                return S_ERROR(DErrno.EMYSQL, "Could not connect")
-        return S_OK(conn)
+            conn.close()
+        except MySQLdb.ProgrammingError as exc:
+            gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
+        except Exception as exc:
+            gLogger.warn("Exception while closing MySQL connection: %s" % exc)
 
     def __ping(self, conn):
         try:
@@ -278,84 +373,298 @@ class ConnectionPool(object):
         except Exception:
             return False
 
-    def __innerGet(self):
-        thid = self.__thid
+    def get(self, dbName, retries=10):
+        """Get a connection pinned to the current thread
+
+        Kept for the code using the connection object directly, prefer checkout() / release().
+
+        :return: S_OK(connection) / S_ERROR
+        """
+        result = self.checkout(dbName, retries)
+        if result["OK"]:
+            self.release(result["Value"], pin=self.SOFT_PIN)
+        return result
+
+    def checkout(self, dbName, retries=10, dedicated=False):
+        """Get a connection for an operation, that has to be given back with release()
+
+        If a connection is pinned to the current thread, it is the one returned, unless a dedicated
+        connection is asked for.
+
+        :param str dbName: database to use
+        :param int retries: number of retries to open a connection
+        :param bool dedicated: ignore the connection pinned to the thread, e.g. to keep reading a result while
+                               the thread executes other commands
+        :return: S_OK(connection) / S_ERROR
+        """
+        retries = max(0, min(MAXCONNECTRETRY, retries))
+        thread = threading.current_thread()
         now = time.time()
-        if thid in self.__assigned:
-            data = self.__assigned[thid]
-            conn = data[0]
-            data[2] = now
-            return data[0], data[1], thid
-        # Not cached
-        try:
-            conn, dbName = self.__spares.pop()
-        except IndexError:
-            conn = self.__newConn()
-            dbName = ""
+        if now - self.__lastClean > CLEAN_INTERVAL:
+            self.clean(now)
+
+        with self.__cond:
+            record = None if dedicated else self.__pinned.get(thread)
+            if record is not None:
+                if getattr(record.conn, "open", True):
+                    record.checkoutTime = now
+                    self.__stats["Checkouts"] += 1
+                else:
+                    # Closed behind our back
+                    self.__drop(record)
+                    record = None
+            if record is None:
+                result = self.__acquire(now)
+                if not result["OK"]:
+                    return result
+                record = result["Value"]
+
+        if record is None or not self.__isHealthy(record):
+            result = self.__open(retries)
+            if not result["OK"]:
+                return result
+            record = result["Value"]
+
+        if record.dbName != dbName:
+            try:
+                record.conn.select_db(dbName)
+                record.dbName = dbName
+            except MySQLdb.MySQLError as excp:
+                self.release(record.conn, broken=True)
+                return S_ERROR(DErrno.EMYSQL, "Could not select db %s: %s" % (dbName, excp))
+        return S_OK(record.conn)
 
-        self.__assigned[thid] = [conn, dbName, now]
-        return conn, dbName, thid
+    def __acquire(self, start):
+        """Take an idle connection or the right to open a new one, waiting if needed (called with the lock)
 
-    def __pop(self, thid):
-        try:
-            data = self.__assigned.pop(thid)
-            if len(self.__spares) < self.__maxSpares:
-                self.__spares.append((data[0], data[1]))
-            else:
-                try:
-                    data[0].close()
-                except MySQLdb.ProgrammingError as exc:
-                    gLogger.warn("ProgrammingError exception while closing MySQL connection: %s" % exc)
-                except Exception as exc:
-                    gLogger.warn("Exception while closing MySQL connection: %s" % exc)
-        except KeyError:
-            pass
+        :return: S_OK(PooledConnection or None if a connection has to be opened) / S_ERROR
+        """
+        deadline = start + self.__waitTimeout
+        waited = False
+        while True:
+            if self.__idle:
+                record = self.__idle.pop()
+                break
+            if self.__size < self.__maxSize:
+                self.__size += 1
+                record = None
+                break
+            if self.__reclaim():
+                continue
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.__stats["Timeouts"] += 1
+                return S_ERROR(
+                    DErrno.EMYSQL, "Timeout waiting for a free connection (%d connections in use)" % self.__size
+                )
+            waited = True
+            self.__cond.wait(remaining)
+
+        now = time.time()
+        self.__stats["Checkouts"] += 1
+        if waited:
+            waitTime = now - start
+            self.__stats["Waits"] += 1
+            self.__stats["WaitTime"] += waitTime
+            self.__stats["MaxWaitTime"] = max(self.__stats["MaxWaitTime"], waitTime)
+        self.__stats["MaxInUse"] = max(self.__stats["MaxInUse"], self.__size - len(self.__idle))
+        if record is not None:
+            record.checkoutTime = now
+        return S_OK(record)
+
+    def __reclaim(self):
+        """Take back a softly pinned connection that is not in use (called with the lock)
+
+        :return: True if a connection was put back in the idle list
+        """
+        for record in self.__pinned.values():
+            if record.pinned == self.SOFT_PIN and not record.checkoutTime:
+                self.__unpin(record)
+                self.__idle.append(record)
+                self.__stats["Reclaimed"] += 1
+                return True
+        return False
+
+    def __isHealthy(self, record):
+        """Check a connection before using it, pinging it if it was idle for too long
+
+        Unhealthy connections are closed, keeping their slot in the pool.
+        """
+        if not getattr(record.conn, "open", True):
+            healthy = False
+        elif time.time() - record.lastUse > self.__pingIdleTime:
+            healthy = self.__ping(record.conn)
+            with self.__cond:
+                self.__stats["Pings"] += 1
+                if not healthy:
+                    self.__stats["FailedPings"] += 1
+        else:
+            return True
+        if not healthy:
+            self.__close(record.conn)
+            with self.__cond:
+                self.__unpin(record)
+                self.__connections.pop(id(record.conn), None)
+                self.__stats["Closed"] += 1
+        return healthy
+
+    def __open(self, retries):
+        """Open a new connection in a slot already reserved in the pool
+
+        :return: S_OK(PooledConnection) / S_ERROR
+        """
+        for retry in range(retries + 1):
+            if retry:
+                time.sleep(RETRY_SLEEP_DURATION * retry)
+            try:
+                conn = self.__newConn()
+                break
+            except MySQLdb.MySQLError as excp:
+                error = excp
+        else:
+            with self.__cond:
+                self.__size -= 1
+                self.__cond.notify()
+            return S_ERROR(DErrno.EMYSQL, "Could not connect: %s" % error)
+
+        record = PooledConnection(conn)
+        record.checkoutTime = time.time()
+        with self.__cond:
+            self.__connections[id(conn)] = record
+            self.__stats["Created"] += 1
+        return S_OK(record)
+
+    def release(self, conn, pin=None, broken=False):
+        """Give back a connection obtained with checkout()
+
+        :param conn: connection
+        :param pin: HARD_PIN or SOFT_PIN to pin the connection to the current thread, False to unpin it,
+                    None to leave it as it is
+        :param bool broken: the connection is not usable anymore and has to be closed
+        """
+        with self.__cond:
+            record = self.__connections.get(id(conn))
+            if record is None:
+                return
+            now = time.time()
+            if record.checkoutTime:
+                self.__stats["UseTime"] += now - record.checkoutTime
+                record.checkoutTime = 0
+            record.lastUse = now
+            if broken:
+                self.__drop(record)
+            elif pin:
+                if record.pinned != self.HARD_PIN:
+                    record.pinned = pin
+                if record.thread is None:
+                    record.thread = threading.current_thread()
+                    self.__pinned[record.thread] = record
+            elif record.pinned is None or (pin is False and record.pinned):
+                self.__unpin(record)
+                self.__idle.append(record)
+                self.__cond.notify()
+        if broken:
+            self.__close(conn)
+
+    def __unpin(self, record):
+        """Called with the lock"""
+        if record.thread is not None:
+            self.__pinned.pop(record.thread, None)
+        record.thread = None
+        record.pinned = None
+
+    def __drop(self, record):
+        """Forget about a connection, that has to be closed (called with the lock)"""
+        self.__unpin(record)
+        if self.__connections.pop(id(record.conn), None) is not None:
+            self.__size -= 1
+            self.__stats["Closed"] += 1
+            self.__cond.notify()
 
     def clean(self, now=False):
+        """Give back the connections pinned to dead threads and close the ones idle for too long"""
         if not now:
             now = time.time()
         self.__lastClean = now
-        for thid in list(self.__assigned):
-            if not thid.is_alive():
-                self.__pop(thid)
-            try:
-                data = self.__assigned[thid]
-            except KeyError:
-                continue
-            if now - data[2] > self.__graceTime:
-                self.__pop(thid)
+        toClose = []
+        with self.__cond:
+            for thread, record in list(self.__pinned.items()):
+                if record.checkoutTime and thread.is_alive():
+                    continue
+                if thread.is_alive() and now - record.lastUse <= self.__graceTime:
+                    continue
+                if record.pinned == self.HARD_PIN:
+                    # A transaction is left open, it is rolled back by closing the connection
+                    self.__drop(record)
+                    toClose.append(record.conn)
+                else:
+                    self.__unpin(record)
+                    self.__idle.append(record)
+                    self.__cond.notify()
+            # Keep at least minSize idle connections
+            expired = [record for record in self.__idle if now - record.lastUse > self.__graceTime]
+            for record in expired[: len(self.__idle) - self.__minSize]:
+                self.__idle.remove(record)
+                self.__drop(record)
+                toClose.append(record.conn)
+        for conn in toClose:
+            self.__close(conn)
+
+    def getStatistics(self):
+        """Get the usage of the pool
+
+        :return: dict with the current number of connections (Size, InUse, Idle, Pinned), the limits
+                 (MinSize, MaxSize) and the counters since the creation of the pool: Checkouts, Waits
+                 (checkouts that had to wait for a connection), WaitTime, MaxWaitTime, Timeouts, UseTime
+                 (time connections were checked out), MaxInUse, Created, Closed, Pings, FailedPings and
+                 Reclaimed (softly pinned connections taken back)
+        """
+        with self.__cond:
+            stats = dict(self.__stats)
+            stats["Size"] = len(self.__connections)
+            stats["Idle"] = len(self.__idle)
+            stats["InUse"] = stats["Size"] - stats["Idle"]
+            stats["Pinned"] = len(self.__pinned)
+            stats["MinSize"] = self.__minSize
+            stats["MaxSize"] = self.__maxSize
+        return stats
 
     def transactionStart(self, dbName):
-        result = self.get(dbName)
+        result = self.checkout(dbName)
         if not result["OK"]:
             return result
         conn = result["Value"]
         try:
-            return S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+            result = S_OK(self.__execute(conn, "START TRANSACTION WITH CONSISTENT SNAPSHOT"))
         except MySQLdb.MySQLError as excp:
+            self.release(conn)
             return S_ERROR(DErrno.EMYSQL, "Could not begin transaction: %s" % excp)
+        self.release(conn, pin=self.HARD_PIN)
+        return result
 
     def transactionCommit(self, dbName):
-        result = self.get(dbName)
+        result = self.checkout(dbName)
         if not result["OK"]:
             return result
         conn = result["Value"]
         try:
-            result = self.__execute(conn, "COMMIT")
-            return S_OK(result)
+            return S_OK(self.__execute(conn, "COMMIT"))
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not commit transaction: %s" % excp)
+        finally:
+            self.release(conn, pin=False)
 
     def transactionRollback(self, dbName):
-        result = self.get(dbName)
+        result = self.checkout(dbName)
         if not result["OK"]:
             return result
         conn = result["Value"]
         try:
-            result = self.__execute(conn, "ROLLBACK")
-            return S_OK(result)
+            return S_OK(self.__execute(conn, "ROLLBACK"))
         except MySQLdb.MySQLError as excp:
             return S_ERROR(DErrno.EMYSQL, "Could not rollback transaction: %s" % excp)
+        finally:
+            self.release(conn, pin=False)
 
 
 class MySQL(object):
@@ -367,11 +676,23 @@ class MySQL(object):
 
     __connectionPools = {}
 
-    def __init__(self, hostName="localhost", userName="dirac", passwd="dirac", dbName="", port=3306, debug=False):
+    def __init__(
+        self,
+        hostName="localhost",
+        userName="dirac",
+        passwd="dirac",
+        dbName="",
+        port=3306,
+        debug=False,
+        poolMinSize=None,
+        poolMaxSize=None,
+    ):
         """
         set MySQL connection parameters and try to connect
 
         :param debug: unused
+        :param int poolMinSize: number of idle connections kept open
+        :param int poolMaxSize: maximum number of connections open at the same time
         """
         global gInstancesCount
         gInstancesCount += 1
@@ -393,8 +714,21 @@ class MySQL(object):
         self.__port = port
         cKey = (self.__hostName, self.__userName, self.__passwd, self.__port)
         if cKey not in MySQL.__connectionPools:
-            MySQL.__connectionPools[cKey] = ConnectionPool(*cKey)
+            MySQL.__connectionPools[cKey] = ConnectionPool(
+                *cKey,
+                minSize=POOL_MIN_SIZE if poolMinSize is None else poolMinSize,
+                maxSize=POOL_MAX_SIZE if poolMaxSize is None else poolMaxSize,
+            )
+        else:
+            # The pool is shared by the databases on the same server with the same credentials,
+            # it gets the largest of the requested sizes
+            pool = MySQL.__connectionPools[cKey]
+            pool.resize(
+                max(pool.minSize, poolMinSize or 0),
+                max(pool.maxSize, poolMaxSize or 0),
+            )
         self.__connectionPool = MySQL.__connectionPools[cKey]
+        self.__maxAllowedPacket = None
 
         self.__initialized = True
         result = self._connect()
@@ -445,10 +779,14 @@ class MySQL(object):
         It also includes quotation marks " around the given string
         """
         if connection is None:
-            retDict = self._getConnection()
+            retDict = self._checkoutConnection()
             if not retDict["OK"]:
                 return retDict
             connection = retDict["Value"]
+            try:
+                return self.__escapeString(myString, connection=connection)
+            finally:
+                self._releaseConnection(connection)
 
         if isinstance(myString, bytes):
             myString = myString.decode()
@@ -522,16 +860,21 @@ class MySQL(object):
         Escapes all strings in the list of values provided
         """
         # self.log.debug('_escapeValues:', inValues)
-        retDict = self._getConnection()
+        if not inValues:
+            return S_OK([])
+
+        retDict = self._checkoutConnection()
         if not retDict["OK"]:
             return retDict
         connection = retDict["Value"]
+        try:
+            return self.__escapeValues(inValues, connection)
+        finally:
+            self._releaseConnection(connection)
 
+    def __escapeValues(self, inValues, connection):
+        """Escapes all strings in the list of values provided, using the given connection"""
         inEscapeValues = []
-
-        if not inValues:
-            return S_OK(inEscapeValues)
-
         for value in inValues:
             if isinstance(value, str):
                 retDict = self.__escapeString(value, connection=connection)
@@ -547,7 +890,7 @@ class MySQL(object):
                     tupleValues.append(retDict["Value"])
                 inEscapeValues.append("(" + ", ".join(tupleValues) + ")")
             elif isinstance(value, bool):
-                inEscapeValues = [str(value)]
+                inEscapeValues.append(str(value))
             else:
                 if isinstance(value, bytes):
                     value = value.decode()
@@ -577,9 +920,10 @@ class MySQL(object):
             return S_OK()
 
         # Test the connection to the DB
-        retDict = self._getConnection()
+        retDict = self._checkoutConnection()
         if not retDict["OK"]:
             return retDict
+        self._releaseConnection(retDict["Value"])
         self._connected = True
         return S_OK()
 
@@ -596,10 +940,11 @@ class MySQL(object):
 
         self.log.debug("_query: %s" % self._safeCmd(cmd))
 
-        retDict = self._getConnection()
+        retDict = self._checkoutConnection()
         if not retDict["OK"]:
             return retDict
         connection = retDict["Value"]
+        error = None
 
         try:
             cursor = connection.cursor()
@@ -619,12 +964,14 @@ class MySQL(object):
         except Exception as x:
             # self.log.debug('_query: %s' % self._safeCmd(cmd))
             retDict = self._except("_query", x, "Execution failed.", cmd, debug)
+            error = x
 
         try:
             cursor.close()
         except Exception:
             pass
 
+        self.__releaseAfter(connection, cmd, error)
         return retDict
 
     def _update(self, cmd, conn=None, debug=True):
@@ -638,10 +985,11 @@ class MySQL(object):
 
         self.log.debug("_update: %s" % self._safeCmd(cmd))
 
-        retDict = self._getConnection()
+        retDict = self._checkoutConnection()
         if not retDict["OK"]:
             return retDict
         connection = retDict["Value"]
+        error = None
 
         try:
             cursor = connection.cursor()
@@ -651,12 +999,14 @@ class MySQL(object):
                 retDict["lastRowId"] = cursor.lastrowid
         except Exception as x:
             retDict = self._except("_update", x, "Execution failed.", cmd, debug)
+            error = x
 
         try:
             cursor.close()
         except Exception:
             pass
 
+        self.__releaseAfter(connection, cmd, error)
         return retDict
 
     def _transaction(self, cmdList, conn=None):
@@ -674,7 +1024,7 @@ class MySQL(object):
         # # get connection
         connection = conn
         if not connection:
-            retDict = self._getConnection()
+            retDict = self._checkoutConnection()
             if not retDict["OK"]:
                 return retDict
             connection = retDict["Value"]
@@ -689,10 +1039,17 @@ class MySQL(object):
         except Exception as error:
             self.logger.exception(error)
             # # rollback, put back connection to the pool
-            connection.rollback()
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            if not conn:
+                self._releaseConnection(connection, broken=_isConnectionError(error))
             return S_ERROR(DErrno.EMYSQL, error)
         # # close cursor, put back connection to the pool
         cursor.close()
+        if not conn:
+            self._releaseConnection(connection)
         return S_OK(cmdRet)
 
     def _createViews(self, viewsDict, force=False):
@@ -909,10 +1266,11 @@ class MySQL(object):
         return str(param[0])
 
     def _getConnection(self, retries=MAXCONNECTRETRY):
-        """Return  a new connection to the DB,
+        """Return  a connection to the DB, pinned to the current thread
 
-        Try the Queue, if it is empty add a newConnection to the Queue and retry
-        it will retry MAXCONNECTRETRY to open a new connection and will return
+        The connection is taken back by the pool if it runs out of connections while it is not in use,
+        or when the thread stays idle for too long.
+        It will retry MAXCONNECTRETRY to open a new connection and will return
         an error if it fails.
 
         :param int retries: Number of time it will retry to open a connection
@@ -926,6 +1284,44 @@ class MySQL(object):
 
         return self.__connectionPool.get(self.__dbName, retries)
 
+    def _checkoutConnection(self, retries=MAXCONNECTRETRY, dedicated=False):
+        """Get a connection from the pool for one operation, it has to be given back with _releaseConnection
+
+        :param int retries: Number of time it will retry to open a connection
+        :param bool dedicated: do not use the connection pinned to the thread, see ConnectionPool.checkout
+        """
+        if not self.__initialized:
+            error = "DB not properly initialized"
+            gLogger.error(error)
+            return S_ERROR(DErrno.EMYSQL, error)
+
+        return self.__connectionPool.checkout(self.__dbName, retries, dedicated)
+
+    def _releaseConnection(self, connection, pin=None, broken=False):
+        """Give back a connection obtained with _checkoutConnection
+
+        :param connection: the connection
+        :param pin: see ConnectionPool.release
+        :param bool broken: the connection is lost and has to be closed
+        """
+        self.__connectionPool.release(connection, pin=pin, broken=broken)
+
+    def __releaseAfter(self, connection, cmd, error):
+        """Give back a connection after executing a command, keeping it for the thread if the
+        command started a transaction or locked tables
+        """
+        pin = _pinningStatement(cmd)
+        if pin:
+            pin = ConnectionPool.HARD_PIN if error is None else None
+        self._releaseConnection(connection, pin=pin, broken=error is not None and _isConnectionError(error))
+
+    def getConnectionPoolStatistics(self):
+        """Get the usage of the connection pool (shared with the other databases on the same server)
+
+        :return: S_OK(dict) see ConnectionPool.getStatistics
+        """
+        return S_OK(self.__connectionPool.getStatistics())
+
     ########################################################################################
     #
     #  Transaction functions
@@ -1479,12 +1875,218 @@ class MySQL(object):
 
         return self._update("INSERT INTO %s %s VALUES %s" % (table, inFieldString, inValueString), conn)
 
+    def _getMaxAllowedPacket(self):
+        """Size in bytes of the largest statement accepted by the server (max_allowed_packet)"""
+        if self.__maxAllowedPacket is None:
+            retDict = self._query("SELECT @@max_allowed_packet")
+            if not retDict["OK"] or not retDict["Value"]:
+                return DEFAULT_MAX_ALLOWED_PACKET
+            self.__maxAllowedPacket = int(retDict["Value"][0][0])
+        return self.__maxAllowedPacket
+
+    def __escapeRows(self, nFields, valuesList):
+        """Escape the values of several rows, using a single connection
+
+        :return: S_OK(list of lists of escaped values) / S_ERROR
+        """
+        for values in valuesList:
+            if len(values) != nFields:
+                return S_ERROR(DErrno.EMYSQL, "Mismatch between inFields and inValues.")
+        retDict = self._checkoutConnection()
+        if not retDict["OK"]:
+            return retDict
+        connection = retDict["Value"]
+        try:
+            rows = []
+            for values in valuesList:
+                retDict = self.__escapeValues(values, connection)
+                if not retDict["OK"]:
+                    return retDict
+                rows.append(retDict["Value"])
+            return S_OK(rows)
+        finally:
+            self._releaseConnection(connection)
+
+    def __chunkRows(self, rowSizes, baseSize):
+        """Split rows in chunks so that the statements fit in max_allowed_packet
+
+        :param list rowSizes: size in bytes each row adds to the statement
+        :param int baseSize: size of the statement without any row
+        :return: generator of (start, end) slices of the rows
+        """
+        # Keep some margin for the protocol overhead
+        budget = int(self._getMaxAllowedPacket() * 0.9) - baseSize
+        start = 0
+        size = 0
+        for index, rowSize in enumerate(rowSizes):
+            if index > start and size + rowSize > budget:
+                yield start, index
+                start = index
+                size = 0
+            size += rowSize
+        if start < len(rowSizes):
+            yield start, len(rowSizes)
+
+    def __insertRows(self, cmdStart, cmdEnd, rows, conn):
+        """Execute multi-rows INSERT statements, as many as needed to fit in max_allowed_packet
+
+        :return: S_OK(number of affected rows) / S_ERROR
+        """
+        rowStrings = ["(%s)" % ", ".join(row) for row in rows]
+        affected = 0
+        for start, end in self.__chunkRows(
+            [len(row.encode()) + 1 for row in rowStrings], len(cmdStart.encode()) + len(cmdEnd.encode())
+        ):
+            retDict = self._update("%s%s%s" % (cmdStart, ",".join(rowStrings[start:end]), cmdEnd), conn)
+            if not retDict["OK"]:
+                return retDict
+            affected += retDict["Value"]
+        return S_OK(affected)
+
+    def insertMany(self, tableName, inFields, valuesList, ignore=False, conn=None):
+        """
+        Insert several rows in "tableName", valuesList being a list of lists of values of the
+        fields "inFields", in as few multi-rows statements as max_allowed_packet allows.
+        String type values will be appropriately escaped.
+        The insertion is not atomic if it needs several statements.
+
+        :param bool ignore: use INSERT IGNORE (rows with duplicated keys are skipped)
+        :return: S_OK( number of inserted rows )
+        """
+        if not valuesList:
+            return S_OK(0)
+        table = _quotedList([tableName])
+        if not table:
+            return S_ERROR(DErrno.EMYSQL, "Invalid tableName argument")
+        inFieldString = _quotedList(inFields)
+        if inFieldString is None:
+            return S_ERROR(DErrno.EMYSQL, "Invalid inFields arguments")
+
+        retDict = self.__escapeRows(len(inFields), valuesList)
+        if not retDict["OK"]:
+            return retDict
+        cmdStart = "INSERT %sINTO %s ( %s ) VALUES " % ("IGNORE " if ignore else "", table, inFieldString)
+        return self.__insertRows(cmdStart, "", retDict["Value"], conn)
+
+    def upsertMany(self, tableName, inFields, valuesList, updateFields=None, conn=None, incrementFields=None):
+        """
+        Insert several rows in "tableName" like insertMany, updating the fields "updateFields"
+        (by default all the fields) of the rows that already exist (INSERT ... ON DUPLICATE KEY UPDATE).
+
+        :param list incrementFields: fields of the existing rows increased by the new values instead of
+                                     being replaced (when given, updateFields defaults to no field)
+        :return: S_OK( number of affected rows ), counting 1 per inserted row and 2 per updated one
+        """
+        if not valuesList:
+            return S_OK(0)
+        table = _quotedList([tableName])
+        if not table:
+            return S_ERROR(DErrno.EMYSQL, "Invalid tableName argument")
+        inFieldString = _quotedList(inFields)
+        if inFieldString is None:
+            return S_ERROR(DErrno.EMYSQL, "Invalid inFields arguments")
+        if updateFields is None:
+            updateFields = [] if incrementFields else inFields
+        updates = ["%s = VALUES(%s)" % ((_quotedList([field]),) * 2) for field in updateFields]
+        updates += ["%s = %s + VALUES(%s)" % ((_quotedList([field]),) * 3) for field in incrementFields or []]
+        updateString = ", ".join(updates)
+        if not updateString:
+            return S_ERROR(DErrno.EMYSQL, "Invalid updateFields arguments")
+
+        retDict = self.__escapeRows(len(inFields), valuesList)
+        if not retDict["OK"]:
+            return retDict
+        cmdStart = "INSERT INTO %s ( %s ) VALUES " % (table, inFieldString)
+        return self.__insertRows(cmdStart, " ON DUPLICATE KEY UPDATE %s" % updateString, retDict["Value"], conn)
+
+    def updateMany(self, tableName, keyFields, updateFields, valuesList, condDict=None, conn=None, extraCondition=None):
+        """
+        Update several rows of "tableName" with different values, in as few statements as max_allowed_packet
+        allows. Each item of valuesList gives the values of the "keyFields" identifying the row followed by
+        the new values of the "updateFields". Only the rows also matching condDict and extraCondition (an SQL
+        expression, e.g. "`Status` != 'Cancelled'") are updated.
+        String type values will be appropriately escaped.
+
+        :return: S_OK( number of updated rows )
+        """
+        if not valuesList:
+            return S_OK(0)
+        table = _quotedList([tableName])
+        if not table:
+            return S_ERROR(DErrno.EMYSQL, "Invalid tableName argument")
+        quotedKeys = [_quotedList([field]) for field in keyFields]
+        quotedFields = [_quotedList([field]) for field in updateFields]
+        if not quotedKeys or None in quotedKeys:
+            return S_ERROR(DErrno.EMYSQL, "Invalid keyFields arguments")
+        if not quotedFields or None in quotedFields:
+            return S_ERROR(DErrno.EMYSQL, "Invalid updateFields arguments")
+
+        retDict = self.__escapeRows(len(keyFields) + len(updateFields), valuesList)
+        if not retDict["OK"]:
+            return retDict
+        rows = retDict["Value"]
+        nKeys = len(keyFields)
+        if nKeys == 1:
+            keyStrings = [row[0] for row in rows]
+            whenStrings = [row[0] for row in rows]
+            keyList = quotedKeys[0]
+            caseStart = "%s " % keyList
+        else:
+            keyStrings = ["(%s)" % ", ".join(row[:nKeys]) for row in rows]
+            whenStrings = [
+                " AND ".join("%s = %s" % (key, value) for key, value in zip(quotedKeys, row)) for row in rows
+            ]
+            keyList = "(%s)" % ", ".join(quotedKeys)
+            caseStart = ""
+
+        try:
+            condition = self.buildCondition(condDict=condDict).strip()
+        except Exception as x:
+            return S_ERROR(DErrno.EMYSQL, x)
+        if extraCondition:
+            condition = "%s (%s)" % ("%s AND" % condition if condition else "WHERE", extraCondition)
+        condition = "%s %s IN " % ("%s AND" % condition if condition else "WHERE", keyList)
+
+        # Each row appears in the IN clause and in the CASE of each updated field
+        rowSizes = [
+            len(keyStrings[i].encode())
+            + 1
+            + sum(len(value.encode()) + len(whenStrings[i].encode()) + 11 for value in row[nKeys:])
+            for i, row in enumerate(rows)
+        ]
+        baseSize = len(condition.encode()) + 30 * (len(quotedFields) + 1) + len(table)
+        updated = 0
+        for start, end in self.__chunkRows(rowSizes, baseSize):
+            setStrings = []
+            for index, field in enumerate(quotedFields):
+                cases = " ".join(
+                    "WHEN %s THEN %s" % (whenStrings[i], rows[i][nKeys + index]) for i in range(start, end)
+                )
+                setStrings.append("%s = CASE %s%s ELSE %s END" % (field, caseStart, cases, field))
+            cmd = "UPDATE %s SET %s %s(%s)" % (
+                table,
+                ", ".join(setStrings),
+                condition,
+                ", ".join(keyStrings[start:end]),
+            )
+            retDict = self._update(cmd, conn)
+            if not retDict["OK"]:
+                return retDict
+            updated += retDict["Value"]
+        return S_OK(updated)
+
     def executeStoredProcedure(self, packageName, parameters, outputIds):
-        conDict = self._getConnection()
+        conDict = self._checkoutConnection()
         if not conDict["OK"]:
             return conDict
 
         connection = conDict["Value"]
+        try:
+            return self.__executeStoredProcedure(connection, packageName, parameters, outputIds)
+        finally:
+            self._releaseConnection(connection)
+
+    def __executeStoredProcedure(self, connection, packageName, parameters, outputIds):
         cursor = connection.cursor()
         try:
             cursor.callproc(packageName, parameters)
@@ -1506,19 +2108,20 @@ class MySQL(object):
 
     # For the procedures that execute a select without storing the result
     def executeStoredProcedureWithCursor(self, packageName, parameters):
-        conDict = self._getConnection()
+        conDict = self._checkoutConnection()
         if not conDict["OK"]:
             return conDict
 
         connection = conDict["Value"]
+        try:
+            return self.__executeStoredProcedureWithCursor(connection, packageName, parameters)
+        finally:
+            self._releaseConnection(connection)
+
+    def __executeStoredProcedureWithCursor(self, connection, packageName, parameters):
         cursor = connection.cursor()
         try:
-            #       execStr = "call %s(%s);" % ( packageName, ",".join( map( str, parameters ) ) )
-            execStr = "call %s(%s);" % (
-                packageName,
-                ",".join(['"%s"' % param if isinstance(param, str) else str(param) for param in parameters]),
-            )
-            cursor.execute(execStr)
+            cursor.execute(self.__callStatement(packageName, parameters))
             rows = cursor.fetchall()
             retDict = S_OK(rows)
         except Exception as x:
@@ -1530,3 +2133,75 @@ class MySQL(object):
             pass
 
         return retDict
+
+    @staticmethod
+    def __callStatement(packageName, parameters):
+        """Statement calling a stored procedure"""
+        return "call %s(%s);" % (
+            packageName,
+            ",".join(['"%s"' % param if isinstance(param, str) else str(param) for param in parameters]),
+        )
+
+    def executeStoredProcedureInBatches(self, packageName, parameters, batchCallback, batchSize=10000):
+        """Execute a stored procedure doing a select, and give its rows to a callback by batches
+
+        See _queryInBatches
+
+        :return: S_OK(number of rows)/S_ERROR
+        """
+        conDict = self._checkoutConnection(dedicated=True)
+        if not conDict["OK"]:
+            return conDict
+        return self.__streamRows(
+            conDict["Value"], self.__callStatement(packageName, parameters), batchCallback, batchSize
+        )
+
+    def _queryInBatches(self, cmd, batchCallback, batchSize=10000, debug=True):
+        """Execute a MySQL query and give its rows to a callback, by batches, as they are fetched
+
+        The rows are read with a server side cursor, so that the result is never completely held in memory,
+        but the connection is busy until all of them are read: the callback should not be too slow.
+        The rows are read on a dedicated connection, so the callback can execute other commands, better
+        once per batch than once per row.
+
+        :param str cmd: query
+        :param batchCallback: function called with each tuple of rows, returning S_OK/S_ERROR.
+                              An error stops the reading of the rows, and is returned
+        :param int batchSize: maximum number of rows given to each call of the callback
+        :param debug: print or not the errors
+
+        :return: S_OK(number of rows)/S_ERROR
+        """
+        self.log.debug("_queryInBatches: %s" % self._safeCmd(cmd))
+
+        retDict = self._checkoutConnection(dedicated=True)
+        if not retDict["OK"]:
+            return retDict
+        return self.__streamRows(retDict["Value"], cmd, batchCallback, batchSize, debug)
+
+    def __streamRows(self, connection, cmd, batchCallback, batchSize, debug=True):
+        """Read the rows of a command with a server side cursor (see _queryInBatches), then release the connection"""
+        complete = False
+        try:
+            cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+            cursor.execute(cmd)
+            retDict = S_OK(0)
+            rows = cursor.fetchmany(batchSize)
+            while rows:
+                result = batchCallback(rows)
+                if not result["OK"]:
+                    retDict = result
+                    break
+                retDict["Value"] += len(rows)
+                rows = cursor.fetchmany(batchSize)
+            else:
+                complete = True
+                cursor.close()
+        except Exception as x:
+            retDict = self._except("_queryInBatches", x, "Execution failed.", cmd, debug)
+            complete = False
+
+        # The rows left by an interrupted command would have to be read before reusing the connection,
+        # it is closed instead
+        self._releaseConnection(connection, broken=not complete)
+        return retDict
@@ -1,25 +1,46 @@
 """ a scheduler of threads, of course!
+
+    The tasks are kept in a heap ordered by their next execution time. The reactor thread dispatches
+    the due tasks to a bounded pool of worker threads, so that a slow task does not delay the others.
+    A task is never executed twice at the same time: if it is still running when it is due again, that
+    execution is skipped. The lateness (delay between the scheduled and the actual start) and the
+    duration of the executions are recorded for each task, see getTaskStatistics.
+
+    Without reactor thread, the tasks are executed by the caller of executeNextTask.
 """
 import hashlib
+import heapq
+import itertools
+import queue
 import threading
 import time
 
 from DIRAC import S_ERROR, S_OK, gLogger
-from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
-
-gSchedulerLock = Synchronizer()
 
 
 class ThreadScheduler(object):
-    def __init__(self, enableReactorThread=True, minPeriod=60):
+    def __init__(self, enableReactorThread=True, minPeriod=60, maxWorkers=4):
+        """c'tor
+
+        :param bool enableReactorThread: execute the tasks in background threads
+        :param int minPeriod: minimum period of the tasks
+        :param int maxWorkers: maximum number of tasks executed at the same time by the reactor
+        """
         self.__thId = False
         self.__minPeriod = minPeriod
+        self.__maxWorkers = max(1, maxWorkers)
         self.__taskDict = {}
+        # Heap of (execution time, sequence number, taskId), entries of removed or rescheduled tasks are skipped
         self.__hood = []
+        self.__sequence = itertools.count()
+        self.__lock = threading.RLock()
+        self.__cond = threading.Condition(self.__lock)
         self.__createReactorThread = enableReactorThread
-        self.__nowEpoch = time.time
-        self.__sleeper = time.sleep
-        self.__min = min
+        # Pool of workers, started on demand
+        self.__workQueue = queue.Queue()
+        self.__workers = []
+        # Number of tasks given to the workers and not yet completed
+        self.__pendingTasks = 0
 
     def setMinValidPeriod(self, period):
         self.__minPeriod = period
@@ -31,7 +52,7 @@ class ThreadScheduler(object):
         if not callable(taskFunc):
             return S_ERROR("%s is not callable" % str(taskFunc))
         period = max(period, self.__minPeriod)
-        elapsedTime = min(elapsedTime, period - 1)
+        elapsedTime = max(0, min(elapsedTime, period - 1))
         md = hashlib.md5()
         task = {
             "period": period,
@@ -40,15 +61,29 @@ class ThreadScheduler(object):
         }
         md.update(str(task).encode())
         taskId = md.hexdigest()
-        if taskId in self.__taskDict:
-            return S_ERROR("Task %s is already added" % taskId)
-        if executions:
-            task["executions"] = executions
-        self.__taskDict[taskId] = task
-        retVal = self.__scheduleTask(taskId, elapsedTime)
-        if not retVal["OK"]:
-            return retVal
-        self.__createExecutorIfNeeded()
+        with self.__lock:
+            if taskId in self.__taskDict:
+                return S_ERROR("Task %s is already added" % taskId)
+            if executions:
+                task["executions"] = executions
+            task["running"] = False
+            task["due"] = None
+            task["stats"] = dict.fromkeys(
+                (
+                    "Executions",
+                    "Failures",
+                    "Skipped",
+                    "LastDuration",
+                    "MaxDuration",
+                    "TotalDuration",
+                    "LastLateness",
+                    "MaxLateness",
+                ),
+                0,
+            )
+            self.__taskDict[taskId] = task
+            self.__scheduleTask(taskId, time.time() + period - elapsedTime)
+            self.__createExecutorIfNeeded()
         return S_OK(taskId)
 
     def setTaskPeriod(self, taskId, period):
@@ -63,132 +98,217 @@ class ThreadScheduler(object):
             return S_ERROR("Unknown task %s" % taskId)
         return S_OK()
 
-    @gSchedulerLock
     def removeTask(self, taskId):
-        if taskId not in self.__taskDict:
-            return S_ERROR("Task %s does not exist" % taskId)
-        del self.__taskDict[taskId]
-        for i in range(len(self.__hood)):
-            if self.__hood[i][0] == taskId:
-                del self.__hood[i]
-                break
+        with self.__lock:
+            if taskId not in self.__taskDict:
+                return S_ERROR("Task %s does not exist" % taskId)
+            # Its entry in the heap is skipped when reached
+            del self.__taskDict[taskId]
+            self.__cond.notify()
         return S_OK()
 
     def addSingleTask(self, taskFunc, taskArgs=()):
         return self.addPeriodicTask(self.__minPeriod, taskFunc, taskArgs, executions=1, elapsedTime=self.__minPeriod)
 
-    @gSchedulerLock
-    def __scheduleTask(self, taskId, elapsedTime=0):
-        executeInSecs = self.__taskDict[taskId]["period"]
-        elapsedTime = min(elapsedTime, executeInSecs - 1)
-        if elapsedTime:
-            executeInSecs -= elapsedTime
+    def __scheduleTask(self, taskId, executionTime):
+        """Schedule the next execution of a task (called with the lock)"""
+        self.__taskDict[taskId]["due"] = executionTime
+        heapq.heappush(self.__hood, (executionTime, next(self.__sequence), taskId))
+        self.__cond.notify()
 
+    def __popNextTask(self):
+        """Get the next task if it is due (called with the lock)
+
+        The next execution of a periodic task is scheduled right away, one period after this one
+        (or after now if the task is more than one period late).
+
+        :return: (taskId, execution time) if a task is due, or (None, seconds to the next task,
+                 None if there is no task scheduled)
+        """
         now = time.time()
-        for i in range(len(self.__hood)):
-            if taskId == self.__hood[i][0]:
-                tD = self.__hood[i][1] - now
-                if abs(tD - executeInSecs) < 30:
-                    return S_OK()
-                else:
-                    del self.__hood[i]
-                    break
-
-        executionTime = now + executeInSecs
-        inserted = False
-        for i in range(len(self.__hood)):
-            if executionTime < self.__hood[i][1]:
-                self.__hood.insert(i, (taskId, executionTime))
-                inserted = True
-                break
-        if not inserted:
-            self.__hood.append((taskId, executionTime))
+        while self.__hood:
+            executionTime, _seq, taskId = self.__hood[0]
+            task = self.__taskDict.get(taskId)
+            if task is None or task["due"] != executionTime:
+                heapq.heappop(self.__hood)
+                continue
+            if executionTime > now:
+                return None, executionTime - now
+            heapq.heappop(self.__hood)
+            task["due"] = None
+            if "executions" in task:
+                task["executions"] -= 1
+            if task.get("executions") != 0:
+                nextTime = executionTime + task["period"]
+                if nextTime <= now:
+                    nextTime = now + task["period"]
+                self.__scheduleTask(taskId, nextTime)
+            if task["running"]:
+                # Do not run the same task twice at the same time
+                task["stats"]["Skipped"] += 1
+                gLogger.verbose("Scheduled task is still running, skipping execution", self.__taskName(task))
+                self.__removeIfDone(taskId)
+                continue
+            task["running"] = True
+            return taskId, executionTime
+        return None, None
 
-        return S_OK()
+    def __taskName(self, task):
+        return getattr(task["func"], "__qualname__", str(task["func"]))
 
     def __executorThread(self):
-        while self.__hood:
-            timeToNext = self.executeNextTask()
-            if timeToNext is None:
-                break
-            if timeToNext and timeToNext > 0.1:
-                self.__sleeper(self.__min(timeToNext, 1))
-        # If we are leaving
-        self.__destroyExecutor()
+        with self.__cond:
+            while self.__taskDict:
+                taskId, value = self.__popNextTask()
+                if taskId is None:
+                    self.__cond.wait(min(value, 5) if value is not None else 5)
+                    continue
+                self.__dispatch(taskId, value)
+            # If we are leaving
+            self.__thId = False
+
+    def __dispatch(self, taskId, executionTime):
+        """Give a task to the pool of workers, starting a new one if needed (called with the lock)"""
+        self.__pendingTasks += 1
+        self.__workQueue.put((taskId, executionTime))
+        if self.__pendingTasks > len(self.__workers) and len(self.__workers) < self.__maxWorkers:
+            worker = threading.Thread(target=self.__workerThread, name="ThreadScheduler-%d" % len(self.__workers))
+            worker.daemon = True
+            self.__workers.append(worker)
+            worker.start()
+
+    def __workerThread(self):
+        while True:
+            taskId, executionTime = self.__workQueue.get()
+            try:
+                self.__executeTask(taskId, executionTime)
+            finally:
+                with self.__lock:
+                    self.__pendingTasks -= 1
 
     def executeNextTask(self):
-        if not self.__hood:
-            return None
-        timeToWait = self.__timeToNextTask()
-        if timeToWait and timeToWait > 0:
-            return timeToWait
-        taskId = self.__popNextTaskId()
-        startTime = time.time()
-        self.__executeTask(taskId)
-        elapsedTime = time.time() - startTime
-        self.__scheduleIfNeeded(taskId, elapsedTime)
-        return self.__timeToNextTask()
+        """Execute the next task in the calling thread if it is due
+
+        :return: seconds to the next task, None if there is no more task
+        """
+        with self.__lock:
+            taskId, value = self.__popNextTask()
+        if taskId is None:
+            return value
+        self.__executeTask(taskId, value)
+        with self.__lock:
+            return self.__timeToNextTask()
 
-    @gSchedulerLock
     def __createExecutorIfNeeded(self):
+        """Called with the lock"""
         if not self.__createReactorThread:
             return
         if self.__thId:
             return
-        self.__thId = threading.Thread(target=self.__executorThread)
-        self.__thId.setDaemon(True)
+        self.__thId = threading.Thread(target=self.__executorThread, name="ThreadScheduler")
+        self.__thId.daemon = True
         self.__thId.start()
 
-    @gSchedulerLock
-    def __destroyExecutor(self):
-        self.__thId = False
-
-    @gSchedulerLock
     def __timeToNextTask(self):
-        if not self.__hood:
-            return None
-        return self.__hood[0][1] - self.__nowEpoch()
-
-    @gSchedulerLock
-    def __popNextTaskId(self):
-        if len(self.__hood) == 0:
-            return None
-        return self.__hood.pop(0)[0]
+        """Called with the lock"""
+        while self.__hood:
+            executionTime, _seq, taskId = self.__hood[0]
+            task = self.__taskDict.get(taskId)
+            if task is not None and task["due"] == executionTime:
+                return executionTime - time.time()
+            heapq.heappop(self.__hood)
+        return None
 
-    @gSchedulerLock
     def getNextTaskId(self):
-        if len(self.__hood) == 0:
-            return None
-        return self.__hood[0][0]
+        with self.__lock:
+            if self.__timeToNextTask() is None:
+                return None
+            return self.__hood[0][2]
 
-    @gSchedulerLock
     def setNumExecutionsForTask(self, taskId, numExecutions):
-        if taskId not in self.__taskDict:
-            return False
-        if numExecutions:
-            self.__taskDict[taskId]["executions"] = numExecutions
-        else:
-            del self.__taskDict[taskId]["executions"]
-
-    def __executeTask(self, taskId):
-        if taskId not in self.__taskDict:
-            return False
-        task = self.__taskDict[taskId]
-        if "executions" in task:
-            task["executions"] -= 1
+        with self.__lock:
+            if taskId not in self.__taskDict:
+                return False
+            if numExecutions:
+                self.__taskDict[taskId]["executions"] = numExecutions
+            else:
+                self.__taskDict[taskId].pop("executions", None)
+
+    def getTaskStatistics(self, taskId):
+        """Get the statistics of the executions of a task
+
+        :return: S_OK(dict) with the number of Executions, Failures (executions raising an exception),
+                 Skipped executions (the task was still running), the Last/Max/TotalDuration of the
+                 executions and the Last/MaxLateness (delay of the start of the executions)
+        """
+        with self.__lock:
+            if taskId not in self.__taskDict:
+                return S_ERROR("Unknown task %s" % taskId)
+            task = self.__taskDict[taskId]
+            stats = dict(task["stats"])
+            stats["Name"] = self.__taskName(task)
+            stats["Period"] = task["period"]
+            stats["Running"] = task["running"]
+        return S_OK(stats)
+
+    def getStatistics(self):
+        """Get the statistics of all the tasks
+
+        :return: S_OK({taskId: dict}) see getTaskStatistics
+        """
+        with self.__lock:
+            return S_OK({taskId: self.getTaskStatistics(taskId)["Value"] for taskId in self.__taskDict})
+
+    def __executeTask(self, taskId, executionTime):
+        with self.__lock:
+            task = self.__taskDict.get(taskId)
+            if task is None:
+                return False
+        startTime = time.time()
+        ok = True
         try:
             task["func"](*task["args"])
         except Exception as lException:
             gLogger.exception("Exception while executing scheduled task", lException=lException)
-            return False
-        return True
-
-    def __scheduleIfNeeded(self, taskId, elapsedTime=0):
-        if "executions" in self.__taskDict[taskId]:
-            if self.__taskDict[taskId]["executions"] == 0:
-                del self.__taskDict[taskId]
-                return True
-        return self.__scheduleTask(taskId, elapsedTime)
+            ok = False
+        duration = time.time() - startTime
+        with self.__lock:
+            task["running"] = False
+            stats = task["stats"]
+            stats["Executions"] += 1
+            if not ok:
+                stats["Failures"] += 1
+            stats["LastDuration"] = duration
+            stats["MaxDuration"] = max(stats["MaxDuration"], duration)
+            stats["TotalDuration"] += duration
+            stats["LastLateness"] = max(0, startTime - executionTime)
+            stats["MaxLateness"] = max(stats["MaxLateness"], stats["LastLateness"])
+            self.__removeIfDone(taskId)
+        return ok
+
+    def afterFork(self):
+        """Forget about the tasks and the threads of the parent process in a forked process
+
+        Only the forking thread exists in the forked process, and the tasks of the parent process are not
+        meant to be executed by each of its children: the code needing periodic tasks in a forked process
+        has to add them again. It is called explicitly by the code forking, e.g. for the workers of the
+        Tornado server, other forked processes keep the tasks.
+        """
+        self.__lock = threading.RLock()
+        self.__cond = threading.Condition(self.__lock)
+        self.__workQueue = queue.Queue()
+        self.__workers = []
+        self.__pendingTasks = 0
+        self.__thId = False
+        self.__taskDict = {}
+        self.__hood = []
+
+    def __removeIfDone(self, taskId):
+        """Forget about a task that has no more execution (called with the lock)"""
+        task = self.__taskDict.get(taskId)
+        if task is not None and task.get("executions") == 0 and not task["running"]:
+            del self.__taskDict[taskId]
+            self.__cond.notify()
 
 
 gThreadScheduler = ThreadScheduler()
@@ -0,0 +1,124 @@
+""" Test the DictCache
+"""
+import threading
+import time
+
+import pytest
+
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+
+def test_addGetDelete():
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append)
+    cache.add("a", 10, 1)
+    cache.add("b", 10, 2)
+    cache.add("c", 0, 3)
+
+    assert cache.get("a") == 1
+    assert cache.exists("b")
+    assert cache.get("c") is None
+    assert sorted(cache.getKeys()) == ["a", "b"]
+    # Not valid for long enough: the record is removed
+    assert cache.get("a", validSeconds=20) is None
+    assert deleted == [1]
+
+    cache.delete("b")
+    assert deleted == [1, 2]
+    assert not cache.getKeys()
+    assert cache.getStatistics() == {"Hits": 1, "Misses": 2, "Evictions": 0, "Size": 0, "MaxSize": 0}
+
+
+def test_expiration(monkeypatch):
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.add("a", 10, 1)
+    cache.add("b", 100, 2)
+
+    monkeypatch.setattr(time, "time", lambda: now + 50)
+    assert cache.getKeys() == ["b"]
+    cache.purgeExpired()
+    assert deleted == [1]
+    cache.purgeExpired(expiredInSeconds=100)
+    assert deleted == [1, 2]
+
+
+@pytest.mark.parametrize("lockStripes", [1, 4])
+def test_lru(lockStripes):
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append, maxSize=4 * lockStripes, lockStripes=lockStripes)
+    for i in range(4 * lockStripes):
+        cache.add(i, 100, i)
+    # Using a record makes it the most recently used one of its shard
+    recentlyUsed = [i for i in range(4 * lockStripes) if i % 4 == 0]
+    for i in recentlyUsed:
+        assert cache.get(i) == i
+    for i in range(100, 100 + 3 * lockStripes):
+        cache.add(i, 100, i)
+
+    stats = cache.getStatistics()
+    assert stats["Size"] <= 4 * lockStripes
+    assert stats["Evictions"] == len(deleted)
+    assert len(cache.getKeys()) + len(deleted) == 7 * lockStripes
+    if lockStripes == 1:
+        assert deleted == [1, 2, 3]
+        assert sorted(cache.getKeys()) == [0, 100, 101, 102]
+
+
+def test_lfu():
+    deleted = []
+    cache = DictCache(deleteFunction=deleted.append, maxSize=3, evictionPolicy=DictCache.LFU, lockStripes=1)
+    for i in range(3):
+        cache.add(i, 100, i)
+    for _ in range(3):
+        cache.get(0)
+    cache.get(2)
+    cache.add(3, 100, 3)
+    assert deleted == [1]
+    cache.get(3)
+    cache.get(3)
+    # 2 and 3 have the same number of uses, 2 was the least recently used
+    cache.add(4, 100, 4)
+    assert deleted == [1, 2]
+    cache.delete(0)
+    assert sorted(cache.getKeys()) == [3, 4]
+    assert cache.getStatistics()["Evictions"] == 2
+
+
+def test_wrongPolicy():
+    with pytest.raises(ValueError):
+        DictCache(evictionPolicy="Random")
+
+
+def test_threadLocal():
+    cache = DictCache(threadLocal=True, maxSize=2)
+    cache.add("a", 10, 1)
+    otherThreadValue = []
+    thread = threading.Thread(target=lambda: otherThreadValue.append(cache.get("a")))
+    thread.start()
+    thread.join()
+    assert otherThreadValue == [None]
+    cache.add("b", 10, 2)
+    assert cache.get("a") == 1
+    cache.add("c", 10, 3)
+    assert sorted(cache.getKeys()) == ["a", "c"]
+
+
+def test_concurrentAccess():
+    cache = DictCache(maxSize=100)
+
+    def worker(offset):
+        for i in range(2000):
+            cache.add((offset + i) % 300, 100, i)
+            cache.get((offset * 7 + i) % 300)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.getStatistics()
+    assert stats["Size"] <= 104
+    assert stats["Hits"] + stats["Misses"] == 8 * 2000
@@ -11,6 +11,7 @@ import datetime
 import sys
 
 from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
+from DIRAC.Core.Utilities.DEncode import encodeFast, decodeFast, encodeGeneric, decodeGeneric, StreamDecoder, iterDecode
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
 from DIRAC.Core.Utilities.MixedEncode import encode as mixEncode, decode as mixDecode
 
@@ -365,3 +366,51 @@ def test_nestedSerializable(data):
     subObj = Serializable(instAttr=data)
     objData = Serializable(instAttr=subObj)
     agnosticTestFunction(jsonTuple, objData)
+
+
+@mark.slow
+@settings(suppress_health_check=function_scoped)
+@given(
+    data=recursive(
+        initialStrategies | floats(allow_nan=False) | binary(),
+        lambda x: lists(x) | dictionaries(text() | integers(), x) | tuples(x),
+    )
+)
+def test_fastDEncodeCompatibility(data):
+    """Test that the fast DEncode functions produce the same bytes and objects as the generic ones"""
+    encodedData = encodeGeneric(data)
+    assert encodeFast(data) == encodedData
+    assert decodeFast(encodedData) == decodeGeneric(encodedData)
+
+
+@mark.slow
+@settings(suppress_health_check=function_scoped)
+@given(data=nestedStrategy, depth=integers(min_value=1, max_value=4), chunkSize=integers(min_value=1, max_value=50))
+def test_streamDecoder(data, depth, chunkSize):
+    """Test that decoding the data chunk by chunk gives the same object as decoding it at once"""
+    encodedData = disetEncode(data)
+    decoder = StreamDecoder(depth=depth, assemble=True)
+    for index in range(0, len(encodedData), chunkSize):
+        decoder.feed(encodedData[index : index + chunkSize])
+    decoder.close()
+    assert decoder.finished
+    assert decoder.result == data
+
+
+def test_iterDecode():
+    """Test that the items of the top level containers are returned one by one"""
+    data = {"OK": True, "Value": {"Successful": {"/a": 1, "/b": [2, 3]}, "Failed": {}}}
+    encodedData = disetEncode(data)
+    chunks = [encodedData[index : index + 3] for index in range(0, len(encodedData), 3)]
+
+    assert list(iterDecode(chunks)) == [((), "OK", True), ((), "Value", data["Value"])]
+    assert list(iterDecode(chunks, depth=3)) == [
+        ((), "OK", True),
+        (("Value", "Successful"), "/a", 1),
+        (("Value", "Successful"), "/b", [2, 3]),
+    ]
+    assert list(iterDecode([disetEncode((1, "a"))])) == [((), 0, 1), ((), 1, "a")]
+    assert list(iterDecode([b"i1", b"2e"])) == [((), None, 12)]
+
+    with raises(ValueError):
+        list(iterDecode(chunks[:-1]))
@@ -0,0 +1,315 @@
+""" Test the pool of connections of the MySQL class, with fake connections """
+import threading
+import time
+
+import pytest
+
+from DIRAC import S_ERROR, S_OK
+from DIRAC.Core.Utilities import MySQL
+from DIRAC.Core.Utilities.MySQL import ConnectionPool, _pinningStatement
+from DIRAC.Core.Utilities.MySQL import MySQL as MySQLDB
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self.rows = ()
+
+    def execute(self, cmd):
+        self.conn.executed.append(cmd)
+        if cmd == "SELECT @@max_allowed_packet":
+            self.rows = ((self.conn.maxAllowedPacket,),)
+        return len(self.rows) or cmd.count("),(") + 1
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = 1
+        self.pings = 0
+        self.dbName = ""
+        self.executed = []
+        self.maxAllowedPacket = 1000
+
+    def cursor(self, cursorClass=None):
+        cursor = FakeCursor(self)
+        if cursorClass:
+            cursor.rows = tuple((i,) for i in range(25))
+        return cursor
+
+    def commit(self):
+        pass
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def select_db(self, dbName):
+        self.dbName = dbName
+
+    def close(self):
+        self.open = 0
+
+    def escape_string(self, value):
+        return value.replace(b"'", b"\\'")
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """List of the connections opened"""
+    opened = []
+
+    def connect(**kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(MySQL.MySQLdb, "connect", connect, raising=False)
+    monkeypatch.setattr(MySQL.MySQLdb, "threadsafety", 1, raising=False)
+    return opened
+
+
+def runInThread(func, *args):
+    """Run a function in another thread and return its result"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_pinningStatement():
+    assert _pinningStatement("  start transaction") is True
+    assert _pinningStatement("LOCK TABLES FC_DirectoryLevelTree WRITE") is True
+    assert _pinningStatement("COMMIT") is False
+    assert _pinningStatement("UNLOCK TABLES") is False
+    assert _pinningStatement("SELECT * FROM Jobs") is None
+
+
+def test_checkoutWithoutThreadAffinity(connections):
+    pool = ConnectionPool("localhost", "user", "passwd", minSize=1, maxSize=5)
+
+    def operation():
+        result = pool.checkout("JobDB")
+        assert result["OK"], result
+        pool.release(result["Value"])
+        return result["Value"]
+
+    # Sequential operations from many threads reuse the same connection
+    conns = {runInThread(operation) for _ in range(20)}
+    assert len(conns) == 1
+    assert len(connections) == 1
+    assert connections[0].dbName == "JobDB"
+    # Recently used connections are not pinged
+    assert connections[0].pings == 0
+
+    stats = pool.getStatistics()
+    assert stats["Checkouts"] == 20
+    assert stats["Created"] == 1
+    assert stats["Size"] == 1
+    assert stats["InUse"] == 0
+    assert stats["Pinned"] == 0
+
+
+def test_maxSize(connections):
+    pool = ConnectionPool("localhost", "user", "passwd", maxSize=2, waitTimeout=0.2)
+    conn1 = pool.checkout("JobDB")["Value"]
+    conn2 = runInThread(pool.checkout, "JobDB")["Value"]
+    assert conn1 is not conn2
+
+    # The pool is exhausted
+    result = runInThread(pool.checkout, "JobDB")
+    assert not result["OK"]
+    assert pool.getStatistics()["Timeouts"] == 1
+
+    # A waiting thread gets the connection as soon as it is released
+    timer = threading.Timer(0.05, pool.release, (conn2,))
+    timer.start()
+    result = runInThread(pool.checkout, "JobDB")
+    timer.join()
+    assert result["OK"]
+    assert result["Value"] is conn2
+
+    stats = pool.getStatistics()
+    assert len(connections) == 2
+    assert stats["Waits"] == 1
+    assert stats["WaitTime"] > 0
+    assert stats["MaxInUse"] == 2
+
+
+def test_lazyHealthCheck(connections):
+    pool = ConnectionPool("localhost", "user", "passwd", pingIdleTime=0.05)
+    conn = pool.checkout("JobDB")["Value"]
+    pool.release(conn)
+    time.sleep(0.1)
+    assert pool.checkout("JobDB")["Value"] is conn
+    assert conn.pings == 1
+    pool.release(conn)
+
+    # Closed connections are replaced
+    conn.close()
+    newConn = pool.checkout("JobDB")["Value"]
+    assert newConn is not conn
+    assert pool.getStatistics()["Closed"] == 1
+
+    # Lost connections are closed and replaced
+    pool.release(newConn, broken=True)
+    assert not newConn.open
+    assert pool.checkout("JobDB")["Value"] is connections[-1]
+    assert len(connections) == 3
+    assert pool.getStatistics()["Size"] == 1
+
+
+def test_transactionPinning(connections):
+    pool = ConnectionPool("localhost", "user", "passwd")
+    assert pool.transactionStart("JobDB")["OK"]
+    conn = connections[0]
+    assert "START TRANSACTION WITH CONSISTENT SNAPSHOT" in conn.executed
+
+    # The connection stays with the thread during the transaction
+    for _ in range(3):
+        assert pool.checkout("JobDB")["Value"] is conn
+        pool.release(conn)
+    other = runInThread(pool.checkout, "JobDB")["Value"]
+    assert other is not conn
+    pool.release(other)
+    assert pool.getStatistics()["Pinned"] == 1
+
+    assert pool.transactionCommit("JobDB")["OK"]
+    assert conn.executed[-1] == "COMMIT"
+    assert pool.getStatistics()["Pinned"] == 0
+
+
+def test_softPinReclaimed(connections):
+    pool = ConnectionPool("localhost", "user", "passwd", maxSize=1, waitTimeout=0.2)
+    conn = runInThread(pool.get, "JobDB")["Value"]
+    assert pool.getStatistics()["Pinned"] == 1
+    # The connection obtained with get() is not in use, it can be taken back
+    result = pool.checkout("JobDB")
+    assert result["OK"]
+    assert result["Value"] is conn
+    assert pool.getStatistics()["Reclaimed"] == 1
+
+
+def test_cleanDeadThreads(connections):
+    pool = ConnectionPool("localhost", "user", "passwd", minSize=0, graceTime=0)
+    runInThread(pool.transactionStart, "JobDB")
+    assert pool.getStatistics()["Pinned"] == 1
+    pool.clean()
+    # The transaction of the dead thread was rolled back by closing the connection
+    stats = pool.getStatistics()
+    assert stats["Pinned"] == 0
+    assert stats["Size"] == 0
+    assert not connections[0].open
+
+
+def test_insertMany(connections):
+    db = MySQLDB(hostName="insertMany", dbName="TestDB")
+    rows = [(i, "lfn'%d" % i, "UTC_TIMESTAMP()") for i in range(100)]
+    result = db.insertMany("Files", ["FileID", "LFN", "InsertedTime"], rows, ignore=True)
+    assert result["OK"], result
+    assert result["Value"] == 100
+
+    inserts = [cmd for cmd in connections[0].executed if cmd.startswith("INSERT")]
+    # Several statements were needed to fit in max_allowed_packet
+    assert len(inserts) > 1
+    assert all(len(cmd) < 1000 for cmd in inserts)
+    assert inserts[0].startswith('INSERT IGNORE INTO `Files` ( `FileID`, `LFN`, `InsertedTime` ) VALUES ("0", ')
+    assert r"""("1", "lfn\'1", UTC_TIMESTAMP())""" in inserts[0]
+    assert sum(cmd.count("UTC_TIMESTAMP()") for cmd in inserts) == 100
+
+    assert not db.insertMany("Files", ["FileID", "LFN"], [(1,)])["OK"]
+    assert db.insertMany("Files", ["FileID"], [])["Value"] == 0
+
+
+def test_upsertMany(connections):
+    db = MySQLDB(hostName="upsertMany", dbName="TestDB")
+    result = db.upsertMany("JobParameters", ["JobID", "Name", "Value"], [(1, "A", "a"), (1, "B", 2)], ["Value"])
+    assert result["OK"], result
+    assert connections[0].executed[-1] == (
+        'INSERT INTO `JobParameters` ( `JobID`, `Name`, `Value` ) VALUES ("1", "A", "a"),("1", "B", "2")'
+        " ON DUPLICATE KEY UPDATE `Value` = VALUES(`Value`)"
+    )
+
+    result = db.upsertMany("Counters", ["Name", "Count"], [("A", 1), ("B", 2.5)], incrementFields=["Count"])
+    assert result["OK"], result
+    assert connections[0].executed[-1] == (
+        'INSERT INTO `Counters` ( `Name`, `Count` ) VALUES ("A", "1"),("B", "2.5")'
+        " ON DUPLICATE KEY UPDATE `Count` = `Count` + VALUES(`Count`)"
+    )
+
+
+def test_updateMany(connections):
+    db = MySQLDB(hostName="updateMany", dbName="TestDB")
+    result = db.updateMany(
+        "Replicas", ["ReplicaID"], ["PFN", "Status"], [(1, "pfn1", "Waiting"), (2, "pfn2", "Waiting")], {"SE": "SE1"}
+    )
+    assert result["OK"], result
+    assert connections[0].executed[-1] == (
+        'UPDATE `Replicas` SET `PFN` = CASE `ReplicaID` WHEN "1" THEN "pfn1" WHEN "2" THEN "pfn2" ELSE `PFN` END, '
+        '`Status` = CASE `ReplicaID` WHEN "1" THEN "Waiting" WHEN "2" THEN "Waiting" ELSE `Status` END '
+        'WHERE `SE` = "SE1" AND `ReplicaID` IN ("1", "2")'
+    )
+
+    result = db.updateMany(
+        "Replicas", ["ReplicaID"], ["Status"], [(1, "Waiting")], extraCondition="`Status` != 'Cancelled'"
+    )
+    assert result["OK"], result
+    assert connections[0].executed[-1] == (
+        'UPDATE `Replicas` SET `Status` = CASE `ReplicaID` WHEN "1" THEN "Waiting" ELSE `Status` END '
+        "WHERE (`Status` != 'Cancelled') AND `ReplicaID` IN (\"1\")"
+    )
+
+    result = db.updateMany("Files", ["TransID", "FileID"], ["Status"], [(1, i, "Done") for i in range(50)])
+    assert result["OK"], result
+    updates = [cmd for cmd in connections[0].executed if cmd.startswith("UPDATE `Files`")]
+    assert len(updates) > 1
+    assert all(len(cmd) < 1000 for cmd in updates)
+    assert 'WHEN `TransID` = "1" AND `FileID` = "0" THEN "Done"' in updates[0]
+    assert 'WHERE (`TransID`, `FileID`) IN (("1", "0"), ' in updates[0]
+
+
+def test_queryInBatches(connections, monkeypatch):
+    monkeypatch.setattr(MySQL.MySQLdb, "cursors", type("cursors", (), {"SSCursor": object}), raising=False)
+    db = MySQLDB(hostName="queryInBatches", dbName="TestDB")
+    batches = []
+
+    def addBatch(rows):
+        batches.append(rows)
+        return S_OK()
+
+    result = db._queryInBatches("SELECT FileID FROM Files", addBatch, batchSize=10)
+    assert result["OK"], result
+    assert result["Value"] == 25
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert connections[0].open
+
+    # An interrupted query leaves unread rows: the connection is closed
+    result = db._queryInBatches("SELECT FileID FROM Files", lambda rows: S_ERROR("Stop"), batchSize=10)
+    assert result["Message"] == "Stop"
+    assert not connections[0].open
+
+
+def test_queryInBatchesWithPinnedConnection(connections, monkeypatch):
+    monkeypatch.setattr(MySQL.MySQLdb, "cursors", type("cursors", (), {"SSCursor": object}), raising=False)
+    db = MySQLDB(hostName="queryInBatchesPinned", dbName="TestDB")
+    pinned = db._getConnection()["Value"]
+
+    def queryPerBatch(rows):
+        # The commands of the callback do not use the connection reading the rows
+        return db._query("SELECT DirName FROM Directories")
+
+    result = db._queryInBatches("SELECT FileID FROM Files", queryPerBatch, batchSize=10)
+    assert result["OK"], result
+    assert result["Value"] == 25
+    streaming = [conn for conn in connections if "SELECT FileID FROM Files" in conn.executed]
+    assert len(streaming) == 1 and streaming[0] is not pinned
+    assert pinned.executed.count("SELECT DirName FROM Directories") == 3
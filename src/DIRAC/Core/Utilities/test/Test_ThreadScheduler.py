@@ -0,0 +1,119 @@
+""" Test the ThreadScheduler """
+import os
+import threading
+import time
+
+from DIRAC.Core.Utilities.ThreadScheduler import ThreadScheduler, gThreadScheduler
+
+
+def test_executeNextTask():
+    scheduler = ThreadScheduler(enableReactorThread=False, minPeriod=0)
+    executions = []
+    taskId = scheduler.addPeriodicTask(0.05, executions.append, ("periodic",), executions=2)["Value"]
+    singleId = scheduler.addSingleTask(executions.append, ("single",))["Value"]
+    assert not scheduler.addPeriodicTask(0.05, executions.append, ("periodic",))["OK"]
+    assert scheduler.getNextTaskId() == singleId
+    assert 0 < scheduler.executeNextTask() <= 0.05
+    assert executions == ["single"]
+    assert not scheduler.getTaskStatistics(singleId)["OK"]
+
+    assert scheduler.getNextTaskId() == taskId
+    assert 0 < scheduler.executeNextTask() <= 0.05
+    assert executions == ["single"]
+    time.sleep(0.05)
+    assert 0 < scheduler.executeNextTask() <= 0.05
+    assert executions == ["single", "periodic"]
+
+    stats = scheduler.getTaskStatistics(taskId)["Value"]
+    assert stats["Executions"] == 1
+    assert stats["Period"] == 0.05
+    assert stats["Name"] == "list.append"
+
+    assert scheduler.removeTask(taskId)["OK"]
+    assert scheduler.executeNextTask() is None
+    assert scheduler.getNextTaskId() is None
+
+
+def test_failuresAndLateness():
+    scheduler = ThreadScheduler(enableReactorThread=False, minPeriod=0)
+    taskId = scheduler.addPeriodicTask(0.01, lambda: 1 / 0)["Value"]
+    time.sleep(0.1)
+    scheduler.executeNextTask()
+    stats = scheduler.getTaskStatistics(taskId)["Value"]
+    assert stats["Executions"] == 1
+    assert stats["Failures"] == 1
+    assert stats["MaxLateness"] >= 0.05
+    # The task is rescheduled one period after now, not after its late execution time
+    assert 0 < scheduler.executeNextTask() <= 0.01
+
+
+def test_workersAndOverlap():
+    scheduler = ThreadScheduler(minPeriod=0, maxWorkers=2)
+    release = threading.Event()
+    fastExecutions = []
+
+    # A slow task does not prevent the others from being executed
+    slowId = scheduler.addPeriodicTask(0.02, release.wait, (5,))["Value"]
+    fastId = scheduler.addPeriodicTask(0.02, fastExecutions.append, (1,))["Value"]
+    for _ in range(100):
+        if len(fastExecutions) > 5:
+            break
+        time.sleep(0.02)
+    assert len(fastExecutions) > 5
+
+    # The slow task was not run again while it was running
+    stats = scheduler.getTaskStatistics(slowId)["Value"]
+    assert stats["Running"]
+    assert stats["Executions"] == 0
+    assert stats["Skipped"] > 0
+
+    release.set()
+    for _ in range(100):
+        if scheduler.getTaskStatistics(slowId)["Value"]["Executions"]:
+            break
+        time.sleep(0.02)
+    assert set(scheduler.getStatistics()["Value"]) == {slowId, fastId}
+    assert scheduler.getTaskStatistics(slowId)["Value"]["MaxDuration"] > 0.1
+
+    scheduler.removeTask(slowId)
+    scheduler.removeTask(fastId)
+
+
+def test_afterFork():
+    scheduler = ThreadScheduler(minPeriod=0)
+    executions = []
+    scheduler.addPeriodicTask(0.02, executions.append, ("parent",))
+    gTaskId = gThreadScheduler.addPeriodicTask(3600, executions.append, ("global",))["Value"]
+
+    pid = os.fork()
+    if pid == 0:
+        # In the forked process: once reset, the tasks of the parent are not executed, the new ones are.
+        # The schedulers are only reset explicitly
+        status = 1
+        try:
+            threadErrors = []
+            threading.excepthook = threadErrors.append
+            scheduler.afterFork()
+            # (the lock of the global scheduler may have been held by a thread of the parent, it is not taken)
+            if scheduler.getStatistics()["Value"] or gTaskId not in gThreadScheduler._ThreadScheduler__taskDict:
+                os._exit(2)
+            del executions[:]
+            scheduler.addPeriodicTask(0.02, executions.append, ("child",))
+            for _ in range(100):
+                if len(executions) > 2:
+                    break
+                time.sleep(0.02)
+            if set(executions) == {"child"} and not threadErrors:
+                status = 0
+        finally:
+            os._exit(status)
+
+    _pid, status = os.waitpid(pid, 0)
+    gThreadScheduler.removeTask(gTaskId)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0, status
+    # The parent goes on executing its tasks
+    for _ in range(100):
+        if len(executions) > 2:
+            break
+        time.sleep(0.02)
+    assert set(executions) == {"parent"}
@@ -166,6 +166,44 @@ class ReplicateAndRegister(DMSRequestOperationsBase):
 
         # Clients
         self.fc = FileCatalog()
+        # Replicas of the files of several operations, obtained by prepareBulk
+        self.__bulkReplicas = {"Successful": {}, "Failed": {}}
+
+    def prepareBulk(self, operations):
+        """get at once the replicas of the files of several operations
+
+        Only the lookup of the replicas is done in bulk: each replica is still registered right after its
+        copy (see dmTransfer), so that a copied file is never left unregistered.
+        """
+        lfns = set()
+        for operation in operations:
+            lfns.update(opFile.LFN for opFile in operation if opFile.Status in ("Waiting", "Scheduled"))
+        if not lfns:
+            return S_OK()
+        replicas = self.fc.getReplicas(list(lfns))
+        if not replicas["OK"]:
+            return replicas
+        self.__bulkReplicas = replicas["Value"]
+        return S_OK()
+
+    def __getReplicas(self, lfns):
+        """get the replicas of the files, obtained before by prepareBulk if possible
+
+        The replicas obtained in bulk are used only once, as an operation may replicate a file to the same
+        target as another one.
+        """
+        bulkSuccessful = self.__bulkReplicas["Successful"]
+        bulkFailed = self.__bulkReplicas["Failed"]
+        if not lfns or not all(lfn in bulkSuccessful or lfn in bulkFailed for lfn in lfns):
+            return self.fc.getReplicas(lfns)
+        successful = {}
+        failed = {}
+        for lfn in lfns:
+            if lfn in bulkSuccessful:
+                successful[lfn] = bulkSuccessful.pop(lfn)
+            else:
+                failed[lfn] = bulkFailed.pop(lfn)
+        return S_OK({"Successful": successful, "Failed": failed})
 
     def __call__(self):
         """call me maybe"""
@@ -196,7 +234,7 @@ class ReplicateAndRegister(DMSRequestOperationsBase):
         )
         targetSESet = set(self.operation.targetSEList)
 
-        replicas = self.fc.getReplicas(list(waitingFiles))
+        replicas = self.__getReplicas(list(waitingFiles))
         if not replicas["OK"]:
             self.log.error("Failed to get replicas", replicas["Message"])
             return replicas
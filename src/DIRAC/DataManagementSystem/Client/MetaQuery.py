@@ -50,6 +50,31 @@ FILEINFO_TABLE_METAKEYS = {
 }
 
 
+def getOperands(value):
+    """Get the (operation, operand) pairs of the value of a metadata in a query"""
+    if isinstance(value, list):
+        return [("in", value)]
+    elif isinstance(value, dict):
+        resultList = []
+        for operation, operand in value.items():
+            resultList.append((operation, operand))
+        return resultList
+    else:
+        return [("=", value)]
+
+
+def getTypedValue(value, mtype):
+    """Convert a metadata value to the type of the metadata field"""
+    if mtype[0:3].lower() == "int":
+        return int(value)
+    elif mtype[0:5].lower() == "float":
+        return float(value)
+    elif mtype[0:4].lower() == "date":
+        return TimeUtilities.fromString(value)
+    else:
+        return value
+
+
 class MetaQuery(object):
     def __init__(self, queryDict=None, typeDict=None):
 
@@ -170,27 +195,6 @@ class MetaQuery(object):
     def applyQuery(self, userMetaDict):
         """Return a list of tuples with tables and conditions to locate files for a given user Metadata"""
 
-        def getOperands(value):
-            if isinstance(value, list):
-                return [("in", value)]
-            elif isinstance(value, dict):
-                resultList = []
-                for operation, operand in value.items():
-                    resultList.append((operation, operand))
-                return resultList
-            else:
-                return [("=", value)]
-
-        def getTypedValue(value, mtype):
-            if mtype[0:3].lower() == "int":
-                return int(value)
-            elif mtype[0:5].lower() == "float":
-                return float(value)
-            elif mtype[0:4].lower() == "date":
-                return TimeUtilities.fromString(value)
-            else:
-                return value
-
         for meta, value in self.__metaQueryDict.items():
 
             # Check if user dict contains all the requested meta data
@@ -822,6 +822,47 @@ class FileManager(FileManagerBase):
         result = self.db._query(req, connection)
         return result
 
+    def streamSEDump(self, seNames, batchCallback, batchSize=10000):
+        """
+         Give all the files at given SEs, together with checksum and size, to a callback
+         by batches, as they are read from the database
+
+        :param seNames: list of StorageElement names
+        :param batchCallback: function called with each list of tuples (SEName, lfn, checksum, size)
+        :param int batchSize: number of files given to each call of the callback
+
+        :returns: S_OK with the number of files/S_ERROR
+        """
+        seNameDict = {}
+        for seName in seNames:
+            res = self.db.seManager.findSE(seName)
+            if not res["OK"]:
+                return res
+            seNameDict[res["Value"]] = seName
+
+        req = "SELECT FR.SEID,FF.DirID,FF.FileName,FI.Checksum,FF.Size FROM FC_Replicas as FR"
+        req += " JOIN FC_Files as FF ON FF.FileID=FR.FileID JOIN FC_FileInfo as FI ON FI.FileID=FR.FileID"
+        req += " WHERE FR.SEID IN (%s)" % intListToString(seNameDict)
+
+        def sendBatch(rows):
+            # The directory paths are resolved at once for each batch
+            dirIDs = list({row[1] for row in rows})
+            res = self.db.dtree.getDirectoryPaths(dirIDs)
+            if not res["OK"]:
+                return res
+            dirPaths = res["Value"]
+            missing = set(dirIDs) - set(dirPaths)
+            if missing:
+                return S_ERROR("Directories not found: %s" % intListToString(missing))
+            return batchCallback(
+                [
+                    (seNameDict[seID], os.path.join(dirPaths[dirID], fileName), checksum, size)
+                    for seID, dirID, fileName, checksum, size in rows
+                ]
+            )
+
+        return self.db._queryInBatches(req, sendBatch, batchSize)
+
     def repairFileTables(self, connection=False):
         """Repair FC_FileInfo table by adding missing records as compaired to the FC_Files table"""
 
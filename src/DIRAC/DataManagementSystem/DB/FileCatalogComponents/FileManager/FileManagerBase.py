@@ -1341,4 +1341,27 @@ class FileManagerBase(object):
 
         :returns: S_OK with list of tuples (SEName, lfn, checksum, size)
         """
+        dump = []
+
+        def addRows(rows):
+            dump.extend(rows)
+            return S_OK()
+
+        result = self.streamSEDump(seNames, addRows)
+        if not result["OK"]:
+            return result
+        return S_OK(dump)
+
+    def streamSEDump(self, seNames, batchCallback, batchSize=10000):
+        """
+         Give all the files at given SEs, together with checksum and size, to a callback
+         by batches, as they are read from the database
+
+        :param seNames: list of StorageElement names
+        :param batchCallback: function called with each list of tuples (SEName, lfn, checksum, size),
+                              returning S_OK/S_ERROR. An error stops the dump
+        :param int batchSize: number of files given to each call of the callback
+
+        :returns: S_OK with the number of files/S_ERROR
+        """
         return S_ERROR("To be implemented on derived class")
@@ -921,13 +921,16 @@ class FileManagerPs(FileManagerBase):
 
         return S_OK({"Successful": successful, "Failed": failed})
 
-    def getSEDump(self, seNames):
+    def streamSEDump(self, seNames, batchCallback, batchSize=10000):
         """
-         Return all the files at a given SE, together with checksum and size
+         Give all the files at given SEs, together with checksum and size, to a callback
+         by batches, as they are read from the database
 
-        :param seName: list of StorageElement names
+        :param seNames: list of StorageElement names
+        :param batchCallback: function called with each list of tuples (SEName, lfn, checksum, size)
+        :param int batchSize: number of files given to each call of the callback
 
-        :returns: S_OK with list of tuples (SEName, lfn, checksum, size)
+        :returns: S_OK with the number of files/S_ERROR
         """
 
         seIDs = []
@@ -940,4 +943,4 @@ class FileManagerPs(FileManagerBase):
 
         formatedSEIds = intListToString(seIDs)
 
-        return self.db.executeStoredProcedureWithCursor("ps_get_se_dump", (formatedSEIds,))
+        return self.db.executeStoredProcedureInBatches("ps_get_se_dump", (formatedSEIds,), batchCallback, batchSize)
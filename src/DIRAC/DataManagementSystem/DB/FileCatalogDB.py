@@ -1180,3 +1180,17 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (SEName, lfn, checksum, size)
         """
         return self.fileManager.getSEDump(seNames)
+
+    def streamSEDump(self, seNames, batchCallback, batchSize=10000):
+        """
+         Give all the files at given SEs, together with checksum and size, to a callback
+         by batches, as they are read from the database
+
+        :param seNames: list of StorageElement names
+        :param batchCallback: function called with each list of tuples (SEName, lfn, checksum, size),
+                              returning S_OK/S_ERROR
+        :param int batchSize: number of files given to each call of the callback
+
+        :returns: S_OK with the number of files/S_ERROR
+        """
+        return self.fileManager.streamSEDump(seNames, batchCallback, batchSize=batchSize)
@@ -6,6 +6,7 @@ in the DIRAC framework
 import csv
 import json
 import os
+import zlib
 from io import StringIO
 
 from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
@@ -13,6 +14,64 @@ from DIRAC import S_OK, S_ERROR
 from DIRAC.DataManagementSystem.DB.FileCatalogDB import FileCatalogDB
 
 
+class SEDumpWriter(object):
+    """Send the rows of an SE dump to a FileHelper, formated as CSV with '|' separation
+
+    The rows are sent by chunks as they are given, optionally gzip compressed.
+    """
+
+    def __init__(self, fileHelper, compress=False, chunkSize=1048576):
+        """c'tor
+
+        :param fileHelper: FileHelper of the transfer
+        :param bool compress: gzip compress the data
+        :param int chunkSize: number of bytes (before compression) sent at once
+        """
+        self.fileHelper = fileHelper
+        self.chunkSize = chunkSize
+        self.sentBytes = 0
+        self.aborted = False
+        self.__buffer = StringIO()
+        self.__writer = csv.writer(self.__buffer, delimiter="|")
+        self.__compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def writeRows(self, rows):
+        """Add rows to the dump
+
+        :return: S_OK/S_ERROR, in particular if the client aborted the transfer
+        """
+        self.__writer.writerows(rows)
+        if self.__buffer.tell() < self.chunkSize:
+            return S_OK()
+        return self.__send()
+
+    def __send(self, final=False):
+        data = self.__buffer.getvalue().encode(errors="surrogateescape")
+        self.__buffer.seek(0)
+        self.__buffer.truncate()
+        if self.__compressor:
+            data = self.__compressor.compress(data)
+            if final:
+                data += self.__compressor.flush()
+        if not data:
+            return S_OK()
+        result = self.fileHelper.sendData(data)
+        if not result["OK"]:
+            return result
+        if result.get("AbortTransfer"):
+            self.aborted = True
+            return S_ERROR("Transfer aborted by the client")
+        self.sentBytes += len(data)
+        return S_OK()
+
+    def close(self):
+        """Send the rest of the dump and the end of the transfer"""
+        result = self.__send(final=True)
+        if not result["OK"]:
+            return result
+        return self.fileHelper.sendEOF()
+
+
 class FileCatalogHandlerMixin:
     """
     A simple Replica and Metadata Catalog service.
@@ -632,13 +691,28 @@ class FileCatalogHandlerMixin:
         """
         return self.fileCatalogDB.getSEDump(seNames)
 
+    def streamSEDump(self, seNames, batchCallback):
+        """
+         Give all the files at given SEs, together with checksum and size, to a callback
+         by batches, as they are read from the database
+
+        :param seNames: StorageElement names
+        :param batchCallback: function called with each list of tuples (SEName, lfn, checksum, size)
+
+        :returns: S_OK with the number of files/S_ERROR
+        """
+        return self.fileCatalogDB.streamSEDump(seNames, batchCallback)
+
 
 class FileCatalogHandler(FileCatalogHandlerMixin, RequestHandler):
     def transfer_toClient(self, jsonSENames, token, fileHelper):
         """This method used to transfer the SEDump to the client,
         formated as CSV with '|' separation
 
-        :param seName: name of the se to dump
+        The files are sent as they are read from the database.
+
+        :param jsonSENames: json formated names of the SEs to dump
+        :param token: "gzip" to compress the dump
 
         :returns: the result of the FileHelper
 
@@ -646,29 +720,23 @@ class FileCatalogHandler(FileCatalogHandlerMixin, RequestHandler):
         """
 
         seNames = json.loads(jsonSENames)
-        csvOutput = None
-        res = self.getSEDump(seNames)
+        writer = SEDumpWriter(fileHelper, compress=token == "gzip")
 
         try:
-            if not res["OK"]:
-                ret = fileHelper.stringToNetwork(json.dumps(res))
-                return ret
+            res = self.streamSEDump(seNames, writer.writeRows)
+            if writer.aborted:
+                self.log.verbose("Transfer aborted")
+                return S_OK()
 
-            retVal = res["Value"]
-
-            csvOutput = StringIO()
-            writer = csv.writer(csvOutput, delimiter="|")
-            for lfn in retVal:
-                writer.writerow(lfn)
-
-            csvOutput.seek(0)
+            if not res["OK"]:
+                if not writer.sentBytes:
+                    # The error is sent instead of the dump
+                    return fileHelper.stringToNetwork(json.dumps(res))
+                fileHelper.sendError(res["Message"])
+                return res
 
-            ret = fileHelper.DataSourceToNetwork(csvOutput)
-            return ret
+            return writer.close()
 
         except Exception as e:
             self.log.exception("Exception while sending seDump", repr(e))
             return S_ERROR("Exception while sending seDump: %s" % repr(e))
-        finally:
-            if csvOutput is not None:
-                csvOutput.close()
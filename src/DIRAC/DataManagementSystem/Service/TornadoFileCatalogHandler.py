@@ -17,7 +17,7 @@ from io import StringIO
 
 # from DIRAC
 
-from DIRAC import S_ERROR
+from DIRAC import S_OK, S_ERROR
 from DIRAC.Core.Utilities.ReturnValues import returnValueOrRaise
 from DIRAC.DataManagementSystem.Service.FileCatalogHandler import FileCatalogHandlerMixin
 
@@ -45,11 +45,15 @@ class TornadoFileCatalogHandler(FileCatalogHandlerMixin, TornadoService):
         csvOutput = None
 
         try:
-            retVal = returnValueOrRaise(self.getSEDump(seNames))
-
             csvOutput = StringIO()
             writer = csv.writer(csvOutput, delimiter="|")
-            writer.writerows(retVal)
+
+            def writeRows(rows):
+                writer.writerows(rows)
+                return S_OK()
+
+            # The files are written as they are read from the database
+            returnValueOrRaise(self.streamSEDump(seNames, writeRows))
 
             ret = csvOutput.getvalue()
             return ret
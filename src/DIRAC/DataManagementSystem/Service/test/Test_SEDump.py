@@ -0,0 +1,61 @@
+""" Test the streaming of the SE dumps of the FileCatalog """
+import io
+
+import pytest
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.Service.FileCatalogHandler import SEDumpWriter
+from DIRAC.Resources.Catalog.FileCatalogClient import GzipDataSink
+
+
+class FakeFileHelper(object):
+    def __init__(self, abortAfter=0):
+        self.chunks = []
+        self.eof = False
+        self.abortAfter = abortAfter
+
+    def sendData(self, data):
+        self.chunks.append(data)
+        result = S_OK()
+        if self.abortAfter and len(self.chunks) >= self.abortAfter:
+            result["AbortTransfer"] = True
+        return result
+
+    def sendEOF(self):
+        self.eof = True
+        return S_OK()
+
+
+rows = [("SE-%d" % (i % 2), "/vo/dir%d/file%d" % (i // 100, i), "%08x" % i, i * 1000) for i in range(2000)]
+expected = "".join("%s|%s|%s|%s\r\n" % row for row in rows).encode()
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_writer(compress):
+    fileHelper = FakeFileHelper()
+    writer = SEDumpWriter(fileHelper, compress=compress, chunkSize=4096)
+    for i in range(0, len(rows), 300):
+        assert writer.writeRows(rows[i : i + 300])["OK"]
+    if not compress:
+        # The dump was sent while it was written (the compressor keeps some data for itself)
+        assert len(fileHelper.chunks) > 1
+    assert writer.close()["OK"]
+    assert fileHelper.eof
+
+    output = io.BytesIO()
+    dataSink = GzipDataSink(output)
+    for chunk in fileHelper.chunks:
+        # The data arrives in any pieces
+        for i in range(0, len(chunk), 1000):
+            dataSink.write(chunk[i : i + 1000])
+    dataSink.close()
+    assert output.getvalue() == expected
+    if compress:
+        assert writer.sentBytes < len(expected) / 2
+
+
+def test_abort():
+    fileHelper = FakeFileHelper(abortAfter=1)
+    writer = SEDumpWriter(fileHelper, chunkSize=100)
+    assert not writer.writeRows(rows[:10])["OK"]
+    assert writer.aborted
@@ -0,0 +1,44 @@
+"""
+MatcherMonitoring type used to monitor the time spent in the stages of the job matching.
+"""
+from DIRAC.MonitoringSystem.Client.Types.BaseType import BaseType
+
+
+class MatcherMonitoring(BaseType):
+    """
+    .. class:: MatcherMonitoring
+
+    Each record is a bucket of the histogram of the durations of a stage of the matching
+    (see :py:class:`~DIRAC.WorkloadManagementSystem.Client.Matcher.MatchingTimes`)
+    """
+
+    def __init__(self):
+
+        super().__init__()
+
+        self.keyFields = [
+            "Host",
+            "Stage",
+            "Bucket",
+        ]
+
+        self.monitoringFields = [
+            "Count",
+            "Duration",
+        ]
+
+        self.index = "matcher_monitoring-index"
+
+        self.addMapping(
+            {
+                "Host": {"type": "keyword"},
+                "Stage": {"type": "keyword"},
+                "Bucket": {"type": "keyword"},
+                "Count": {"type": "long"},
+                "Duration": {"type": "long"},
+            }
+        )
+
+        self.period = "month"
+
+        self.checkType()
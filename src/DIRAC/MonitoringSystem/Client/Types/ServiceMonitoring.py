@@ -30,6 +30,8 @@ class ServiceMonitoring(BaseType):
             "RunningThreads",
             "MaxFD",
             "ResponseTime",
+            "RejectedQueries",
+            "QueueTime",
         ]
 
         self.index = "service_monitoring-index"
@@ -49,6 +51,8 @@ class ServiceMonitoring(BaseType):
                 "RunningThreads": {"type": "long"},
                 "MaxFD": {"type": "long"},
                 "ResponseTime": {"type": "long"},
+                "RejectedQueries": {"type": "long"},
+                "QueueTime": {"type": "long"},
             }
         )
 
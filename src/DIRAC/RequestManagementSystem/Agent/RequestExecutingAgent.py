@@ -43,6 +43,7 @@ from DIRAC.Core.Utilities.ProcessPool import ProcessPool
 from DIRAC.MonitoringSystem.Client.MonitoringReporter import MonitoringReporter
 from DIRAC.RequestManagementSystem.Client.ReqClient import ReqClient
 from DIRAC.RequestManagementSystem.private.RequestTask import RequestTask
+from DIRAC.RequestManagementSystem.private.CoalescedRequestTask import CoalescedRequestTask
 
 
 # # agent name
@@ -63,6 +64,8 @@ OPERATIONTIMEOUT = 300
 POOLTIMEOUT = 900
 # # ProcessPool sleep time
 POOLSLEEP = 5
+# # maximal nb of requests executed in a single task
+MAXCOALESCEDREQUESTS = 20
 
 
 class AgentConfigError(Exception):
@@ -110,6 +113,11 @@ class RequestExecutingAgent(AgentModule):
         # Size of the bulk if use of getRequests. If 0, use getRequest
         self.__bulkRequest = 0
         self.__rmsMonitoring = False
+        # Types of operations executed in a single task for several requests
+        self.__coalescedOperations = []
+        self.__maxCoalescedRequests = MAXCOALESCEDREQUESTS
+        # taskID -> RequestIDs of the requests executed in a single task
+        self.__coalescedTasks = {}
 
     def processPool(self):
         """facade for ProcessPool"""
@@ -216,6 +224,12 @@ class RequestExecutingAgent(AgentModule):
         self.log.info("ProcessPool sleep time = %d seconds" % self.__poolSleep)
         self.__bulkRequest = self.am_getOption("BulkRequest", self.__bulkRequest)
         self.log.info("Bulk request size = %d" % self.__bulkRequest)
+        self.__coalescedOperations = self.am_getOption("CoalescedOperations", self.__coalescedOperations)
+        self.__maxCoalescedRequests = self.am_getOption("MaxCoalescedRequests", self.__maxCoalescedRequests)
+        self.log.info(
+            "Coalesced operations = %s (at most %d requests per task)"
+            % (self.__coalescedOperations, self.__maxCoalescedRequests)
+        )
         # Check if monitoring is enabled
         if "Monitoring" in Operations().getMonitoringBackends(monitoringType="RMSMonitoring"):
             # Enable RMS monitoring
@@ -314,9 +328,9 @@ class RequestExecutingAgent(AgentModule):
 
             self.log.info("execute: will execute requests ", "%s" % len(requestsToExecute))
 
-            for request in requestsToExecute:
+            for requests in self.coalesceRequests(requestsToExecute):
                 # # set task id
-                taskID = request.RequestID
+                taskID = requests[0].RequestID
 
                 self.log.info(
                     "processPool status",
@@ -338,36 +352,59 @@ class RequestExecutingAgent(AgentModule):
                         if looping:
                             self.log.info("Free slot found", "after %d seconds" % looping * self.__poolSleep)
                         looping = 0
-                        # # save current request in cache
-                        res = self.cacheRequest(request)
-                        if not res["OK"]:
-                            if cmpError(res, errno.EALREADY):
-                                # The request is already in the cache, skip it. break out of the while loop to get next request
-                                break
-                            # There are too many requests in the cache, commit suicide
-                            self.log.error(
-                                "Too many requests in cache",
-                                "(%d requests): put back all requests and exit cycle. Error %s"
-                                % (len(self.__requestCache), res["Message"]),
-                            )
-                            self.putAllRequests()
-                            return res
+                        # # save current requests in cache
+                        cachedRequests = []
+                        for request in requests:
+                            res = self.cacheRequest(request)
+                            if res["OK"]:
+                                cachedRequests.append(request)
+                            elif not cmpError(res, errno.EALREADY):
+                                # There are too many requests in the cache, commit suicide
+                                self.log.error(
+                                    "Too many requests in cache",
+                                    "(%d requests): put back all requests and exit cycle. Error %s"
+                                    % (len(self.__requestCache), res["Message"]),
+                                )
+                                self.putAllRequests()
+                                return res
+                        # The requests already in the cache are skipped. break out of the while loop to get next ones
+                        if not cachedRequests:
+                            break
+                        taskID = cachedRequests[0].RequestID
                         # # serialize to JSON
-                        result = request.toJSON()
-                        if not result["OK"]:
+                        requestsJSON = []
+                        for request in cachedRequests:
+                            result = request.toJSON()
+                            if result["OK"]:
+                                requestsJSON.append(result["Value"])
+                        if not requestsJSON:
                             continue
-                        requestJSON = result["Value"]
-                        self.log.info("spawning task for request", "'%s/%s'" % (request.RequestID, request.RequestName))
-                        timeOut = self.getTimeout(request)
+                        timeOut = sum(self.getTimeout(request) for request in cachedRequests)
+                        taskKwargs = {
+                            "handlersDict": self.handlersDict,
+                            "csPath": self.__configPath,
+                            "agentName": self.agentName,
+                            "rmsMonitoring": self.__rmsMonitoring,
+                        }
+                        if len(cachedRequests) == 1:
+                            self.log.info(
+                                "spawning task for request", "'%s/%s'" % (taskID, cachedRequests[0].RequestName)
+                            )
+                            taskClass = RequestTask
+                            taskKwargs["requestJSON"] = requestsJSON[0]
+                        else:
+                            self.log.info(
+                                "spawning task for requests",
+                                ", ".join(
+                                    "'%s/%s'" % (request.RequestID, request.RequestName) for request in cachedRequests
+                                ),
+                            )
+                            taskClass = CoalescedRequestTask
+                            taskKwargs["requestsJSON"] = requestsJSON
+                            self.__coalescedTasks[taskID] = [request.RequestID for request in cachedRequests]
                         enqueue = self.processPool().createAndQueueTask(
-                            RequestTask,
-                            kwargs={
-                                "requestJSON": requestJSON,
-                                "handlersDict": self.handlersDict,
-                                "csPath": self.__configPath,
-                                "agentName": self.agentName,
-                                "rmsMonitoring": self.__rmsMonitoring,
-                            },
+                            taskClass,
+                            kwargs=taskKwargs,
                             taskID=taskID,
                             blocking=True,
                             usePoolCallbacks=True,
@@ -375,23 +412,25 @@ class RequestExecutingAgent(AgentModule):
                         )
                         if not enqueue["OK"]:
                             self.log.error("Could not enqueue task", enqueue["Message"])
+                            self.__coalescedTasks.pop(taskID, None)
                         else:
                             self.log.debug("successfully enqueued task", "'%s'" % taskID)
                             # # update monitor
                             if self.__rmsMonitoring:
-                                self.rmsMonitoringReporter.addRecord(
-                                    {
-                                        "timestamp": int(TimeUtilities.toEpoch()),
-                                        "host": Network.getFQDN(),
-                                        "objectType": "Request",
-                                        "status": "Attempted",
-                                        "objectID": request.RequestID,
-                                        "nbObject": 1,
-                                    }
-                                )
+                                for request in cachedRequests:
+                                    self.rmsMonitoringReporter.addRecord(
+                                        {
+                                            "timestamp": int(TimeUtilities.toEpoch()),
+                                            "host": Network.getFQDN(),
+                                            "objectType": "Request",
+                                            "status": "Attempted",
+                                            "objectID": request.RequestID,
+                                            "nbObject": 1,
+                                        }
+                                    )
 
                             # # update request counter
-                            taskCounter += 1
+                            taskCounter += len(cachedRequests)
                             # # task created, a little time kick to proceed
                             time.sleep(0.1)
                             break
@@ -408,6 +447,30 @@ class RequestExecutingAgent(AgentModule):
         # # clean return
         return S_OK()
 
+    def coalesceRequests(self, requests):
+        """group the requests whose waiting operations can be executed in a single task:
+        operations of the same type, for the same target SE and owner
+
+        :param list requests: Request instances
+        :return: list of lists of Request instances, in the order of the requests
+        """
+        groups = {}
+        for request in requests:
+            key = request.RequestID
+            if self.__coalescedOperations:
+                waiting = request.getWaiting()
+                operation = waiting["Value"] if waiting["OK"] else None
+                if operation and operation.Status == "Waiting" and operation.Type in self.__coalescedOperations:
+                    key = (operation.Type, operation.TargetSE, request.OwnerDN, request.OwnerGroup)
+            groups.setdefault(key, []).append(request)
+        coalesced = []
+        for group in groups.values():
+            for index in range(0, len(group), max(1, self.__maxCoalescedRequests)):
+                coalesced.append(group[index : index + max(1, self.__maxCoalescedRequests)])
+        if len(coalesced) < len(requests):
+            self.log.info("Coalesced requests", "%d requests in %d tasks" % (len(requests), len(coalesced)))
+        return coalesced
+
     def getTimeout(self, request):
         """get timeout for request"""
         timeout = 0
@@ -438,6 +501,15 @@ class RequestExecutingAgent(AgentModule):
         :param str taskID: Request.RequestID
         :param dict taskResult: task result S_OK(Request)/S_ERROR(Message)
         """
+        if taskID in self.__coalescedTasks:
+            # # fan the results out to the requests of the task
+            requestIDs = self.__coalescedTasks.pop(taskID)
+            for requestID in requestIDs:
+                requestResult = taskResult
+                if taskResult["OK"]:
+                    requestResult = taskResult["Value"].get(requestID, S_ERROR("No result for request"))
+                self.resultCallback(requestID, requestResult)
+            return
         # # clean cache
         res = self.putRequest(taskID, taskResult)
         self.log.info(
@@ -459,7 +531,8 @@ class RequestExecutingAgent(AgentModule):
         :param Exception taskException: Exception instance
         """
         self.log.error("exceptionCallback:", "%s was hit by exception %s" % (taskID, taskException))
-        self.putRequest(taskID)
+        for requestID in self.__coalescedTasks.pop(taskID, [taskID]):
+            self.putRequest(requestID)
 
     def __rmsMonitoringReporting(self):
         """This method is called by the ThreadScheduler as a periodic task in order to commit the collected data which
@@ -17,6 +17,7 @@
 """
 import errno
 import random
+import itertools
 
 import datetime
 
@@ -24,6 +25,7 @@ from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm import relationship, backref, sessionmaker, joinedload, mapper
 from sqlalchemy.sql import update
 from sqlalchemy import (
+    and_,
     create_engine,
     func,
     Table,
@@ -49,6 +51,9 @@ from DIRAC.ConfigurationSystem.Client.Utilities import getDBParameters
 # Metadata instance that is used to bind the engine, Object and tables
 metadata = MetaData()
 
+# Minimal number of the oldest Waiting requests among which the requests to execute are chosen
+CLAIM_CANDIDATES = 100
+
 
 # Description of the file table
 
@@ -333,6 +338,12 @@ class RequestDB(object):
 
         """
 
+        if not reqID and assigned:
+            res = self.claimRequests(1)
+            if not res["OK"]:
+                return res
+            return S_OK(next(iter(res["Value"].values()), None))
+
         # expire_on_commit is set to False so that we can still use the object after we close the session
         session = self.DBSession(expire_on_commit=False)
         log = self.log.getSubLogger("getRequest" if assigned else "peekRequest")
@@ -434,6 +445,8 @@ class RequestDB(object):
         :returns: a dictionary of Request objects indexed on the RequestID
 
         """
+        if assigned:
+            return self.claimRequests(numberOfRequest)
 
         # expire_on_commit is set to False so that we can still use the object after we close the session
         session = self.DBSession(expire_on_commit=False)
@@ -448,7 +461,6 @@ class RequestDB(object):
                 now = datetime.datetime.utcnow().replace(microsecond=0)
                 requestIDs = (
                     session.query(Request.RequestID)
-                    .with_for_update()
                     .filter(Request._Status == "Waiting")
                     .filter(Request._NotBefore < now)
                     .order_by(Request._LastUpdate)
@@ -471,25 +483,113 @@ class RequestDB(object):
             except NoResultFound:
                 pass
 
-            if assigned and requestDict:
-                session.execute(
+            session.commit()
+
+            session.expunge_all()
+
+        except Exception as e:
+            session.rollback()
+            log.exception("unexpected exception", lException=e)
+            return S_ERROR("getBulkRequest: unexpected exception : %s" % e)
+        finally:
+            session.close()
+
+        return S_OK(requestDict)
+
+    def claimRequests(self, numberOfRequest=10):
+        """Claim Waiting requests for execution: their status is set to Assigned
+
+        The requests are chosen among the oldest eligible ones, in turn for each owner and type of operation to
+        execute, so that the requests of one owner or of one type can't delay all the others.
+        Each request is claimed by an update conditioned on its status still being Waiting, committed at once:
+        the requests claimed meanwhile by another agent are skipped without waiting for their lock, as with
+        SELECT ... FOR UPDATE SKIP LOCKED, which is not available in MySQL 5.7.
+        The claimed requests are then read with their operations and files in a single query.
+
+        :param int numberOfRequest: maximum number of requests to claim
+        :returns: S_OK( { RequestID : Request } )
+        """
+        # expire_on_commit is set to False so that we can still use the object after we close the session
+        session = self.DBSession(expire_on_commit=False)
+        log = self.log.getSubLogger("claimRequests")
+
+        requestDict = {}
+        try:
+            now = datetime.datetime.utcnow().replace(microsecond=0)
+            candidates = (
+                session.query(
+                    requestTable.c.RequestID, requestTable.c.OwnerDN, requestTable.c.OwnerGroup, operationTable.c.Type
+                )
+                .select_from(requestTable)
+                .outerjoin(
+                    operationTable,
+                    and_(operationTable.c.RequestID == requestTable.c.RequestID, operationTable.c.Status == "Waiting"),
+                )
+                .filter(requestTable.c.Status == "Waiting")
+                .filter(requestTable.c.NotBefore < now)
+                .order_by(requestTable.c.LastUpdate)
+                .limit(max(CLAIM_CANDIDATES, 2 * numberOfRequest))
+                .all()
+            )
+
+            claimedIDs = []
+            skipped = 0
+            for requestID in self._fairOrder(candidates):
+                if len(claimedIDs) >= numberOfRequest:
+                    break
+                updateRet = session.execute(
                     update(Request)
-                    .where(Request.RequestID.in_(requestDict.keys()))
+                    .where(Request.RequestID == requestID)
+                    .where(Request._Status == "Waiting")
                     .values({Request._Status: "Assigned", Request._LastUpdate: datetime.datetime.utcnow()})
                 )
-            session.commit()
+                # Committed at once so that the row is not kept locked while claiming the others
+                session.commit()
+                if updateRet.rowcount:
+                    claimedIDs.append(requestID)
+                else:
+                    skipped += 1
+            log.verbose("Claimed requests", "%d (%d claimed by others)" % (len(claimedIDs), skipped))
 
+            if claimedIDs:
+                # the joinedload is to force the non-lazy loading of all the attributes, especially _parent
+                requests = (
+                    session.query(Request)
+                    .options(joinedload("__operations__").joinedload("__files__"))
+                    .filter(Request.RequestID.in_(claimedIDs))
+                    .all()
+                )
+                requestDict = dict((req.RequestID, req) for req in requests)
+            session.commit()
             session.expunge_all()
 
         except Exception as e:
             session.rollback()
             log.exception("unexpected exception", lException=e)
-            return S_ERROR("getBulkRequest: unexpected exception : %s" % e)
+            return S_ERROR("claimRequests: unexpected exception : %s" % e)
         finally:
             session.close()
 
         return S_OK(requestDict)
 
+    @staticmethod
+    def _fairOrder(candidates):
+        """Order the candidate requests taking them in turn from each owner and type of operation
+
+        :param candidates: list of (RequestID, OwnerDN, OwnerGroup, operation type), oldest first
+        :returns: list of RequestIDs
+        """
+        groups = {}
+        for requestID, ownerDN, ownerGroup, operationType in candidates:
+            groups.setdefault((ownerDN, ownerGroup, operationType), []).append(requestID)
+        orderedIDs = []
+        seen = set()
+        for requestID in itertools.chain.from_iterable(itertools.zip_longest(*groups.values())):
+            if requestID is not None and requestID not in seen:
+                seen.add(requestID)
+                orderedIDs.append(requestID)
+        return orderedIDs
+
     def peekRequest(self, requestID):
         """get request (ro), no update on states
 
@@ -83,6 +83,45 @@ def test_stressBulk(reqDB):
         assert delete["OK"], delete
 
 
+def test_claimRequests(reqDB):
+    """claim the requests in turn for each owner and operation type"""
+
+    reqIDs = {}
+    for i, (owner, opType) in enumerate(
+        [("/DN/A", "RemoveReplica")] * 6 + [("/DN/B", "ReplicateAndRegister")] * 2 + [("/DN/A", "RemoveFile")]
+    ):
+        request = Request({"RequestName": "claim-%d" % i, "OwnerDN": owner, "OwnerGroup": "group"})
+        op = Operation({"Type": opType, "TargetSE": "CERN-USER"})
+        op += File({"LFN": "/lhcb/user/c/cibak/foo%d" % i})
+        request += op
+        put = reqDB.putRequest(request)
+        assert put["OK"], put
+        reqIDs[put["Value"]] = (owner, opType)
+
+    time.sleep(1)
+
+    claim = reqDB.claimRequests(3)
+    assert claim["OK"], claim
+    assert sorted(reqIDs[reqID] for reqID in claim["Value"]) == sorted(set(reqIDs.values()))
+    for request in claim["Value"].values():
+        assert len(request) == 1
+
+    # The requests are claimed only once
+    claimed = set(claim["Value"])
+    for _ in range(3):
+        claim = reqDB.claimRequests(3)
+        assert claim["OK"], claim
+        assert not claimed & set(claim["Value"])
+        claimed |= set(claim["Value"])
+    assert claimed == set(reqIDs)
+    claim = reqDB.getRequest()
+    assert claim == {"OK": True, "Value": None}
+
+    for reqID in reqIDs:
+        delete = reqDB.deleteRequest(reqID)
+        assert delete["OK"], delete
+
+
 def test_scheduled(reqDB):
     """scheduled request r/w"""
 
@@ -0,0 +1,102 @@
+""" :mod: CoalescedRequestTask
+
+    =========================
+
+    .. module: CoalescedRequestTask
+
+    :synopsis: processing task for several requests with compatible operations
+
+    Task executing in a single process several requests of the same owner, whose waiting operations have the
+    same type and target SE. The owner proxy is set up once, the operations are executed one after the other by
+    the same handler, which can get in bulk what it needs for all of them
+    (see :py:meth:`~DIRAC.RequestManagementSystem.private.OperationHandlerBase.OperationHandlerBase.prepareBulk`),
+    and the result of each request is returned to the RequestExecutingAgent.
+"""
+import os
+
+from DIRAC import gLogger, S_OK, S_ERROR, gConfig
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.RequestManagementSystem.Client.Request import Request
+from DIRAC.RequestManagementSystem.private.RequestTask import RequestTask
+
+
+class CoalescedRequestTask(RequestTask):
+    """
+    .. class:: CoalescedRequestTask
+
+    processing task for several requests with compatible operations
+    """
+
+    def __init__(self, requestsJSON, handlersDict, csPath, agentName, standalone=False, **kwargs):
+        """c'tor
+
+        :param list requestsJSON: requests serialized to JSON, with the same owner
+        :param dict handlersDict: operation handlers
+        """
+        super().__init__(requestsJSON[0], handlersDict, csPath, agentName, standalone=standalone, **kwargs)
+        self.requests = [self.request] + [Request(requestJSON) for requestJSON in requestsJSON[1:]]
+
+    def __setRequest(self, request):
+        """set the request being processed"""
+        self.request = request
+        self.log = gLogger.getSubLogger("pid_%s/%s" % (os.getpid(), request.RequestName))
+
+    def prepareBulk(self, shifter):
+        """let the handler of the waiting operations prepare their execution in bulk
+
+        :param list shifter: shifters matching the requests owner
+        """
+        operations = []
+        for request in self.requests:
+            waiting = request.getWaiting()
+            if waiting["OK"] and waiting["Value"] and waiting["Value"].Status == "Waiting":
+                operations.append(waiting["Value"])
+        if len(operations) < 2:
+            return S_OK()
+        handler = self.getHandler(operations[0])
+        if not handler["OK"]:
+            return handler
+        handler = handler["Value"]
+        handler.shifter = shifter
+        # Always use request owner proxy
+        useServerCertificate = gConfig.useServerCertificate() if self.standalone else True
+        if useServerCertificate:
+            gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", "false")
+        try:
+            return handler.prepareBulk(operations)
+        except Exception as error:
+            self.log.exception("hit by exception preparing the operations:", error)
+            return S_ERROR(str(error))
+        finally:
+            if useServerCertificate:
+                gConfigurationData.setOptionInCFG("/DIRAC/Security/UseServerCertificate", "true")
+
+    def __call__(self):
+        """requests processing
+
+        :return: S_OK( { RequestID : S_OK( Request ) or S_ERROR } )
+        """
+        self.log.debug("about to execute requests", "%d" % len(self.requests))
+        results = {}
+        # # setup proxy for the owner of all the requests
+        setupProxy = self.setupProxy()
+        if not setupProxy["OK"]:
+            for request in self.requests:
+                self.__setRequest(request)
+                results[request.RequestID] = self.proxyError(setupProxy)
+            return S_OK(results)
+        shifter = setupProxy["Value"]["Shifter"]
+
+        res = self.prepareBulk(shifter)
+        if not res["OK"]:
+            # Each operation will get what it needs by itself
+            self.log.warn("Could not prepare the operations in bulk", res["Message"])
+
+        for request in self.requests:
+            self.__setRequest(request)
+            try:
+                results[request.RequestID] = self.executeRequest(shifter)
+            except Exception as error:
+                self.log.exception("hit by exception:", error)
+                results[request.RequestID] = S_ERROR(str(error))
+        return S_OK(results)
@@ -24,6 +24,7 @@
     * self.shifter -- list of shifters matching request owner (could be empty!!!)
     * each CS option stored under CS path "RequestExecutingAgent/OperationHandlers/Foo" is exported as read-only property too
     * self.initialize() -- overwrite it to perform additional initialization
+    * self.prepareBulk( operations ) -- overwrite it to prepare at once several operations executed one after the other
     * self.log -- own sub logger
     * self.request, self.operation -- reference to Operation and Request itself
 
@@ -264,6 +265,17 @@ class OperationHandlerBase(metaclass=DynamicProps):
         """
         raise NotImplementedError("Implement me please!")
 
+    def prepareBulk(self, operations):
+        """called before executing one after the other several operations of this type, with the same
+        target SE and owner, coming from different requests (see CoalescedRequestTask)
+
+        It can be overwritten in the inherited class to get at once what __call__ gets for each operation.
+
+        :param list operations: Operation instances
+        :return: S_OK/S_ERROR
+        """
+        return S_OK()
+
     def createRMSRecord(self, status, nbObject):
         """
         This method is used to create a record given some parameters for sending it to the ES backend.
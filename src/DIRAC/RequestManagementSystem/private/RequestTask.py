@@ -251,26 +251,40 @@ class RequestTask(object):
         # # setup proxy for request owner
         setupProxy = self.setupProxy()
         if not setupProxy["OK"]:
-            userSuspended = "User is currently suspended"
-            self.request.Error = setupProxy["Message"]
-            # In case the user does not have proxy
-            if DErrno.cmpError(setupProxy, DErrno.EPROXYFIND):
-                self.log.error("Error setting proxy. Request set to Failed:", setupProxy["Message"])
-                # If user is no longer registered, fail the request
-                for operation in self.request:
-                    for opFile in operation:
-                        opFile.Status = "Failed"
-                    operation.Status = "Failed"
-            elif userSuspended in setupProxy["Message"]:
-                # If user is suspended, wait for a long time
-                self.request.delayNextExecution(6 * 60)
-                self.request.Error = userSuspended
-                self.log.error("Error setting proxy: " + userSuspended, self.request.OwnerDN)
-            else:
-                self.log.error("Error setting proxy", setupProxy["Message"])
-            return S_OK(self.request)
-        shifter = setupProxy["Value"]["Shifter"]
+            return self.proxyError(setupProxy)
+        return self.executeRequest(setupProxy["Value"]["Shifter"])
+
+    def proxyError(self, setupProxy):
+        """update the request when the proxy of its owner could not be set up
+
+        :param dict setupProxy: S_ERROR returned by setupProxy
+        :return: S_OK( Request )
+        """
+        userSuspended = "User is currently suspended"
+        self.request.Error = setupProxy["Message"]
+        # In case the user does not have proxy
+        if DErrno.cmpError(setupProxy, DErrno.EPROXYFIND):
+            self.log.error("Error setting proxy. Request set to Failed:", setupProxy["Message"])
+            # If user is no longer registered, fail the request
+            for operation in self.request:
+                for opFile in operation:
+                    opFile.Status = "Failed"
+                operation.Status = "Failed"
+        elif userSuspended in setupProxy["Message"]:
+            # If user is suspended, wait for a long time
+            self.request.delayNextExecution(6 * 60)
+            self.request.Error = userSuspended
+            self.log.error("Error setting proxy: " + userSuspended, self.request.OwnerDN)
+        else:
+            self.log.error("Error setting proxy", setupProxy["Message"])
+        return S_OK(self.request)
 
+    def executeRequest(self, shifter):
+        """execute the operations of the request, the proxy of its owner being set up
+
+        :param list shifter: shifters matching the request owner
+        :return: S_OK( Request ) or S_ERROR
+        """
         error = None
 
         while self.request.Status == "Waiting":
@@ -0,0 +1,102 @@
+""" Test the execution of several requests in a single task
+"""
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK, gLogger
+from DIRAC.RequestManagementSystem.Agent.RequestExecutingAgent import RequestExecutingAgent
+from DIRAC.RequestManagementSystem.Client.File import File
+from DIRAC.RequestManagementSystem.Client.Operation import Operation
+from DIRAC.RequestManagementSystem.Client.Request import Request
+from DIRAC.RequestManagementSystem.private import RequestTask as moduleTested
+from DIRAC.RequestManagementSystem.private.CoalescedRequestTask import CoalescedRequestTask
+
+
+def makeRequest(requestID, opType="ReplicateAndRegister", targetSE="SE-A", ownerDN="/DN/A", lfn="/a/b/c"):
+    request = Request({"RequestName": "request-%d" % requestID, "OwnerDN": ownerDN, "OwnerGroup": "group"})
+    request.RequestID = requestID
+    operation = Operation({"Type": opType, "TargetSE": targetSE})
+    operation += File({"LFN": lfn})
+    request += operation
+    return request
+
+
+class FakeHandler(object):
+    """Handler replicating the files, or failing on an LFN"""
+
+    def __init__(self):
+        self.operation = None
+        self.prepared = []
+        self.executed = []
+
+    def setOperation(self, operation):
+        self.operation = operation
+
+    def prepareBulk(self, operations):
+        self.prepared.append([operation._parent.RequestID for operation in operations])
+        return S_OK()
+
+    def __call__(self):
+        self.executed.append(self.operation._parent.RequestID)
+        for opFile in self.operation:
+            if opFile.LFN == "/crash":
+                raise RuntimeError("Crash")
+            opFile.Status = "Done"
+        return S_OK()
+
+
+def test_coalescedRequestTask(monkeypatch):
+    monkeypatch.setattr(moduleTested, "Operations", MagicMock())
+    requests = [makeRequest(1), makeRequest(2, lfn="/crash"), makeRequest(3)]
+    task = CoalescedRequestTask(
+        [request.toJSON()["Value"] for request in requests],
+        {"ReplicateAndRegister": "DIRAC/DataManagementSystem/Agent/RequestOperations/ReplicateAndRegister"},
+        "csPath",
+        "RequestManagement/RequestExecutingAgent",
+        requestClient=MagicMock(),
+    )
+    handler = FakeHandler()
+
+    def getHandler(operation):
+        handler.setOperation(operation)
+        return S_OK(handler)
+
+    task.getHandler = getHandler
+    task.setupProxy = MagicMock(return_value=S_OK({"Shifter": [], "ProxyFile": "proxy"}))
+
+    res = task()
+    assert res["OK"], res
+    # The proxy is set up once, the operations are prepared together and executed one by one
+    task.setupProxy.assert_called_once_with()
+    assert handler.prepared == [[1, 2, 3]]
+    assert handler.executed == [1, 2, 3]
+    assert sorted(res["Value"]) == [1, 2, 3]
+    assert res["Value"][1]["Value"].Status == "Done"
+    # The failure of a request does not prevent the others from being executed
+    assert not res["Value"][2]["OK"]
+    assert res["Value"][3]["Value"].Status == "Done"
+
+
+@pytest.mark.parametrize(
+    "coalescedOperations, maxCoalescedRequests, expected",
+    [
+        ([], 20, [[1], [2], [3], [4], [5], [6]]),
+        (["ReplicateAndRegister"], 20, [[1, 2, 6], [3], [4], [5]]),
+        (["ReplicateAndRegister"], 2, [[1, 2], [6], [3], [4], [5]]),
+    ],
+)
+def test_coalesceRequests(coalescedOperations, maxCoalescedRequests, expected):
+    agent = RequestExecutingAgent.__new__(RequestExecutingAgent)
+    agent.log = gLogger
+    agent._RequestExecutingAgent__coalescedOperations = coalescedOperations
+    agent._RequestExecutingAgent__maxCoalescedRequests = maxCoalescedRequests
+    requests = [
+        makeRequest(1),
+        makeRequest(2),
+        makeRequest(3, targetSE="SE-B"),
+        makeRequest(4, ownerDN="/DN/B"),
+        makeRequest(5, opType="RemoveFile"),
+        makeRequest(6),
+    ]
+    groups = agent.coalesceRequests(requests)
+    assert [[request.RequestID for request in group] for group in groups] == expected
@@ -2,8 +2,10 @@
 """
 import json
 import os
+import zlib
 
 from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.TransferClient import TransferClient as DISETTransferClient
 from DIRAC.Core.Tornado.Client.ClientSelector import TransferClientSelector as TransferClient
 
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry import getVOMSAttributeForGroup, getDNForUsername
@@ -11,6 +13,37 @@ from DIRAC.Resources.Catalog.Utilities import checkCatalogArguments
 from DIRAC.Resources.Catalog.FileCatalogClientBase import FileCatalogClientBase
 
 
+class GzipDataSink(object):
+    """Data sink decompressing gzip data into a file
+
+    Data which does not start as gzip (sent by a service not compressing it) is written as it is.
+    """
+
+    def __init__(self, outputFile):
+        self.outputFile = outputFile
+        self.__decompressor = None
+        self.__start = b""
+
+    def write(self, data):
+        if self.__decompressor is None:
+            # Wait for the gzip magic number
+            self.__start += data
+            if len(self.__start) < 2:
+                return
+            data, self.__start = self.__start, b""
+            self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if data[:2] == b"\x1f\x8b" else False
+        if self.__decompressor:
+            data = self.__decompressor.decompress(data)
+        self.outputFile.write(data)
+
+    def close(self):
+        """Write what remains, the output file is not closed"""
+        if self.__start:
+            self.outputFile.write(self.__start)
+        elif self.__decompressor:
+            self.outputFile.write(self.__decompressor.flush())
+
+
 class FileCatalogClient(FileCatalogClientBase):
     """Client code to the DIRAC File Catalogue"""
 
@@ -657,7 +690,7 @@ class FileCatalogClient(FileCatalogClientBase):
 
     #############################################################################
 
-    def getSEDump(self, seNames, outputFilename):
+    def getSEDump(self, seNames, outputFilename, compress=True):
         """
         Dump the content of SEs in the given file.
         The file contains a list of [SEName, lfn,checksum,size] dumped as csv,
@@ -665,6 +698,7 @@ class FileCatalogClient(FileCatalogClientBase):
 
         :param seName: list of StorageElement names
         :param outputFilename: path to the file where to dump it
+        :param bool compress: ask the service to compress the dump on the wire (with a DISET service)
 
         :returns: result from the TransferClient
         """
@@ -674,4 +708,11 @@ class FileCatalogClient(FileCatalogClientBase):
         seNames = json.dumps(seNames)
 
         dfc = TransferClient(self.serverURL, timeout=3600)
-        return dfc.receiveFile(outputFilename, seNames)
+        if not compress or not isinstance(outputFilename, str) or not isinstance(dfc, DISETTransferClient):
+            return dfc.receiveFile(outputFilename, seNames)
+
+        with open(outputFilename, "wb") as outputFile:
+            dataSink = GzipDataSink(outputFile)
+            result = dfc.receiveFile(dataSink, seNames, "gzip")
+            dataSink.close()
+        return result
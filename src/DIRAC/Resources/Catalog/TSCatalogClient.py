@@ -12,9 +12,9 @@ class TSCatalogClient(FileCatalogClientBase):
     """Exposes the catalog functionality available in the DIRAC/TransformationHandler"""
 
     # List of common File Catalog methods implemented by this client
-    WRITE_METHODS = FileCatalogClientBase.WRITE_METHODS + ["addFile", "removeFile", "setMetadata"]
+    WRITE_METHODS = FileCatalogClientBase.WRITE_METHODS + ["addFile", "removeFile", "setMetadata", "setMetadataBulk"]
 
-    NO_LFN_METHODS = ["setMetadata"]
+    NO_LFN_METHODS = ["setMetadata", "setMetadataBulk"]
 
     def __init__(self, url=None, **kwargs):
 
@@ -48,3 +48,12 @@ class TSCatalogClient(FileCatalogClientBase):
         """
         rpcClient = self._getRPC()
         return rpcClient.setMetadata(path, metadatadict)
+
+    def setMetadataBulk(self, pathMetadataDict):
+        """Set metadata parameters for the given paths
+
+        :param dict pathMetadataDict: { path : metadata dictionary }
+        :return: Successful/Failed dict.
+        """
+        rpcClient = self._getRPC()
+        return rpcClient.setMetadataBulk(pathMetadataDict)
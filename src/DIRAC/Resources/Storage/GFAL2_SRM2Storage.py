@@ -26,6 +26,9 @@ class GFAL2_SRM2Storage(GFAL2_StorageBase):
     _INPUT_PROTOCOLS = ["file", "root", "srm", "gsiftp", "https"]
     _OUTPUT_PROTOCOLS = ["file", "root", "dcap", "gsidcap", "rfio", "srm", "gsiftp", "https"]
 
+    # A single srmRm request removes all the files
+    _bulkUnlink = True
+
     def __init__(self, storageName, parameters):
         """ """
         super(GFAL2_SRM2Storage, self).__init__(storageName, parameters)
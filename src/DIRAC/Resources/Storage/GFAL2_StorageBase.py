@@ -25,6 +25,7 @@ import six
 import os
 import datetime
 import errno
+from concurrent.futures import ThreadPoolExecutor
 from stat import S_ISREG, S_ISDIR, S_IXUSR, S_IRUSR, S_IWUSR, S_IRWXG, S_IRWXU, S_IRWXO
 
 import gfal2  # pylint: disable=import-error
@@ -108,6 +109,12 @@ class GFAL2_StorageBase(StorageBase):
         self.stageTimeout = gConfig.getValue("/Resources/StorageElements/StageTimeout", 12 * 60 * 60)
         # gfal2Timeout, amount of time it takes until an operation times out
         self.gfal2Timeout = gConfig.getValue("/Resources/StorageElements/GFAL_Timeout", 100)
+        # maximum number of files handled concurrently by the bulk methods (1: one after the other)
+        self.maxConcurrentOperations = int(
+            parameters.get(
+                "MaxConcurrentOperations", gConfig.getValue("/Resources/StorageElements/MaxConcurrentOperations", 1)
+            )
+        )
         # set the gfal2 default protocols, e.g. used when trying to retrieve transport url
         self.defaultLocalProtocols = gConfig.getValue("/Resources/StorageElements/DefaultProtocols", [])
 
@@ -133,6 +140,94 @@ class GFAL2_StorageBase(StorageBase):
         # If the list is empty, all of them will be queried
         self._defaultExtendedAttributes = []
 
+    # Whether the files are removed with a single (bulk) unlink call instead of one call per file.
+    # It is only worth it for the protocols where gfal2 sends a single request to the storage.
+    _bulkUnlink = False
+
+    def _executeForUrls(self, singleFunc, urls, *args, withTokens=False, concurrent=True):
+        """Execute a method on each of the urls, with up to maxConcurrentOperations of them at the same time
+
+        :param singleFunc: method taking an url (and args) and returning an S_ structure
+        :param urls: urls to give to the method
+        :param args: other arguments given to the method
+        :param bool withTokens: urls is a dict { url : token }, the token being given to the method after the url
+        :param bool concurrent: False if the method can't be executed in several threads
+        :returns: S_OK( { "Failed" : { url : error message }, "Successful" : { url : value } } )
+        """
+        if withTokens:
+            calls = [(url, (token,) + args) for url, token in urls.items()]
+        else:
+            calls = [(url, args) for url in urls]
+
+        nThreads = min(self.maxConcurrentOperations, len(calls)) if concurrent else 1
+        if nThreads > 1:
+            with ThreadPoolExecutor(nThreads) as executor:
+                results = list(executor.map(lambda call: singleFunc(call[0], *call[1]), calls))
+        else:
+            results = [singleFunc(url, *callArgs) for url, callArgs in calls]
+
+        successful = {}
+        failed = {}
+        for (url, _callArgs), res in zip(calls, results):
+            if res["OK"]:
+                successful[url] = res["Value"]
+            else:
+                failed[url] = res["Message"]
+        return S_OK({"Failed": failed, "Successful": successful})
+
+    def _executeBulk(self, bulkFunc, urls, errStr):
+        """Execute a gfal2 bulk method on all the urls at once
+
+        :param bulkFunc: function taking the list of urls and returning the list of their errors
+                         (gfal2.GError or None), and a dict { error code : value } giving the value of the
+                         urls without error (code None) and of the urls whose error is not a failure
+        :param list urls: urls to give to the bulk method
+        :param str errStr: error message for the failed urls
+        :returns: S_OK( { "Failed" : { url : error message }, "Successful" : { url : value } } ),
+                  None if the gfal2 bindings have no bulk version of the method
+        """
+        try:
+            errors, values = bulkFunc([str(url) for url in urls])
+        except TypeError:
+            # Old bindings, only taking a single url
+            return None
+        except gfal2.GError as e:
+            self.log.debug(errStr, repr(e))
+            return S_OK({"Failed": dict.fromkeys(urls, "%s %s" % (errStr, repr(e))), "Successful": {}})
+
+        successful = {}
+        failed = {}
+        for url, error in zip(urls, errors):
+            code = error.code if error is not None else None
+            if code in values:
+                successful[url] = values[code]
+            else:
+                self.log.debug(errStr, "%s %s" % (url, repr(error)))
+                failed[url] = "%s %s" % (errStr, repr(error))
+        return S_OK({"Failed": failed, "Successful": successful})
+
+    def _executeBulkByToken(self, bulkFunc, urls, errStr):
+        """Execute a gfal2 bulk method taking a token, once per token
+
+        :param bulkFunc: function taking the list of urls and their token, see _executeBulk
+        :param dict urls: { url : token }
+        :param str errStr: error message for the failed urls
+        :returns: see _executeBulk
+        """
+        urlsPerToken = {}
+        for url, token in urls.items():
+            urlsPerToken.setdefault(str(token), []).append(url)
+
+        successful = {}
+        failed = {}
+        for token, tokenUrls in urlsPerToken.items():
+            res = self._executeBulk(lambda surls: bulkFunc(surls, token), tokenUrls, errStr)
+            if res is None:
+                return None
+            successful.update(res["Value"]["Successful"])
+            failed.update(res["Value"]["Failed"])
+        return S_OK({"Failed": failed, "Successful": successful})
+
     def exists(self, path):
         """Check if the path exists on the storage
 
@@ -149,19 +244,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.exists: Checking the existence of %s path(s)" % len(urls))
 
-        successful = {}
-        failed = {}
-
-        for url in urls:
-            res = self.__singleExists(url)
-
-            if res["OK"]:
-                successful[url] = res["Value"]
-            else:  # something went wrong with the query
-                failed[url] = res["Message"]
-
-        resDict = {"Failed": failed, "Successful": successful}
-        return S_OK(resDict)
+        return self._executeForUrls(self.__singleExists, urls)
 
     def _estimateTransferTimeout(self, fileSize):
         """Dark magic to estimate the timeout for a transfer
@@ -215,18 +298,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.isFile: checking whether %s path(s) are file(s)." % len(urls))
 
-        successful = {}
-        failed = {}
-
-        for url in urls:
-            res = self._isSingleFile(url)
-
-            if res["OK"]:
-                successful[url] = res["Value"]
-            else:
-                failed[url] = res["Message"]
-
-        return S_OK({"Failed": failed, "Successful": successful})
+        return self._executeForUrls(self._isSingleFile, urls)
 
     def _isSingleFile(self, path):
         """Checking if :path: exists and is a file
@@ -536,18 +608,15 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.removeFile: Attempting to remove %s files" % len(urls))
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            res = self._removeSingleFile(url)
-
-            if res["OK"]:
-                successful[url] = res["Value"]
-            else:
-                failed[url] = res["Message"]
-
-        return S_OK({"Failed": failed, "Successful": successful})
+        if self._bulkUnlink and len(urls) > 1:
+            res = self._executeBulk(
+                lambda surls: (self.ctx.unlink(surls), {None: True, errno.ENOENT: True}),
+                list(urls),
+                "Failed to remove file.",
+            )
+            if res is not None:
+                return res
+        return self._executeForUrls(self._removeSingleFile, urls)
 
     def _removeSingleFile(self, path):
         """Physically remove the file specified by path
@@ -598,18 +667,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.getFileSize: Trying to determine file size of %s files" % len(urls))
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            res = self._getSingleFileSize(url)
-
-            if not res["OK"]:
-                failed[url] = res["Message"]
-            else:
-                successful[url] = res["Value"]
-
-        return S_OK({"Failed": failed, "Successful": successful})
+        return self._executeForUrls(self._getSingleFileSize, urls)
 
     def _getSingleFileSize(self, path):
         """Get the physical size of the given file
@@ -654,18 +712,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.getFileMetadata: trying to read metadata for %s paths" % len(urls))
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            res = self._getSingleFileMetadata(url)
-
-            if not res["OK"]:
-                failed[url] = res["Message"]
-            else:
-                successful[url] = res["Value"]
-
-        return S_OK({"Failed": failed, "Successful": successful})
+        return self._executeForUrls(self._getSingleFileMetadata, urls)
 
     def _getSingleFileMetadata(self, path):
         """Fetch the metadata associated to the file
@@ -761,16 +808,29 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.prestageFile: Attempting to issue stage requests for %s file(s)." % len(urls))
 
-        failed = {}
-        successful = {}
-        for url in urls:
-            res = self._prestageSingleFile(url, lifetime)
+        if len(urls) > 1:
+            res = self._bringOnline(list(urls), lifetime, "Error occured while prestaging file")
+            if res is not None:
+                return res
+        return self._executeForUrls(self._prestageSingleFile, urls, lifetime)
 
-            if not res["OK"]:
-                failed[url] = res["Message"]
-            else:
-                successful[url] = res["Value"]
-        return S_OK({"Failed": failed, "Successful": successful})
+    def _bringOnline(self, urls, lifetime, errStr):
+        """Issue a single bring online request for several files
+
+        :param list urls: urls to be brought online
+        :param int lifetime: pinning lifetime in seconds
+        :param str errStr: error message for the failed urls
+
+        :return: S_OK( { "Failed" : { url : error message }, "Successful" : { url : token } } ),
+                 None if the gfal2 bindings have no bulk bring online
+        """
+
+        def bringOnline(surls):
+            errors, token = self.ctx.bring_online(surls, lifetime, self.stageTimeout, True)
+            # EAGAIN: the staging is pending
+            return errors, {None: token, errno.EAGAIN: token}
+
+        return self._executeBulk(bringOnline, urls, errStr)
 
     def _prestageSingleFile(self, path, lifetime):
         """Issue prestage for single file
@@ -814,16 +874,20 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.prestageFileStatus: Checking the staging status for %s file(s)." % len(urls))
 
-        failed = {}
-        successful = {}
-        for path, token in urls.items():
-
-            res = self._prestageSingleFileStatus(path, token)
-            if not res["OK"]:
-                failed[path] = res["Message"]
-            else:
-                successful[path] = res["Value"]
-        return S_OK({"Failed": failed, "Successful": successful})
+        if len(urls) > 1:
+            try:
+                self.ctx.set_opt_boolean("BDII", "ENABLE", True)
+                # EAGAIN: the file is not staged yet
+                res = self._executeBulkByToken(
+                    lambda surls, token: (self.ctx.bring_online_poll(surls, token), {None: True, errno.EAGAIN: False}),
+                    urls,
+                    "Error occured while polling for prestaging file",
+                )
+                if res is not None:
+                    return res
+            finally:
+                self.ctx.set_opt_boolean("BDII", "ENABLE", False)
+        return self._executeForUrls(self._prestageSingleFileStatus, urls, withTokens=True, concurrent=False)
 
     def _prestageSingleFileStatus(self, path, token):
         """Check prestage status for single file
@@ -889,15 +953,15 @@ class GFAL2_StorageBase(StorageBase):
         urls = res["Value"]
 
         self.log.debug("GFAL2_StorageBase.pinFile: Attempting to pin %s file(s)." % len(urls))
-        failed = {}
-        successful = {}
-        for url in urls:
-            res = self._pinSingleFile(url, lifetime)
-            if not res["OK"]:
-                failed[url] = res["Message"]
-            else:
-                successful[url] = res["Value"]
-        return S_OK({"Failed": failed, "Successful": successful})
+        if len(urls) > 1:
+            try:
+                self.ctx.set_opt_boolean("BDII", "ENABLE", True)
+                res = self._bringOnline(list(urls), lifetime, "Error occured while pinning file")
+                if res is not None:
+                    return res
+            finally:
+                self.ctx.set_opt_boolean("BDII", "ENABLE", False)
+        return self._executeForUrls(self._pinSingleFile, urls, lifetime, concurrent=False)
 
     def _pinSingleFile(self, path, lifetime):
         """Pin a single staged file
@@ -947,16 +1011,19 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.releaseFile: Attempting to release %s file(s)." % len(urls))
 
-        failed = {}
-        successful = {}
-        for path, token in urls.items():
-            res = self._releaseSingleFile(path, token)
-
-            if not res["OK"]:
-                failed[path] = res["Message"]
-            else:
-                successful[path] = res["Value"]
-        return S_OK({"Failed": failed, "Successful": successful})
+        if len(urls) > 1:
+            try:
+                self.ctx.set_opt_boolean("BDII", "ENABLE", True)
+                res = self._executeBulkByToken(
+                    lambda surls, token: (self.ctx.release(surls, token), {None: token}),
+                    urls,
+                    "Error occured while releasing file",
+                )
+                if res is not None:
+                    return res
+            finally:
+                self.ctx.set_opt_boolean("BDII", "ENABLE", False)
+        return self._executeForUrls(self._releaseSingleFile, urls, withTokens=True, concurrent=False)
 
     def _releaseSingleFile(self, path, token):
         """release a single pinned file
@@ -1149,18 +1216,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.isDirectory: checking whether %s path(s) are directory(ies)." % len(urls))
 
-        successful = {}
-        failed = {}
-
-        for url in urls:
-            res = self._isSingleDirectory(url)
-            if res["OK"]:
-                successful[url] = res["Value"]
-            else:
-                failed[url] = res["Message"]
-
-        resDict = {"Failed": failed, "Successful": successful}
-        return S_OK(resDict)
+        return self._executeForUrls(self._isSingleDirectory, urls)
 
     def _isSingleDirectory(self, path):
         """Checking if :path: exists and is a directory
@@ -1710,18 +1766,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.getDirectorySize: Attempting to get size of %s directories" % len(urls))
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            res = self._getSingleDirectorySize(url)
-
-            if not res["OK"]:
-                failed[url] = res["Message"]
-            else:
-                successful[url] = res["Value"]
-
-        return S_OK({"Failed": failed, "Successful": successful})
+        return self._executeForUrls(self._getSingleDirectorySize, urls)
 
     def _getSingleDirectorySize(self, path):
         """Get the size of the directory on the storage
@@ -1767,18 +1812,7 @@ class GFAL2_StorageBase(StorageBase):
 
         self.log.debug("GFAL2_StorageBase.getDirectoryMetadata: Attempting to fetch metadata.")
 
-        failed = {}
-        successful = {}
-
-        for url in urls:
-            res = self._getSingleDirectoryMetadata(url)
-
-            if not res["OK"]:
-                failed[url] = res["Message"]
-            else:
-                successful[url] = res["Value"]
-
-        return S_OK({"Failed": failed, "Successful": successful})
+        return self._executeForUrls(self._getSingleDirectoryMetadata, urls)
 
     def _getSingleDirectoryMetadata(self, path):
         """Fetch the metadata of the provided path
@@ -0,0 +1,116 @@
+""" Test the execution of the bulk methods of the gfal2 plugins
+"""
+import errno
+import sys
+import threading
+import time
+
+import pytest
+from mock import MagicMock
+
+sys.modules.setdefault("gfal2", MagicMock())
+
+from DIRAC.Resources.Storage import GFAL2_StorageBase as moduleTested
+from DIRAC.Resources.Storage.GFAL2_StorageBase import GFAL2_StorageBase
+
+
+class GError(Exception):
+    def __init__(self, code, message=""):
+        super(GError, self).__init__(message)
+        self.code = code
+        self.message = message
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setattr(moduleTested.gfal2, "GError", GError)
+
+    def getStorage(maxConcurrentOperations=1):
+        parameters = dict(
+            Protocol="protocol",
+            Path="/path",
+            Host="host",
+            Port="",
+            MaxConcurrentOperations=str(maxConcurrentOperations),
+        )
+        return GFAL2_StorageBase("storageName", parameters)
+
+    return getStorage
+
+
+@pytest.mark.parametrize("maxConcurrentOperations", [1, 4])
+def test_concurrentOperations(storage, maxConcurrentOperations):
+    resource = storage(maxConcurrentOperations)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def stat(path):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        if path.endswith("missing"):
+            raise GError(errno.ENOENT)
+        if path.endswith("error"):
+            raise GError(errno.EACCES, "Permission denied")
+        return MagicMock()
+
+    resource.ctx.stat.side_effect = stat
+    urls = ["protocol://host/path/file%d" % i for i in range(6)] + [
+        "protocol://host/path/missing",
+        "protocol://host/path/error",
+    ]
+    res = resource.exists(urls)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == dict(dict.fromkeys(urls[:6], True), **{urls[6]: False})
+    assert list(res["Value"]["Failed"]) == [urls[7]]
+    assert running[1] == maxConcurrentOperations
+
+
+def test_bulkStaging(storage):
+    resource = storage()
+    urls = ["srm://host/path/file%d" % i for i in range(3)]
+
+    resource.ctx.bring_online.return_value = ([None, GError(errno.EAGAIN), GError(errno.EACCES)], "token")
+    res = resource.prestageFile(urls)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == dict.fromkeys(urls[:2], "token")
+    assert list(res["Value"]["Failed"]) == [urls[2]]
+    resource.ctx.bring_online.assert_called_once_with(urls, 86400, resource.stageTimeout, True)
+
+    # One poll per token
+    polled = {}
+
+    def poll(surls, token):
+        polled[token] = surls
+        return [None if token == "token1" else GError(errno.EAGAIN) for _ in surls]
+
+    resource.ctx.bring_online_poll.side_effect = poll
+    res = resource.prestageFileStatus({urls[0]: "token1", urls[1]: "token1", urls[2]: 2})
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {urls[0]: True, urls[1]: True, urls[2]: False}
+    assert polled == {"token1": urls[:2], "2": urls[2:]}
+
+    # The whole request failed
+    resource.ctx.release.side_effect = GError(errno.ETIMEDOUT, "Timeout")
+    res = resource.releaseFile(dict.fromkeys(urls, "token"))
+    assert res["OK"], res
+    assert sorted(res["Value"]["Failed"]) == urls
+    resource.ctx.set_opt_boolean.assert_called_with("BDII", "ENABLE", False)
+
+
+def test_noBulkBindings(storage):
+    resource = storage()
+    urls = ["srm://host/path/file%d" % i for i in range(2)]
+
+    def bringOnline(path, *_args):
+        if not isinstance(path, str):
+            raise TypeError("Python argument types did not match C++ signature")
+        return 0, "token"
+
+    resource.ctx.bring_online.side_effect = bringOnline
+    res = resource.pinFile(urls)
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == dict.fromkeys(urls, "token")
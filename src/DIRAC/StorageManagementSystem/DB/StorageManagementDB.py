@@ -680,24 +680,20 @@ class StorageManagementDB(DB):
             if not res["OK"]:
                 return res
             existingReplicas = res["Value"]
+            for lfn in existingReplicas:
+                gLogger.verbose(
+                    "StorageManagementDB.setRequest: Replica already exists in CacheReplicas table %s @ %s" % (lfn, se)
+                )
             # Insert the CacheReplicas that do not already exist
+            newLfns = [lfn for lfn in lfns if lfn not in existingReplicas]
+            if newLfns:
+                res = self._insertReplicasInformation(newLfns, se, "Stage", connection=connection)
+                if not res["OK"]:
+                    self._cleanTask(taskID, connection=connection)
+                    return res
+                existingReplicas.update(res["Value"])
             for lfn in lfns:
-                if lfn in existingReplicas:
-                    gLogger.verbose(
-                        "StorageManagementDB.setRequest: Replica already exists in CacheReplicas table %s @ %s"
-                        % (lfn, se)
-                    )
-                    existingFileState = existingReplicas[lfn][1]
-                    taskState = self.__getTaskStateFromReplicaState(existingFileState)
-                else:
-                    res = self._insertReplicaInformation(lfn, se, "Stage", connection=connection)
-                    if not res["OK"]:
-                        self._cleanTask(taskID, connection=connection)
-                        return res
-
-                    existingReplicas[lfn] = (res["Value"], "New")
-                    newFileState = existingReplicas[lfn][1]
-                    taskState = self.__getTaskStateFromReplicaState(newFileState)
+                taskState = self.__getTaskStateFromReplicaState(existingReplicas[lfn][1])
                 if taskState not in taskStates:
                     taskStates.append(taskState)
 
@@ -765,44 +761,39 @@ class StorageManagementDB(DB):
             existingReplicas[lfn] = (replicaID, status)
         return S_OK(existingReplicas)
 
-    def _insertReplicaInformation(self, lfn, storageElement, rType, connection=False):
-        """Enter the replica into the CacheReplicas table"""
+    def _insertReplicasInformation(self, lfns, storageElement, rType, connection=False):
+        """Enter several replicas of a storage element into the CacheReplicas table
+
+        :return: S_OK( { lfn: (replicaID, status) } )
+        """
         connection = self.__getConnection(connection)
-        req = (
-            "INSERT INTO CacheReplicas (Type,SE,LFN,PFN,Size,FileChecksum,GUID,SubmitTime,LastUpdate) VALUES ('%s','%s','%s','',0,'','',UTC_TIMESTAMP(),UTC_TIMESTAMP());"
-            % (rType, storageElement, lfn)
+        res = self.insertMany(
+            "CacheReplicas",
+            ["Type", "SE", "LFN", "PFN", "Size", "FileChecksum", "GUID", "SubmitTime", "LastUpdate"],
+            [(rType, storageElement, lfn, "", 0, "", "", "UTC_TIMESTAMP()", "UTC_TIMESTAMP()") for lfn in lfns],
+            conn=connection,
         )
-        res = self._update(req, connection)
         if not res["OK"]:
-            gLogger.error("_insertReplicaInformation: Failed to insert to CacheReplicas table.", res["Message"])
+            gLogger.error("_insertReplicasInformation: Failed to insert to CacheReplicas table.", res["Message"])
             return res
-        # gLogger.info( "%s_DB:%s" % ('_insertReplicaInformation',req))
-
-        replicaID = res["lastRowId"]
-        reqSelect = "SELECT * FROM CacheReplicas WHERE ReplicaID = %s;" % (replicaID)
-        resSelect = self._query(reqSelect, connection)
-        if not resSelect["OK"]:
-            gLogger.warn(
-                "%s.%s_DB: problem retrieving record: %s. %s"
-                % (self._caller(), "_insertReplicaInformation", reqSelect, resSelect["Message"])
-            )
-        else:
-            gLogger.verbose(
-                "%s.%s_DB: inserted CacheReplicas = %s"
-                % (self._caller(), "_insertReplicaInformation", resSelect["Value"][0])
-            )
-        # gLogger.verbose("_insertReplicaInformation: Inserted Replica ('%s','%s') and obtained ReplicaID %s" % (lfn,storageElement,replicaID))
-        return S_OK(replicaID)
+        # The IDs of a multi-rows insertion are not necessarily consecutive, get them back
+        res = self._getExistingReplicas(storageElement, lfns, connection=connection)
+        if not res["OK"]:
+            return res
+        gLogger.verbose(
+            "%s.%s_DB: inserted CacheReplicas = %s" % (self._caller(), "_insertReplicasInformation", res["Value"])
+        )
+        return res
 
     def _insertTaskReplicaInformation(self, taskID, replicaIDs, connection=False):
         """Enter the replicas into TaskReplicas table"""
         connection = self.__getConnection(connection)
-        req = "INSERT INTO TaskReplicas (TaskID,ReplicaID) VALUES "
-        for replicaID, _status in replicaIDs:
-            replicaString = "(%s,%s)," % (taskID, replicaID)
-            req = "%s %s" % (req, replicaString)
-        req = req.rstrip(",")
-        res = self._update(req, connection)
+        res = self.insertMany(
+            "TaskReplicas",
+            ["TaskID", "ReplicaID"],
+            [(taskID, replicaID) for replicaID, _status in replicaIDs],
+            conn=connection,
+        )
         if not res["OK"]:
             gLogger.error(
                 "StorageManagementDB._insertTaskReplicaInformation: Failed to insert to TaskReplicas table.",
@@ -951,52 +942,37 @@ class StorageManagementDB(DB):
 
     def updateReplicaInformation(self, replicaTuples):
         """This method set the replica size information and pfn for the requested storage element."""
-        for replicaID, pfn, size in replicaTuples:
-            # reqSelect = "SELECT * FROM CacheReplicas WHERE ReplicaID = %s and Status != 'Cancelled';" % ( replicaID )
-            reqSelect = "SELECT ReplicaID FROM CacheReplicas WHERE ReplicaID = %s and Status != 'Cancelled';" % (
-                replicaID
-            )
-            resSelect = self._query(reqSelect)
-            if not resSelect["OK"]:
-                gLogger.warn(
-                    "%s.%s_DB: problem retrieving record: %s. %s"
-                    % (self._caller(), "updateReplicaInformation", reqSelect, resSelect["Message"])
-                )
+        if not replicaTuples:
+            return S_OK()
+        replicaIDs = [replicaID for replicaID, _pfn, _size in replicaTuples]
+        res = self.updateMany(
+            "CacheReplicas",
+            ["ReplicaID"],
+            ["PFN", "Size", "Status"],
+            [(replicaID, pfn, size, "Waiting") for replicaID, pfn, size in replicaTuples],
+            extraCondition="`Status` != 'Cancelled'",
+        )
+        if not res["OK"]:
+            gLogger.error("StagerDB.updateReplicaInformation: Failed to insert replica information.", res["Message"])
+            return S_OK()
 
-            req = (
-                "UPDATE CacheReplicas SET PFN = '%s', Size = %s, Status = 'Waiting' WHERE ReplicaID = %s and Status != 'Cancelled';"
-                % (pfn, size, replicaID)
+        reqSelect = "SELECT * FROM CacheReplicas WHERE ReplicaID IN (%s);" % intListToString(replicaIDs)
+        resSelect = self._query(reqSelect)
+        if not resSelect["OK"]:
+            gLogger.warn(
+                "%s.%s_DB: problem retrieving record: %s. %s"
+                % (self._caller(), "updateReplicaInformation", reqSelect, resSelect["Message"])
             )
-            res = self._update(req)
-            if not res["OK"]:
-                gLogger.error(
-                    "StagerDB.updateReplicaInformation: Failed to insert replica information.", res["Message"]
-                )
-
-            replicaIDs = []
+        else:
             for record in resSelect["Value"]:
-                replicaIDs.append(record[0])
                 gLogger.verbose(
-                    "%s.%s_DB: to_update CacheReplicas =  %s" % (self._caller(), "updateReplicaInformation", record)
+                    "%s.%s_DB: updated CacheReplicas = %s" % (self._caller(), "updateReplicaInformation", record)
                 )
 
-            reqSelect1 = "SELECT * FROM CacheReplicas WHERE ReplicaID IN (%s);" % intListToString(replicaIDs)
-            resSelect1 = self._query(reqSelect1)
-            if not resSelect1["OK"]:
-                gLogger.warn(
-                    "%s.%s_DB: problem retrieving record: %s. %s"
-                    % (self._caller(), "updateReplicaInformation", reqSelect1, resSelect1["Message"])
-                )
-            else:
-                for record in resSelect1["Value"]:
-                    gLogger.verbose(
-                        "%s.%s_DB: updated CacheReplicas = %s" % (self._caller(), "updateReplicaInformation", record)
-                    )
-
-            gLogger.debug(
-                "StagerDB.updateReplicaInformation: Successfully updated CacheReplicas record With Status=Waiting, for ReplicaID= %s"
-                % (replicaID)
-            )
+        gLogger.debug(
+            "StagerDB.updateReplicaInformation: Successfully updated %s CacheReplicas records With Status=Waiting"
+            % res["Value"]
+        )
         return S_OK()
 
     ####################################################################
@@ -1020,44 +996,42 @@ class StorageManagementDB(DB):
         return S_OK(storageRequests)
 
     def insertStageRequest(self, requestDict, pinLifeTime):
-        req = "INSERT INTO StageRequests (ReplicaID,RequestID,StageRequestSubmitTime,PinLength) VALUES "
-        for requestID, replicaIDs in requestDict.items():
-            for replicaID in replicaIDs:
-                replicaString = "(%s,'%s',UTC_TIMESTAMP(),%d)," % (replicaID, requestID, pinLifeTime)
-                req = "%s %s" % (req, replicaString)
-        req = req.rstrip(",")
-        res = self._update(req)
+        res = self.insertMany(
+            "StageRequests",
+            ["ReplicaID", "RequestID", "StageRequestSubmitTime", "PinLength"],
+            [
+                (replicaID, str(requestID), "UTC_TIMESTAMP()", int(pinLifeTime))
+                for requestID, replicaIDs in requestDict.items()
+                for replicaID in replicaIDs
+            ],
+        )
         if not res["OK"]:
             gLogger.error(
                 "StorageManagementDB.insertStageRequest: Failed to insert to StageRequests table.", res["Message"]
             )
             return res
 
-        for requestID, replicaIDs in requestDict.items():
-            for replicaID in replicaIDs:
-                # fix, no individual queries
-                reqSelect = "SELECT * FROM StageRequests WHERE ReplicaID = %s AND RequestID = '%s';" % (
-                    replicaID,
-                    requestID,
+        reqSelect = "SELECT * FROM StageRequests WHERE RequestID IN (%s);" % stringListToString(
+            [str(requestID) for requestID in requestDict]
+        )
+        resSelect = self._query(reqSelect)
+        if not resSelect["OK"]:
+            gLogger.warn(
+                "%s.%s_DB: problem retrieving record: %s. %s"
+                % (self._caller(), "insertStageRequest", reqSelect, resSelect["Message"])
+            )
+        else:
+            for record in resSelect["Value"]:
+                gLogger.verbose(
+                    "%s.%s_DB: inserted StageRequests = %s" % (self._caller(), "insertStageRequest", record)
                 )
-                resSelect = self._query(reqSelect)
-                if not resSelect["OK"]:
-                    gLogger.warn(
-                        "%s.%s_DB: problem retrieving record: %s. %s"
-                        % (self._caller(), "insertStageRequest", reqSelect, resSelect["Message"])
-                    )
-                else:
-                    gLogger.verbose(
-                        "%s.%s_DB: inserted StageRequests = %s"
-                        % (self._caller(), "insertStageRequest", resSelect["Value"][0])
-                    )
 
         # gLogger.info( "%s_DB: howmany = %s" % ('insertStageRequest',res))
 
         # gLogger.info( "%s_DB:%s" % ('insertStageRequest',req))
         gLogger.debug(
-            "StorageManagementDB.insertStageRequest: Successfully added %s StageRequests with RequestID %s."
-            % (res["Value"], requestID)
+            "StorageManagementDB.insertStageRequest: Successfully added %s StageRequests with RequestIDs %s."
+            % (res["Value"], ", ".join(str(requestID) for requestID in requestDict))
         )
         return S_OK()
 
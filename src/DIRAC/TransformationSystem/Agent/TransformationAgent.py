@@ -11,21 +11,19 @@ The following options can be set for the TransformationAgent.
 import time
 import os
 import datetime
-import pickle
 import concurrent.futures
 
 from DIRAC import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Base.AgentModule import AgentModule
-from DIRAC.Core.Utilities.ThreadSafe import Synchronizer
 from DIRAC.Core.Utilities.List import breakListIntoChunks, randomize
 from DIRAC.DataManagementSystem.Client.DataManager import DataManager
 from DIRAC.TransformationSystem.Client import TransformationFilesStatus
 from DIRAC.TransformationSystem.Client.TransformationClient import TransformationClient
 from DIRAC.TransformationSystem.Agent.TransformationAgentsUtilities import TransformationAgentsUtilities
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
 
 AGENT_NAME = "Transformation/TransformationAgent"
-gSynchro = Synchronizer()
 
 
 class TransformationAgent(AgentModule, TransformationAgentsUtilities):
@@ -54,8 +52,8 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         # Validity of the cache
         self.replicaCache = None
         self.replicaCacheValidity = None
-        self.writingCache = False
-        self.removedFromCache = 0
+        # Transformations whose cached replicas are to be refreshed
+        self.invalidatedCaches = set()
 
         self.noUnusedDelay = 0
         self.unusedFiles = {}
@@ -85,17 +83,17 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         # clients
         self.transfClient = TransformationClient()
 
-        # for caching using a pickle file
+        # for caching using an SQLite file
         self.workDirectory = self.am_getWorkDirectory()
-        self.cacheFile = os.path.join(self.workDirectory, "ReplicaCache.pkl")
+        self.cacheFile = os.path.join(self.workDirectory, "ReplicaCache.db")
         self.controlDirectory = self.am_getControlDirectory()
 
         # remember the offset if any in TS
         self.lastFileOffset = {}
 
         # Validity of the cache
-        self.replicaCache = {}
         self.replicaCacheValidity = self.am_getOption("ReplicaCacheValidity", 2)
+        self.replicaCache = ReplicaCache(self.cacheFile, self.replicaCacheValidity)
 
         self.noUnusedDelay = self.am_getOption("NoUnusedDelay", 6)
 
@@ -115,7 +113,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         self._logInfo("Wait for threads to get empty before terminating the agent", method=method)
         self.threadPoolExecutor.shutdown()
         self._logInfo("Threads are empty, terminating the agent...", method=method)
-        self.__writeCache()
+        self.replicaCache.close()
         return S_OK()
 
     def execute(self):
@@ -125,6 +123,9 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         if not res["OK"]:
             self._logError("Failed to obtain transformations:", res["Message"])
             return S_OK()
+        removed = self.replicaCache.purge()
+        if removed:
+            self._logInfo("Removed %d expired replicas from cache" % removed, method="execute")
         # Process the transformations
         count = 0
         future_to_transID = {}
@@ -238,8 +239,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
         if not transFiles["Value"]:
             return S_OK()
 
-        if transID not in self.replicaCache:
-            self.__readCache(transID)
         transFiles = transFiles["Value"]
         unusedLfns = [f["LFN"] for f in transFiles]
         unusedFiles = len(unusedLfns)
@@ -450,30 +449,24 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                 os.remove(clearCacheFile)
         except Exception:
             pass
+        if transID in self.invalidatedCaches:
+            self.invalidatedCaches.discard(transID)
+            clearCache = True
         if clearCache or transDict["Status"] == "Flush":
-            self._logInfo("Replica cache cleared", method=method, transID=transID)
             # We may need to get new replicas
-            self.__clearCacheForTrans(transID)
-        else:
-            # If the cache needs to be cleaned
-            self.__cleanCache(transID)
+            removed = self.replicaCache.remove(lfns)
+            self._logInfo("Replica cache cleared (%d replicas)" % removed, method=method, transID=transID)
         startTime = time.time()
-        dataReplicas = {}
         nLfns = len(lfns)
         self._logVerbose("Getting replicas for %d files" % nLfns, method=method, transID=transID)
-        cachedReplicaSets = self.replicaCache.get(transID, {})
-        cachedReplicas = {}
-        # Merge all sets of replicas
-        for replicas in cachedReplicaSets.values():
-            cachedReplicas.update(replicas)
-        self._logInfo("Number of cached replicas: %d" % len(cachedReplicas), method=method, transID=transID)
-        setCached = set(cachedReplicas)
-        setLfns = set(lfns)
-        for lfn in setLfns & setCached:
-            dataReplicas[lfn] = cachedReplicas[lfn]
-        newLFNs = setLfns - setCached
+        self._logInfo("Number of cached replicas: %d" % len(self.replicaCache), method=method, transID=transID)
+        dataReplicas = self.replicaCache.get(lfns, forJobs=forJobs, transID=transID)
+        newLFNs = set(lfns) - set(dataReplicas)
+        hitRate = self.replicaCache.getStatistics()[transID]["HitRate"]
         self._logInfo(
-            "ReplicaCache hit for %d out of %d LFNs" % (len(dataReplicas), nLfns), method=method, transID=transID
+            "ReplicaCache hit for %d out of %d LFNs (%.1f%% since start)" % (len(dataReplicas), nLfns, 100 * hitRate),
+            method=method,
+            transID=transID,
         )
         if newLFNs:
             startTime = time.time()
@@ -484,7 +477,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                 if res["OK"]:
                     reps = dict((lfn, ses) for lfn, ses in res["Value"].items() if ses)
                     newReplicas.update(reps)
-                    self.__updateCache(transID, reps)
+                    self.replicaCache.update(reps, forJobs=forJobs)
                 else:
                     self._logWarn(
                         "Failed to get replicas for %d files" % len(chunk),
@@ -500,7 +493,6 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
             )
             dataReplicas.update(newReplicas)
             noReplicas = newLFNs - set(dataReplicas)
-            self.__writeCache(transID)
             if noReplicas:
                 self._logWarn(
                     "Found %d files without replicas (or only in Failover)" % len(noReplicas),
@@ -579,124 +571,10 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
                     )
         return S_OK(dataReplicas)
 
-    def __updateCache(self, transID, newReplicas):
-        """Add replicas to the cache"""
-        self.replicaCache.setdefault(transID, {})[datetime.datetime.utcnow()] = newReplicas
-
-    def __clearCacheForTrans(self, transID):
-        """Remove all replicas for a transformation"""
-        self.replicaCache.pop(transID, None)
-
-    def __cleanReplicas(self, transID, lfns):
-        """Remove cached replicas that are not in a list"""
-        cachedReplicas = set()
-        for replicas in self.replicaCache.get(transID, {}).values():
-            cachedReplicas.update(replicas)
-        toRemove = cachedReplicas - set(lfns)
-        if toRemove:
-            self._logInfo("Remove %d files from cache" % len(toRemove), method="__cleanReplicas", transID=transID)
-            self.__removeFromCache(transID, toRemove)
-
-    def __cleanCache(self, transID):
-        """Cleans the cache"""
-        try:
-            if transID in self.replicaCache:
-                timeLimit = datetime.datetime.utcnow() - datetime.timedelta(days=self.replicaCacheValidity)
-                for updateTime in set(self.replicaCache[transID]):
-                    nCache = len(self.replicaCache[transID][updateTime])
-                    if updateTime < timeLimit or not nCache:
-                        self._logInfo(
-                            "Clear %s replicas for transformation %s, time %s"
-                            % ("%d cached" % nCache if nCache else "empty cache", str(transID), str(updateTime)),
-                            transID=transID,
-                            method="__cleanCache",
-                        )
-                        del self.replicaCache[transID][updateTime]
-                # Remove empty transformations
-                if not self.replicaCache[transID]:
-                    del self.replicaCache[transID]
-        except Exception as x:
-            self._logException("Exception when cleaning replica cache:", lException=x)
-
     def __removeFilesFromCache(self, transID, lfns):
-        removed = self.__removeFromCache(transID, lfns)
+        removed = self.replicaCache.remove(lfns)
         if removed:
             self._logInfo("Removed %d replicas from cache" % removed, method="__removeFilesFromCache", transID=transID)
-            self.__writeCache(transID)
-
-    def __removeFromCache(self, transID, lfns):
-        if transID not in self.replicaCache:
-            return
-        removed = 0
-        if self.replicaCache[transID] and lfns:
-            for lfn in lfns:
-                for timeKey in self.replicaCache[transID]:
-                    if self.replicaCache[transID][timeKey].pop(lfn, None):
-                        removed += 1
-        return removed
-
-    def __cacheFile(self, transID):
-        return self.cacheFile.replace(".pkl", "_%s.pkl" % str(transID))
-
-    @gSynchro
-    def __readCache(self, transID):
-        """Reads from the cache"""
-        if transID in self.replicaCache:
-            return
-        try:
-            method = "__readCache"
-            fileName = self.__cacheFile(transID)
-            if not os.path.exists(fileName):
-                self.replicaCache[transID] = {}
-            else:
-                with open(fileName, "rb") as cacheFile:
-                    self.replicaCache[transID] = pickle.load(cacheFile)
-                self._logInfo(
-                    "Successfully loaded replica cache from file %s (%d files)"
-                    % (fileName, self.__filesInCache(transID)),
-                    method=method,
-                    transID=transID,
-                )
-        except Exception as x:
-            self._logException(
-                "Failed to load replica cache from file %s" % fileName, lException=x, method=method, transID=transID
-            )
-            self.replicaCache[transID] = {}
-
-    def __filesInCache(self, transID):
-        cache = self.replicaCache.get(transID, {})
-        return sum(len(lfns) for lfns in cache.values())
-
-    @gSynchro
-    def __writeCache(self, transID=None):
-        """Writes the cache"""
-        method = "__writeCache"
-        try:
-            startTime = time.time()
-            transList = [transID] if transID else set(self.replicaCache)
-            filesInCache = 0
-            nCache = 0
-            for t_id in transList:
-                # Protect the copy of the cache
-                filesInCache += self.__filesInCache(t_id)
-                # write to a temporary file in order to avoid corrupted files
-                cacheFile = self.__cacheFile(t_id)
-                tmpFile = cacheFile + ".tmp"
-                with open(tmpFile, "wb") as fd:
-                    pickle.dump(self.replicaCache.get(t_id, {}), fd)
-                # Now rename the file as it shold
-                os.rename(tmpFile, cacheFile)
-                nCache += 1
-            self._logInfo(
-                "Successfully wrote %d replica cache file(s) (%d files) in %.1f seconds"
-                % (nCache, filesInCache, time.time() - startTime),
-                method=method,
-                transID=transID if transID else None,
-            )
-        except Exception as x:
-            self._logException(
-                "Could not write replica cache file %s" % cacheFile, lException=x, method=method, transID=t_id
-            )
 
     def __generatePluginObject(self, plugin, clients):
         """This simply instantiates the TransformationPlugin class with the relevant plugin name"""
@@ -721,12 +599,7 @@ class TransformationAgent(AgentModule, TransformationAgentsUtilities):
     def pluginCallback(self, transID, invalidateCache=False):
         """Standard plugin callback"""
         if invalidateCache:
-            try:
-                if transID in self.replicaCache:
-                    self._logInfo(
-                        "Removed cached replicas for transformation", method="pluginCallBack", transID=transID
-                    )
-                    self.replicaCache.pop(transID)
-                    self.__writeCache(transID)
-            except Exception:
-                pass
+            self._logInfo(
+                "Cached replicas of the transformation will be refreshed", method="pluginCallBack", transID=transID
+            )
+            self.invalidatedCaches.add(transID)
@@ -21,9 +21,13 @@ from DIRAC.Core.Utilities.List import stringListToString, intListToString, break
 from DIRAC.Core.Utilities.Shifter import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Utilities.Subprocess import pythonCall
-from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaQueryIndex import MetaQueryIndex
 
 MAX_ERROR_COUNT = 10
+# Status of the transformations to which the files are added according to their metadata
+FILTER_TRANSFORMATION_STATUSES = ["New", "Active", "Stopped", "Flush", "Completing"]
+# Seconds after which the metadata types and the status of the transformations of the filter queries are refreshed
+FILTER_INDEX_LIFETIME = 60
 
 #############################################################################
 
@@ -111,6 +115,10 @@ class TransformationDB(DB):
 
         # Intialize filter Queries with Input Meta Queries
         self.filterQueries = []
+        # Status of the transformations of the filter queries, and the index compiled from them
+        self.filterStatus = {}
+        self.filterIndex = None
+        self.filterIndexTime = 0
         res = self.__updateFilterQueries()
         if not res["OK"]:
             gLogger.fatal("Failed to create filter queries")
@@ -209,6 +217,8 @@ class TransformationDB(DB):
         # If the transformation has an input data specification
         if inputMetaQuery:
             self.filterQueries.append((transID, inputMetaQuery))
+            self.filterStatus[str(transID)] = "New"
+            self.filterIndex = None
 
         if inheritedFrom:
             res = self._getTransformationID(inheritedFrom, connection=connection)
@@ -441,23 +451,62 @@ class TransformationDB(DB):
     def __updateFilterQueries(self, connection=False):
         """Get filters for all defined input streams in all the transformations."""
         resultList = []
-        res = self.getTransformations(
-            condDict={"Status": ["New", "Active", "Stopped", "Flush", "Completing"]}, connection=connection
-        )
+        res = self.getTransformations(condDict={"Status": FILTER_TRANSFORMATION_STATUSES}, connection=connection)
         if not res["OK"]:
             return res
 
         transIDs = res["Value"]
+        statusDict = {}
         for transDict in transIDs:
             transID = str(transDict["TransformationID"])
             res = self.getTransformationMetaQuery(transID, "Input")
             if not res["OK"]:
                 continue
             resultList.append((transID, res["Value"]))
+            statusDict[transID] = transDict["Status"]
 
         self.filterQueries = resultList
+        self.filterStatus = statusDict
+        self.filterIndex = None
         return S_OK(resultList)
 
+    def __getFilterIndex(self, connection=False):
+        """Get the index of the filter queries, compiled again when they changed or when it is too old
+
+        The metadata types of the catalog and the status of the transformations are refreshed at the same time,
+        as other service instances may have changed them.
+        """
+        if self.filterIndex is not None and time.time() - self.filterIndexTime < FILTER_INDEX_LIFETIME:
+            return S_OK(self.filterIndex)
+
+        res = FileCatalog().getMetadataFields()
+        if not res["OK"]:
+            gLogger.error("Error in getMetadataFields: %s" % res["Message"])
+            return res
+        if not res["Value"]:
+            gLogger.error("Error: no metadata fields defined")
+            return res
+        typeDict = res["Value"]["FileMetaFields"]
+        typeDict.update(res["Value"]["DirectoryMetaFields"])
+
+        queries = [(str(transID), query) for transID, query in self.filterQueries]
+        transIDs = [int(transID) for transID, _query in queries]
+        if transIDs:
+            res = self.getTransformations(
+                condDict={"TransformationID": transIDs}, columns=["TransformationID", "Status"], connection=connection
+            )
+            if not res["OK"]:
+                return res
+            self.filterStatus = {str(transDict["TransformationID"]): transDict["Status"] for transDict in res["Value"]}
+
+        filterIndex = self.filterIndex
+        if filterIndex is None or filterIndex.typeDict != typeDict:
+            filterIndex = MetaQueryIndex(queries, typeDict)
+            gLogger.verbose("Compiled the filter queries", "of %d transformations" % len(queries))
+        self.filterIndex = filterIndex
+        self.filterIndexTime = time.time()
+        return S_OK(filterIndex)
+
     ###########################################################################
     #
     # These methods manipulate the AdditionalParameters tables
@@ -472,6 +521,8 @@ class TransformationDB(DB):
         message = ""
         if paramName in self.TRANSPARAMS:
             res = self.__updateTransformationParameter(transID, paramName, paramValue, connection=connection)
+            if res["OK"] and paramName == "Status" and str(transID) in self.filterStatus:
+                self.filterStatus[str(transID)] = paramValue
             if res["OK"]:
                 pv = self._escapeString(paramValue)
                 if not pv["OK"]:
@@ -750,11 +801,12 @@ class TransformationDB(DB):
             fileIDs.remove(tupleIn[0])
         if not fileIDs:
             return S_OK([])
-        req = "INSERT INTO TransformationFiles (TransformationID,FileID,LastUpdate,InsertedTime) VALUES"
-        for fileID in fileIDs:
-            req = "%s (%d,%d,UTC_TIMESTAMP(),UTC_TIMESTAMP())," % (req, transID, fileID)
-        req = req.rstrip(",")
-        res = self._update(req, connection)
+        res = self.insertMany(
+            "TransformationFiles",
+            ["TransformationID", "FileID", "LastUpdate", "InsertedTime"],
+            [(transID, fileID, "UTC_TIMESTAMP()", "UTC_TIMESTAMP()") for fileID in fileIDs],
+            conn=connection,
+        )
         if not res["OK"]:
             return res
         return S_OK(fileIDs)
@@ -763,43 +815,28 @@ class TransformationDB(DB):
         """Inserting already transformation files in TransformationFiles table (e.g. for deriving transformations)"""
         gLogger.info("Inserting %d files in TransformationFiles" % len(fileTuplesList))
 
-        # splitting in various chunks, in case it is too big
-        for fileTuples in breakListIntoChunks(fileTuplesList, 10000):
-
-            gLogger.verbose(
-                "Adding first %d files in TransformationFiles (out of %d)" % (len(fileTuples), len(fileTuplesList))
-            )
-            req = "INSERT INTO TransformationFiles (TransformationID,Status,TaskID,FileID,TargetSE,UsedSE,LastUpdate) VALUES"
-            candidates = False
-
-            for ft in fileTuples:
-                _lfn, originalID, fileID, status, taskID, targetSE, usedSE, _errorCount, _lastUpdate, _insertTime = ft[
-                    :10
-                ]
-                if status not in ("Removed",):
-                    candidates = True
-                    if not re.search("-", status):
-                        status = "%s-inherited" % status
-                        if taskID:
-                            # Should be readable up to 999,999 tasks: that field is an int(11) in the DB, not a string
-                            taskID = 1000000 * int(originalID) + int(taskID)
-                    req = "%s (%d,'%s','%d',%d,'%s','%s',UTC_TIMESTAMP())," % (
-                        req,
-                        transID,
-                        status,
-                        taskID,
-                        fileID,
-                        targetSE,
-                        usedSE,
-                    )
-            if not candidates:
-                continue
-
-            req = req.rstrip(",")
-            res = self._update(req, connection)
-            if not res["OK"]:
-                return res
+        rows = []
+        for ft in fileTuplesList:
+            _lfn, originalID, fileID, status, taskID, targetSE, usedSE, _errorCount, _lastUpdate, _insertTime = ft[:10]
+            if status not in ("Removed",):
+                if not re.search("-", status):
+                    status = "%s-inherited" % status
+                    if taskID:
+                        # Should be readable up to 999,999 tasks: that field is an int(11) in the DB, not a string
+                        taskID = 1000000 * int(originalID) + int(taskID)
+                rows.append((transID, status, int(taskID or 0), fileID, targetSE, usedSE, "UTC_TIMESTAMP()"))
+        if not rows:
+            return S_OK()
 
+        # The rows are inserted in as many statements as needed
+        res = self.insertMany(
+            "TransformationFiles",
+            ["TransformationID", "Status", "TaskID", "FileID", "TargetSE", "UsedSE", "LastUpdate"],
+            rows,
+            conn=connection,
+        )
+        if not res["OK"]:
+            return res
         return S_OK()
 
     def __assignTransformationFile(self, transID, taskID, se, fileIDs, connection=False):
@@ -814,11 +851,12 @@ class TransformationDB(DB):
         res = self._update(req, connection)
         if not res["OK"]:
             gLogger.error("Failed to assign file to task", res["Message"])
-        fileTuples = []
-        for fileID in fileIDs:
-            fileTuples.append(("(%d,%d,%d)" % (transID, fileID, taskID)))
-        req = "INSERT INTO TransformationFileTasks (TransformationID,FileID,TaskID) VALUES %s" % ",".join(fileTuples)
-        res = self._update(req, connection)
+        res = self.insertMany(
+            "TransformationFileTasks",
+            ["TransformationID", "FileID", "TaskID"],
+            [(transID, fileID, taskID) for fileID in fileIDs],
+            conn=connection,
+        )
         if not res["OK"]:
             gLogger.error("Failed to assign file to task", res["Message"])
         return res
@@ -1363,12 +1401,20 @@ class TransformationDB(DB):
             return res
         # Insert only files not found, and assume the LFN is unique in the table
         lfnFileIDs = res["Value"][1]
-        for lfn in set(lfns) - set(lfnFileIDs):
-            req = "INSERT INTO DataFiles (LFN,Status) VALUES ('%s','New');" % lfn
-            res = self._update(req, connection)
-            # If the LFN is duplicate we get an error and ignore it
-            if res["OK"]:
-                lfnFileIDs[lfn] = res["lastRowId"]
+        newLfns = list(set(lfns) - set(lfnFileIDs))
+        if not newLfns:
+            return S_OK(lfnFileIDs)
+        # If the LFN is duplicate (inserted meanwhile) it is ignored
+        res = self.insertMany(
+            "DataFiles", ["LFN", "Status"], [(lfn, "New") for lfn in newLfns], ignore=True, conn=connection
+        )
+        if not res["OK"]:
+            return res
+        # The IDs of a multi-rows insertion are not necessarily consecutive, get them back
+        res = self.__getFileIDsForLfns(newLfns, connection=connection)
+        if not res["OK"]:
+            return res
+        lfnFileIDs.update(res["Value"][1])
         return S_OK(lfnFileIDs)
 
     def __setDataFileStatus(self, fileIDs, status, connection=False):
@@ -1610,17 +1656,14 @@ class TransformationDB(DB):
                         transFiles[trans] = []
                     transFiles[trans].append(lfn)
 
-            # Add the files to the transformations
-            gLogger.info("Files to add to transformations:", filesToAdd)
-            if filesToAdd:
-                for transID, lfns in transFiles.items():
-                    res = self.addFilesToTransformation(transID, lfns)
-                    if not res["OK"]:
-                        gLogger.error("Failed to add files to transformation", "%s %s" % (transID, res["Message"]))
-                        return res
-                    else:
-                        for lfn in lfns:
-                            successful[lfn] = True
+        # Add the files to the transformations
+        gLogger.info("Files to add to transformations:", filesToAdd)
+        res = self.__addFilesToTransformations(transFiles, connection=connection)
+        if not res["OK"]:
+            return res
+        for lfns in transFiles.values():
+            for lfn in lfns:
+                successful[lfn] = True
 
         res = S_OK({"Successful": successful, "Failed": failed})
         return res
@@ -1694,96 +1737,141 @@ class TransformationDB(DB):
         if the the updated metadata dictionary passes the filter.
         """
         gLogger.info("setMetadata: Attempting to set metadata %s to: %s" % (usermetadatadict, path))
+        res = self.setMetadataBulk({path: usermetadatadict})
+        if not res["OK"]:
+            return res
+        if path in res["Value"]["Failed"]:
+            return S_ERROR(res["Value"]["Failed"][path])
+        return S_OK()
+
+    def setMetadataBulk(self, pathMetadataDict):
+        """
+        Same as setMetadata for many paths: the paths are checked in the catalog in bulk,
+        and the files passing the filters are added to each of the Transformations at once.
+
+        :param dict pathMetadataDict: { path : metadata dictionary }
+        :return: S_OK with Successful { path : list of transformations passing the filter } / Failed { path : error }
+        """
+        gLogger.info("setMetadataBulk: Attempting to set metadata to %d paths" % len(pathMetadataDict))
+        successful = {}
+        failed = {}
+        # Files to add, by transformation
         transFiles = {}
-        filesToAdd = []
+        if not pathMetadataDict:
+            return S_OK({"Successful": successful, "Failed": failed})
 
         catalog = FileCatalog()
-        res = catalog.isFile(path)
-        if res["OK"]:
-            isFile = res["Value"]["Successful"][path]
-        else:
-            gLogger.error("Failed isFile %s: %s" % (path, res["Message"]))
-            return res
-        res = catalog.isDirectory(path)
-        if res["OK"]:
-            isDirectory = res["Value"]["Successful"][path]
-        else:
-            gLogger.error("Failed isDirectory %s: %s" % (path, res["Message"]))
+        paths = list(pathMetadataDict)
+        res = catalog.isFile(paths)
+        if not res["OK"]:
+            gLogger.error("Failed isFile", res["Message"])
             return res
+        isFile = res["Value"]["Successful"]
+        failed.update(res["Value"]["Failed"])
+        isDirectory = {}
+        otherPaths = [path for path in paths if not isFile.get(path) and path not in failed]
+        if otherPaths:
+            res = catalog.isDirectory(otherPaths)
+            if not res["OK"]:
+                gLogger.error("Failed isDirectory", res["Message"])
+                return res
+            isDirectory = res["Value"]["Successful"]
+            failed.update(res["Value"]["Failed"])
 
-        if isFile:
-            res = catalog.getFileUserMetadata(path)
-        elif isDirectory:
-            res = catalog.getDirectoryUserMetadata(path)
+        for path in paths:
+            if path in failed:
+                continue
+            if isFile.get(path):
+                res = catalog.getFileUserMetadata(path)
+            elif isDirectory.get(path):
+                res = catalog.getDirectoryUserMetadata(path)
+            else:
+                failed[path] = "No such file or directory"
+                continue
+            if not res["OK"]:
+                gLogger.error("Failed to get User Metadata %s: %s" % (path, res["Message"]))
+                failed[path] = res["Message"]
+                continue
+            metadatadict = res["Value"]
+            metadatadict.update(pathMetadataDict[path])
 
+            res = self.__matchFilterQueries(metadatadict)
+            if not res["OK"]:
+                failed[path] = res["Message"]
+                continue
+            transIDs = res["Value"]
+            successful[path] = transIDs
+            if not transIDs:
+                continue
+            if isFile.get(path):
+                lfns = [path]
+            else:
+                res = catalog.findFilesByMetadata(metadatadict, path)
+                if not res["OK"]:
+                    gLogger.error("Failed to findFilesByMetadata %s: %s" % (path, res["Message"]))
+                    failed[path] = res["Message"]
+                    del successful[path]
+                    continue
+                lfns = res["Value"]
+            for transID in transIDs:
+                transFiles.setdefault(transID, set()).update(lfns)
+
+        # Add the files to the transformations
+        res = self.__addFilesToTransformations(transFiles)
         if not res["OK"]:
-            gLogger.error("Failed to get User Metadata %s: %s" % (path, res["Message"]))
             return res
-        else:
-            metadatadict = res["Value"]
-        metadatadict.update(usermetadatadict)
-        gLogger.info("Filter file with metadata:", metadatadict)
-        transIDs = self._filterFileByMetadata(metadatadict)
-        gLogger.info("Transformations passing the filter: %s" % transIDs)
-        if not transIDs:
+        return S_OK({"Successful": successful, "Failed": failed})
+
+    def __addFilesToTransformations(self, transFiles, connection=False):
+        """Add files to several transformations, the files being added to the DataFiles table only once
+
+        :param dict transFiles: { transID : list of LFNs }
+        """
+        lfns = set()
+        for transLfns in transFiles.values():
+            lfns.update(transLfns)
+        if not lfns:
             return S_OK()
-        elif isFile:
-            filesToAdd.append(path)
-        elif isDirectory:
-            res = catalog.findFilesByMetadata(metadatadict, path)
+        gLogger.info(
+            "TransformationDB.addFilesToTransformations:"
+            " Attempting to add %s files to transformations: %s" % (len(lfns), ",".join(str(t) for t in transFiles))
+        )
+        connection = self.__getConnection(connection)
+        lfnFileIDs = {}
+        for lfnChunk in breakListIntoChunks(sorted(lfns), 10000):
+            res = self.__addDataFiles(lfnChunk, connection=connection)
             if not res["OK"]:
-                gLogger.error("Failed to findFilesByMetadata %s: %s" % (path, res["Message"]))
                 return res
-            filesToAdd.extend(res["Value"])
-        for trans in transIDs:
-            if trans not in transFiles:
-                transFiles[trans] = []
-            transFiles[trans].extend(filesToAdd)
-
-        # Add the files to the transformations
-        gLogger.info("Files to add to transformations:", filesToAdd)
-        if filesToAdd:
-            for transID, lfns in transFiles.items():
-                res = self.addFilesToTransformation(transID, lfns)
+            lfnFileIDs.update(res["Value"])
+        for transID, transLfns in transFiles.items():
+            fileIDs = [lfnFileIDs[lfn] for lfn in set(transLfns) if lfn in lfnFileIDs]
+            for fileIDChunk in breakListIntoChunks(fileIDs, 10000):
+                res = self.__addFilesToTransformation(int(transID), fileIDChunk, connection=connection)
                 if not res["OK"]:
                     gLogger.error("Failed to add files to transformation", "%s %s" % (transID, res["Message"]))
                     return res
-
         return S_OK()
 
-    def _filterFileByMetadata(self, metadatadict):
-        """Pass the input metadatadict through those currently active"""
-        transIDs = []
-        queries = self.filterQueries
-
-        catalog = FileCatalog()
-        gLogger.info("Filter file by queries", queries)
-        res = catalog.getMetadataFields()
-
+    def __matchFilterQueries(self, metadatadict):
+        """Get the active transformations whose input query matches the metadata dictionary"""
+        res = self.__getFilterIndex()
         if not res["OK"]:
-            gLogger.error("Error in getMetadataFields: %s" % res["Message"])
             return res
-        if not res["Value"]:
-            gLogger.error("Error: no metadata fields defined")
-            return res
-        typeDict = res["Value"]["FileMetaFields"]
-        typeDict.update(res["Value"]["DirectoryMetaFields"])
+        filterIndex = res["Value"]
 
-        for transID, query in queries:
-            gLogger.info("Check the transformation status")
-            res = self.getTransformationParameters(transID, "Status")
-            if res["Value"] not in ["New", "Active", "Stopped", "Completing", "Flush"]:
-                continue
-            mq = MetaQuery(query, typeDict)
-            gLogger.info("Apply query %s to metadata %s" % (mq.getMetaQuery(), metadatadict))
-            res = mq.applyQuery(metadatadict)
-            if not res["OK"]:
-                gLogger.error("Error in applying query: %s" % res["Message"])
-                return res
-            elif res["Value"]:
-                gLogger.info("Apply query result is True")
-                transIDs.append(transID)
-            else:
-                gLogger.info("Apply query result is False")
+        activeTransIDs = set(
+            transID for transID, status in self.filterStatus.items() if status in FILTER_TRANSFORMATION_STATUSES
+        )
+        res = filterIndex.match(metadatadict, transIDs=activeTransIDs)
+        if not res["OK"]:
+            gLogger.error("Error in applying query: %s" % res["Message"])
+            return res
+        gLogger.verbose("Metadata matched by the queries", "%s: %s" % (metadatadict, res["Value"]))
+        return res
 
-        return transIDs
+    def _filterFileByMetadata(self, metadatadict):
+        """Pass the input metadatadict through those currently active"""
+        res = self.__matchFilterQueries(metadatadict)
+        if not res["OK"]:
+            return res
+        return res["Value"]
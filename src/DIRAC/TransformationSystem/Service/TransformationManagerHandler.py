@@ -434,6 +434,13 @@ class TransformationManagerHandlerMixin:
         """Set metadata to a file or to a directory (path)"""
         return cls.transformationDB.setMetadata(path, querydict)
 
+    types_setMetadataBulk = [dict]
+
+    @classmethod
+    def export_setMetadataBulk(cls, pathMetadataDict):
+        """Set metadata to many files or directories { path : querydict }"""
+        return cls.transformationDB.setMetadataBulk(pathMetadataDict)
+
     ####################################################################
     #
     # These are the methods used for web monitoring
@@ -0,0 +1,170 @@
+"""Index of the input meta queries of the transformations
+
+The queries are compiled once into an index by metadata field, so that the transformations whose input query
+may match a metadata dictionary are found without evaluating all the queries. Each query is indexed on a single
+of its metadata fields:
+
+* on the values of an equality ("=", "in") condition, looked up in a dictionary,
+* or, failing that, on the interval of its range (">", "<", ">=", "<=") conditions, looked up by bisection,
+* or, if it has no such condition (e.g. only "!=", "nin", "Any" or "Missing"), it is always a candidate.
+
+The candidates are then checked with :py:meth:`~DIRAC.DataManagementSystem.Client.MetaQuery.MetaQuery.applyQuery`,
+so that the result is the same as applying all the queries in turn.
+"""
+import bisect
+
+from DIRAC import S_OK
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery, getOperands, getTypedValue
+
+RANGE_OPERATIONS = (">", "<", ">=", "<=")
+
+
+class MetaQueryIndex(object):
+    """Compiled input meta queries of the transformations"""
+
+    def __init__(self, queries, typeDict):
+        """c'tor
+
+        :param queries: list of (transID, query dict), in the order in which they are applied
+        :param dict typeDict: { metadata field : type } of the catalog
+        """
+        self.typeDict = dict(typeDict)
+        # List of (transID, MetaQuery), the position in the list identifies the query
+        self.__queries = []
+        # meta -> { typed value : set of positions }
+        self.__equality = {}
+        # meta -> (sorted list of lower bounds, list of (lower, upper, position) in the same order)
+        self.__ranges = {}
+        # meta -> list of (upper, position) of the ranges without lower bound
+        self.__openRanges = {}
+        # Positions of the queries that are not indexed
+        self.__scan = set()
+
+        ranges = {}
+        for transID, query in queries:
+            position = len(self.__queries)
+            self.__queries.append((transID, MetaQuery(query, self.typeDict)))
+            if not self.__indexEquality(query, position):
+                self.__collectRange(query, position, ranges)
+        for meta, entries in ranges.items():
+            self.__indexRanges(meta, entries)
+
+    def __len__(self):
+        return len(self.__queries)
+
+    @staticmethod
+    def __isIndexable(value):
+        """Conditions that are not used for the index: "Any" and "Missing" are special values"""
+        return str(value).lower() not in ("any", "missing")
+
+    def __indexEquality(self, query, position):
+        """Index a query on its most selective equality condition
+
+        :return: True if the query was indexed
+        """
+        best = None
+        for meta, value in query.items():
+            if meta not in self.typeDict or not self.__isIndexable(value):
+                continue
+            for operation, operand in getOperands(value):
+                if operation not in ("=", "in"):
+                    continue
+                operands = operand if isinstance(operand, list) else [operand]
+                try:
+                    typedValues = set(getTypedValue(x, self.typeDict[meta]) for x in operands)
+                except (ValueError, TypeError):
+                    # The query is illegal, let applyQuery report it
+                    return False
+                if best is None or len(typedValues) < len(best[1]):
+                    best = (meta, typedValues)
+        if best is None:
+            return False
+        meta, typedValues = best
+        valueDict = self.__equality.setdefault(meta, {})
+        for typedValue in typedValues:
+            valueDict.setdefault(typedValue, set()).add(position)
+        return True
+
+    def __collectRange(self, query, position, ranges):
+        """Collect the interval of the range conditions of a query on one of its fields"""
+        for meta, value in query.items():
+            if meta not in self.typeDict or not isinstance(value, dict) or not self.__isIndexable(value):
+                continue
+            lower = upper = None
+            try:
+                for operation, operand in value.items():
+                    if operation not in RANGE_OPERATIONS or isinstance(operand, list):
+                        continue
+                    typedValue = getTypedValue(operand, self.typeDict[meta])
+                    if operation in (">", ">="):
+                        lower = typedValue if lower is None else max(lower, typedValue)
+                    else:
+                        upper = typedValue if upper is None else min(upper, typedValue)
+            except (ValueError, TypeError):
+                break
+            if lower is not None or upper is not None:
+                ranges.setdefault(meta, []).append((lower, upper, position))
+                return
+        self.__scan.add(position)
+
+    def __indexRanges(self, meta, entries):
+        """Sort the intervals of the range conditions on a field"""
+        bounded = [entry for entry in entries if entry[0] is not None]
+        try:
+            bounded.sort(key=lambda entry: entry[0])
+        except TypeError:
+            # Values that can't be compared are not indexed
+            self.__scan.update(entry[2] for entry in entries)
+            return
+        self.__ranges[meta] = ([entry[0] for entry in bounded], bounded)
+        self.__openRanges[meta] = [(upper, position) for lower, upper, position in entries if lower is None]
+
+    def __allPositions(self, meta):
+        """Positions of all the queries indexed on a field"""
+        positions = set()
+        for valuePositions in self.__equality.get(meta, {}).values():
+            positions.update(valuePositions)
+        positions.update(entry[2] for entry in self.__ranges.get(meta, ([], []))[1])
+        positions.update(position for _upper, position in self.__openRanges.get(meta, []))
+        return positions
+
+    def __getCandidates(self, metadataDict):
+        """Positions of the queries that may match a metadata dictionary"""
+        candidates = set(self.__scan)
+        for meta, userValue in metadataDict.items():
+            if userValue is None or (meta not in self.__equality and meta not in self.__ranges):
+                continue
+            try:
+                typedValue = getTypedValue(userValue, self.typeDict[meta])
+                candidates.update(self.__equality.get(meta, {}).get(typedValue, ()))
+                if meta in self.__ranges:
+                    lowers, bounded = self.__ranges[meta]
+                    for lower, upper, position in bounded[: bisect.bisect_right(lowers, typedValue)]:
+                        if upper is None or typedValue <= upper:
+                            candidates.add(position)
+                    for upper, position in self.__openRanges[meta]:
+                        if upper is None or typedValue <= upper:
+                            candidates.add(position)
+            except (ValueError, TypeError):
+                # The queries on this field will report the illegal value
+                candidates.update(self.__allPositions(meta))
+        return candidates
+
+    def match(self, metadataDict, transIDs=None):
+        """Get the transformations whose query matches a metadata dictionary
+
+        :param dict metadataDict: { metadata field : value }
+        :param transIDs: if given, only the queries of these transformations are applied
+        :return: S_OK(list of transIDs) in the order of the queries, or the error of the first illegal query
+        """
+        matching = []
+        for position in sorted(self.__getCandidates(metadataDict)):
+            transID, metaQuery = self.__queries[position]
+            if transIDs is not None and transID not in transIDs:
+                continue
+            res = metaQuery.applyQuery(metadataDict)
+            if not res["OK"]:
+                return res
+            if res["Value"]:
+                matching.append(transID)
+        return S_OK(matching)
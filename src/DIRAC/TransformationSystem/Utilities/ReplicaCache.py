@@ -0,0 +1,154 @@
+"""Replica cache shared by the threads of the TransformationAgent
+
+The replicas of the LFNs are cached by LFN, whatever the transformation asking for them, with the time at which
+they were obtained from the catalog. The replicas eligible for jobs and all the replicas are cached separately.
+The cache is kept in memory and persisted in an SQLite file, updated entry by entry instead of being rewritten.
+"""
+import sqlite3
+import threading
+import time
+
+from DIRAC import gLogger
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+
+
+class ReplicaCache(object):
+    """Cache of the replicas of the LFNs"""
+
+    def __init__(self, fileName, validity=2):
+        """c'tor
+
+        :param str fileName: SQLite file where the cache is persisted
+        :param float validity: number of days the replicas are valid
+        """
+        self.log = gLogger.getSubLogger(self.__class__.__name__)
+        self.fileName = fileName
+        self.validity = validity * 86400
+        self.__lock = threading.Lock()
+        # (lfn, forJobs) -> (list of SEs, update time)
+        self.__cache = {}
+        # transID -> {"Hits": n, "Misses": n}
+        self.__stats = {}
+        self.__db = None
+        self.__open()
+
+    def __open(self):
+        """Open the SQLite file and load the valid replicas it contains"""
+        try:
+            self.__db = sqlite3.connect(self.fileName, check_same_thread=False)
+            self.__db.execute("PRAGMA journal_mode=WAL")
+            self.__db.execute("PRAGMA synchronous=NORMAL")
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS Replicas (LFN TEXT NOT NULL, ForJobs INTEGER NOT NULL, "
+                "SEs TEXT NOT NULL, UpdateTime REAL NOT NULL, PRIMARY KEY (LFN, ForJobs))"
+            )
+            self.__db.execute("CREATE INDEX IF NOT EXISTS UpdateTimeIndex ON Replicas (UpdateTime)")
+            self.__db.commit()
+            timeLimit = time.time() - self.validity
+            for lfn, forJobs, ses, updateTime in self.__db.execute(
+                "SELECT LFN, ForJobs, SEs, UpdateTime FROM Replicas WHERE UpdateTime >= ?", (timeLimit,)
+            ):
+                self.__cache[(lfn, bool(forJobs))] = (ses.split(","), updateTime)
+            self.log.info("Loaded replica cache", "from %s (%d entries)" % (self.fileName, len(self.__cache)))
+        except sqlite3.Error as e:
+            self.log.exception(
+                "Can't use the replica cache file, the cache is kept in memory", self.fileName, lException=e
+            )
+            self.__db = None
+
+    def __execute(self, cmd, rows):
+        """Execute a modification of the SQLite file (called with the lock)"""
+        if self.__db is None:
+            return
+        try:
+            self.__db.executemany(cmd, rows)
+            self.__db.commit()
+        except sqlite3.Error as e:
+            self.log.exception("Can't update the replica cache file", self.fileName, lException=e)
+
+    def get(self, lfns, forJobs=True, transID=None):
+        """Get the valid cached replicas of LFNs
+
+        :param lfns: LFNs to look for
+        :param bool forJobs: replicas eligible for jobs, or all the replicas
+        :param transID: transformation asking for the replicas, for the statistics
+        :return: dict { lfn : list of SEs } of the LFNs found in the cache
+        """
+        timeLimit = time.time() - self.validity
+        replicas = {}
+        nLfns = 0
+        with self.__lock:
+            for lfn in lfns:
+                nLfns += 1
+                cached = self.__cache.get((lfn, forJobs))
+                if cached and cached[1] >= timeLimit:
+                    replicas[lfn] = list(cached[0])
+            stats = self.__stats.setdefault(transID, {"Hits": 0, "Misses": 0})
+            stats["Hits"] += len(replicas)
+            stats["Misses"] += nLfns - len(replicas)
+        return replicas
+
+    def update(self, replicas, forJobs=True):
+        """Add or refresh the replicas of LFNs
+
+        :param dict replicas: { lfn : list of SEs }
+        :param bool forJobs: replicas eligible for jobs, or all the replicas
+        """
+        now = time.time()
+        rows = [(lfn, int(forJobs), ",".join(ses), now) for lfn, ses in replicas.items() if ses]
+        with self.__lock:
+            for lfn, _forJobs, ses, _now in rows:
+                self.__cache[(lfn, forJobs)] = (ses.split(","), now)
+            self.__execute("INSERT OR REPLACE INTO Replicas (LFN, ForJobs, SEs, UpdateTime) VALUES (?, ?, ?, ?)", rows)
+
+    def remove(self, lfns):
+        """Remove LFNs from the cache
+
+        :param lfns: LFNs whose replicas have to be obtained from the catalog next time
+        :return: number of cache entries removed
+        """
+        removed = []
+        with self.__lock:
+            for lfn in lfns:
+                for forJobs in (True, False):
+                    if self.__cache.pop((lfn, forJobs), None):
+                        removed.append((lfn,))
+            for chunk in breakListIntoChunks(removed, 10000):
+                self.__execute("DELETE FROM Replicas WHERE LFN = ?", chunk)
+        return len(removed)
+
+    def purge(self):
+        """Remove the entries older than the validity
+
+        :return: number of cache entries removed
+        """
+        timeLimit = time.time() - self.validity
+        with self.__lock:
+            expired = [key for key, (_ses, updateTime) in self.__cache.items() if updateTime < timeLimit]
+            for key in expired:
+                del self.__cache[key]
+            self.__execute("DELETE FROM Replicas WHERE UpdateTime < ?", [(timeLimit,)])
+        return len(expired)
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__cache)
+
+    def getStatistics(self):
+        """Get the use of the cache
+
+        :return: dict { transID : { "Hits" : n, "Misses" : n, "HitRate" : fraction } }
+        """
+        with self.__lock:
+            stats = {transID: dict(transStats) for transID, transStats in self.__stats.items()}
+        for transStats in stats.values():
+            lookups = transStats["Hits"] + transStats["Misses"]
+            transStats["HitRate"] = float(transStats["Hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """Close the SQLite file"""
+        with self.__lock:
+            if self.__db is not None:
+                self.__db.close()
+                self.__db = None
@@ -0,0 +1,94 @@
+"""Test the index of the input meta queries of the transformations"""
+import random
+
+import pytest
+
+from DIRAC.DataManagementSystem.Client.MetaQuery import MetaQuery
+from DIRAC.TransformationSystem.Utilities.MetaQueryIndex import MetaQueryIndex
+
+typeDict = {"DataType": "VARCHAR(128)", "RunNumber": "INT", "Energy": "FLOAT", "Tag": "VARCHAR(128)"}
+
+queries = [
+    ("1", {"DataType": "RAW", "RunNumber": {">": 100, "<=": 200}}),
+    ("2", {"DataType": ["RAW", "DST"]}),
+    ("3", {"RunNumber": {">=": 150}}),
+    ("4", {"Energy": {"<": 6.5}, "Tag": "Any"}),
+    ("5", {"Tag": {"!=": "test"}}),
+    ("6", {"DataType": "DST", "Tag": "Missing"}),
+    ("7", {"RunNumber": {"in": [1, 2, 3]}, "Energy": 7.0}),
+    ("8", {"RunNumber": "12"}),
+]
+
+
+def bruteForce(queries, metadataDict):
+    """Apply all the queries in turn"""
+    matching = []
+    for transID, query in queries:
+        res = MetaQuery(query, typeDict).applyQuery(metadataDict)
+        if not res["OK"]:
+            return res
+        if res["Value"]:
+            matching.append(transID)
+    return {"OK": True, "Value": matching}
+
+
+@pytest.mark.parametrize(
+    "metadataDict, expected",
+    [
+        ({"DataType": "RAW", "RunNumber": 120}, ["1", "2"]),
+        ({"DataType": "RAW", "RunNumber": "160"}, ["1", "2", "3"]),
+        ({"DataType": "DST", "RunNumber": 12, "Tag": "test"}, ["2", "8"]),
+        ({"DataType": "DST", "Energy": 5}, ["2", "6"]),
+        ({"DataType": "DST", "Energy": 5, "Tag": "test"}, ["2", "4"]),
+        ({"RunNumber": 2, "Energy": "7"}, ["7"]),
+        ({"Tag": "prod"}, ["5"]),
+        ({}, []),
+    ],
+)
+def test_match(metadataDict, expected):
+    res = MetaQueryIndex(queries, typeDict).match(metadataDict)
+    assert res["OK"], res
+    assert res["Value"] == expected
+
+
+def test_filter():
+    index = MetaQueryIndex(queries, typeDict)
+    res = index.match({"DataType": "RAW", "RunNumber": 160}, transIDs={"2", "3"})
+    assert res["Value"] == ["2", "3"]
+
+    # An illegal value is reported as when applying the queries
+    res = index.match({"DataType": "RAW", "RunNumber": "abc"})
+    assert not res["OK"]
+    assert res["Message"] == bruteForce(queries, {"DataType": "RAW", "RunNumber": "abc"})["Message"]
+
+
+def test_random():
+    rnd = random.Random(1234)
+    dataTypes = ["RAW", "DST", "SIM", "MC"]
+    randomQueries = []
+    for transID in range(200):
+        query = {}
+        if rnd.random() < 0.5:
+            query["DataType"] = rnd.choice([rnd.choice(dataTypes), rnd.sample(dataTypes, 2), "Any"])
+        if rnd.random() < 0.6:
+            query["RunNumber"] = {rnd.choice([">", ">=", "<", "<=", "!="]): rnd.randint(0, 50)}
+            if rnd.random() < 0.5:
+                query["RunNumber"][rnd.choice(["<", "<="])] = rnd.randint(25, 75)
+        if rnd.random() < 0.3:
+            query["Energy"] = rnd.choice([{"nin": [1.0, 2.0]}, 3.0, "Missing"])
+        randomQueries.append((str(transID), query))
+
+    index = MetaQueryIndex(randomQueries, typeDict)
+    for _ in range(500):
+        metadataDict = {}
+        if rnd.random() < 0.9:
+            metadataDict["DataType"] = rnd.choice(dataTypes)
+        if rnd.random() < 0.9:
+            metadataDict["RunNumber"] = rnd.randint(0, 80)
+        if rnd.random() < 0.5:
+            metadataDict["Energy"] = rnd.choice([1.0, 2.0, 3.0])
+        res = index.match(metadataDict)
+        expected = bruteForce(randomQueries, metadataDict)
+        assert res["OK"] == expected["OK"]
+        assert res.get("Value") == expected.get("Value")
+        assert res.get("Message") == expected.get("Message")
@@ -0,0 +1,41 @@
+"""Test the replica cache of the TransformationAgent"""
+import time
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import ReplicaCache
+
+
+def test_replicaCache(tmp_path):
+    fileName = str(tmp_path / "ReplicaCache.db")
+    cache = ReplicaCache(fileName)
+    cache.update({"/lfn/1": ["SE1", "SE2"], "/lfn/2": ["SE1"], "/lfn/3": []})
+    cache.update({"/lfn/1": ["SE1", "SE2", "Failover-SE"]}, forJobs=False)
+
+    # Shared by the transformations, separately for the jobs
+    assert cache.get(["/lfn/1", "/lfn/2", "/lfn/3"], transID=1) == {"/lfn/1": ["SE1", "SE2"], "/lfn/2": ["SE1"]}
+    assert cache.get(["/lfn/1", "/lfn/2"], forJobs=False, transID=2) == {"/lfn/1": ["SE1", "SE2", "Failover-SE"]}
+    assert len(cache) == 3
+
+    assert cache.remove(["/lfn/1", "/lfn/4"]) == 2
+    assert cache.get(["/lfn/1"], transID=1) == {}
+
+    stats = cache.getStatistics()
+    assert stats[1] == {"Hits": 2, "Misses": 2, "HitRate": 0.5}
+    assert stats[2]["Hits"] == 1
+    cache.close()
+
+    # The changes were persisted
+    cache = ReplicaCache(fileName)
+    assert cache.get(["/lfn/1", "/lfn/2"]) == {"/lfn/2": ["SE1"]}
+    cache.close()
+
+
+def test_validity(tmp_path):
+    fileName = str(tmp_path / "ReplicaCache.db")
+    cache = ReplicaCache(fileName, validity=1.0 / 86400)
+    cache.update({"/lfn/1": ["SE1"]})
+    time.sleep(1.1)
+    cache.update({"/lfn/2": ["SE1"]})
+    assert cache.get(["/lfn/1", "/lfn/2"]) == {"/lfn/2": ["SE1"]}
+    assert cache.purge() == 1
+    assert len(cache) == 1
+    cache.close()
@@ -0,0 +1,72 @@
+"""Test the addition of the files to the transformations according to their metadata"""
+import time
+
+import pytest
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.TransformationSystem.DB import TransformationDB as moduleTested
+from DIRAC.TransformationSystem.DB.TransformationDB import TransformationDB
+from DIRAC.TransformationSystem.Utilities.MetaQueryIndex import MetaQueryIndex
+
+typeDict = {"DataType": "VARCHAR(128)", "RunNumber": "INT"}
+queries = [("1", {"DataType": "RAW"}), ("2", {"RunNumber": {">": 10}}), ("3", {"DataType": "DST"})]
+catalogMetadata = {
+    "/vo/raw/file1": {"DataType": "RAW", "RunNumber": 5},
+    "/vo/raw/file2": {"DataType": "RAW", "RunNumber": 20},
+    "/vo/dst": {"DataType": "DST"},
+}
+
+
+@pytest.fixture
+def transDB(monkeypatch):
+    catalog = MagicMock()
+    catalog.isFile.side_effect = lambda paths: S_OK(
+        {"Successful": {path: path.startswith("/vo/raw/") for path in paths}, "Failed": {}}
+    )
+    catalog.isDirectory.side_effect = lambda paths: S_OK(
+        {"Successful": {path: path == "/vo/dst" for path in paths}, "Failed": {}}
+    )
+    catalog.getFileUserMetadata.side_effect = lambda path: S_OK(dict(catalogMetadata[path]))
+    catalog.getDirectoryUserMetadata.side_effect = lambda path: S_OK(dict(catalogMetadata[path]))
+    catalog.findFilesByMetadata.return_value = S_OK(["/vo/dst/file1", "/vo/dst/file2"])
+    monkeypatch.setattr(moduleTested, "FileCatalog", lambda: catalog)
+
+    db = TransformationDB.__new__(TransformationDB)
+    db.filterQueries = queries
+    db.filterStatus = {"1": "Active", "2": "Active", "3": "Completed"}
+    db.filterIndex = MetaQueryIndex(queries, typeDict)
+    db.filterIndexTime = time.time()
+    db._TransformationDB__getConnection = MagicMock(return_value="connection")
+    lfnFileIDs = {}
+    db._TransformationDB__addDataFiles = MagicMock(
+        side_effect=lambda lfns, connection: S_OK({lfn: lfnFileIDs.setdefault(lfn, len(lfnFileIDs)) for lfn in lfns})
+    )
+    db._TransformationDB__addFilesToTransformation = MagicMock(return_value=S_OK([]))
+    db.catalog = catalog
+    return db
+
+
+def test_setMetadataBulk(transDB):
+    res = transDB.setMetadataBulk(
+        {"/vo/raw/file1": {}, "/vo/raw/file2": {"RunNumber": 30}, "/vo/dst": {"RunNumber": 40}, "/vo/none": {}}
+    )
+    assert res["OK"], res
+    assert res["Value"]["Successful"] == {"/vo/raw/file1": ["1"], "/vo/raw/file2": ["1", "2"], "/vo/dst": ["2"]}
+    assert list(res["Value"]["Failed"]) == ["/vo/none"]
+
+    # The paths are checked in bulk and the files are registered once for all the transformations
+    transDB.catalog.isFile.assert_called_once()
+    transDB.catalog.isDirectory.assert_called_once_with(["/vo/dst", "/vo/none"])
+    transDB._TransformationDB__addDataFiles.assert_called_once()
+    added = {
+        call.args[0]: sorted(call.args[1])
+        for call in transDB._TransformationDB__addFilesToTransformation.call_args_list
+    }
+    assert added == {1: [2, 3], 2: [0, 1, 3]}
+
+
+def test_setMetadata(transDB):
+    assert transDB.setMetadata("/vo/raw/file1", {"DataType": "DST"})["OK"]
+    transDB._TransformationDB__addFilesToTransformation.assert_not_called()
+    assert not transDB.setMetadata("/vo/none", {})["OK"]
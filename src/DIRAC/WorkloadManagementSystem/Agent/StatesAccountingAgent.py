@@ -1,6 +1,10 @@
 """  StatesAccountingAgent sends periodically numbers of jobs and pilots in various states for various
      sites to the Monitoring system to create historical plots.
 
+     If *JobScheduling/UseRunningJobsCounters* is enabled in the Operations, it also installs the running jobs
+     counters of the JobDB if needed, and checks them at every cycle. They are recomputed if they drifted
+     only if the RepairRunningJobsCounters option is set.
+
 .. literalinclude:: ../ConfigTemplate.cfg
   :start-after: ##BEGIN StatesAccountingAgent
   :end-before: ##END
@@ -72,8 +76,37 @@ class StatesAccountingAgent(AgentModule):
             elif field == "UserGroup":
                 field = "OwnerGroup"
             self.__jobDBFields.append(field)
+        self.__runningJobsCountersInstalled = False
+        self.__repairRunningJobsCounters = self.am_getOption("RepairRunningJobsCounters", False)
         return S_OK()
 
+    def __refreshRunningJobsCounters(self, jobDB):
+        """Install the running jobs counters used by the Limiter in the JobDB if needed, and check them:
+        they are recomputed if they drifted only on request, as it locks the Jobs table
+        """
+        if not self.__runningJobsCountersInstalled:
+            result = jobDB.installRunningJobsCounters()
+            if not result["OK"]:
+                self.log.error("Can't install the running jobs counters", result["Message"])
+                return
+            self.__runningJobsCountersInstalled = True
+            if result["Value"]:
+                # Just initialised
+                return
+        result = jobDB.checkRunningJobsCounters()
+        if not result["OK"]:
+            self.log.error("Can't check the running jobs counters", result["Message"])
+            return
+        if not result["Value"]:
+            return
+        for (site, jobType), (counter, jobs) in result["Value"].items():
+            self.log.warn("Running jobs counter drifted", f"{site} {jobType}: {counter} instead of {jobs}")
+        if not self.__repairRunningJobsCounters:
+            return
+        result = jobDB.resetRunningJobsCounters()
+        if not result["OK"]:
+            self.log.error("Can't reset the running jobs counters", result["Message"])
+
     def execute(self):
         """Main execution method"""
         # PilotsHistory to Monitoring
@@ -101,9 +134,13 @@ class StatesAccountingAgent(AgentModule):
                 self.log.error("Could not commit to Monitoring", result["Message"])
             self.log.verbose("Done committing PilotsHistory to Monitoring")
 
+        jobDB = JobDB()
+        if Operations().getValue("JobScheduling/UseRunningJobsCounters", False):
+            self.__refreshRunningJobsCounters(jobDB)
+
         # WMSHistory to Monitoring or Accounting
         self.log.info("Committing WMSHistory to %s backend" % "and ".join(self.jobMonitoringOption))
-        result = JobDB().getSummarySnapshot(self.__jobDBFields)
+        result = jobDB.getSummarySnapshot(self.__jobDBFields)
         now = datetime.datetime.utcnow()
         if not result["OK"]:
             self.log.error(
@@ -159,8 +159,38 @@ class Limiter:
         self.csDictCache.add(section, 300, stuffDict)
         return S_OK(stuffDict)
 
-    def __getRunningCondition(self, siteName, gridCE=None):
-        """Get extra conditions allowing site throttling"""
+    def getJobsHeadroomForSite(self, siteName, gridCE=None):
+        """Get how many more jobs can be matched at a site without going over its limits
+
+        The limits that are not reached yet are taken into account whatever job they apply to, and a single job
+        can be matched if matching delays are set for the site, as the delay starts with the first match.
+
+        :return: number of jobs, or None if the site has no limit
+        """
+        headroom = None
+        if self.__opsHelper.getValue("JobScheduling/CheckJobLimits", True):
+            for ce in [None, gridCE] if gridCE else [None]:
+                result = self.__getRunningLimits(siteName, ce)
+                if not result["OK"]:
+                    self.log.error("Issue getting running limits", result["Message"])
+                    # Match a single job, as selectJob would
+                    return 1
+                for _attName, _attValue, limit, running in result["Value"]:
+                    if running < limit:
+                        headroom = limit - running if headroom is None else min(headroom, limit - running)
+
+        if self.__opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
+            result = self.__extractCSData("%s/%s" % (self.__matchingDelaySection, siteName))
+            if result["OK"] and result["Value"]:
+                headroom = 1 if headroom is None else min(headroom, 1)
+
+        return headroom
+
+    def __getRunningLimits(self, siteName, gridCE=None):
+        """Get the running limits of a site, with the number of jobs they currently apply to
+
+        :return: S_OK( [ ( attName, attValue, limit, running ) ] )
+        """
         if gridCE:
             csSection = "%s/%s/CEs/%s" % (self.__runningLimitSection, siteName, gridCE)
         else:
@@ -170,10 +200,7 @@ class Limiter:
             return result
         limitsDict = result["Value"]
         # limitsDict is something like { 'JobType' : { 'Merge' : 20, 'MCGen' : 1000 } }
-        if not limitsDict:
-            return S_OK({})
-        # Check if the site exceeding the given limits
-        negCond = {}
+        limits = []
         for attName in limitsDict:
             if attName not in self.jobDB.jobAttributeNames:
                 self.log.error("Attribute does not exist", "(%s). Check the job limits" % attName)
@@ -181,30 +208,54 @@ class Limiter:
             cK = "Running:%s:%s" % (siteName, attName)
             data = self.condCache.get(cK)
             if not data:
-                result = self.jobDB.getCounters(
-                    "Jobs",
-                    [attName],
-                    {"Site": siteName, "Status": [JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED]},
-                )
+                result = self.__getRunningCounters(siteName, attName)
                 if not result["OK"]:
                     return result
                 data = result["Value"]
-                data = dict([(k[0][attName], k[1]) for k in data])
                 self.condCache.add(cK, 10, data)
             for attValue in limitsDict[attName]:
-                limit = limitsDict[attName][attValue]
-                running = data.get(attValue, 0)
-                if running >= limit:
-                    self.log.verbose(
-                        "Job Limit imposed",
-                        "at %s on %s/%s=%d, %d jobs already deployed" % (siteName, attName, attValue, limit, running),
-                    )
-                    if attName not in negCond:
-                        negCond[attName] = []
-                    negCond[attName].append(attValue)
+                limits.append((attName, attValue, limitsDict[attName][attValue], data.get(attValue, 0)))
+        return S_OK(limits)
+
+    def __getRunningCondition(self, siteName, gridCE=None):
+        """Get extra conditions allowing site throttling"""
+        result = self.__getRunningLimits(siteName, gridCE)
+        if not result["OK"]:
+            return result
+        # Check if the site exceeding the given limits
+        negCond = {}
+        for attName, attValue, limit, running in result["Value"]:
+            if running >= limit:
+                self.log.verbose(
+                    "Job Limit imposed",
+                    "at %s on %s/%s=%d, %d jobs already deployed" % (siteName, attName, attValue, limit, running),
+                )
+                if attName not in negCond:
+                    negCond[attName] = []
+                negCond[attName].append(attValue)
         # negCond is something like : {'JobType': ['Merge']}
         return S_OK(negCond)
 
+    def __getRunningCounters(self, siteName, attName):
+        """Get the number of Running, Matched and Stalled jobs at a site for each value of attName
+
+        The per JobType counters maintained by the JobDB are used if enabled,
+        otherwise (or if they can not be retrieved) the Jobs table is counted.
+        """
+        if attName == "JobType" and self.__opsHelper.getValue("JobScheduling/UseRunningJobsCounters", False):
+            result = self.jobDB.getRunningJobsCounters(siteName)
+            if result["OK"]:
+                return result
+            self.log.warn("Can not get running jobs counters, counting jobs instead", result["Message"])
+        result = self.jobDB.getCounters(
+            "Jobs",
+            [attName],
+            {"Site": siteName, "Status": [JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED]},
+        )
+        if not result["OK"]:
+            return result
+        return S_OK(dict([(k[0][attName], k[1]) for k in result["Value"]]))
+
     def updateDelayCounters(self, siteName, jid):
         # Get the info from the CS
         siteSection = "%s/%s" % (self.__matchingDelaySection, siteName)
@@ -1,8 +1,14 @@
 """ Encapsulate here the logic for matching jobs
 
     Utilities and classes here are used by MatcherHandler
+
+    The time spent in each stage of the matching (credentials and mask checks, Limiter, TaskQueueDB
+    match, JobDB and JobLoggingDB updates...) is accumulated in histograms by gMatchingTimes.
 """
+import bisect
+import threading
 import time
+from contextlib import contextmanager
 
 from DIRAC import gLogger, convertToPy3VersionNumber
 
@@ -20,10 +26,78 @@ from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
 from DIRAC.ResourceStatusSystem.Client.SiteStatus import SiteStatus
 
 
+#: Upper bounds (in seconds) of the buckets of the histograms of gMatchingTimes
+TIMING_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+
+
 class PilotVersionError(Exception):
     pass
 
 
+class MatchingTimes:
+    """Histograms of the time spent in the stages of the matching, for all the Matcher objects of a process"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__histograms = {}
+
+    @staticmethod
+    def getBucketNames():
+        """Names of the buckets of the histograms, from the fastest to the slowest"""
+        return ["<=%gms" % (bound * 1000) for bound in TIMING_BUCKETS] + [">%gms" % (TIMING_BUCKETS[-1] * 1000)]
+
+    def add(self, stage, duration):
+        """Record the duration of a stage
+
+        :param str stage: name of the stage
+        :param float duration: duration in seconds
+        """
+        bucket = bisect.bisect_left(TIMING_BUCKETS, duration)
+        with self.__lock:
+            histogram = self.__histograms.get(stage)
+            if histogram is None:
+                histogram = self.__histograms[stage] = {
+                    "Count": 0,
+                    "TotalTime": 0.0,
+                    "MaxTime": 0.0,
+                    "Buckets": [0] * (len(TIMING_BUCKETS) + 1),
+                    "BucketTimes": [0.0] * (len(TIMING_BUCKETS) + 1),
+                }
+            histogram["Count"] += 1
+            histogram["TotalTime"] += duration
+            histogram["MaxTime"] = max(histogram["MaxTime"], duration)
+            histogram["Buckets"][bucket] += 1
+            histogram["BucketTimes"][bucket] += duration
+
+    @contextmanager
+    def timer(self, stage):
+        """Context manager recording the time spent in a stage"""
+        startTime = time.time()
+        try:
+            yield
+        finally:
+            self.add(stage, time.time() - startTime)
+
+    def getHistograms(self, reset=False):
+        """Get the histograms
+
+        :param bool reset: start new histograms
+        :return: dict {stage: {"Count", "TotalTime", "MaxTime", "Buckets", "BucketTimes"}}, the Buckets
+                 and BucketTimes being the number of measures and the time spent in each bucket
+        """
+        with self.__lock:
+            histograms = {
+                stage: dict(histogram, Buckets=list(histogram["Buckets"]), BucketTimes=list(histogram["BucketTimes"]))
+                for stage, histogram in self.__histograms.items()
+            }
+            if reset:
+                self.__histograms = {}
+        return histograms
+
+
+gMatchingTimes = MatchingTimes()
+
+
 class Matcher:
     """Logic for matching"""
 
@@ -86,18 +160,22 @@ class Matcher:
             toPrintDict.pop("Tag")
         self.log.info("Resource description for matching", printDict(toPrintDict))
 
-        negativeCond = self.limiter.getNegativeCondForSite(resourceDict["Site"], resourceDict.get("GridCE"))
-        result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
+        with gMatchingTimes.timer("Limiter"):
+            negativeCond = self.limiter.getNegativeCondForSite(resourceDict["Site"], resourceDict.get("GridCE"))
+        with gMatchingTimes.timer("TaskQueueMatch"):
+            result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
 
         if not result["OK"]:
             raise RuntimeError(result["Message"])
         result = result["Value"]
         if not result["matchFound"]:
             self.log.info("No match found")
+            gMatchingTimes.add("NoMatch", time.time() - startTime)
             return {}
 
         jobID = result["jobId"]
-        resAtt = self.jobDB.getJobAttributes(jobID, ["OwnerDN", "OwnerGroup", "Status"])
+        with gMatchingTimes.timer("JobAttributes"):
+            resAtt = self.jobDB.getJobAttributes(jobID, ["OwnerDN", "OwnerGroup", "Status"])
         if not resAtt["OK"]:
             raise RuntimeError("Could not retrieve job attributes")
         if not resAtt["Value"]:
@@ -111,7 +189,8 @@ class Matcher:
 
         self._reportStatus(resourceDict, jobID)
 
-        result = self.jobDB.getJobJDL(jobID)
+        with gMatchingTimes.timer("JobDescription"):
+            result = self.jobDB.getJobJDL(jobID)
         if not result["OK"]:
             raise RuntimeError("Failed to get the job JDL")
 
@@ -123,18 +202,21 @@ class Matcher:
         self.log.verbose("Match time", "[%s]" % str(matchTime))
 
         # Get some extra stuff into the response returned
-        resOpt = self.jobDB.getJobOptParameters(jobID)
+        with gMatchingTimes.timer("JobDescription"):
+            resOpt = self.jobDB.getJobOptParameters(jobID)
         if resOpt["OK"]:
             for key, value in resOpt["Value"].items():
                 resultDict[key] = value
-        resAtt = self.jobDB.getJobAttributes(jobID, ["OwnerDN", "OwnerGroup"])
+        with gMatchingTimes.timer("JobAttributes"):
+            resAtt = self.jobDB.getJobAttributes(jobID, ["OwnerDN", "OwnerGroup"])
         if not resAtt["OK"]:
             raise RuntimeError("Could not retrieve job attributes")
         if not resAtt["Value"]:
             raise RuntimeError("No attributes returned for job")
 
         if self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True):
-            self.limiter.updateDelayCounters(resourceDict["Site"], jobID)
+            with gMatchingTimes.timer("DelayCounters"):
+                self.limiter.updateDelayCounters(resourceDict["Site"], jobID)
 
         pilotInfoReportedFlag = resourceDict.get("PilotInfoReportedFlag", False)
         if not pilotInfoReportedFlag:
@@ -145,14 +227,124 @@ class Matcher:
         resultDict["Group"] = resAtt["Value"]["OwnerGroup"]
         resultDict["PilotInfoReportedFlag"] = True
 
+        gMatchingTimes.add("Match", time.time() - startTime)
         return resultDict
 
+    def selectJobs(self, resourceDescription, credDict, numJobs):
+        """Batched version of selectJob: find up to numJobs jobs matching the resource capacity in one go
+
+        The NumberOfProcessors and MaxRAM of the resource description are the total amounts available
+        for all the jobs: they are shared among the matched jobs according to what each of them requires.
+
+        :param dict resourceDescription: resource description, as for selectJob
+        :param dict credDict: credentials of the requester
+        :param int numJobs: maximum number of jobs to match
+        :returns: list of dictionaries as the one returned by selectJob (empty if no job matched)
+        """
+
+        startTime = time.time()
+
+        resourceDict = self._getResourceDict(resourceDescription, credDict)
+        self.log.info("Resource description for matching %s jobs" % numJobs, printDict(resourceDict))
+
+        # Budget to share among the matched jobs
+        processors = None
+        if resourceDescription.get("NumberOfProcessors"):
+            try:
+                processors = int(resourceDescription["NumberOfProcessors"])
+            except ValueError:
+                processors = None
+        ram = None
+        if resourceDescription.get("MaxRAM"):
+            try:
+                ram = int(resourceDescription["MaxRAM"] / 1000)
+            except (TypeError, ValueError):
+                ram = None
+
+        with gMatchingTimes.timer("Limiter"):
+            negativeCond = self.limiter.getNegativeCondForSite(resourceDict["Site"], resourceDict.get("GridCE"))
+            # The negative condition holds for the whole batch: don't match more jobs than the limits allow
+            headroom = self.limiter.getJobsHeadroomForSite(resourceDict["Site"], resourceDict.get("GridCE"))
+        if headroom is not None and headroom < numJobs:
+            self.log.verbose("Number of jobs to match reduced by the site limits", "%s -> %s" % (numJobs, headroom))
+            numJobs = max(headroom, 1)
+        with gMatchingTimes.timer("TaskQueueMatch"):
+            result = self.tqDB.matchAndGetJobs(
+                resourceDict, numJobs=numJobs, negativeCond=negativeCond, processors=processors, ram=ram
+            )
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+        jobIDs = [jobID for jobID, _tqID in result["Value"]["jobs"]]
+        if not jobIDs:
+            self.log.info("No match found")
+            gMatchingTimes.add("NoMatch", time.time() - startTime)
+            return []
+
+        with gMatchingTimes.timer("JobAttributes"):
+            resAtt = self.jobDB.getJobsAttributes(jobIDs, ["OwnerDN", "OwnerGroup", "Status"])
+        if not resAtt["OK"]:
+            raise RuntimeError("Could not retrieve job attributes")
+        jobsAttributes = resAtt["Value"]
+        matchedJobIDs = []
+        for jobID in jobIDs:
+            if jobID not in jobsAttributes:
+                self.log.error("No attributes returned for job", str(jobID))
+                continue
+            if jobsAttributes[jobID]["Status"] != JobStatus.WAITING:
+                self.log.error("Job matched by the TQ is not in Waiting state", str(jobID))
+                result = self.tqDB.deleteJob(jobID)
+                if not result["OK"]:
+                    raise RuntimeError(result["Message"])
+                continue
+            matchedJobIDs.append(jobID)
+        if not matchedJobIDs:
+            raise RuntimeError("Jobs %s are not in Waiting state" % ",".join(str(jobID) for jobID in jobIDs))
+
+        self._reportStatus(resourceDict, matchedJobIDs)
+
+        with gMatchingTimes.timer("JobDescription"):
+            result = self.jobDB.getJobsJDL(matchedJobIDs)
+            if not result["OK"]:
+                raise RuntimeError("Failed to get the jobs JDL")
+            jdls = result["Value"]
+            resOpt = self.jobDB.getJobsOptParameters(matchedJobIDs)
+        optParameters = resOpt["Value"] if resOpt["OK"] else {}
+
+        checkMatchingDelay = self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True)
+        if not resourceDict.get("PilotInfoReportedFlag", False):
+            self._updatePilotInfo(resourceDict)
+
+        resultList = []
+        for jobID in matchedJobIDs:
+            if jobID not in jdls:
+                self.log.error("Failed to get the job JDL", str(jobID))
+                continue
+            resultDict = {"JDL": jdls[jobID], "JobID": jobID}
+            resultDict.update(optParameters.get(jobID, {}))
+            if checkMatchingDelay:
+                with gMatchingTimes.timer("DelayCounters"):
+                    self.limiter.updateDelayCounters(resourceDict["Site"], jobID)
+            self._updatePilotJobMapping(resourceDict, jobID)
+            resultDict["DN"] = jobsAttributes[jobID]["OwnerDN"]
+            resultDict["Group"] = jobsAttributes[jobID]["OwnerGroup"]
+            resultDict["PilotInfoReportedFlag"] = True
+            resultList.append(resultDict)
+
+        matchTime = time.time() - startTime
+        self.log.verbose("Match time", "[%s] for %d jobs" % (str(matchTime), len(resultList)))
+        gMatchingTimes.add("BatchMatch", matchTime)
+
+        return resultList
+
     def _getResourceDict(self, resourceDescription, credDict):
         """from resourceDescription to resourceDict (just various mods)"""
         resourceDict = self._processResourceDescription(resourceDescription)
-        resourceDict = self._checkCredentials(resourceDict, credDict)
+        with gMatchingTimes.timer("Credentials"):
+            resourceDict = self._checkCredentials(resourceDict, credDict)
         self._checkPilotVersion(resourceDict)
-        if not self._checkMask(resourceDict):
+        with gMatchingTimes.timer("SiteMask"):
+            siteAllowed = self._checkMask(resourceDict)
+        if not siteAllowed:
             # Banned destinations can only take Test jobs
             resourceDict["JobType"] = "Test"
 
@@ -243,13 +435,16 @@ class Matcher:
         return resourceDict
 
     def _reportStatus(self, resourceDict, jobID):
-        """Reports the status of the matched job in jobDB and jobLoggingDB
+        """Reports the status of the matched job(s) in jobDB and jobLoggingDB
 
         Do not fail if errors happen here
+
+        :param jobID: one job ID or a list of job IDs, updated in bulk
         """
         attNames = ["Status", "MinorStatus", "ApplicationStatus", "Site"]
         attValues = ["Matched", "Assigned", "Unknown", resourceDict["Site"]]
-        result = self.jobDB.setJobAttributes(jobID, attNames, attValues)
+        with gMatchingTimes.timer("JobStatus"):
+            result = self.jobDB.setJobAttributes(jobID, attNames, attValues)
         if not result["OK"]:
             self.log.error(
                 "Problem reporting job status", "setJobAttributes, jobID = %s: %s" % (jobID, result["Message"])
@@ -257,7 +452,10 @@ class Matcher:
         else:
             self.log.verbose("Set job attributes for jobID", jobID)
 
-        result = self.jlDB.addLoggingRecord(jobID, status=JobStatus.MATCHED, minorStatus="Assigned", source="Matcher")
+        with gMatchingTimes.timer("JobLogging"):
+            result = self.jlDB.addLoggingRecord(
+                jobID, status=JobStatus.MATCHED, minorStatus="Assigned", source="Matcher"
+            )
         if not result["OK"]:
             self.log.error(
                 "Problem reporting job status", "addLoggingRecord, jobID = %s: %s" % (jobID, result["Message"])
@@ -297,9 +495,10 @@ class Matcher:
                 "for %s: gridCE=%s, site=%s, benchmark=%f" % (pilotReference, gridCE, site, benchmark),
             )
 
-            result = self.pilotAgentsDB.setPilotStatus(
-                pilotReference, status=PilotStatus.RUNNING, gridSite=site, destination=gridCE, benchmark=benchmark
-            )
+            with gMatchingTimes.timer("PilotInfo"):
+                result = self.pilotAgentsDB.setPilotStatus(
+                    pilotReference, status=PilotStatus.RUNNING, gridSite=site, destination=gridCE, benchmark=benchmark
+                )
             if not result["OK"]:
                 self.log.warn(
                     "Problem updating pilot information",
@@ -310,18 +509,19 @@ class Matcher:
         """Update pilot to job mapping information"""
         pilotReference = resourceDict.get("PilotReference", "")
         if pilotReference and pilotReference != "Unknown":
-            result = self.pilotAgentsDB.setCurrentJobID(pilotReference, jobID)
-            if not result["OK"]:
-                self.log.error(
-                    "Problem updating pilot information",
-                    ";setCurrentJobID. pilotReference: %s; %s" % (pilotReference, result["Message"]),
-                )
-            result = self.pilotAgentsDB.setJobForPilot(jobID, pilotReference, updateStatus=False)
-            if not result["OK"]:
-                self.log.error(
-                    "Problem updating pilot information",
-                    "; setJobForPilot. pilotReference: %s; %s" % (pilotReference, result["Message"]),
-                )
+            with gMatchingTimes.timer("PilotJobMapping"):
+                result = self.pilotAgentsDB.setCurrentJobID(pilotReference, jobID)
+                if not result["OK"]:
+                    self.log.error(
+                        "Problem updating pilot information",
+                        ";setCurrentJobID. pilotReference: %s; %s" % (pilotReference, result["Message"]),
+                    )
+                result = self.pilotAgentsDB.setJobForPilot(jobID, pilotReference, updateStatus=False)
+                if not result["OK"]:
+                    self.log.error(
+                        "Problem updating pilot information",
+                        "; setJobForPilot. pilotReference: %s; %s" % (pilotReference, result["Message"]),
+                    )
 
     def _checkCredentials(self, resourceDict, credDict):
         """Check if we can get a job given the passed credentials"""
@@ -13,7 +13,8 @@ from DIRAC import gLogger
 gLogger.setLevel("DEBUG")
 
 # sut
-from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
+from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
+from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher, MatchingTimes, gMatchingTimes
 from DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient import SandboxStoreClient
 
 
@@ -83,6 +84,154 @@ def test__processResourceDescription(setUp):
     assert res == resExpected
 
 
+def test_selectJobs(mocker, setUp):
+
+    resourceDescription = {
+        "Site": "DIRAC.Jenkins.ch",
+        "GridCE": "jenkins.cern.ch",
+        "Setup": "LHCb-Certification",
+        "CPUTime": 1080000,
+        "NumberOfProcessors": 8,
+        "MaxRAM": 16000,
+        "PilotInfoReportedFlag": True,
+    }
+    mocker.patch.object(
+        matcher, "_getResourceDict", side_effect=lambda rd, _cred: matcher._processResourceDescription(rd)
+    )
+    mocker.patch.object(matcher.limiter, "getNegativeCondForSite", return_value={})
+    mocker.patch.object(matcher.limiter, "getJobsHeadroomForSite", return_value=None)
+    tqDBMock.matchAndGetJobs.return_value = {
+        "OK": True,
+        "Value": {"matchFound": True, "jobs": [(1, 10), (2, 10), (3, 11)]},
+    }
+    jobDBMock.getJobsAttributes.return_value = {
+        "OK": True,
+        "Value": {
+            1: {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "Status": "Waiting"},
+            2: {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "Status": "Killed"},
+            3: {"OwnerDN": "/other/DN", "OwnerGroup": "myGroup", "Status": "Waiting"},
+        },
+    }
+    jobDBMock.getJobsJDL.return_value = {"OK": True, "Value": {1: "[JDL1]", 3: "[JDL3]"}}
+    jobDBMock.getJobsOptParameters.return_value = {"OK": True, "Value": {1: {"Param": "Value"}}}
+    jobDBMock.setJobAttributes.return_value = {"OK": True, "Value": 2}
+    jlDBMock.addLoggingRecord.return_value = {"OK": True, "Value": 2}
+    tqDBMock.deleteJob.return_value = {"OK": True, "Value": False}
+
+    res = matcher.selectJobs(resourceDescription, {}, 3)
+
+    assert [jobDict["JobID"] for jobDict in res] == [1, 3]
+    assert res[0]["JDL"] == "[JDL1]"
+    assert res[0]["Param"] == "Value"
+    assert res[1]["DN"] == "/other/DN"
+    assert tqDBMock.matchAndGetJobs.call_args.kwargs["processors"] == 8
+    assert tqDBMock.matchAndGetJobs.call_args.kwargs["ram"] == 16
+    tqDBMock.deleteJob.assert_called_with(2)
+    assert jlDBMock.addLoggingRecord.call_args.args[0] == [1, 3]
+    assert tqDBMock.matchAndGetJobs.call_args.kwargs["numJobs"] == 3
+
+    # A site one job below its running limit only gets one more job
+    mocker.patch.object(matcher.limiter, "getJobsHeadroomForSite", return_value=1)
+    matcher.selectJobs(resourceDescription, {}, 3)
+    assert tqDBMock.matchAndGetJobs.call_args.kwargs["numJobs"] == 1
+
+
+def test_matchingTimes():
+    matchingTimes = MatchingTimes()
+    for duration in (0.0005, 0.003, 0.004, 10):
+        matchingTimes.add("TaskQueueMatch", duration)
+    with matchingTimes.timer("JobLogging"):
+        pass
+
+    histograms = matchingTimes.getHistograms(reset=True)
+    assert set(histograms) == {"TaskQueueMatch", "JobLogging"}
+    histogram = histograms["TaskQueueMatch"]
+    assert histogram["Count"] == 4
+    assert histogram["MaxTime"] == 10
+    assert histogram["TotalTime"] == pytest.approx(10.0075)
+    buckets = dict(zip(matchingTimes.getBucketNames(), histogram["Buckets"]))
+    assert buckets["<=1ms"] == 1
+    assert buckets["<=5ms"] == 2
+    assert buckets[">5000ms"] == 1
+    assert sum(buckets.values()) == 4
+    assert not matchingTimes.getHistograms()
+
+    # The stages of selectJobs (above) were timed
+    assert {"Limiter", "TaskQueueMatch", "JobAttributes", "JobStatus", "JobLogging", "BatchMatch"} <= set(
+        gMatchingTimes.getHistograms()
+    )
+
+
+@pytest.mark.parametrize(
+    "useCounters, countersResult, expectedCountCalls",
+    [
+        (False, None, 1),
+        (True, {"OK": True, "Value": {"MCSimulation": 10, "User": 1}}, 0),
+        (True, {"OK": False, "Message": "Table 'RunningJobsCounters' doesn't exist"}, 1),
+    ],
+)
+def test_limiterRunningCondition(useCounters, countersResult, expectedCountCalls):
+    Limiter.condCache.purgeAll()
+    Limiter.csDictCache.purgeAll()
+    limiterJobDB = MagicMock()
+    limiterJobDB.jobAttributeNames = ["JobType", "Site", "Status"]
+    limiterJobDB.getRunningJobsCounters.return_value = countersResult
+    limiterJobDB.getCounters.return_value = {"OK": True, "Value": [({"JobType": "MCSimulation"}, 10)]}
+    limiterOps = MagicMock()
+    limiterOps.getValue.side_effect = lambda option, default: {"JobScheduling/UseRunningJobsCounters": useCounters}.get(
+        option, default
+    )
+    limiterOps.getSections.return_value = {"OK": True, "Value": ["JobType"]}
+    limiterOps.getOptionsDict.return_value = {"OK": True, "Value": {"MCSimulation": "10", "User": "5"}}
+
+    limiter = Limiter(jobDB=limiterJobDB, opsHelper=limiterOps)
+    negCond = limiter.getNegativeCondForSite("DIRAC.Jenkins.ch")
+
+    assert negCond == {"JobType": ["MCSimulation"]}
+    assert limiterJobDB.getCounters.call_count == expectedCountCalls
+    assert limiterJobDB.getRunningJobsCounters.call_count == (1 if useCounters else 0)
+
+
+@pytest.mark.parametrize(
+    "limits, delays, gridCE, expected",
+    [
+        ({}, {}, None, None),
+        ({"DIRAC.Jenkins.ch/JobType": {"MCSimulation": "10", "User": "5"}}, {}, None, 4),
+        ({"DIRAC.Jenkins.ch/JobType": {"MCSimulation": "10"}}, {}, None, None),
+        (
+            {"DIRAC.Jenkins.ch/JobType": {"User": "5"}, "DIRAC.Jenkins.ch/CEs/jenkins.cern.ch/JobType": {"User": "3"}},
+            {},
+            "jenkins.cern.ch",
+            2,
+        ),
+        ({"DIRAC.Jenkins.ch/JobType": {"User": "5"}}, {"DIRAC.Jenkins.ch/JobType": {"User": "60"}}, None, 1),
+    ],
+)
+def test_limiterJobsHeadroom(limits, delays, gridCE, expected):
+    Limiter.condCache.purgeAll()
+    Limiter.csDictCache.purgeAll()
+    limiterJobDB = MagicMock()
+    limiterJobDB.jobAttributeNames = ["JobType", "Site", "Status"]
+    limiterJobDB.getCounters.return_value = {
+        "OK": True,
+        "Value": [({"JobType": "MCSimulation"}, 10), ({"JobType": "User"}, 1)],
+    }
+    options = {"JobScheduling/RunningLimit/" + section: value for section, value in limits.items()}
+    options.update({"JobScheduling/MatchingDelay/" + section: value for section, value in delays.items()})
+
+    def getSections(section):
+        sections = {option[len(section) + 1 :].split("/")[0] for option in options if option.startswith(section + "/")}
+        return {"OK": True, "Value": sorted(sections)}
+
+    limiterOps = MagicMock()
+    limiterOps.getValue.side_effect = lambda option, default: default
+    limiterOps.getSections.side_effect = getSections
+    limiterOps.getOptionsDict.side_effect = lambda section: {"OK": True, "Value": options.get(section, {})}
+
+    limiter = Limiter(jobDB=limiterJobDB, opsHelper=limiterOps)
+    assert limiter.getJobsHeadroomForSite("DIRAC.Jenkins.ch", gridCE) == expected
+
+
 def test_uploadFilesAsSandbox(mocker, setUp):
 
     mocker.patch("DIRAC.WorkloadManagementSystem.Client.SandboxStoreClient.TransferClient", return_value=MagicMock())
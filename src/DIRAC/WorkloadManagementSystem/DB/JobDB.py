@@ -373,6 +373,39 @@ class JobDB(DB):
             jobOptParameters = {name: value for name, value in result.get("Value", {})}
         return S_OK(jobOptParameters)
 
+    def getJobsOptParameters(self, jobIDs, paramList=None):
+        """Get optimizer parameters for a list of jobs. If the list of parameter names is
+        empty, get all the parameters then
+
+        :param list jobIDs: list of job IDs
+        :param list paramList: list of parameter names
+        :return: S_OK( { jobID: { name: value } } ) / S_ERROR
+        """
+        if not jobIDs:
+            return S_OK({})
+        jobIDList = ",".join(str(int(jobID)) for jobID in jobIDs)
+        cmd = "SELECT JobID, Name, Value from OptimizerParameters WHERE JobID IN (%s)" % jobIDList
+        if paramList:
+            paramNameList = []
+            for x in paramList:
+                ret = self._escapeString(x)
+                if not ret["OK"]:
+                    return ret
+                paramNameList.append(ret["Value"])
+            cmd += " and Name in (%s)" % ",".join(paramNameList)
+
+        result = self._query(cmd)
+        if not result["OK"]:
+            return S_ERROR("JobDB.getJobsOptParameters: failed to retrieve parameters")
+        jobsOptParameters = {int(jobID): {} for jobID in jobIDs}
+        for jobID, name, value in result["Value"]:
+            try:
+                value = value.decode()  # account for BLOBs
+            except AttributeError:
+                pass
+            jobsOptParameters[int(jobID)][name] = value
+        return S_OK(jobsOptParameters)
+
     #############################################################################
 
     def getInputData(self, jobID):
@@ -754,20 +787,30 @@ class JobDB(DB):
         if not parameters:
             return S_OK()
 
-        insertValueList = []
-        for name, value in parameters:
-            ret = self._escapeString(name)
-            if not ret["OK"]:
-                return ret
-            e_name = ret["Value"]
-            ret = self._escapeString(value)
-            if not ret["OK"]:
-                return ret
-            e_value = ret["Value"]
-            insertValueList.append("(%s,%s,%s)" % (jobID, e_name, e_value))
+        return self.upsertMany(
+            "JobParameters",
+            ["JobID", "Name", "Value"],
+            [(int(jobID), name, value) for name, value in parameters],
+            updateFields=["Value"],
+        )
 
-        cmd = "REPLACE JobParameters (JobID,Name,Value) VALUES %s" % ", ".join(insertValueList)
-        return self._update(cmd)
+    #############################################################################
+    def setJobsParameter(self, jobsParameterDict):
+        """Set a parameter for several jobs at once
+
+        :param dict jobsParameterDict: { jobID: (name, value) }
+
+        :return: S_OK/S_ERROR
+        """
+        if not jobsParameterDict:
+            return S_OK()
+
+        return self.upsertMany(
+            "JobParameters",
+            ["JobID", "Name", "Value"],
+            [(int(jobID), str(name), str(value)) for jobID, (name, value) in jobsParameterDict.items()],
+            updateFields=["Value"],
+        )
 
     #############################################################################
     def setJobOptParameter(self, jobID, name, value):
@@ -933,6 +976,26 @@ class JobDB(DB):
             return S_OK(extractJDL(jdl[0][0]))
         return result
 
+    #############################################################################
+    def getJobsJDL(self, jobIDs, original=False):
+        """Get the JDLs of a list of jobs. By default the current job JDLs
+        are returned. If 'original' argument is True, original JDLs are returned
+
+        :param list jobIDs: list of job IDs
+        :return: S_OK( { jobID: JDL } ) / S_ERROR
+        """
+        if not jobIDs:
+            return S_OK({})
+        column = "OriginalJDL" if original else "JDL"
+        cmd = "SELECT JobID, %s FROM JobJDLs WHERE JobID IN (%s)" % (
+            column,
+            ",".join(str(int(jobID)) for jobID in jobIDs),
+        )
+        result = self._query(cmd)
+        if not result["OK"]:
+            return result
+        return S_OK({int(jobID): extractJDL(jdl) for jobID, jdl in result["Value"]})
+
     #############################################################################
     def insertNewJobIntoDB(
         self,
@@ -2064,6 +2127,129 @@ class JobDB(DB):
             return result
         return S_OK(((defFields + valueFields), result["Value"]))
 
+    #####################################################################################
+    def getRunningJobsCounters(self, site):
+        """Get the number of Running, Matched and Stalled jobs per JobType at a site,
+        as maintained by the triggers of the RunningJobsCounters table
+
+        :param str site: site name
+        :returns: S_OK({JobType: number of jobs})/S_ERROR
+        """
+        ret = self._escapeString(site)
+        if not ret["OK"]:
+            return ret
+        site = ret["Value"]
+
+        result = self._query(f"SELECT JobType, Counter FROM RunningJobsCounters WHERE Site={site} AND Counter > 0")
+        if not result["OK"]:
+            return result
+        return S_OK({jobType: int(counter) for jobType, counter in result["Value"]})
+
+    def installRunningJobsCounters(self):
+        """Create the RunningJobsCounters table and its triggers on the Jobs table if they are missing
+        (they are not part of JobDB.sql), and initialise the counters after installing them
+
+        :returns: S_OK(bool) telling whether anything was installed / S_ERROR
+        """
+        result = self._query("SHOW TABLES LIKE 'RunningJobsCounters'")
+        if not result["OK"]:
+            return result
+        installed = False
+        if not result["Value"]:
+            result = self._update(
+                "CREATE TABLE IF NOT EXISTS `RunningJobsCounters` ("
+                "`Site` VARCHAR(100) NOT NULL, `JobType` VARCHAR(32) NOT NULL, `Counter` INT(11) NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (`Site`,`JobType`)) ENGINE=InnoDB DEFAULT CHARSET=latin1"
+            )
+            if not result["OK"]:
+                return result
+            installed = True
+
+        result = self._query("SHOW TRIGGERS LIKE 'Jobs'")
+        if not result["OK"]:
+            return result
+        existingTriggers = {row[0] for row in result["Value"]}
+        statusList = ", ".join(f"'{status}'" for status in (JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED))
+        increment = (
+            "INSERT INTO RunningJobsCounters (Site, JobType, Counter) VALUES (NEW.Site, NEW.JobType, 1) "
+            "ON DUPLICATE KEY UPDATE Counter = Counter + 1;"
+        )
+        decrement = (
+            "UPDATE RunningJobsCounters SET Counter = GREATEST(Counter - 1, 0) "
+            "WHERE Site = OLD.Site AND JobType = OLD.JobType;"
+        )
+        triggers = {
+            "RunningJobsCounters_Insert": (
+                "AFTER INSERT",
+                f"IF NEW.Status IN ({statusList}) THEN {increment} END IF;",
+            ),
+            "RunningJobsCounters_Update": (
+                "AFTER UPDATE",
+                "IF NOT (OLD.Status <=> NEW.Status AND OLD.Site <=> NEW.Site AND OLD.JobType <=> NEW.JobType) THEN "
+                f"IF OLD.Status IN ({statusList}) THEN {decrement} END IF; "
+                f"IF NEW.Status IN ({statusList}) THEN {increment} END IF; "
+                "END IF;",
+            ),
+            "RunningJobsCounters_Delete": (
+                "AFTER DELETE",
+                f"IF OLD.Status IN ({statusList}) THEN {decrement} END IF;",
+            ),
+        }
+        for name, (event, body) in triggers.items():
+            if name in existingTriggers:
+                continue
+            self.log.info("Installing the trigger of the running jobs counters", name)
+            result = self._update(f"CREATE TRIGGER `{name}` {event} ON `Jobs` FOR EACH ROW BEGIN {body} END")
+            if not result["OK"]:
+                return result
+            installed = True
+
+        if installed:
+            result = self.resetRunningJobsCounters()
+            if not result["OK"]:
+                return result
+        return S_OK(installed)
+
+    def checkRunningJobsCounters(self):
+        """Compare the RunningJobsCounters table with the number of jobs in the Jobs table
+
+        A single non locking read is done, the Jobs table is not locked.
+
+        :returns: S_OK({(Site, JobType): (counter, number of jobs)}) for the counters which differ / S_ERROR
+        """
+        statusList = ", ".join(f"'{status}'" for status in (JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED))
+        result = self._query(
+            "SELECT Site, JobType, SUM(Counter), SUM(Jobs) FROM ("
+            "SELECT Site, JobType, Counter, 0 AS Jobs FROM RunningJobsCounters UNION ALL "
+            f"SELECT Site, JobType, 0, COUNT(*) FROM Jobs WHERE Status IN ({statusList}) GROUP BY Site, JobType"
+            ") AS Counters GROUP BY Site, JobType HAVING SUM(Counter) != SUM(Jobs)"
+        )
+        if not result["OK"]:
+            return result
+        return S_OK({(site, jobType): (int(counter), int(jobs)) for site, jobType, counter, jobs in result["Value"]})
+
+    def resetRunningJobsCounters(self):
+        """Recompute the content of the RunningJobsCounters table from the Jobs table,
+        after the triggers were installed, or to repair a drift of the counters.
+        It locks the Jobs table while counting the jobs.
+
+        :returns: S_OK/S_ERROR
+        """
+        statusList = ", ".join(f"'{status}'" for status in (JobStatus.RUNNING, JobStatus.MATCHED, JobStatus.STALLED))
+        result = self.transactionStart()
+        if not result["OK"]:
+            return result
+        for cmd in (
+            "DELETE FROM RunningJobsCounters",
+            "INSERT INTO RunningJobsCounters (Site, JobType, Counter) "
+            f"SELECT Site, JobType, COUNT(*) FROM Jobs WHERE Status IN ({statusList}) GROUP BY Site, JobType",
+        ):
+            result = self._update(cmd)
+            if not result["OK"]:
+                self.transactionRollback()
+                return result
+        return self.transactionCommit()
+
     def removeInfoFromHeartBeatLogging(self, status, delTime, maxLines):
         """Remove HeartBeatLoggingInfo from DB.
 
@@ -43,6 +43,8 @@ class JobLoggingDB(DB):
         be provided in a form of a string in a format '%Y-%m-%d %H:%M:%S' or
         as datetime.datetime object. If the time stamp is not provided the current
         UTC time is used.
+        jobID can also be a list of job IDs, in which case the same record is added
+        to all of them with a single query.
         """
 
         # Backward compatibility
@@ -52,8 +54,14 @@ class JobLoggingDB(DB):
         if application:
             applicationStatus = application
 
+        jobIDList = jobID if isinstance(jobID, (list, tuple)) else [jobID]
+        if not jobIDList:
+            return S_OK(0)
+
         event = "status/minor/app=%s/%s/%s" % (status, minorStatus, applicationStatus)
-        self.log.info("Adding record for job ", str(jobID) + ": '" + event + "' from " + source)
+        self.log.info(
+            "Adding record for job ", ",".join(str(jID) for jID in jobIDList) + ": '" + event + "' from " + source
+        )
 
         try:
             if not date:
@@ -74,8 +82,12 @@ class JobLoggingDB(DB):
 
         cmd = (
             "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, "
-            + "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')"
-            % (int(jobID), status, minorStatus, applicationStatus[:255], str(_date), epoc, source[:32])
+            + "StatusTime, StatusTimeOrder, StatusSource) VALUES "
+            + ",".join(
+                "(%d,'%s','%s','%s','%s',%f,'%s')"
+                % (int(jID), status, minorStatus, applicationStatus[:255], str(_date), epoc, source[:32])
+                for jID in jobIDList
+            )
         )
 
         return self._update(cmd)
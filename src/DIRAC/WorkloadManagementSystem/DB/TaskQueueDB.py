@@ -1,6 +1,7 @@
 """ TaskQueueDB class is a front-end to the task queues db
 """
 import random
+import re
 import string
 
 from DIRAC import gConfig, S_OK, S_ERROR
@@ -12,6 +13,7 @@ from DIRAC.Core.Security import Properties
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry
 from DIRAC.WorkloadManagementSystem.private.SharesCorrector import SharesCorrector
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 
 DEFAULT_GROUP_SHARE = 1000
 TQ_MIN_SHARE = 0.001
@@ -60,6 +62,7 @@ class TaskQueueDB(DB):
         self.__opsHelper = Operations()
         self.__ensureInsertionIsSingle = False
         self.__sharesCorrector = SharesCorrector(self.__opsHelper)
+        self.__tqIndex = TaskQueueIndex()
         result = self.__initializeDB()
         if not result["OK"]:
             raise Exception("Can't create tables: %s" % result["Message"])
@@ -84,6 +87,43 @@ class TaskQueueDB(DB):
     def getValidPilotTypes(self):
         return self.__getCSOption("AllPilotTypes", ["private"])
 
+    def isTaskQueueIndexEnabled(self):
+        return self.__getCSOption("UseTaskQueueIndex", False)
+
+    def __getTaskQueueIndex(self, connObj=False):
+        """
+        Get the in-memory index of the task queues, (re)loading it from the DB if it is too old
+          :returns: S_OK( TaskQueueIndex ) / S_ERROR
+        """
+        if self.__tqIndex.needsReload(self.__getCSOption("TaskQueueIndexRefreshTime", 60)):
+            result = self.__loadTaskQueueDefinitions(connObj=connObj)
+            if not result["OK"]:
+                return result
+            self.__tqIndex.load(result["Value"])
+            self.log.verbose("Loaded task queue index", "(%s TQs)" % len(self.__tqIndex))
+        return S_OK(self.__tqIndex)
+
+    def __loadTaskQueueDefinitions(self, connObj=False):
+        """
+        Get the definitions of all the task queues, including the empty ones
+          :returns: S_OK( { tqId : tqDefDict } ) / S_ERROR
+        """
+        sqlCmd = "SELECT TQId, Priority, %s FROM `tq_TaskQueues`" % ", ".join(singleValueDefFields)
+        result = self._query(sqlCmd, conn=connObj)
+        if not result["OK"]:
+            return result
+        tqDefs = {}
+        for record in result["Value"]:
+            tqDefs[record[0]] = dict(zip(("Priority",) + singleValueDefFields, record[1:]))
+        for field in multiValueDefFields:
+            result = self._query("SELECT TQId, Value FROM `tq_TQTo%s`" % field, conn=connObj)
+            if not result["OK"]:
+                return result
+            for tqId, value in result["Value"]:
+                if tqId in tqDefs:
+                    tqDefs[tqId].setdefault(field, []).append(value)
+        return S_OK(tqDefs)
+
     def __initializeDB(self):
         """
         Create the tables
@@ -316,6 +356,7 @@ class TaskQueueDB(DB):
         result = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId in ( %s )" % ",".join(orphanedTQs), conn=connObj)
         if not result["OK"]:
             return result
+        self.__tqIndex.removeTaskQueues(orphanedTQs)
         return S_OK()
 
     def __setTaskQueueEnabled(self, tqId, enabled=True, connObj=False):
@@ -358,7 +399,10 @@ class TaskQueueDB(DB):
         if not retVal["OK"]:
             return S_ERROR("Can't insert job: %s" % retVal["Message"])
         connObj = retVal["Value"]
+        # Unescaped definition, to be added to the task queue index
+        rawDefDict = None
         if not skipTQDefCheck:
+            rawDefDict = dict(tqDefDict)
             tqDefDict = dict(tqDefDict)
             retVal = self._checkTaskQueueDefinition(tqDefDict)
             if not retVal["OK"]:
@@ -379,6 +423,11 @@ class TaskQueueDB(DB):
                 return retVal
             tqId = retVal["Value"]
             newTQ = True
+            if rawDefDict is not None:
+                rawDefDict["CPUTime"] = tqDefDict["CPUTime"]
+                self.__tqIndex.addTaskQueue(tqId, rawDefDict, priority=1)
+            else:
+                self.__tqIndex.invalidate()
         else:
             tqId = tqInfo["tqId"]
             self.log.info("Found TQ for job requirements", "(%s : %s)" % (tqId, jobId))
@@ -523,6 +572,8 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC"
         """
         if negativeCond is None:
             negativeCond = {}
+        # Keep the unescaped values for the task queue index
+        rawMatchDict = dict(tqMatchDict)
         # Make a copy to avoid modification of original if escaping needs to be done
         tqMatchDict = dict(tqMatchDict)
         retVal = self._checkMatchDefinition(tqMatchDict)
@@ -542,15 +593,13 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
             noJobsFound = False
             if "JobID" in tqMatchDict:
                 # A certain JobID is required by the resource, so all TQ are to be considered
-                retVal = self.matchAndGetTaskQueue(
-                    tqMatchDict, numQueuesToGet=0, skipMatchDictDef=True, connObj=connObj
-                )
+                retVal = self.__matchTaskQueues(tqMatchDict, rawMatchDict, numQueuesToGet=0, connObj=connObj)
                 preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict["JobID"])
             else:
-                retVal = self.matchAndGetTaskQueue(
+                retVal = self.__matchTaskQueues(
                     tqMatchDict,
+                    rawMatchDict,
                     numQueuesToGet=numQueuesPerTry,
-                    skipMatchDictDef=True,
                     negativeCond=negativeCond,
                     connObj=connObj,
                 )
@@ -595,18 +644,195 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         self.log.info("Could not find a match after %s match retries" % self.__maxMatchRetry)
         return S_ERROR("Could not find a match after %s match retries" % self.__maxMatchRetry)
 
+    def matchAndGetJobs(
+        self, tqMatchDict, numJobs=1, numJobsPerTry=50, numQueuesPerTry=10, negativeCond=None, processors=None, ram=None
+    ):
+        """Match several jobs based on requirements, and take them out of the task queues in a single transaction
+
+        The task queues and the jobs inside them are chosen as in matchAndGetJob. If a processors and/or
+        RAM budget is given, each job consumes the number of processors and the RAM requested by its task queue
+        (through its "<N>Processors", "WholeNode" and "<N>GB" tags), and no more jobs are taken once the budget
+        is exhausted.
+
+        :param dict tqMatchDict: dict for TQ match
+        :param int numJobs: maximum number of jobs to take
+        :param int processors: number of processors available for all the jobs (None for no limit)
+        :param int ram: RAM in GB available for all the jobs (None for no limit)
+        :returns: S_OK( { "matchFound": bool, "jobs": [ ( jobId, tqId ) ], "tqMatch": dict } ) / S_ERROR
+        """
+        if "JobID" in tqMatchDict:
+            # A certain job is required by the resource, there can only be one
+            retVal = self.matchAndGetJob(tqMatchDict, numJobsPerTry=numJobsPerTry, negativeCond=negativeCond)
+            if not retVal["OK"]:
+                return retVal
+            matchDict = retVal["Value"]
+            jobs = [(matchDict["jobId"], matchDict["taskQueueId"])] if matchDict["matchFound"] else []
+            return S_OK({"matchFound": matchDict["matchFound"], "jobs": jobs, "tqMatch": matchDict["tqMatch"]})
+
+        if negativeCond is None:
+            negativeCond = {}
+        # Keep the unescaped values for the task queue index
+        rawMatchDict = dict(tqMatchDict)
+        # Make a copy to avoid modification of original if escaping needs to be done
+        tqMatchDict = dict(tqMatchDict)
+        retVal = self._checkMatchDefinition(tqMatchDict)
+        if not retVal["OK"]:
+            self.log.error("TQ match request check failed", retVal["Message"])
+            return retVal
+        retVal = self.__matchTaskQueues(
+            tqMatchDict, rawMatchDict, numQueuesToGet=numQueuesPerTry, negativeCond=negativeCond
+        )
+        if not retVal["OK"]:
+            return retVal
+        tqList = retVal["Value"]
+        if not tqList:
+            self.log.info("No TQ matches requirements")
+            return S_OK({"matchFound": False, "jobs": [], "tqMatch": tqMatchDict})
+        retVal = self.__getTaskQueuesRequirements([tqTuple[0] for tqTuple in tqList])
+        if not retVal["OK"]:
+            return retVal
+        tqRequirements = retVal["Value"]
+
+        retVal = self.transactionStart()
+        if not retVal["OK"]:
+            return S_ERROR("Can't begin transaction for matching jobs: %s" % retVal["Message"])
+        jobs = []
+        for tqId, tqOwnerDN, tqOwnerGroup in tqList:
+            if len(jobs) >= numJobs:
+                break
+            tqProcessors, tqRAM = tqRequirements.get(tqId, (1, 0))
+            if tqProcessors is None:
+                # Whole node jobs take all the processors left
+                tqProcessors = processors if processors else 1
+            maxJobs = numJobs - len(jobs)
+            if processors is not None:
+                maxJobs = min(maxJobs, processors // tqProcessors)
+            if ram is not None and tqRAM:
+                maxJobs = min(maxJobs, ram // tqRAM)
+            if maxJobs < 1:
+                continue
+            self.log.verbose("Trying to extract jobs from TQ", "(%s jobs from %s)" % (maxJobs, tqId))
+            retVal = self.__extractJobsFromTaskQueue(tqId, maxJobs, numJobsPerTry)
+            if not retVal["OK"]:
+                self.transactionRollback()
+                return retVal
+            jobIDs = retVal["Value"]
+            # The TQ is deleted later if it is left empty
+            self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
+            if not jobIDs:
+                self.log.info("No jobs could be extracted from TQ", tqId)
+                continue
+            self.log.info("Extracted jobs from TQ", "(%s : %s)" % (tqId, ",".join(str(jobID) for jobID in jobIDs)))
+            jobs.extend((jobID, tqId) for jobID in jobIDs)
+            if processors is not None:
+                processors -= tqProcessors * len(jobIDs)
+            if ram is not None:
+                ram -= tqRAM * len(jobIDs)
+        retVal = self.transactionCommit()
+        if not retVal["OK"]:
+            self.transactionRollback()
+            return S_ERROR("Can't commit transaction for matching jobs: %s" % retVal["Message"])
+        return S_OK({"matchFound": bool(jobs), "jobs": jobs, "tqMatch": tqMatchDict})
+
+    def __extractJobsFromTaskQueue(self, tqId, maxJobs, numJobsPerTry):
+        """Take out of a task queue up to maxJobs jobs with the same (randomly chosen) priority
+
+        To be called inside a transaction: the chosen jobs are locked before being deleted,
+        so that a job can't be given to two different requests
+
+        :returns: S_OK( [ jobId ] ) / S_ERROR
+        """
+        retVal = self._query(
+            "SELECT `tq_Jobs`.Priority FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s \
+ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
+            % tqId
+        )
+        if not retVal["OK"]:
+            return S_ERROR("Can't retrieve winning priority for matching jobs: %s" % retVal["Message"])
+        if not retVal["Value"]:
+            return S_OK([])
+        prio = retVal["Value"][0][0]
+        retVal = self._query(
+            "SELECT `tq_Jobs`.JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s AND `tq_Jobs`.Priority = %s \
+ORDER BY `tq_Jobs`.JobId ASC LIMIT %s"
+            % (tqId, prio, max(numJobsPerTry, maxJobs))
+        )
+        if not retVal["OK"]:
+            return S_ERROR("Can't retrieve jobs for matching: %s" % retVal["Message"])
+        jobIDs = [row[0] for row in retVal["Value"]]
+        if not jobIDs:
+            return S_OK([])
+        jobIDs = sorted(random.sample(jobIDs, min(maxJobs, len(jobIDs))))
+        jobIDsStr = ", ".join(str(jobID) for jobID in jobIDs)
+        # Lock the jobs still in the TQ, the ones taken meanwhile by someone else are not returned
+        retVal = self._query("SELECT JobId FROM `tq_Jobs` WHERE JobId IN ( %s ) FOR UPDATE" % jobIDsStr)
+        if not retVal["OK"]:
+            return S_ERROR("Can't lock jobs for matching: %s" % retVal["Message"])
+        jobIDs = [row[0] for row in retVal["Value"]]
+        if not jobIDs:
+            return S_OK([])
+        retVal = self._update("DELETE FROM `tq_Jobs` WHERE JobId IN ( %s )" % ", ".join(str(jobID) for jobID in jobIDs))
+        if not retVal["OK"]:
+            return S_ERROR("Could not take jobs out of TQ %s: %s" % (tqId, retVal["Message"]))
+        return S_OK(jobIDs)
+
+    def __getTaskQueuesRequirements(self, tqIdList):
+        """Get the number of processors and RAM (in GB) needed by the jobs of some task queues
+
+        :returns: S_OK( { tqId : ( processors, ram ) } ), processors being None for whole node TQs
+        """
+        requirements = {tqId: (1, 0) for tqId in tqIdList}
+        retVal = self._query(
+            "SELECT TQId, Value FROM `tq_TQToTags` WHERE TQId IN ( %s )" % ", ".join(str(tqId) for tqId in tqIdList)
+        )
+        if not retVal["OK"]:
+            return retVal
+        for tqId, tag in retVal["Value"]:
+            processors, ram = requirements[tqId]
+            if tag == "WholeNode":
+                processors = None
+            elif processors is not None and re.match(r"^\d+Processors$", tag):
+                processors = max(processors, int(tag[: -len("Processors")]))
+            elif re.match(r"^\d+GB$", tag):
+                ram = max(ram, int(tag[: -len("GB")]))
+            requirements[tqId] = (processors, ram)
+        return S_OK(requirements)
+
     def matchAndGetTaskQueue(
         self, tqMatchDict, numQueuesToGet=1, skipMatchDictDef=False, negativeCond=None, connObj=False
     ):
         """Get a queue that matches the requirements"""
         if negativeCond is None:
             negativeCond = {}
+        # Keep the unescaped values for the task queue index (only known if not yet checked)
+        rawMatchDict = None if skipMatchDictDef else dict(tqMatchDict)
         # Make a copy to avoid modification of original if escaping needs to be done
         tqMatchDict = dict(tqMatchDict)
         if not skipMatchDictDef:
             retVal = self._checkMatchDefinition(tqMatchDict)
             if not retVal["OK"]:
                 return retVal
+        return self.__matchTaskQueues(
+            tqMatchDict, rawMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond, connObj=connObj
+        )
+
+    def __matchTaskQueues(self, tqMatchDict, rawMatchDict, numQueuesToGet=1, negativeCond=None, connObj=False):
+        """Get the task queues that match an already checked match dict
+
+        If enabled, the in-memory task queue index is used, otherwise (or if it can't be loaded) the DB is queried
+
+        :param dict tqMatchDict: checked and escaped match dict
+        :param dict rawMatchDict: same as tqMatchDict but with unescaped values (or None)
+        :returns: S_OK( [ ( tqId, tqOwnerDN, tqOwnerGroup ) ] ) / S_ERROR
+        """
+        if rawMatchDict is not None and self.isTaskQueueIndexEnabled():
+            retVal = self.__getTaskQueueIndex(connObj=connObj)
+            if retVal["OK"]:
+                tqList = retVal["Value"].match(rawMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond)
+                if tqList is None:
+                    return S_ERROR("Wrong conditions")
+                return S_OK(tqList)
+            self.log.warn("Can't load the task queue index, falling back to DB matching", retVal["Message"])
         retVal = self.__generateTQMatchSQL(tqMatchDict, numQueuesToGet=numQueuesToGet, negativeCond=negativeCond)
         if not retVal["OK"]:
             return retVal
@@ -1032,6 +1258,7 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
             retVal = self._update("DELETE FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn=connObj)
             if not retVal["OK"]:
                 return retVal
+            self.__tqIndex.removeTaskQueues([tqId])
             self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
             self.log.info("Deleted empty and enabled TQ", tqId)
             return S_OK()
@@ -1060,6 +1287,7 @@ WHERE j.JobId = %s AND t.TQId = j.TQId"
         if not retVal["OK"]:
             return S_ERROR("Could not delete task queue %s: %s" % (tqId, retVal["Message"]))
         delTQ = retVal["Value"]
+        self.__tqIndex.removeTaskQueues([tqId])
         sqlCmd = "DELETE FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s" % tqId
         retVal = self._update(sqlCmd, conn=connObj)
         if not retVal["OK"]:
@@ -1318,7 +1546,9 @@ FROM `tq_TaskQueues` t, `tq_Jobs` j WHERE "
         for prio in prioDict:
             tqList = ", ".join([str(tqId) for tqId in prioDict[prio]])
             updateSQL = "UPDATE `tq_TaskQueues` SET Priority=%.4f WHERE TQId in ( %s )" % (prio, tqList)
-            self._update(updateSQL, conn=connObj)
+            result = self._update(updateSQL, conn=connObj)
+            if result["OK"]:
+                self.__tqIndex.setPriority(prioDict[prio], float("%.4f" % prio))
         return S_OK()
 
     @staticmethod
@@ -352,27 +352,23 @@ class JobStateUpdateHandlerMixin:
         """Set arbitrary parameter specified by name/value pair
         for job specified by its JobId
         """
+        if not cls.elasticJobParametersDB:
+            res = cls.jobDB.setJobsParameter(jobsParameterDict)
+            if not res["OK"]:
+                cls.log.error("Failed to add Job Parameter to MySQL", res["Message"])
+                return res
+            return S_OK()
+
         failed = False
 
         for jobID in jobsParameterDict:
-
-            if cls.elasticJobParametersDB:
-                res = cls.elasticJobParametersDB.setJobParameter(
-                    jobID, str(jobsParameterDict[jobID][0]), str(jobsParameterDict[jobID][1])
-                )
-                if not res["OK"]:
-                    cls.log.error("Failed to add Job Parameter to elasticJobParametersDB", res["Message"])
-                    failed = True
-                    message = res["Message"]
-
-            else:
-                res = cls.jobDB.setJobParameter(
-                    jobID, str(jobsParameterDict[jobID][0]), str(jobsParameterDict[jobID][1])
-                )
-                if not res["OK"]:
-                    cls.log.error("Failed to add Job Parameter to MySQL", res["Message"])
-                    failed = True
-                    message = res["Message"]
+            res = cls.elasticJobParametersDB.setJobParameter(
+                jobID, str(jobsParameterDict[jobID][0]), str(jobsParameterDict[jobID][1])
+            )
+            if not res["OK"]:
+                cls.log.error("Failed to add Job Parameter to elasticJobParametersDB", res["Message"])
+                failed = True
+                message = res["Message"]
 
         if failed:
             return S_ERROR(message)
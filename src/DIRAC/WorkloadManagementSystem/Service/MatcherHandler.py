@@ -2,16 +2,20 @@
 
     It uses a Matcher and a Limiter object that encapsulates the matching logic.
     It connects to JobDB, TaskQueueDB, JobLoggingDB, and PilotAgentsDB.
+
+    If the MatcherMonitoring type is sent to the Monitoring backend, the histograms of the time
+    spent in the stages of the matching are reported every 5 minutes.
 """
 from DIRAC import S_OK, S_ERROR
 
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
-from DIRAC.Core.Utilities import DErrno
+from DIRAC.Core.Utilities import DErrno, Network, TimeUtilities
 from DIRAC.Core.Utilities.DEncode import ignoreEncodeWarning
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 
-from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher, PilotVersionError
+from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher, PilotVersionError, gMatchingTimes
 from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
 
 
@@ -44,8 +48,36 @@ class MatcherHandlerMixin:
 
         cls.limiter = Limiter(jobDB=cls.jobDB)
 
+        cls.matchingMonitoringReporter = None
+        if "Monitoring" in Operations().getMonitoringBackends(monitoringType="MatcherMonitoring"):
+            from DIRAC.MonitoringSystem.Client.MonitoringReporter import MonitoringReporter
+
+            cls.matchingMonitoringReporter = MonitoringReporter(monitoringType="MatcherMonitoring")
+            gThreadScheduler.addPeriodicTask(300, cls._reportMatchingTimes)
+
         return S_OK()
 
+    @classmethod
+    def _reportMatchingTimes(cls):
+        """Send the histograms of the matching stage durations collected since the last report"""
+        timestamp = int(TimeUtilities.toEpoch())
+        host = Network.getFQDN()
+        bucketNames = gMatchingTimes.getBucketNames()
+        for stage, histogram in gMatchingTimes.getHistograms(reset=True).items():
+            for bucketName, count, duration in zip(bucketNames, histogram["Buckets"], histogram["BucketTimes"]):
+                if count:
+                    cls.matchingMonitoringReporter.addRecord(
+                        {
+                            "timestamp": timestamp,
+                            "Host": host,
+                            "Stage": stage,
+                            "Bucket": bucketName,
+                            "Count": count,
+                            "Duration": int(duration * 1000),
+                        }
+                    )
+        return cls.matchingMonitoringReporter.commit()
+
     ##############################################################################
     types_requestJob = [[str, dict]]
 
@@ -81,6 +113,44 @@ class MatcherHandlerMixin:
             return S_OK(result)
         return S_ERROR(DErrno.EWMSNOMATCH, callStack=[])
 
+    ##############################################################################
+    types_requestJobs = [dict, int]
+
+    def export_requestJobs(self, resourceDescription, numberOfJobs):
+        """Serve up to numberOfJobs jobs at once to the request of an agent, sharing among them
+        the processors and memory of the resource description.
+
+        :returns: S_OK( list of job dictionaries, as for requestJob )
+        """
+
+        resourceDescription["Setup"] = self.serviceInfoDict["clientSetup"]
+        credDict = self.getRemoteCredentials()
+        pilotRef = resourceDescription.get("PilotReference", "Unknown")
+        numberOfJobs = min(numberOfJobs, self.srv_getCSOption("MaxJobsPerRequest", 100))
+
+        try:
+            opsHelper = Operations(group=credDict["group"])
+            matcher = Matcher(
+                pilotAgentsDB=self.pilotAgentsDB,
+                jobDB=self.jobDB,
+                tqDB=self.taskQueueDB,
+                jlDB=self.jobLoggingDB,
+                opsHelper=opsHelper,
+                pilotRef=pilotRef,
+            )
+            result = matcher.selectJobs(resourceDescription, credDict, numberOfJobs)
+        except RuntimeError as rte:
+            self.log.error("Error requesting jobs for pilot", "[%s] %s" % (pilotRef, rte))
+            return S_ERROR("Error requesting jobs")
+        except PilotVersionError as pve:
+            self.log.warn("Pilot version error for pilot", "[%s] %s" % (pilotRef, pve))
+            return S_ERROR(DErrno.EWMSPLTVER, callStack=[])
+
+        # result can be empty, meaning that no job matched
+        if result:
+            return S_OK(result)
+        return S_ERROR(DErrno.EWMSNOMATCH, callStack=[])
+
     ##############################################################################
     types_getActiveTaskQueues = []
 
@@ -0,0 +1,306 @@
+""" In-memory index of the task queue definitions stored in the TaskQueueDB
+
+    The index keeps, for every task queue, its owner, setup, CPU time, priority and the values
+    of its multi-value fields (Sites, GridCEs, BannedSites, Platforms, JobTypes, Tags), together
+    with inverted lists (value -> set of TQIds) for the fields used to restrict the candidates.
+    It answers "which task queues match this resource description" with the same semantics as
+    the SQL generated by TaskQueueDB.__generateTQMatchSQL, without querying the database.
+
+    The index is owned by a TaskQueueDB instance, which fills it from the database and keeps it
+    up to date when task queues are created, deleted or re-prioritised in this process. Changes done
+    by other processes are picked up when the index is reloaded.
+"""
+import random
+import string
+import threading
+import time
+
+from DIRAC.Core.Security import Properties
+from DIRAC.ConfigurationSystem.Client.Helpers import Registry
+
+# Resource description fields matched against the multi value fields of the TQs ( field -> field + "s" )
+indexedMatchFields = ("GridCE", "Site", "Platform", "JobType", "Tag")
+# Fields of the TQ definitions kept as a single value
+indexedSingleFields = ("OwnerDN", "OwnerGroup", "Setup", "CPUTime")
+
+_punctuationTable = str.maketrans("", "", string.punctuation)
+
+
+def _toList(value):
+    if isinstance(value, (list, tuple, set)):
+        return [str(v).strip() for v in value]
+    return [str(value).strip()]
+
+
+def _isAny(values):
+    """Check if one of the values is the "any" wildcard"""
+    return any(v.lower().translate(_punctuationTable) == "any" for v in values)
+
+
+class TaskQueueIndex:
+    """Thread safe in-memory index of task queue definitions"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__loaded = False
+        self.__loadTime = 0
+        # TQId -> { "OwnerDN": str, "OwnerGroup": str, "Setup": str, "CPUTime": int,
+        #           "Priority": float, "<MultiField>": frozenset }
+        self.__tqs = {}
+        # Field -> value -> set( TQId )
+        self.__valueIndex = {}
+        # TQs with no value for a given multi value field
+        self.__noValue = {}
+
+    @property
+    def loaded(self):
+        return self.__loaded
+
+    def needsReload(self, maxAge):
+        """Check if the index has never been loaded or is older than maxAge seconds"""
+        return not self.__loaded or time.time() - self.__loadTime > maxAge
+
+    def invalidate(self):
+        """Force a reload of the index the next time it is used"""
+        with self.__lock:
+            self.__loaded = False
+
+    def load(self, tqDefs):
+        """Replace the content of the index
+
+        :param dict tqDefs: { TQId: TQ definition dict } as produced by the TaskQueueDB,
+                            the definition dicts must contain the Priority
+        """
+        tqs = {}
+        valueIndex = {field: {} for field in indexedMatchFields}
+        valueIndex["OwnerGroup"] = {}
+        valueIndex["Setup"] = {}
+        noValue = {field: set() for field in indexedMatchFields}
+        for tqId, tqDef in tqDefs.items():
+            self.__indexTaskQueue(tqs, valueIndex, noValue, tqId, tqDef)
+        with self.__lock:
+            self.__tqs = tqs
+            self.__valueIndex = valueIndex
+            self.__noValue = noValue
+            self.__loaded = True
+            self.__loadTime = time.time()
+
+    @staticmethod
+    def __indexTaskQueue(tqs, valueIndex, noValue, tqId, tqDef):
+        tqData = {"Priority": float(tqDef.get("Priority", 1))}
+        for field in indexedSingleFields:
+            tqData[field] = tqDef[field]
+        tqData["CPUTime"] = int(tqData["CPUTime"])
+        for field in ("OwnerGroup", "Setup"):
+            valueIndex[field].setdefault(tqData[field], set()).add(tqId)
+        for field in indexedMatchFields + ("BannedSite",):
+            values = frozenset(v for v in _toList(tqDef.get("%ss" % field, [])) if v)
+            tqData["%ss" % field] = values
+            if field not in noValue:
+                continue
+            if not values:
+                noValue[field].add(tqId)
+            for value in values:
+                valueIndex[field].setdefault(value, set()).add(tqId)
+        tqs[tqId] = tqData
+
+    @staticmethod
+    def __unindexTaskQueue(tqs, valueIndex, noValue, tqId):
+        tqData = tqs.pop(tqId, None)
+        if not tqData:
+            return
+        for field in ("OwnerGroup", "Setup"):
+            valueIndex[field].get(tqData[field], set()).discard(tqId)
+        for field in indexedMatchFields:
+            noValue[field].discard(tqId)
+            for value in tqData["%ss" % field]:
+                valueIndex[field].get(value, set()).discard(tqId)
+
+    def addTaskQueue(self, tqId, tqDef, priority=1):
+        """Add (or replace) a task queue definition
+
+        :param int tqId: task queue ID
+        :param dict tqDef: unescaped task queue definition
+        :param float priority: task queue priority
+        """
+        if not self.__loaded:
+            return
+        tqDef = dict(tqDef)
+        tqDef.setdefault("Priority", priority)
+        with self.__lock:
+            self.__unindexTaskQueue(self.__tqs, self.__valueIndex, self.__noValue, tqId)
+            self.__indexTaskQueue(self.__tqs, self.__valueIndex, self.__noValue, tqId, tqDef)
+
+    def removeTaskQueues(self, tqIds):
+        """Remove task queues from the index
+
+        :param list tqIds: task queue IDs
+        """
+        if not self.__loaded:
+            return
+        with self.__lock:
+            for tqId in tqIds:
+                self.__unindexTaskQueue(self.__tqs, self.__valueIndex, self.__noValue, int(tqId))
+
+    def setPriority(self, tqIds, priority):
+        """Update the priority of task queues
+
+        :param list tqIds: task queue IDs
+        :param float priority: new priority
+        """
+        if not self.__loaded:
+            return
+        with self.__lock:
+            for tqId in tqIds:
+                tqData = self.__tqs.get(int(tqId))
+                if tqData:
+                    tqData["Priority"] = float(priority)
+
+    def __len__(self):
+        return len(self.__tqs)
+
+    def match(self, tqMatchDict, numQueuesToGet=1, negativeCond=None):
+        """Get the task queues matching a resource description
+
+        :param dict tqMatchDict: unescaped (but already checked) match definition
+        :param int numQueuesToGet: maximum number of TQs to return, 0 means all of them
+        :param negativeCond: dict or list of dicts with the conditions the TQs must NOT fulfil
+        :returns: list of (TQId, OwnerDN, OwnerGroup) sorted randomly weighted by the TQ priority,
+                  or None if the match conditions are inconsistent
+        """
+        tqMatchDict = dict(tqMatchDict)
+        with self.__lock:
+            candidates = self.__selectCandidates(tqMatchDict)
+            if candidates is None:
+                return None
+            checks = self.__generateChecks(tqMatchDict, negativeCond)
+            if checks is None:
+                return None
+            matched = []
+            for tqId in candidates:
+                tqData = self.__tqs[tqId]
+                if all(check(tqData) for check in checks):
+                    matched.append((tqId, tqData["OwnerDN"], tqData["OwnerGroup"], tqData["Priority"]))
+
+        # Same as ORDER BY RAND() / tq.Priority ASC
+        sortKeys = {tqId: random.random() / prio if prio > 0 else 0.0 for tqId, _, _, prio in matched}
+        matched.sort(key=lambda tqTuple: sortKeys[tqTuple[0]])
+        if numQueuesToGet:
+            matched = matched[:numQueuesToGet]
+        return [(tqId, ownerDN, ownerGroup) for tqId, ownerDN, ownerGroup, _ in matched]
+
+    def __selectCandidates(self, tqMatchDict):
+        """Restrict the TQs to be checked using the inverted lists"""
+        candidates = None
+
+        def restrict(current, tqIds):
+            return set(tqIds) if current is None else current & tqIds
+
+        if "OwnerGroup" in tqMatchDict:
+            groupTQs = set()
+            for group in _toList(tqMatchDict["OwnerGroup"]):
+                groupTQs |= self.__valueIndex["OwnerGroup"].get(group, set())
+            candidates = restrict(candidates, groupTQs)
+        if "Setup" in tqMatchDict:
+            setupTQs = set()
+            for setup in _toList(tqMatchDict["Setup"]):
+                setupTQs |= self.__valueIndex["Setup"].get(setup, set())
+            candidates = restrict(candidates, setupTQs)
+        for field in indexedMatchFields:
+            if field == "Tag" or field not in tqMatchDict:
+                continue
+            values = [v for v in _toList(tqMatchDict[field]) if v] if tqMatchDict[field] else []
+            if not values or _isAny(values):
+                continue
+            fieldTQs = set(self.__noValue[field])
+            for value in values:
+                fieldTQs |= self.__valueIndex[field].get(value, set())
+            candidates = restrict(candidates, fieldTQs)
+        if candidates is None:
+            candidates = set(self.__tqs)
+        return candidates
+
+    def __generateChecks(self, tqMatchDict, negativeCond):
+        """Generate the list of predicates a TQ has to fulfil to be matched"""
+        checks = []
+
+        if "OwnerDN" in tqMatchDict and "OwnerGroup" in tqMatchDict:
+            dns = set(_toList(tqMatchDict["OwnerDN"]))
+            sharingGroups = set()
+            ownerGroups = set()
+            for group in _toList(tqMatchDict["OwnerGroup"]):
+                if Properties.JOB_SHARING in Registry.getPropertiesForGroup(group):
+                    sharingGroups.add(group)
+                else:
+                    ownerGroups.add(group)
+            checks.append(
+                lambda tq: tq["OwnerGroup"] in sharingGroups
+                or (tq["OwnerGroup"] in ownerGroups and tq["OwnerDN"] in dns)
+            )
+        elif "OwnerDN" in tqMatchDict:
+            dns = set(_toList(tqMatchDict["OwnerDN"]))
+            checks.append(lambda tq: tq["OwnerDN"] in dns)
+
+        if "CPUTime" in tqMatchDict:
+            cpuTime = max(int(v) for v in _toList(tqMatchDict["CPUTime"]))
+            checks.append(lambda tq: tq["CPUTime"] <= cpuTime)
+
+        # Just treating the (not so) special case of no Tag, No RequiredTag
+        if "Tag" not in tqMatchDict and "RequiredTag" not in tqMatchDict:
+            tqMatchDict["Tag"] = []
+
+        tags = []
+        if "Tag" in tqMatchDict:
+            tags = _toList(tqMatchDict["Tag"]) if tqMatchDict["Tag"] else []
+            if not _isAny(tags):
+                # All the TQ tags must be provided by the resource
+                resourceTags = frozenset(tags)
+                checks.append(lambda tq: tq["Tags"] <= resourceTags)
+
+        # In case of Site, check it's not in job banned sites
+        sites = _toList(tqMatchDict["Site"]) if tqMatchDict.get("Site") else []
+        if sites and not _isAny(sites):
+            checks.append(lambda tq: any(site not in tq["BannedSites"] for site in sites))
+
+        requiredTags = _toList(tqMatchDict["RequiredTag"]) if tqMatchDict.get("RequiredTag") else []
+        if requiredTags and not _isAny(requiredTags):
+            if not set(requiredTags).issubset(set(tags)):
+                return None
+            requiredTags = frozenset(requiredTags)
+            checks.append(lambda tq: requiredTags <= tq["Tags"])
+
+        # Resource banning conditions
+        for field in indexedMatchFields:
+            bannedValues = tqMatchDict.get("Banned%s" % field)
+            if not bannedValues:
+                continue
+            bannedValues = _toList(bannedValues)
+            if _isAny(bannedValues):
+                continue
+            checks.append(self.__notAllInCheck("%ss" % field, bannedValues))
+
+        if negativeCond:
+            if not isinstance(negativeCond, (list, tuple)):
+                negativeCond = [negativeCond]
+            negChecks = [self.__negativeCondCheck(condDict) for condDict in negativeCond]
+            checks.append(lambda tq: any(negCheck(tq) for negCheck in negChecks))
+
+        return checks
+
+    @staticmethod
+    def __notAllInCheck(tqField, values):
+        return lambda tq: any(value not in tq[tqField] for value in values)
+
+    @staticmethod
+    def __negativeCondCheck(condDict):
+        """not ( cond1 and cond2 ) = ( not cond1 or not cond 2 )"""
+        subChecks = []
+        for field, values in condDict.items():
+            values = _toList(values)
+            if field in indexedMatchFields:
+                tqField = "%ss" % field
+                subChecks.append(lambda tq, tqField=tqField, values=values: all(v not in tq[tqField] for v in values))
+            elif field in indexedSingleFields:
+                for value in values:
+                    subChecks.append(lambda tq, field=field, value=value: str(tq[field]) != value)
+        return lambda tq: any(subCheck(tq) for subCheck in subChecks)
@@ -0,0 +1,115 @@
+""" Test class for the TaskQueueIndex
+"""
+import pytest
+
+from DIRAC.WorkloadManagementSystem.private import TaskQueueIndex as tqIndexModule
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+baseDef = {"OwnerDN": "/my/DN", "OwnerGroup": "myGroup", "Setup": "aSetup", "CPUTime": 5000, "Priority": 1}
+
+tqDefs = {
+    1: dict(baseDef),
+    2: dict(baseDef, Sites=["LCG.CERN.ch"]),
+    3: dict(baseDef, Sites=["CLOUD.IN2P3.fr"]),
+    4: dict(baseDef, Sites=["LCG.CERN.ch", "CLOUD.IN2P3.fr"], Platforms=["centos7"]),
+    5: dict(baseDef, BannedSites=["LCG.CERN.ch"]),
+    6: dict(baseDef, Tags=["MultiProcessor"]),
+    7: dict(baseDef, Tags=["MultiProcessor", "GPU"], CPUTime=500000),
+    8: dict(baseDef, OwnerDN="/other/DN", Setup="otherSetup"),
+}
+
+
+@pytest.fixture
+def tqIndex(mocker):
+    mocker.patch.object(tqIndexModule.Registry, "getPropertiesForGroup", return_value=[])
+    index = TaskQueueIndex()
+    index.load(tqDefs)
+    return index
+
+
+def _matched(tqIndex, matchDict, **kwargs):
+    return {tqTuple[0] for tqTuple in tqIndex.match(matchDict, numQueuesToGet=0, **kwargs)}
+
+
+def test_loadAndUpdate(tqIndex):
+    assert tqIndex.loaded
+    assert len(tqIndex) == len(tqDefs)
+    assert not tqIndex.needsReload(60)
+    assert tqIndex.needsReload(-1)
+
+    tqIndex.addTaskQueue(9, dict(baseDef, Sites=["DIRAC.Jenkins.ch"]))
+    assert 9 in _matched(tqIndex, {"Setup": "aSetup", "CPUTime": 50000, "Site": "DIRAC.Jenkins.ch"})
+    tqIndex.removeTaskQueues(["9", 1])
+    assert len(tqIndex) == len(tqDefs) - 1
+    assert not {1, 9} & _matched(tqIndex, {"Setup": "aSetup", "CPUTime": 50000})
+
+    tqIndex.invalidate()
+    assert tqIndex.needsReload(60)
+    # Updates are ignored until the index is loaded again
+    tqIndex.addTaskQueue(9, baseDef)
+    assert len(tqIndex) == len(tqDefs) - 1
+
+
+def test_unloadedIndexIgnoresUpdates():
+    tqIndex = TaskQueueIndex()
+    tqIndex.addTaskQueue(1, baseDef)
+    tqIndex.setPriority([1], 10)
+    assert len(tqIndex) == 0
+    assert tqIndex.needsReload(60)
+
+
+@pytest.mark.parametrize(
+    "matchDict, expected",
+    [
+        ({"Setup": "aSetup", "CPUTime": 50000}, {1, 2, 3, 4, 5}),
+        ({"Setup": "aSetup", "CPUTime": 500000}, {1, 2, 3, 4, 5}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "Site": "LCG.CERN.ch"}, {1, 2, 4}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "Site": ["LCG.CERN.ch", "CLOUD.IN2P3.fr"]}, {1, 2, 3, 4, 5}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "Site": "Any"}, {1, 2, 3, 4, 5}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "Platform": "centos7"}, {1, 2, 3, 4, 5}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "Platform": "slc6"}, {1, 2, 3, 5}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "BannedSite": "CLOUD.IN2P3.fr"}, {1, 2, 5}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "Tag": "MultiProcessor"}, {1, 2, 3, 4, 5, 6}),
+        ({"Setup": "aSetup", "CPUTime": 500000, "Tag": ["MultiProcessor", "GPU"]}, {1, 2, 3, 4, 5, 6, 7}),
+        ({"Setup": "aSetup", "CPUTime": 500000, "Tag": "any"}, {1, 2, 3, 4, 5, 6, 7}),
+        ({"Setup": "aSetup", "CPUTime": 500000, "Tag": ["MultiProcessor", "GPU"], "RequiredTag": "GPU"}, {7}),
+        ({"Setup": "otherSetup", "CPUTime": 50000}, {8}),
+        ({"Setup": "aSetup", "CPUTime": 50000, "OwnerDN": "/other/DN", "OwnerGroup": "myGroup"}, set()),
+        ({"CPUTime": 50000, "OwnerDN": "/other/DN", "OwnerGroup": "myGroup"}, {8}),
+    ],
+)
+def test_match(tqIndex, matchDict, expected):
+    assert _matched(tqIndex, matchDict) == expected
+
+
+def test_matchWrongConditions(tqIndex):
+    assert tqIndex.match({"Setup": "aSetup", "CPUTime": 50000, "RequiredTag": "GPU"}) is None
+
+
+def test_matchJobSharing(tqIndex, mocker):
+    mocker.patch.object(tqIndexModule.Registry, "getPropertiesForGroup", return_value=["JobSharing"])
+    matchDict = {"CPUTime": 50000, "OwnerDN": "/yet/another/DN", "OwnerGroup": "myGroup"}
+    assert _matched(tqIndex, matchDict) == {1, 2, 3, 4, 5, 8}
+
+
+@pytest.mark.parametrize(
+    "negativeCond, expected",
+    [
+        ({"Site": "LCG.CERN.ch"}, {1, 3, 5}),
+        ({"Site": ["LCG.CERN.ch", "CLOUD.IN2P3.fr"]}, {1, 5}),
+        ([{"Site": "LCG.CERN.ch"}, {"Site": "CLOUD.IN2P3.fr"}], {1, 2, 3, 5}),
+        ({"Site": "LCG.CERN.ch", "Platform": "centos7"}, {1, 2, 3, 5}),
+        ({"OwnerGroup": "myGroup"}, set()),
+    ],
+)
+def test_matchNegativeConditions(tqIndex, negativeCond, expected):
+    assert _matched(tqIndex, {"Setup": "aSetup", "CPUTime": 50000}, negativeCond=negativeCond) == expected
+
+
+def test_matchPriorities(tqIndex):
+    matchDict = {"Setup": "aSetup", "CPUTime": 50000}
+    assert len(tqIndex.match(matchDict, numQueuesToGet=2)) == 2
+    assert tqIndex.match(matchDict, numQueuesToGet=10)[0][1:] == ("/my/DN", "myGroup")
+    # A TQ with a huge priority almost always comes first
+    tqIndex.setPriority([3], 10**6)
+    assert sum(tqIndex.match(matchDict)[0][0] == 3 for _ in range(20)) >= 19
@@ -426,3 +426,51 @@ def test_attributes(putAndDelete):
     res = jobDB.getJobsAttributes([jobID_1, jobID_2], ["Status"])
     assert res["OK"] is True, res["Message"]
     assert res["Value"] == {jobID_1: {"Status": JobStatus.DONE}, jobID_2: {"Status": JobStatus.RUNNING}}
+
+
+def test_runningJobsCounters(putAndDelete):
+
+    # An existing database without the counters gets them installed
+    for cmd in (
+        "DROP TRIGGER IF EXISTS `RunningJobsCounters_Insert`",
+        "DROP TRIGGER IF EXISTS `RunningJobsCounters_Update`",
+        "DROP TRIGGER IF EXISTS `RunningJobsCounters_Delete`",
+        "DROP TABLE IF EXISTS `RunningJobsCounters`",
+    ):
+        res = jobDB._update(cmd)
+        assert res["OK"] is True, res["Message"]
+    res = jobDB.installRunningJobsCounters()
+    assert res["OK"] is True, res["Message"]
+    assert res["Value"] is True
+    res = jobDB.installRunningJobsCounters()
+    assert res["OK"] is True, res["Message"]
+    assert res["Value"] is False
+
+    res = jobDB.insertNewJobIntoDB(jdl, "owner", "/DN/OF/owner", "ownerGroup", "someSetup")
+    assert res["OK"] is True, res["Message"]
+    jobID = int(res["JobID"])
+    res = jobDB.setJobAttributes(jobID, ["Site", "Status"], ["DIRAC.Jenkins.ch", JobStatus.RUNNING], True)
+    assert res["OK"] is True, res["Message"]
+    res = jobDB.getRunningJobsCounters("DIRAC.Jenkins.ch")
+    assert res["OK"] is True, res["Message"]
+    assert res["Value"] == {"User": 1}
+
+    res = jobDB.checkRunningJobsCounters()
+    assert res["OK"] is True, res["Message"]
+    assert res["Value"] == {}
+
+    # A drift is found, and repaired
+    res = jobDB._update("UPDATE RunningJobsCounters SET Counter = 5 WHERE Site = 'DIRAC.Jenkins.ch'")
+    assert res["OK"] is True, res["Message"]
+    res = jobDB.checkRunningJobsCounters()
+    assert res["OK"] is True, res["Message"]
+    assert res["Value"] == {("DIRAC.Jenkins.ch", "User"): (5, 1)}
+    res = jobDB.resetRunningJobsCounters()
+    assert res["OK"] is True, res["Message"]
+    res = jobDB.getRunningJobsCounters("DIRAC.Jenkins.ch")
+    assert res["Value"] == {"User": 1}
+
+    res = jobDB.setJobAttributes(jobID, ["Status"], [JobStatus.DONE], True)
+    assert res["OK"] is True, res["Message"]
+    res = jobDB.getRunningJobsCounters("DIRAC.Jenkins.ch")
+    assert res["Value"] == {}
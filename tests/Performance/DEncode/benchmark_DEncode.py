@@ -0,0 +1,92 @@
+"""
+Throughput comparison of the DEncode implementations (generic per type dispatch vs fast codec)
+on payloads similar to what goes through DISET: job JDLs, replica dictionaries and accounting bundles.
+
+Usage::
+
+  python benchmark_DEncode.py [number of repetitions]
+"""
+import datetime
+import sys
+import timeit
+
+from DIRAC.Core.Utilities.DEncode import encodeGeneric, decodeGeneric, encodeFast, decodeFast
+
+
+def jobPayload(nJobs=1000):
+    """Job attributes and JDL, as returned by the JobMonitoring"""
+    jdl = "\n".join('  %s = "%s";' % ("Attribute%d" % i, "Value %d" % i * 5) for i in range(40))
+    now = datetime.datetime.utcnow()
+    return {
+        jobID: {
+            "JobID": jobID,
+            "Status": "Waiting",
+            "MinorStatus": "Pilot Agent Submission",
+            "Site": "ANY",
+            "OwnerDN": "/DC=ch/DC=cern/OU=Users/CN=someone",
+            "SubmissionTime": now,
+            "JDL": "[\n%s\n]" % jdl,
+        }
+        for jobID in range(nJobs)
+    }
+
+
+def replicaPayload(nLFNs=50000):
+    """getReplicas like result"""
+    lfns = ["/vo/data/2022/RAW/run%08d/file_%06d.raw" % (i // 100, i) for i in range(nLFNs)]
+    return {
+        "OK": True,
+        "Value": {
+            "Successful": {
+                lfn: {
+                    "CERN-DST": "root://eos.cern.ch//eos%s" % lfn,
+                    "IN2P3-DST": "srm://ccsrm.in2p3.fr/pnfs%s" % lfn,
+                }
+                for lfn in lfns
+            },
+            "Failed": {},
+        },
+    }
+
+
+def accountingPayload(nRecords=20000):
+    """Accounting bundle: list of (type, start, end, values) records"""
+    start = datetime.datetime.utcnow()
+    end = start + datetime.timedelta(hours=1)
+    return [
+        ("Job", start, end, ["user", "group", "Site%d" % (i % 50), 1, 3600.5, 3000.25, 0.95, 10 * i, True])
+        for i in range(nRecords)
+    ]
+
+
+def benchmark(name, payload, repetitions):
+    """Print the encoding and decoding throughput of both implementations for a payload"""
+    encodedData = encodeGeneric(payload)
+    if encodeFast(payload) != encodedData or decodeFast(encodedData) != decodeGeneric(encodedData):
+        raise RuntimeError("The implementations are not compatible for %s" % name)
+    sizeMB = len(encodedData) / 1024.0 / 1024.0
+    print("%s (%.1f MB)" % (name, sizeMB))
+    results = {}
+    for label, func, arg in (
+        ("encodeGeneric", encodeGeneric, payload),
+        ("encodeFast", encodeFast, payload),
+        ("decodeGeneric", decodeGeneric, encodedData),
+        ("decodeFast", decodeFast, encodedData),
+    ):
+        elapsed = min(timeit.repeat(lambda: func(arg), number=1, repeat=repetitions))
+        results[label] = elapsed
+        print("  %-14s %8.3f s %8.1f MB/s" % (label, elapsed, sizeMB / elapsed))
+    print(
+        "  speedup: encode x%.2f, decode x%.2f"
+        % (
+            results["encodeGeneric"] / results["encodeFast"],
+            results["decodeGeneric"] / results["decodeFast"],
+        )
+    )
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    benchmark("Jobs attributes and JDLs", jobPayload(), repetitions)
+    benchmark("Replicas", replicaPayload(), repetitions)
+    benchmark("Accounting bundle", accountingPayload(), repetitions)
@@ -0,0 +1,193 @@
+"""
+Matching throughput of the WMS Matcher against a synthetic TaskQueueDB.
+
+The TaskQueueDB has to be defined in the configuration and point to a local MySQL server: the task
+queues are created there with job IDs starting at FIRST_JOB_ID, and the remaining jobs are removed at
+the end. The JobDB, JobLoggingDB and PilotAgentsDB are replaced by in-memory fakes, so that the
+measure focuses on the Matcher itself and on the TaskQueueDB. The time spent in each stage of the
+matching is printed from the histograms of the Matcher (gMatchingTimes).
+
+Usage::
+
+  python benchmark_Matcher.py --taskQueues 500 --jobs 20000 --sites 50 --tags 10 --matches 5000
+"""
+import argparse
+import random
+import time
+
+import DIRAC
+
+DIRAC.initialize()  # Initialize configuration
+
+from DIRAC import S_OK
+from DIRAC.Core.Security import Properties
+from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher, gMatchingTimes
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+
+FIRST_JOB_ID = 10**9
+GROUPS = ["dirac_user", "dirac_prod", "dirac_data"]
+PLATFORMS = ["x86_64-el9", "x86_64-centos7", "aarch64-el9"]
+JOB_TYPES = ["User", "MCSimulation", "Merge"]
+
+
+class FakeJobDB:
+    """In-memory JobDB, with the methods used by the Matcher and the Limiter"""
+
+    jobAttributeNames = ["JobID", "Status", "MinorStatus", "ApplicationStatus", "Site", "OwnerDN", "OwnerGroup"]
+
+    def __init__(self):
+        self.jobs = {}
+
+    def getJobAttributes(self, jobID, attrList=None):
+        return S_OK({name: value for name, value in self.jobs[jobID].items() if not attrList or name in attrList})
+
+    def getJobsAttributes(self, jobIDs, attrList=None):
+        return S_OK({jobID: self.getJobAttributes(jobID, attrList)["Value"] for jobID in jobIDs if jobID in self.jobs})
+
+    def setJobAttributes(self, jobID, attrNames, attrValues, **kwargs):
+        for jid in jobID if isinstance(jobID, list) else [jobID]:
+            self.jobs[jid].update(zip(attrNames, attrValues))
+        return S_OK()
+
+    def getJobJDL(self, jobID, original=False, status=""):
+        return S_OK('[ Executable = "dirac-jobexec"; JobID = %s; ]' % jobID)
+
+    def getJobsJDL(self, jobIDs, original=False):
+        return S_OK({jobID: self.getJobJDL(jobID)["Value"] for jobID in jobIDs})
+
+    def getJobOptParameters(self, jobID, paramList=None):
+        return S_OK({})
+
+    def getJobsOptParameters(self, jobIDs, paramList=None):
+        return S_OK({})
+
+    def getCounters(self, *args, **kwargs):
+        return S_OK([])
+
+
+class FakeDB:
+    """Accepts any call (JobLoggingDB and PilotAgentsDB)"""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: S_OK()
+
+
+class FakeSiteStatus:
+    """All the sites are usable"""
+
+    def getUsableSites(self, siteNames=None):
+        return S_OK(siteNames if isinstance(siteNames, list) else [siteNames])
+
+
+def fillTaskQueues(tqDB, jobDB, args):
+    """Insert the jobs in randomly defined task queues"""
+    sites = ["DIRAC.Site%d.org" % i for i in range(args.sites)]
+    tags = ["Tag%d" % i for i in range(args.tags)]
+    definitions = []
+    for i in range(args.taskQueues):
+        group = random.choice(GROUPS)
+        tqDefDict = {
+            "OwnerDN": "/DC=org/DC=dirac/CN=user%d" % (i % 20),
+            "OwnerGroup": group,
+            "Setup": DIRAC.gConfig.getValue("/DIRAC/Setup", "Benchmark"),
+            "CPUTime": random.choice([3600, 86400, 345600]),
+            "Platforms": [random.choice(PLATFORMS)],
+            "JobTypes": [random.choice(JOB_TYPES)],
+        }
+        if random.random() < 0.3:
+            tqDefDict["Sites"] = random.sample(sites, min(len(sites), 3))
+        if tags and random.random() < 0.3:
+            tqDefDict["Tags"] = random.sample(tags, 1)
+        definitions.append(tqDefDict)
+
+    startTime = time.time()
+    for jobID in range(FIRST_JOB_ID, FIRST_JOB_ID + args.jobs):
+        tqDefDict = random.choice(definitions)
+        result = tqDB.insertJob(jobID, tqDefDict, random.randint(1, 10))
+        if not result["OK"]:
+            raise RuntimeError(result["Message"])
+        jobDB.jobs[jobID] = {
+            "JobID": jobID,
+            "Status": "Waiting",
+            "OwnerDN": tqDefDict["OwnerDN"],
+            "OwnerGroup": tqDefDict["OwnerGroup"],
+        }
+    print("Inserted %d jobs in %d task queues in %.1f s" % (args.jobs, args.taskQueues, time.time() - startTime))
+    return sites, tags
+
+
+def runMatches(matcher, sites, tags, args):
+    """Request jobs as generic pilots would do, until args.matches jobs are matched"""
+    credDict = {"DN": "/DC=org/DC=dirac/CN=pilot", "group": "hosts", "properties": [Properties.GENERIC_PILOT]}
+    matched = noMatch = 0
+    startTime = time.time()
+    while matched < args.matches and matched + noMatch < 10 * args.matches:
+        site = random.choice(sites)
+        resourceDescription = {
+            "Site": site,
+            "GridCE": "ce.%s" % site.lower(),
+            "Setup": DIRAC.gConfig.getValue("/DIRAC/Setup", "Benchmark"),
+            "CPUTime": 400000,
+            "OwnerGroup": GROUPS,
+            "Platform": random.choice(PLATFORMS),
+            "ReleaseVersion": DIRAC.version,
+            "PilotInfoReportedFlag": True,
+        }
+        if tags:
+            resourceDescription["Tag"] = random.sample(tags, min(len(tags), 2))
+        if matcher.selectJob(resourceDescription, credDict):
+            matched += 1
+        else:
+            noMatch += 1
+    elapsed = time.time() - startTime
+    print(
+        "%d matches and %d requests without match in %.1f s: %.1f matches/s"
+        % (matched, noMatch, elapsed, matched / elapsed if elapsed else 0)
+    )
+
+
+def printStageTimes():
+    """Print the time spent in each stage of the matching"""
+    print("%-16s %8s %10s %10s" % ("Stage", "Count", "Mean (ms)", "Max (ms)"))
+    for stage, histogram in sorted(gMatchingTimes.getHistograms().items()):
+        print(
+            "%-16s %8d %10.2f %10.2f"
+            % (
+                stage,
+                histogram["Count"],
+                1000 * histogram["TotalTime"] / histogram["Count"],
+                1000 * histogram["MaxTime"],
+            )
+        )
+
+
+def cleanTaskQueues(tqDB, jobDB):
+    """Remove the remaining jobs and the empty task queues"""
+    for jobID in jobDB.jobs:
+        if jobDB.jobs[jobID]["Status"] == "Waiting":
+            tqDB.deleteJob(jobID)
+    tqDB.cleanOrphanedTaskQueues()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--taskQueues", type=int, default=500, help="number of task queue definitions")
+    parser.add_argument("--jobs", type=int, default=20000, help="number of jobs in the task queues")
+    parser.add_argument("--sites", type=int, default=50, help="number of sites")
+    parser.add_argument("--tags", type=int, default=10, help="number of tags")
+    parser.add_argument("--matches", type=int, default=5000, help="number of jobs to match")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random generator")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tqDB = TaskQueueDB()
+    jobDB = FakeJobDB()
+    matcher = Matcher(pilotAgentsDB=FakeDB(), jobDB=jobDB, tqDB=tqDB, jlDB=FakeDB())
+    matcher.siteClient = FakeSiteStatus()
+
+    try:
+        sites, tags = fillTaskQueues(tqDB, jobDB, args)
+        runMatches(matcher, sites, tags, args)
+        printStageTimes()
+    finally:
+        cleanTaskQueues(tqDB, jobDB)